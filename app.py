@@ -31,6 +31,8 @@ from src.utils.contract_generator import generar_contrato_docx
 from src.utils.ui_helpers import detect_mobile_device, apply_responsive_css, detect_device_type
 from src.ui.mobile import render_mobile_interface
 from src.ui.desktop import render_desktop_interface
+from src.ui.admin import render_panel_admin, panel_admin_habilitado
+from src.utils.telemetria import iniciar_servidor_metricas
 
 # Import carbon calculator module
 try:
@@ -44,6 +46,12 @@ except ImportError:
 project_manager = None
 financial_summary_generator = None
 
+@st.cache_resource
+def iniciar_metricas():
+    """Inicia el endpoint de métricas una sola vez por proceso (no en cada rerun)."""
+    return iniciar_servidor_metricas()
+
+
 def main():
     # Configuración básica
     st.set_page_config(
@@ -52,6 +60,8 @@ def main():
         initial_sidebar_state="collapsed"
     )
     
+    puerto_metricas = iniciar_metricas()
+
     # Inicializar first_load
     if 'first_load' not in st.session_state:
         st.session_state.first_load = True
@@ -94,6 +104,10 @@ def main():
         st.markdown("- **Móvil**: Interfaz con tabs optimizada")
         st.markdown("- **Desktop**: Interfaz completa con sidebar")
         st.markdown("- Cambia instantáneamente con los botones")
+
+        if panel_admin_habilitado():
+            st.markdown("---")
+            render_panel_admin(puerto_metricas)
     
     # Aplicar CSS responsive
     apply_responsive_css()
@@ -41,8 +41,8 @@ def reproduce():
         incluir_baterias=False
     )
     
-    monthly_generation = results[7] # 8th return value is monthly_generation_init
-    n = results[14] # 15th return value is n (PR)
+    monthly_generation = results.generacion_mensual
+    n = results.performance_ratio
     
     print(f"Performance Ratio (PR): {n}")
     print("Monthly Generation (kWh):")
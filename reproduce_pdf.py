@@ -10,6 +10,7 @@ from src.utils.pdf_generator import PropuestaPDF
 from src.services.calculator_service import cotizacion, redondear_a_par
 from src.config import HSP_MENSUAL_POR_CIUDAD, HSP_POR_CIUDAD, PROMEDIOS_COSTO
 from src.utils.plotting import generar_grafica_generacion
+from src.services.location_service import get_static_map_image
 
 def generate_sample_pdf():
     # --------------------------------------------------------------------------------
@@ -179,7 +180,10 @@ def generate_sample_pdf():
     )
 
     try:
-        pdf_bytes = pdf.generar(datos_para_pdf, usa_financiamiento=usa_financiamiento, lat=lat, lon=lon)
+        api_key = os.environ.get("Maps_API_KEY")
+        imagen_mapa = get_static_map_image(lat, lon, api_key) if api_key else None
+        pdf_bytes = pdf.generar(datos_para_pdf, usa_financiamiento=usa_financiamiento, lat=lat, lon=lon,
+                                imagen_mapa=imagen_mapa)
         
         output_filename = "sample_propuesta_real.pdf"
         with open(output_filename, "wb") as f:
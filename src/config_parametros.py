@@ -6,6 +6,7 @@ por el usuario o que varían según el mercado/cliente.
 
 Para modificar los valores por defecto, cambia los valores en DEFAULT_PARAMS.
 """
+from collections.abc import Mapping
 
 # =============================================================================
 # PARÁMETROS CONFIGURABLES POR DEFECTO
@@ -73,6 +74,81 @@ PARAM_DESCRIPTIONS = {
     "performance_ratio_base": "Eficiencia base del sistema considerando pérdidas. Típicamente 70-80%.",
 }
 
+# =============================================================================
+# PARÁMETROS COMPILADOS
+# =============================================================================
+
+class ParametrosCompilados(Mapping):
+    """
+    Conjunto inmutable de parámetros ya combinados con los defaults y validados.
+
+    Se construye una vez por solicitud con compilar_parametros() y se pasa como
+    custom_params a las funciones de cálculo, que lo leen sin volver a combinar
+    ni validar. Es hashable, así que sirve directamente como clave de caché.
+    """
+
+    __slots__ = ("_valores", "_hash")
+
+    def __init__(self, valores):
+        object.__setattr__(self, "_valores", dict(valores))
+        object.__setattr__(self, "_hash", hash(tuple(sorted(self._valores.items()))))
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("ParametrosCompilados es inmutable")
+
+    def __getitem__(self, nombre):
+        return self._valores[nombre]
+
+    def __iter__(self):
+        return iter(self._valores)
+
+    def __len__(self):
+        return len(self._valores)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, otro):
+        if isinstance(otro, ParametrosCompilados):
+            return self._hash == otro._hash and self._valores == otro._valores
+        return NotImplemented
+
+    def __reduce__(self):
+        return (ParametrosCompilados, (self._valores,))
+
+    def __repr__(self):
+        personalizados = {k: v for k, v in self._valores.items() if DEFAULT_PARAMS.get(k) != v}
+        return f"ParametrosCompilados({personalizados})"
+
+
+def compilar_parametros(custom_params: dict = None) -> ParametrosCompilados:
+    """
+    Combina los parámetros personalizados con DEFAULT_PARAMS y los valida contra PARAM_LIMITS.
+
+    Args:
+        custom_params: Diccionario opcional con valores personalizados. Si ya es un
+                       ParametrosCompilados se retorna tal cual.
+
+    Returns:
+        ParametrosCompilados con todos los parámetros
+
+    Raises:
+        ValueError: si algún parámetro está fuera de sus límites (el mensaje lista todos)
+    """
+    if isinstance(custom_params, ParametrosCompilados):
+        return custom_params
+
+    params = get_all_params(custom_params)
+    errores = []
+    for name, value in params.items():
+        is_valid, error_message = validate_param(name, value)
+        if not is_valid:
+            errores.append(error_message)
+    if errores:
+        raise ValueError("Parámetros inválidos: " + "; ".join(errores))
+    return ParametrosCompilados(params)
+
+
 # =============================================================================
 # FUNCIONES DE ACCESO
 # =============================================================================
@@ -84,10 +160,13 @@ def get_param(name: str, custom_params: dict = None) -> float:
     Args:
         name: Nombre del parámetro
         custom_params: Diccionario opcional con valores personalizados
+                       (o un ParametrosCompilados, que ya incluye los defaults)
 
     Returns:
         Valor del parámetro (personalizado si existe, default si no)
     """
+    if type(custom_params) is ParametrosCompilados:
+        return custom_params._valores.get(name, 0)
     if custom_params and name in custom_params:
         return custom_params[name]
     return DEFAULT_PARAMS.get(name, 0)
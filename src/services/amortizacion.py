@@ -0,0 +1,168 @@
+"""
+Amortización mensual de créditos y comparación de productos de financiamiento.
+
+cotizacion() resume el crédito en una cuota fija (npf.pmt) que descuenta 12 cuotas
+por año desde el año 1. Este módulo arma la tabla de amortización completa mes a
+mes (cuota, interés, abono a capital y saldo), con meses de gracia en los que solo
+se pagan intereses y con el mes en que arranca el crédito. Las tablas de muchos
+créditos se calculan a la vez como arreglos (créditos, meses).
+
+comparar_financiamientos() cruza una malla de productos (tasa × plazo × cuota
+inicial × gracia) con el flujo de caja del proyecto sin crédito y los ordena por
+VPN para el cliente, todo en un lote.
+"""
+import itertools
+
+import numpy as np
+
+from src.services.motor_vectorizado import (
+    argumentos_vectorizados,
+    cotizacion_vectorizada,
+    payback_vectorizado,
+    tir_vectorizada,
+    valor_proyecto_calculado,
+    vpn_vectorizado,
+)
+
+
+def tabla_amortizacion(monto, tasa_anual, plazo_meses, meses_gracia=0):
+    """
+    Tablas de amortización (sistema francés, cuota fija) de uno o varios créditos.
+
+    Args:
+        monto, tasa_anual, plazo_meses, meses_gracia: escalares o arreglos (broadcasting).
+            La tasa mensual es tasa_anual / 12, como en cotizacion(). Durante los
+            meses de gracia (incluidos en el plazo) solo se pagan intereses; el
+            capital se amortiza en los meses restantes.
+
+    Returns:
+        dict con cuota_fija (n,) y arreglos (n, meses) cuota, interes, abono_capital y
+        saldo (saldo al final de cada mes). Los meses después del plazo valen cero.
+    """
+    monto, tasa_anual, plazo_meses, meses_gracia = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(v, dtype=float)) for v in (monto, tasa_anual, plazo_meses, meses_gracia)))
+    if np.any(meses_gracia >= plazo_meses) or np.any(meses_gracia < 0):
+        raise ValueError("Los meses de gracia deben ser menores que el plazo del crédito")
+    tasa = tasa_anual / 12
+    meses_amortizacion = plazo_meses - meses_gracia
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cuota_fija = np.where(tasa > 0, monto * tasa / (1 - (1 + tasa) ** -meses_amortizacion),
+                              monto / meses_amortizacion)
+
+    # k: meses de amortización transcurridos al inicio de cada mes (0 durante la gracia)
+    mes = np.arange(1, int(plazo_meses.max()) + 1)
+    k = np.clip(mes[None, :] - meses_gracia[:, None] - 1, 0, None)
+    crecimiento = (1 + tasa[:, None]) ** k
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saldo_inicial = np.where(tasa[:, None] > 0,
+                                 monto[:, None] * crecimiento - cuota_fija[:, None] * (crecimiento - 1) / tasa[:, None],
+                                 monto[:, None] - cuota_fija[:, None] * k)
+    en_gracia = mes[None, :] <= meses_gracia[:, None]
+    vigente = mes[None, :] <= plazo_meses[:, None]
+
+    interes = np.where(vigente, saldo_inicial * tasa[:, None], 0.0)
+    cuota = np.where(vigente, np.where(en_gracia, interes, cuota_fija[:, None]), 0.0)
+    abono_capital = cuota - interes
+    saldo = np.where(vigente, saldo_inicial - abono_capital, 0.0)
+    # El último abono cierra el saldo (evita residuos de punto flotante)
+    saldo[np.abs(saldo) < 1e-6 * np.maximum(monto[:, None], 1)] = 0.0
+
+    return {
+        "cuota_fija": cuota_fija,
+        "cuota": cuota,
+        "interes": interes,
+        "abono_capital": abono_capital,
+        "saldo": saldo,
+    }
+
+
+def pagos_anuales(cuotas, años, mes_inicio=0):
+    """
+    Suma las cuotas mensuales (n, meses) por año del proyecto.
+
+    mes_inicio es el mes del proyecto (0 = primer mes del año 1) en que se paga la
+    primera cuota. Las cuotas que caen después del horizonte se cargan al último año
+    (el crédito se liquida al final del análisis).
+    """
+    cuotas = np.atleast_2d(np.asarray(cuotas, dtype=float))
+    desplazadas = np.zeros((len(cuotas), años * 12))
+    meses = cuotas.shape[1]
+    dentro = max(0, min(meses, años * 12 - mes_inicio))
+    desplazadas[:, mes_inicio:mes_inicio + dentro] = cuotas[:, :dentro]
+    por_año = desplazadas.reshape(len(cuotas), años, 12).sum(axis=2)
+    if años:
+        por_año[:, -1] += cuotas[:, dentro:].sum(axis=1)
+    return por_año
+
+
+def malla_productos(tasas, plazos_meses, cuotas_iniciales, meses_gracia=(0,)):
+    """Todas las combinaciones de productos de crédito como arreglos planos (tasa, plazo, cuota inicial, gracia)."""
+    combinaciones = [c for c in itertools.product(tasas, plazos_meses, cuotas_iniciales, meses_gracia) if c[3] < c[1]]
+    if not combinaciones:
+        raise ValueError("No hay productos válidos: la gracia debe ser menor que el plazo")
+    tasa, plazo, cuota_inicial, gracia = (np.array(v, dtype=float) for v in zip(*combinaciones))
+    return {"tasa_anual": tasa, "plazo_meses": plazo, "cuota_inicial": cuota_inicial, "meses_gracia": gracia}
+
+
+def comparar_financiamientos(productos, *args, mes_inicio_credito=0, precio_manual=None, mejores=5, **kwargs):
+    """
+    Evalúa productos de crédito contra el flujo de caja del proyecto y retorna los de mayor VPN.
+
+    Args:
+        productos: dict de arreglos tasa_anual (fracción), plazo_meses, cuota_inicial
+            (% del precio pagado de contado) y meses_gracia, como los de malla_productos().
+        *args, **kwargs: los argumentos de cotizacion() del proyecto (su financiamiento se ignora).
+        mes_inicio_credito: mes del proyecto en que se paga la primera cuota.
+        precio_manual: precio de venta opcional en vez del calculado.
+        mejores: cuántos productos retornar.
+
+    Returns:
+        dict con contado (valor_presente, tasa_interna y payback sin crédito), evaluados
+        (cantidad de productos) y productos: lista de dicts, mejor VPN primero, con los
+        datos del producto, monto, cuota_fija, intereses_totales, valor_presente,
+        tasa_interna (NaN si no existe) y payback (None si no se recupera).
+    """
+    argumentos = argumentos_vectorizados(*args, **kwargs)
+    argumentos.update(perc_financiamiento=0, tasa_interes_credito=0, plazo_credito_años=0)
+    precio = precio_manual if precio_manual is not None else valor_proyecto_calculado(argumentos)
+    argumentos["valor_proyecto"] = precio
+    años = int(argumentos["horizonte_tiempo"])
+
+    # Flujo del proyecto pagado de contado: una sola evaluación del motor
+    contado = cotizacion_vectorizada(**argumentos)
+    flujo_contado = contado["flujo_caja"][0]
+
+    monto = precio * (1 - np.asarray(productos["cuota_inicial"], dtype=float) / 100)
+    tabla = tabla_amortizacion(monto, productos["tasa_anual"], productos["plazo_meses"], productos["meses_gracia"])
+    flujos = np.tile(flujo_contado, (len(monto), 1))
+    flujos[:, 0] += monto
+    flujos[:, 1:] -= pagos_anuales(tabla["cuota"], años, mes_inicio_credito)
+
+    valor_presente = vpn_vectorizado(argumentos["dRate"], flujos)
+    tasa_interna = tir_vectorizada(flujos)
+    payback = payback_vectorizado(flujos)
+    intereses = tabla["interes"].sum(axis=1)
+
+    orden = np.argsort(-valor_presente, kind="stable")[:mejores]
+    resultado = [{
+        "tasa_anual": float(productos["tasa_anual"][i]),
+        "plazo_meses": int(productos["plazo_meses"][i]),
+        "cuota_inicial": float(productos["cuota_inicial"][i]),
+        "meses_gracia": int(productos["meses_gracia"][i]),
+        "monto": float(monto[i]),
+        "cuota_fija": float(tabla["cuota_fija"][i]),
+        "intereses_totales": float(intereses[i]),
+        "valor_presente": float(valor_presente[i]),
+        "tasa_interna": float(tasa_interna[i]),
+        "payback": None if np.isnan(payback[i]) else float(payback[i]),
+    } for i in orden]
+    return {
+        "contado": {
+            "valor_presente": float(contado["valor_presente"][0]),
+            "tasa_interna": float(contado["tasa_interna"][0]),
+            "payback": None if np.isnan(contado["payback"][0]) else float(contado["payback"][0]),
+        },
+        "productos": resultado,
+        "evaluados": len(monto),
+    }
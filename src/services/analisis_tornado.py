@@ -0,0 +1,100 @@
+"""
+Análisis de sensibilidad tipo tornado (una variable a la vez).
+
+Cada supuesto clave se mueve ±X% manteniendo los demás en su valor base, y se
+mide el cambio en VPN y TIR. Las 2×K cotizaciones (más la base) se evalúan en una
+sola llamada al motor vectorizado, así que el análisis completo cuesta
+aproximadamente lo mismo que una cotización.
+"""
+import math
+
+import numpy as np
+
+from src.config_parametros import get_param
+from src.services.motor_vectorizado import argumentos_vectorizados, cotizacion_vectorizada, valor_proyecto_calculado
+
+# Variables del tornado: (clave, etiqueta)
+VARIABLES_TORNADO = (
+    ("costkWh", "Tarifa de energía"),
+    ("index", "Indexación de la tarifa"),
+    ("dRate", "Tasa de descuento"),
+    ("escala_hsp", "Radiación (HSP)"),
+    ("tasa_degradacion", "Degradación anual"),
+    ("precio_excedentes", "Precio de excedentes"),
+    ("porcentaje_mantenimiento", "Mantenimiento (O&M)"),
+    ("valor_proyecto", "Inversión (CAPEX)"),
+)
+
+
+def calcular_analisis_tornado(*args, variacion=0.10, precio_manual=None, **kwargs):
+    """
+    Tornado de VPN y TIR moviendo cada variable ±variacion (fracción, 0.10 = ±10%).
+
+    Recibe los mismos argumentos que cotizacion(), más la variación y el precio manual opcional.
+
+    Returns:
+        dict con variacion, vpn_base, tir_base y variables: una entrada por variable
+        (variable, etiqueta, valor_base, valor_bajo, valor_alto, vpn_bajo, vpn_alto,
+        tir_bajo, tir_alto, impacto_vpn, impacto_tir), ordenadas por impacto en el VPN.
+    """
+    if not 0 < variacion < 1:
+        raise ValueError("La variación debe estar entre 0 y 1 (fracción del valor base)")
+
+    argumentos = argumentos_vectorizados(*args, **kwargs)
+    params = argumentos["custom_params"]
+    base = {
+        "costkWh": argumentos["costkWh"],
+        "index": argumentos["index"],
+        "dRate": argumentos["dRate"],
+        "escala_hsp": 1.0,
+        "tasa_degradacion": argumentos["tasa_degradacion"] if argumentos["tasa_degradacion"] is not None
+        else get_param("tasa_degradacion_anual", params),
+        "precio_excedentes": argumentos["precio_excedentes"] if argumentos["precio_excedentes"] is not None
+        else get_param("precio_excedentes", params),
+        "porcentaje_mantenimiento": get_param("porcentaje_mantenimiento", params),
+        "valor_proyecto": precio_manual if precio_manual is not None else valor_proyecto_calculado(argumentos),
+    }
+
+    # Fila 0: caso base; filas 2k+1 y 2k+2: variable k a la baja y al alza
+    n = 1 + 2 * len(VARIABLES_TORNADO)
+    columnas = {clave: np.full(n, float(valor)) for clave, valor in base.items()}
+    for k, (clave, _) in enumerate(VARIABLES_TORNADO):
+        columnas[clave][2 * k + 1] = base[clave] * (1 - variacion)
+        columnas[clave][2 * k + 2] = base[clave] * (1 + variacion)
+
+    escala_hsp = columnas.pop("escala_hsp")
+    argumentos.update(columnas, hsp_mensual=np.asarray(argumentos["hsp_mensual"], dtype=float) * escala_hsp[:, None])
+    resultado = cotizacion_vectorizada(**argumentos)
+    vpn = resultado["valor_presente"]
+    tir = resultado["tasa_interna"]
+
+    variables = []
+    for k, (clave, etiqueta) in enumerate(VARIABLES_TORNADO):
+        bajo, alto = 2 * k + 1, 2 * k + 2
+        valores = escala_hsp if clave == "escala_hsp" else columnas[clave]
+        variables.append({
+            "variable": clave,
+            "etiqueta": etiqueta,
+            "valor_base": base[clave],
+            "valor_bajo": float(valores[bajo]),
+            "valor_alto": float(valores[alto]),
+            "vpn_bajo": float(vpn[bajo]),
+            "vpn_alto": float(vpn[alto]),
+            "tir_bajo": float(tir[bajo]),
+            "tir_alto": float(tir[alto]),
+            "impacto_vpn": abs(float(vpn[alto] - vpn[bajo])),
+            "impacto_tir": abs(float(tir[alto] - tir[bajo])),
+        })
+
+    return {
+        "variacion": variacion,
+        "vpn_base": float(vpn[0]),
+        "tir_base": float(tir[0]),
+        "variables": ordenar_tornado(variables, "vpn"),
+    }
+
+
+def ordenar_tornado(variables, metrica="vpn"):
+    """Ordena las variables de mayor a menor impacto en 'vpn' o 'tir' (las de impacto indefinido al final)."""
+    clave = f"impacto_{metrica}"
+    return sorted(variables, key=lambda v: (math.isnan(v[clave]), -v[clave] if not math.isnan(v[clave]) else 0))
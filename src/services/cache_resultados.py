@@ -0,0 +1,219 @@
+"""
+Caché en memoria de resultados completos de cotización y de análisis de sensibilidad.
+
+Streamlit vuelve a ejecutar todo el script en cada interacción, y muchas veces con
+las mismas entradas (duplicar desde el historial, cambiar una opción de
+visualización, regenerar tras un fallo al subir a Drive). Los resultados se
+guardan por una clave canónica de todas las entradas de la función, incluidas la
+lista de HSP y los parámetros personalizados, y se comparten entre todas las
+sesiones del proceso.
+
+La caché está limitada por número de entradas y por bytes aproximados; al superar
+cualquiera de los dos se descartan las usadas hace más tiempo (LRU).
+"""
+import os
+import sys
+import copy
+import json
+import hashlib
+import inspect
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+
+from src.config_parametros import compilar_parametros
+from src.services.calculator_service import calcular_analisis_sensibilidad, cotizacion
+
+MAX_ENTRADAS_CACHE_RESULTADOS = 512
+MAX_BYTES_CACHE_RESULTADOS = 64 * 1024 * 1024
+
+
+def _canonico(valor):
+    """Convierte a JSON los tipos que json no maneja (numpy, tuplas de HSP, parámetros compilados)."""
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, Mapping):
+        return dict(valor)
+    raise TypeError(f"Tipo no soportado en la clave de caché: {type(valor).__name__}")
+
+
+def clave_resultado(funcion, args, kwargs):
+    """
+    Clave canónica de una llamada: hash SHA-256 de todos sus argumentos ya enlazados.
+
+    Los argumentos se enlazan a la firma de la función con sus valores por defecto,
+    así que da igual si se pasan por posición o por nombre. custom_params se
+    compila antes (None, {} y los defaults explícitos comparten clave).
+    Retorna (clave, argumentos enlazados).
+    """
+    argumentos = inspect.signature(funcion).bind(*args, **kwargs)
+    argumentos.apply_defaults()
+    if "custom_params" in argumentos.arguments:
+        argumentos.arguments["custom_params"] = compilar_parametros(argumentos.arguments["custom_params"])
+    texto = json.dumps([funcion.__name__, argumentos.arguments], sort_keys=True, default=_canonico)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest(), argumentos
+
+
+def tamano_aproximado(valor, _vistos=None):
+    """Bytes aproximados de un resultado (recorre contenedores, arreglos numpy y objetos con __slots__)."""
+    vistos = _vistos if _vistos is not None else set()
+    if id(valor) in vistos:
+        return 0
+    vistos.add(id(valor))
+
+    if isinstance(valor, np.ndarray):
+        return sys.getsizeof(valor) + (0 if valor.base is None else valor.nbytes)
+    tamano = sys.getsizeof(valor)
+    if isinstance(valor, (str, bytes, int, float, bool)) or valor is None:
+        return tamano
+    if isinstance(valor, dict):
+        return tamano + sum(tamano_aproximado(k, vistos) + tamano_aproximado(v, vistos) for k, v in valor.items())
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return tamano + sum(tamano_aproximado(v, vistos) for v in valor)
+    for slot in getattr(type(valor), "__slots__", ()):
+        try:
+            tamano += tamano_aproximado(object.__getattribute__(valor, slot), vistos)
+        except AttributeError:
+            continue
+    return tamano
+
+
+class CacheResultados:
+    """
+    Caché LRU de resultados compartida por las sesiones del proceso.
+
+    Lleva aciertos y fallos por función para el panel de administración.
+    """
+
+    def __init__(self, max_entradas=MAX_ENTRADAS_CACHE_RESULTADOS, max_bytes=MAX_BYTES_CACHE_RESULTADOS):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._aciertos = {}
+        self._fallos = {}
+        self._desalojos = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, funcion=""):
+        """Retorna (encontrado, valor) y registra el acierto o fallo."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self._fallos[funcion] = self._fallos.get(funcion, 0) + 1
+                return False, None
+            self._entradas.move_to_end(clave)
+            self._aciertos[funcion] = self._aciertos.get(funcion, 0) + 1
+            return True, entrada[0]
+
+    def guardar(self, clave, valor):
+        """Guarda un resultado. Los que por sí solos superan max_bytes no se guardan."""
+        tamano = tamano_aproximado(valor)
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= anterior[1]
+            self._entradas[clave] = (valor, tamano)
+            self._bytes += tamano
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                _, (_, tamano_desalojado) = self._entradas.popitem(last=False)
+                self._bytes -= tamano_desalojado
+                self._desalojos += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def reiniciar_estadisticas(self):
+        with self._lock:
+            self._aciertos.clear()
+            self._fallos.clear()
+            self._desalojos = 0
+
+    def estadisticas(self):
+        """Dict con el estado de la caché y una fila de aciertos/fallos por función."""
+        with self._lock:
+            funciones = sorted(set(self._aciertos) | set(self._fallos))
+            por_funcion = []
+            for funcion in funciones:
+                aciertos = self._aciertos.get(funcion, 0)
+                fallos = self._fallos.get(funcion, 0)
+                por_funcion.append({
+                    "funcion": funcion,
+                    "aciertos": aciertos,
+                    "fallos": fallos,
+                    "tasa_aciertos": aciertos / (aciertos + fallos) if aciertos + fallos else 0.0,
+                })
+            aciertos = sum(self._aciertos.values())
+            consultas = aciertos + sum(self._fallos.values())
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "aciertos": aciertos,
+                "fallos": consultas - aciertos,
+                "tasa_aciertos": aciertos / consultas if consultas else 0.0,
+                "desalojos": self._desalojos,
+                "por_funcion": por_funcion,
+            }
+
+
+_cache_resultados = None
+_lock_cache_resultados = threading.Lock()
+
+
+def obtener_cache_resultados():
+    """
+    Caché de resultados compartida por todas las sesiones del proceso.
+
+    Los límites se pueden ajustar con CACHE_RESULTADOS_MAX_ENTRADAS y CACHE_RESULTADOS_MAX_MB.
+    """
+    global _cache_resultados
+    with _lock_cache_resultados:
+        if _cache_resultados is None:
+            _cache_resultados = CacheResultados(
+                max_entradas=int(os.environ.get("CACHE_RESULTADOS_MAX_ENTRADAS", MAX_ENTRADAS_CACHE_RESULTADOS)),
+                max_bytes=int(float(os.environ.get("CACHE_RESULTADOS_MAX_MB", MAX_BYTES_CACHE_RESULTADOS / 2**20)) * 2**20),
+            )
+        return _cache_resultados
+
+
+def _en_cache(funcion, args, kwargs, cache, copiar, preparar=None):
+    cache = cache or obtener_cache_resultados()
+    clave, argumentos = clave_resultado(funcion, args, kwargs)
+    encontrado, valor = cache.obtener(clave, funcion.__name__)
+    if not encontrado:
+        valor = funcion(*argumentos.args, **argumentos.kwargs)
+        if preparar is not None:
+            valor = preparar(valor)
+        cache.guardar(clave, copy.deepcopy(valor) if copiar else valor)
+    return copy.deepcopy(valor) if copiar else valor
+
+
+def cotizacion_en_cache(*args, cache=None, **kwargs):
+    """
+    cotizacion() con memoización. Acepta los mismos argumentos.
+
+    ResultadoCotizacion es inmutable, así que todas las sesiones reciben el mismo objeto.
+    Sus campos perezosos se evalúan antes de guardarlo: las funciones pendientes
+    retienen el marco de cotizacion() y el tamaño medido no lo incluiría.
+    """
+    return _en_cache(cotizacion, args, kwargs, cache, copiar=False,
+                     preparar=lambda resultado: resultado.evaluar_perezosos())
+
+
+def analisis_sensibilidad_en_cache(*args, cache=None, **kwargs):
+    """
+    calcular_analisis_sensibilidad() con memoización. Acepta los mismos argumentos.
+
+    El resultado es un dict mutable: se guarda y se entrega una copia.
+    """
+    return _en_cache(calcular_analisis_sensibilidad, args, kwargs, cache, copiar=True)
@@ -3,12 +3,14 @@ Servicio de cálculos financieros y técnicos para sistemas solares.
 """
 import math
 import io
+import numbers
 import pandas as pd
 import numpy_financial as npf
 import numpy as np
 import streamlit as st
 from src.config import HSP_MENSUAL_POR_CIUDAD, PROMEDIOS_COSTO
-from src.config_parametros import DEFAULT_PARAMS, get_param
+from src.config_parametros import DEFAULT_PARAMS, compilar_parametros, get_param
+from src.services.resultado_cotizacion import ResultadoCotizacion
 
 try:
     from carbon_calculator import CarbonEmissionsCalculator
@@ -225,7 +227,24 @@ def calcular_factor_clipping(dc_ac_ratio):
     else:
         return 0.05  # >35% de sobrecarga, cap a 5% de pérdida
 
-def generar_csv_flujo_caja_detallado(Load, size, quantity, cubierta, clima, index, dRate, costkWh, module,
+# Tipos de las columnas del flujo de caja detallado (el resto de métricas son float64).
+# La inversión y el consumo son enteros como en el CSV de siempre; pasan a float64
+# solo si el monto o el consumo de entrada no son enteros, y los excedentes son
+# enteros si no hubo ninguno (ver calcular_flujo_caja_detallado).
+TIPOS_FLUJO_CAJA_DETALLADO = {
+    'Año': 'int64', 'Inversión_Inicial_COP': 'int64', 'Generación_Anual_kWh': 'float64',
+    'Consumo_Anual_kWh': 'int64', 'Excedentes_Vendidos_kWh': 'float64', 'Cobertura_Consumo_Porc': 'float64',
+    'Costo_Energia_Indexado_COP_kWh': 'float64', 'Ahorro_Anual_COP': 'float64', 'Ingresos_Excedentes_COP': 'float64',
+    'Mantenimiento_COP': 'float64', 'Cuotas_Credito_COP': 'int64', 'Flujo_Neto_Anual_COP': 'float64',
+    'Flujo_Acumulado_COP': 'float64', 'VPN_Parcial_COP': 'float64', 'TIR_Parcial_Porc': 'float64',
+    'Degradación_Aplicada_Porc': 'float64', 'Beneficio_Deduccion_Renta_COP': 'float64',
+    'Beneficio_Depreciacion_Acelerada_COP': 'float64', 'Beneficio_Tributario_Total_COP': 'float64',
+}
+
+FORMATOS_FLUJO_CAJA = ("parquet", "feather", "csv")
+
+
+def calcular_flujo_caja_detallado(Load, size, quantity, cubierta, clima, index, dRate, costkWh, module,
                                       ciudad=None, hsp_lista=None, perc_financiamiento=0, tasa_interes_credito=0,
                                       plazo_credito_años=0, incluir_baterias=False, costo_kwh_bateria=0,
                                       profundidad_descarga=0.9, eficiencia_bateria=0.95, dias_autonomia=2,
@@ -233,15 +252,22 @@ def generar_csv_flujo_caja_detallado(Load, size, quantity, cubierta, clima, inde
                                       incluir_beneficios_tributarios=False, incluir_deduccion_renta=False,
                                       incluir_depreciacion_acelerada=False, custom_params=None):
     """
-    Genera CSV super detallado del flujo de caja con métricas financieras y técnicas completas
+    Flujo de caja super detallado con métricas financieras y técnicas completas, por columnas.
+
+    Cada métrica se calcula de una vez para todos los años a partir de los arreglos
+    de generación mensual (sin construir una fila por año). Retorna un dict
+    ordenado nombre_columna -> arreglo numpy, con los tipos de
+    TIPOS_FLUJO_CAJA_DETALLADO; la fila 0 es la inversión inicial. Si el consumo o
+    el desembolso inicial no son enteros (p. ej. un precio manual con decimales),
+    esa columna es float64 para no truncarlos; sin ningún excedente, esa columna
+    es int64. Así el CSV sale igual que antes.
 
     Args:
         custom_params: Diccionario opcional con parámetros personalizados (precio_excedentes,
                        tasa_degradacion_anual, porcentaje_mantenimiento, etc.)
     """
-    import io
-
-    # Obtener parámetros configurables
+    # Obtener parámetros configurables (se combinan y validan una sola vez)
+    custom_params = compilar_parametros(custom_params)
     precio_excedentes = get_param("precio_excedentes", custom_params)
     tasa_degradacion = get_param("tasa_degradacion_anual", custom_params)
     porcentaje_mantenimiento = get_param("porcentaje_mantenimiento", custom_params)
@@ -323,147 +349,310 @@ def generar_csv_flujo_caja_detallado(Load, size, quantity, cubierta, clima, inde
         fcl = cashflow_free
         monthly_generation = monthly_generation_init
 
-    # Calcular flujo de caja detallado
-    data_rows = []
-    flujos_acumulados = []
-
-    # Año 0: Inversión inicial
-    data_rows.append({
-        'Año': 0,
-        'Inversión_Inicial_COP': desembolso_inicial_cliente,
-        'Generación_Anual_kWh': 0,
-        'Consumo_Anual_kWh': 0,
-        'Excedentes_Vendidos_kWh': 0,
-        'Cobertura_Consumo_Porc': 0,
-        'Costo_Energia_Indexado_COP_kWh': 0,
-        'Ahorro_Anual_COP': 0,
-        'Ingresos_Excedentes_COP': 0,
-        'Mantenimiento_COP': 0,
-        'Cuotas_Credito_COP': 0,
-        'Flujo_Neto_Anual_COP': -desembolso_inicial_cliente,
-        'Flujo_Acumulado_COP': -desembolso_inicial_cliente,
-        'VPN_Parcial_COP': -desembolso_inicial_cliente,
-        'TIR_Parcial_Porc': 0,
-        'Degradación_Aplicada_Porc': 0
+    # Calcular flujo de caja detallado: una fila por año, todas las métricas como arreglos
+    años = np.arange(life)
+    factor_indexacion = (1 + index) ** años
+    generacion = np.outer((1 - tasa_degradacion) ** años, np.asarray(monthly_generation, dtype=float))
+    generacion_anual = _sumar_meses(generacion)
+    consumo_anual = Load * 12
+
+    if incluir_baterias:
+        # Sistema Off-Grid: todo el consumo se ahorra
+        ahorro_anual = np.full(life, consumo_anual * costkWh, dtype=float)
+        excedentes = np.zeros(life)
+        ingresos_excedentes = np.zeros(life)
+        cobertura_consumo = np.full(life, 100.0)
+    else:
+        # Sistema On-Grid: el consumo de cada mes se cubre y lo que sobra se vende como excedente
+        hay_excedente = generacion >= Load
+        excedentes_mes = np.where(hay_excedente, generacion - Load, 0.0)
+        ahorro_anual = _sumar_meses(np.where(hay_excedente, Load * costkWh, generacion * costkWh))
+        excedentes = _sumar_meses(excedentes_mes)
+        ingresos_excedentes = _sumar_meses(excedentes_mes * precio_excedentes)
+        if consumo_anual > 0:
+            cobertura_consumo = np.minimum(100.0, (generacion_anual / consumo_anual) * 100)
+        else:
+            cobertura_consumo = np.zeros(life)
+
+    # Indexación, mantenimiento y cuotas del crédito
+    costo_energia_indexado = costkWh * factor_indexacion
+    ahorro_anual_indexado = ahorro_anual * factor_indexacion
+    ingresos_excedentes_indexados = ingresos_excedentes * factor_indexacion
+    mantenimiento_anual = porcentaje_mantenimiento * ahorro_anual_indexado
+    cuotas_anuales_credito = np.where(años < plazo_credito_años, cuota_mensual_credito * 12, 0)
+
+    # Beneficios tributarios
+    beneficio_deduccion_renta = np.zeros(life)
+    beneficio_depreciacion_acelerada = np.zeros(life)
+    if incluir_beneficios_tributarios:
+        if incluir_deduccion_renta and life > 1:  # Año 2
+            # 17.5% del CAPEX indexado al año 2
+            beneficio_deduccion_renta[1] = valor_proyecto_total * (1 + index) * 0.175
+        if incluir_depreciacion_acelerada:  # Años 1-3
+            # 33% del CAPEX cada año por 3 años
+            beneficio_depreciacion_acelerada[:3] = valor_proyecto_total * 0.33
+    beneficio_tributario_total = beneficio_deduccion_renta + beneficio_depreciacion_acelerada
+
+    # Flujo neto, acumulado y métricas parciales hasta cada año
+    flujo_anual = ahorro_anual_indexado - mantenimiento_anual - cuotas_anuales_credito + beneficio_tributario_total
+    flujos = np.concatenate(([-desembolso_inicial_cliente], flujo_anual))
+    flujo_acumulado = np.cumsum(flujos)
+
+    tir_parcial = np.zeros(life + 1)
+    vpn_parcial = flujo_acumulado.copy()
+    for k in range(2, life + 2):
+        try:
+            tir_parcial[k - 1] = npf.irr(flujos[:k]) * 100
+            vpn_parcial[k - 1] = npf.npv(dRate, flujos[:k])
+        except Exception:
+            tir_parcial[k - 1] = 0
+
+    def _con_año_cero(valor, arreglo):
+        return np.concatenate(([valor], arreglo))
+
+    columnas = {
+        'Año': np.arange(life + 1),
+        'Inversión_Inicial_COP': _con_año_cero(desembolso_inicial_cliente, np.zeros(life)),
+        'Generación_Anual_kWh': _con_año_cero(0, generacion_anual),
+        'Consumo_Anual_kWh': _con_año_cero(0, np.full(life, consumo_anual)),
+        'Excedentes_Vendidos_kWh': _con_año_cero(0, excedentes),
+        'Cobertura_Consumo_Porc': _con_año_cero(0, cobertura_consumo),
+        'Costo_Energia_Indexado_COP_kWh': _con_año_cero(0, costo_energia_indexado),
+        'Ahorro_Anual_COP': _con_año_cero(0, ahorro_anual_indexado),
+        'Ingresos_Excedentes_COP': _con_año_cero(0, ingresos_excedentes_indexados),
+        'Mantenimiento_COP': _con_año_cero(0, mantenimiento_anual),
+        'Cuotas_Credito_COP': _con_año_cero(0, cuotas_anuales_credito),
+        'Flujo_Neto_Anual_COP': flujos,
+        'Flujo_Acumulado_COP': flujo_acumulado,
+        'VPN_Parcial_COP': vpn_parcial,
+        'TIR_Parcial_Porc': tir_parcial,
+        'Degradación_Aplicada_Porc': _con_año_cero(0, np.full(life, tasa_degradacion * 100)),
+        # Los beneficios no aplican a la inversión inicial (quedan vacíos en el año 0)
+        'Beneficio_Deduccion_Renta_COP': _con_año_cero(np.nan, beneficio_deduccion_renta),
+        'Beneficio_Depreciacion_Acelerada_COP': _con_año_cero(np.nan, beneficio_depreciacion_acelerada),
+        'Beneficio_Tributario_Total_COP': _con_año_cero(np.nan, beneficio_tributario_total),
+    }
+    tipos = dict(TIPOS_FLUJO_CAJA_DETALLADO)
+    if not isinstance(desembolso_inicial_cliente, numbers.Integral):
+        tipos['Inversión_Inicial_COP'] = 'float64'
+    if not isinstance(Load, numbers.Integral):
+        tipos['Consumo_Anual_kWh'] = 'float64'
+    if not excedentes.any():
+        # Sin ningún mes con excedentes el CSV de siempre los escribía como el entero 0
+        tipos['Excedentes_Vendidos_kWh'] = 'int64'
+    return {nombre: valores.astype(tipos[nombre]) for nombre, valores in columnas.items()}
+
+
+def _sumar_meses(matriz):
+    """Suma por año (filas) los 12 meses en el mismo orden que sum() sobre la lista mensual."""
+    total = np.zeros(matriz.shape[0])
+    for mes in range(matriz.shape[1]):
+        total = total + matriz[:, mes]
+    return total
+
+
+def tabla_flujo_caja_arrow(columnas):
+    """Tabla de Arrow tipada con las columnas de calcular_flujo_caja_detallado (NaN -> nulo)."""
+    import pyarrow as pa
+
+    return pa.table({
+        nombre: pa.array(valores, type=pa.from_numpy_dtype(valores.dtype), from_pandas=True)
+        for nombre, valores in columnas.items()
     })
 
-    flujos_acumulados = [-desembolso_inicial_cliente]
 
-    # Años 1-N: Flujos anuales con métricas detalladas
+def exportar_flujo_caja(columnas, formato="parquet"):
+    """
+    Serializa el flujo de caja detallado en uno de FORMATOS_FLUJO_CAJA y retorna los bytes.
+
+    Parquet y Feather conservan los tipos de cada columna y van comprimidos con zstd;
+    CSV mantiene el formato de texto de siempre: enteros sin decimales y el resto
+    con dos.
+    """
+    if formato == "csv":
+        csv_buffer = io.StringIO()
+        pd.DataFrame(columnas).to_csv(csv_buffer, index=False, float_format='%.2f')
+        return csv_buffer.getvalue().encode("utf-8")
+
+    import pyarrow as pa
+    tabla = tabla_flujo_caja_arrow(columnas)
+    buffer = pa.BufferOutputStream()
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(tabla, buffer, compression="zstd")
+    elif formato == "feather":
+        import pyarrow.feather as feather
+        feather.write_feather(tabla, buffer, compression="zstd")
+    else:
+        raise ValueError(f"Formato no soportado: {formato}. Use uno de {FORMATOS_FLUJO_CAJA}")
+    return buffer.getvalue().to_pybytes()
+
+
+def generar_csv_flujo_caja_detallado(*args, **kwargs):
+    """
+    Genera CSV super detallado del flujo de caja con métricas financieras y técnicas completas.
+    Recibe los mismos argumentos que calcular_flujo_caja_detallado.
+    """
+    return exportar_flujo_caja(calcular_flujo_caja_detallado(*args, **kwargs), "csv").decode("utf-8")
+
+# =============================================================================
+# ETAPAS DE LA COTIZACIÓN
+# =============================================================================
+# cotizacion() encadena estas funciones; modelo_incremental las usa como nodos
+# de un grafo para recalcular solo lo que depende de una entrada modificada.
+
+def calcular_area_requerida(quantity):
+    """Área de cubierta (m²) para los paneles, con 30% de margen."""
+    area_por_panel = 2.3 * 1.0
+    factor_seguridad = 1.30
+    return math.ceil(quantity * area_por_panel * factor_seguridad)
+
+
+def calcular_valor_proyecto_fv(size, cubierta, custom_params=None):
+    """Valor del sistema fotovoltaico (sin baterías) según la curva de costo por kWp y la cubierta."""
+    valor_proyecto_fv = calcular_costo_por_kwp(size, custom_params) * size
+    if cubierta.strip().upper() == "TEJA":
+        valor_proyecto_fv *= get_param("ajuste_cubierta_teja", custom_params)
+    return valor_proyecto_fv
+
+
+def calcular_bateria(Load, dias_autonomia, profundidad_descarga, costo_kwh_bateria):
+    """Retorna (capacidad_nominal_kwh, costo) del banco de baterías para la autonomía pedida."""
+    consumo_diario = Load / 30
+    capacidad_util_bateria = consumo_diario * dias_autonomia
+    if profundidad_descarga > 0 and profundidad_descarga <= 1.0:
+        capacidad_nominal_bateria = capacidad_util_bateria / profundidad_descarga
+    else:
+        # Valor por defecto si profundidad_descarga es inválida
+        capacidad_nominal_bateria = capacidad_util_bateria / 0.8  # 80% por defecto
+    return capacidad_nominal_bateria, capacidad_nominal_bateria * costo_kwh_bateria
+
+
+def calcular_financiamiento(valor_proyecto_total, perc_financiamiento, tasa_interes_credito, plazo_credito_años):
+    """Retorna (monto_a_financiar, cuota_mensual_credito, desembolso_inicial_cliente)."""
+    monto_a_financiar = valor_proyecto_total * (perc_financiamiento / 100)
+    monto_a_financiar = math.ceil(monto_a_financiar)
+
+    cuota_mensual_credito = 0
+    if monto_a_financiar > 0 and plazo_credito_años > 0 and tasa_interes_credito > 0:
+        tasa_mensual_credito = tasa_interes_credito / 12
+        num_pagos_credito = plazo_credito_años * 12
+        try:
+            cuota_mensual_credito = abs(npf.pmt(tasa_mensual_credito, num_pagos_credito, -monto_a_financiar))
+            cuota_mensual_credito = math.ceil(cuota_mensual_credito)
+        except (ValueError, ZeroDivisionError):
+            cuota_mensual_credito = 0
+
+    return monto_a_financiar, cuota_mensual_credito, valor_proyecto_total - monto_a_financiar
+
+
+def calcular_generacion_mensual(size, hsp_mensual, performance_ratio, factor_clipping):
+    """Generación (kWh) de cada mes del primer año a partir de los HSP mensuales."""
+    dias_por_mes = [31, 28.25, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    return [(size * hsp * dias * performance_ratio) * (1 - factor_clipping) for hsp, dias in zip(hsp_mensual, dias_por_mes)]
+
+
+def calcular_ahorros_anuales(generacion_mensual, life, tasa_degradacion, Load, costkWh, precio_excedentes,
+                             incluir_baterias=False):
+    """
+    Ahorro de cada año (sin indexar) con la generación degradada.
+
+    Retorna (ahorros, generacion_total_vida_util).
+    """
+    ahorros, total_lifetime_generation = [], 0
     for i in range(life):
-        # Generación del año con degradación
-        current_monthly_generation = [gen * ((1 - tasa_degradacion) ** i) for gen in monthly_generation]
-        generacion_anual_total = sum(current_monthly_generation)
+        current_monthly_generation = [gen * ((1 - tasa_degradacion) ** i) for gen in generacion_mensual]
+        total_lifetime_generation += sum(current_monthly_generation)
 
-        # Consumo y excedentes
-        consumo_anual = Load * 12
-        excedentes_totales = 0
         ahorro_anual_total = 0
-        ingresos_excedentes = 0
-
         if incluir_baterias:
-            # Sistema Off-Grid: todo el consumo se ahorra
-            ahorro_anual_total = consumo_anual * costkWh
-            cobertura_consumo = 100.0
-        else:
-            # Sistema On-Grid: cálculo mensual detallado
+            ahorro_anual_total = (Load * 12) * costkWh
+        else: # Lógica On-Grid
             for gen_mes in current_monthly_generation:
                 consumo_mes = Load
                 if gen_mes >= consumo_mes:
-                    # Consumo cubierto + excedentes vendidos
-                    ahorro_mes = consumo_mes * costkWh
-                    excedentes_mes = gen_mes - consumo_mes
-                    ingresos_excedentes_mes = excedentes_mes * precio_excedentes
-                    excedentes_totales += excedentes_mes
-                    ingresos_excedentes += ingresos_excedentes_mes
+                    ahorro_mes = (consumo_mes * costkWh) + ((gen_mes - consumo_mes) * precio_excedentes)
                 else:
-                    # Consumo parcialmente cubierto
                     ahorro_mes = gen_mes * costkWh
-                    excedentes_totales += 0
-
                 ahorro_anual_total += ahorro_mes
+        ahorros.append(ahorro_anual_total)
+    return ahorros, total_lifetime_generation
 
-            # Calcular cobertura de consumo
-            cobertura_consumo = min(100.0, (generacion_anual_total / consumo_anual) * 100) if consumo_anual > 0 else 0
 
-        # Costo de energía indexado
-        costo_energia_indexado = costkWh * ((1 + index) ** i)
-
-        # Aplicar indexación al ahorro
+def calcular_flujo_caja_libre(ahorros, index, porcentaje_mantenimiento, cuota_mensual_credito, plazo_credito_años,
+                              desembolso_inicial_cliente, valor_proyecto_total, demora_6_meses=False,
+                              incluir_beneficios_tributarios=False, incluir_deduccion_renta=False,
+                              incluir_depreciacion_acelerada=False):
+    """Flujo de caja libre: año 0 con el desembolso inicial y un flujo por cada año de ahorro."""
+    cashflow_free = []
+    for i, ahorro_anual_total in enumerate(ahorros):
         ahorro_anual_indexado = ahorro_anual_total * ((1 + index) ** i)
-        ingresos_excedentes_indexados = ingresos_excedentes * ((1 + index) ** i)
 
-        # Mantenimiento
-        mantenimiento_anual = porcentaje_mantenimiento * ahorro_anual_indexado
+        # Aplicar demora de 6 meses si está habilitada
+        if demora_6_meses and i == 0:  # Solo afecta el año 1
+            ahorro_anual_indexado *= 0.5  # 50% para 6 meses de operación
 
-        # Cuotas anuales del crédito
+        mantenimiento_anual = porcentaje_mantenimiento * ahorro_anual_indexado
         cuotas_anuales_credito = 0
         if i < plazo_credito_años:
             cuotas_anuales_credito = cuota_mensual_credito * 12
+        flujo_anual = ahorro_anual_indexado - mantenimiento_anual - cuotas_anuales_credito
 
-        # Beneficios tributarios
+        # Aplicar beneficios tributarios (pueden aplicarse ambos simultáneamente)
         beneficio_tributario_total = 0
-        beneficio_deduccion_renta = 0
-        beneficio_depreciacion_acelerada = 0
-
         if incluir_beneficios_tributarios:
             if incluir_deduccion_renta and i == 1:  # Año 2
                 # 17.5% del CAPEX indexado al año 2
                 capex_indexado_año2 = valor_proyecto_total * ((1 + index) ** i)
-                beneficio_deduccion_renta = capex_indexado_año2 * 0.175
-                beneficio_tributario_total += beneficio_deduccion_renta
+                beneficio_deduccion = capex_indexado_año2 * 0.175
+                beneficio_tributario_total += beneficio_deduccion
 
             if incluir_depreciacion_acelerada and i < 3:  # Años 1-3
                 # 33% del CAPEX cada año por 3 años
-                beneficio_depreciacion_acelerada = valor_proyecto_total * 0.33
-                beneficio_tributario_total += beneficio_depreciacion_acelerada
+                beneficio_depreciacion = valor_proyecto_total * 0.33
+                beneficio_tributario_total += beneficio_depreciacion
+
+        flujo_anual += beneficio_tributario_total
 
-        # Flujo neto del año
-        flujo_anual = ahorro_anual_indexado - mantenimiento_anual - cuotas_anuales_credito + beneficio_tributario_total
-        flujo_acumulado = sum(flujos_acumulados) + flujo_anual
-        flujos_acumulados.append(flujo_anual)
+        cashflow_free.append(flujo_anual)
 
-        # TIR y VPN parciales hasta este año
-        tir_parcial = 0
-        vpn_parcial = flujo_acumulado
+    cashflow_free.insert(0, -desembolso_inicial_cliente)
+    return cashflow_free
+
+
+def calcular_lcoe(desembolso_inicial_cliente, ahorros, index, dRate, total_lifetime_generation):
+    """Costo nivelado de la energía (COP/kWh); el O&M se estima como 5% del ahorro del último año."""
+    if total_lifetime_generation <= 0:
+        return 0
+    ahorro_ultimo_año = ahorros[-1] if ahorros else 0
+    costos_om = [0.05 * ahorro_ultimo_año * ((1 + index) ** i) for i in range(len(ahorros))]
+    return (desembolso_inicial_cliente + npf.npv(dRate, costos_om)) / total_lifetime_generation
+
+
+def calcular_datos_carbono(generacion_mensual, ciudad, life):
+    """Emisiones evitadas del sistema, o {} si el módulo de carbono no está disponible."""
+    if not carbon_calculator:
+        return {}
+    try:
+        # Calculate annual generation for carbon analysis
+        annual_generation = sum(generacion_mensual) if generacion_mensual else 0
+
+        # Get city for emission factor (handle variations)
+        ciudad_normalizada = ciudad.upper() if ciudad else "BOGOTA"
+        if ciudad_normalizada == "MEDELLÍN":
+            ciudad_normalizada = "MEDELLIN"
+        elif ciudad_normalizada == "CALÍ":
+            ciudad_normalizada = "CALI"
+
+        return carbon_calculator.calculate_emissions_avoided(
+            annual_generation_kwh=annual_generation,
+            region=ciudad_normalizada,
+            system_lifetime_years=life
+        )
+    except Exception as e:
+        print(f"Error calculating carbon emissions: {e}")
+        return carbon_calculator._get_empty_carbon_data() if carbon_calculator else {}
 
-        if len(flujos_acumulados) > 1:
-            try:
-                tir_parcial = npf.irr(flujos_acumulados) * 100
-                vpn_parcial = npf.npv(dRate, flujos_acumulados)
-            except:
-                tir_parcial = 0
-                vpn_parcial = flujo_acumulado
-
-        data_rows.append({
-            'Año': i + 1,
-            'Inversión_Inicial_COP': 0,
-            'Generación_Anual_kWh': generacion_anual_total,
-            'Consumo_Anual_kWh': consumo_anual,
-            'Excedentes_Vendidos_kWh': excedentes_totales,
-            'Cobertura_Consumo_Porc': cobertura_consumo,
-            'Costo_Energia_Indexado_COP_kWh': costo_energia_indexado,
-            'Ahorro_Anual_COP': ahorro_anual_indexado,
-            'Ingresos_Excedentes_COP': ingresos_excedentes_indexados,
-            'Mantenimiento_COP': mantenimiento_anual,
-            'Cuotas_Credito_COP': cuotas_anuales_credito,
-            'Beneficio_Deduccion_Renta_COP': beneficio_deduccion_renta,
-            'Beneficio_Depreciacion_Acelerada_COP': beneficio_depreciacion_acelerada,
-            'Beneficio_Tributario_Total_COP': beneficio_tributario_total,
-            'Flujo_Neto_Anual_COP': flujo_anual,
-            'Flujo_Acumulado_COP': flujo_acumulado,
-            'VPN_Parcial_COP': vpn_parcial,
-            'TIR_Parcial_Porc': tir_parcial,
-            'Degradación_Aplicada_Porc': tasa_degradacion * 100
-        })
-
-    # Crear DataFrame y CSV
-    df = pd.DataFrame(data_rows)
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False, float_format='%.2f')
-    csv_content = csv_buffer.getvalue()
-
-    return csv_content
 
 def cotizacion(Load, size, quantity, cubierta, clima, index, dRate, costkWh, module, ciudad=None,
                 hsp_lista=None,
@@ -481,16 +670,18 @@ def cotizacion(Load, size, quantity, cubierta, clima, index, dRate, costkWh, mod
     Args:
         custom_params: Diccionario opcional con parámetros personalizados.
                        Si se pasan tasa_degradacion o precio_excedentes directamente,
-                       estos tienen prioridad sobre custom_params.
+                       estos tienen prioridad sobre custom_params. Puede ser un
+                       ParametrosCompilados (ver compilar_parametros); un dict se
+                       compila y valida aquí y lanza ValueError si está fuera de límites.
     """
     # Obtener parámetros configurables (prioridad: argumento directo > custom_params > default)
+    custom_params = compilar_parametros(custom_params)
     if tasa_degradacion is None:
         tasa_degradacion = get_param("tasa_degradacion_anual", custom_params)
     if precio_excedentes is None:
         precio_excedentes = get_param("precio_excedentes", custom_params)
 
     porcentaje_mantenimiento = get_param("porcentaje_mantenimiento", custom_params)
-    ajuste_teja = get_param("ajuste_cubierta_teja", custom_params)
 
     # Se asegura de tener la lista de HSP mensuales para el cálculo
     hsp_mensual = hsp_lista if hsp_lista is not None else HSP_MENSUAL_POR_CIUDAD.get(ciudad.upper(), HSP_MENSUAL_POR_CIUDAD["MEDELLIN"])
@@ -505,132 +696,50 @@ def cotizacion(Load, size, quantity, cubierta, clima, index, dRate, costkWh, mod
     factor_clipping = calcular_factor_clipping(dc_ac_ratio)
     # --- Fin Nueva Lógica ---
     
-    area_por_panel = 2.3 * 1.0
-    factor_seguridad = 1.30
-    area_requerida = math.ceil(quantity * area_por_panel * factor_seguridad)
-    
-    costo_por_kwp = calcular_costo_por_kwp(size, custom_params)
-    valor_proyecto_fv = costo_por_kwp * size
-    if cubierta.strip().upper() == "TEJA": valor_proyecto_fv *= ajuste_teja
+    area_requerida = calcular_area_requerida(quantity)
+    valor_proyecto_fv = calcular_valor_proyecto_fv(size, cubierta, custom_params)
 
     costo_bateria = 0
     capacidad_nominal_bateria = 0
     if incluir_baterias:
-        consumo_diario = Load / 30
-        capacidad_util_bateria = consumo_diario * dias_autonomia
-        if profundidad_descarga > 0 and profundidad_descarga <= 1.0:
-            capacidad_nominal_bateria = capacidad_util_bateria / profundidad_descarga
-        else:
-            # Valor por defecto si profundidad_descarga es inválida
-            capacidad_nominal_bateria = capacidad_util_bateria / 0.8  # 80% por defecto
-        costo_bateria = capacidad_nominal_bateria * costo_kwh_bateria
+        capacidad_nominal_bateria, costo_bateria = calcular_bateria(Load, dias_autonomia, profundidad_descarga,
+                                                                    costo_kwh_bateria)
     
     valor_proyecto_total = valor_proyecto_fv + costo_bateria
     valor_proyecto_total = math.ceil(valor_proyecto_total)
     
-    monto_a_financiar = valor_proyecto_total * (perc_financiamiento / 100)
-    monto_a_financiar = math.ceil(monto_a_financiar)
-    
-    cuota_mensual_credito = 0
-    if monto_a_financiar > 0 and plazo_credito_años > 0 and tasa_interes_credito > 0:
-        tasa_mensual_credito = tasa_interes_credito / 12
-        num_pagos_credito = plazo_credito_años * 12
-        try:
-            cuota_mensual_credito = abs(npf.pmt(tasa_mensual_credito, num_pagos_credito, -monto_a_financiar))
-            cuota_mensual_credito = math.ceil(cuota_mensual_credito)
-        except (ValueError, ZeroDivisionError):
-            cuota_mensual_credito = 0
-        
-    desembolso_inicial_cliente = valor_proyecto_total - monto_a_financiar
-    
-    cashflow_free, total_lifetime_generation, ahorro_anual_año1 = [], 0, 0
-    dias_por_mes = [31, 28.25, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    monto_a_financiar, cuota_mensual_credito, desembolso_inicial_cliente = calcular_financiamiento(
+        valor_proyecto_total, perc_financiamiento, tasa_interes_credito, plazo_credito_años)
 
     # Se calcula la generación de cada mes individualmente usando los HSP mensuales
-    monthly_generation_init = [(size * hsp * dias * n) * (1 - factor_clipping) for hsp, dias in zip(hsp_mensual, dias_por_mes)]
-    
-    for i in range(life):
-        current_monthly_generation = [gen * ((1 - tasa_degradacion) ** i) for gen in monthly_generation_init]
-        total_lifetime_generation += sum(current_monthly_generation)
-
-        ahorro_anual_total = 0
-        if incluir_baterias:
-            ahorro_anual_total = (Load * 12) * costkWh
-        else: # Lógica On-Grid
-            for gen_mes in current_monthly_generation:
-                consumo_mes = Load
-                if gen_mes >= consumo_mes:
-                    ahorro_mes = (consumo_mes * costkWh) + ((gen_mes - consumo_mes) * precio_excedentes)
-                else:
-                    ahorro_mes = gen_mes * costkWh
-                ahorro_anual_total += ahorro_mes
-
-        ahorro_anual_indexado = ahorro_anual_total * ((1 + index) ** i)
-        if i == 0:
-            ahorro_anual_año1 = ahorro_anual_total
-
-        # Aplicar demora de 6 meses si está habilitada
-        if demora_6_meses and i == 0:  # Solo afecta el año 1
-            ahorro_anual_indexado *= 0.5  # 50% para 6 meses de operación
-
-        mantenimiento_anual = porcentaje_mantenimiento * ahorro_anual_indexado
-        cuotas_anuales_credito = 0
-        if i < plazo_credito_años:
-            cuotas_anuales_credito = cuota_mensual_credito * 12
-        flujo_anual = ahorro_anual_indexado - mantenimiento_anual - cuotas_anuales_credito
-
-        # Aplicar beneficios tributarios (pueden aplicarse ambos simultáneamente)
-        beneficio_tributario_total = 0
-        if incluir_beneficios_tributarios:
-            if incluir_deduccion_renta and i == 1:  # Año 2
-                # 17.5% del CAPEX indexado al año 2
-                capex_indexado_año2 = valor_proyecto_total * ((1 + index) ** i)
-                beneficio_deduccion = capex_indexado_año2 * 0.175
-                beneficio_tributario_total += beneficio_deduccion
-
-            if incluir_depreciacion_acelerada and i < 3:  # Años 1-3
-                # 33% del CAPEX cada año por 3 años
-                beneficio_depreciacion = valor_proyecto_total * 0.33
-                beneficio_tributario_total += beneficio_depreciacion
-
-        flujo_anual += beneficio_tributario_total
-
-        cashflow_free.append(flujo_anual)
-
-    cashflow_free.insert(0, -desembolso_inicial_cliente)
+    monthly_generation_init = calcular_generacion_mensual(size, hsp_mensual, n, factor_clipping)
+    ahorros_anuales, total_lifetime_generation = calcular_ahorros_anuales(
+        monthly_generation_init, life, tasa_degradacion, Load, costkWh, precio_excedentes, incluir_baterias)
+    ahorro_anual_año1 = ahorros_anuales[0] if ahorros_anuales else 0
+
+    cashflow_free = calcular_flujo_caja_libre(
+        ahorros_anuales, index, porcentaje_mantenimiento, cuota_mensual_credito, plazo_credito_años,
+        desembolso_inicial_cliente, valor_proyecto_total, demora_6_meses=demora_6_meses,
+        incluir_beneficios_tributarios=incluir_beneficios_tributarios,
+        incluir_deduccion_renta=incluir_deduccion_renta,
+        incluir_depreciacion_acelerada=incluir_depreciacion_acelerada)
     present_value = npf.npv(dRate, cashflow_free)
     internal_rate = npf.irr(cashflow_free)
-    lcoe = (desembolso_inicial_cliente + npf.npv(dRate, [0.05 * ahorro_anual_total * ((1 + index) ** i) for i in range(life)])) / total_lifetime_generation if total_lifetime_generation > 0 else 0
     trees = round(Load * 12 * 0.154 * 22 / 1000, 0)
 
-    # Carbon emissions calculation (NEW)
-    carbon_data = {}
-    if incluir_carbon and carbon_calculator:
-        try:
-            # Calculate annual generation for carbon analysis
-            annual_generation = sum(monthly_generation_init) if monthly_generation_init else 0
-
-            # Get city for emission factor (handle variations)
-            ciudad_normalizada = ciudad.upper() if ciudad else "BOGOTA"
-            if ciudad_normalizada == "MEDELLÍN":
-                ciudad_normalizada = "MEDELLIN"
-            elif ciudad_normalizada == "CALÍ":
-                ciudad_normalizada = "CALI"
-
-            carbon_data = carbon_calculator.calculate_emissions_avoided(
-                annual_generation_kwh=annual_generation,
-                region=ciudad_normalizada,
-                system_lifetime_years=life
-            )
-        except Exception as e:
-            print(f"Error calculating carbon emissions: {e}")
-            carbon_data = carbon_calculator._get_empty_carbon_data() if carbon_calculator else {}
-
-    # Se devuelve la lista 'hsp_mensual' en lugar de un solo valor 'HSP'
-    return valor_proyecto_total, size, monto_a_financiar, cuota_mensual_credito, \
-           desembolso_inicial_cliente, cashflow_free, trees, monthly_generation_init, \
-           present_value, internal_rate, quantity, life, recomendacion_inversor_str, \
-           lcoe, n, hsp_mensual, potencia_ac_inversor, ahorro_anual_año1, area_requerida, capacidad_nominal_bateria, carbon_data
+    # El LCOE y el carbono se calculan solo si se leen
+    return ResultadoCotizacion(
+        valor_proyecto_total=valor_proyecto_total, size=size, monto_a_financiar=monto_a_financiar,
+        cuota_mensual_credito=cuota_mensual_credito, desembolso_inicial_cliente=desembolso_inicial_cliente,
+        flujo_caja=cashflow_free, arboles=trees, generacion_mensual=monthly_generation_init,
+        valor_presente=present_value, tasa_interna=internal_rate, cantidad_paneles=quantity, vida_util=life,
+        recomendacion_inversor=recomendacion_inversor_str,
+        lcoe=lambda: calcular_lcoe(desembolso_inicial_cliente, ahorros_anuales, index, dRate, total_lifetime_generation),
+        performance_ratio=n,
+        hsp_mensual=hsp_mensual, potencia_ac_inversor=potencia_ac_inversor, ahorro_año1=ahorro_anual_año1,
+        area_requerida=area_requerida, capacidad_nominal_bateria=capacidad_nominal_bateria,
+        carbon_data=lambda: calcular_datos_carbono(monthly_generation_init, ciudad, life) if incluir_carbon else {},
+    )
 
 def calcular_analisis_sensibilidad(Load, size, quantity, cubierta, clima, index, dRate, costkWh, module,
                                     ciudad=None, hsp_lista=None, incluir_baterias=False, costo_kwh_bateria=0,
@@ -645,7 +754,8 @@ def calcular_analisis_sensibilidad(Load, size, quantity, cubierta, clima, index,
     Args:
         custom_params: Diccionario opcional con parámetros personalizados
     """
-    # Obtener parámetros configurables
+    # Obtener parámetros configurables; los escenarios reutilizan el mismo conjunto compilado
+    custom_params = compilar_parametros(custom_params)
     precio_excedentes = get_param("precio_excedentes", custom_params)
     porcentaje_mantenimiento = get_param("porcentaje_mantenimiento", custom_params)
 
@@ -667,22 +777,23 @@ def calcular_analisis_sensibilidad(Load, size, quantity, cubierta, clima, index,
             plazo_escenario = plazo_credito_años if escenario["financiamiento"] else 0
             
             # Calcular cotización para este escenario (usar parámetros configurables)
-            valor_proyecto_total, size_calc, monto_a_financiar, cuota_mensual_credito, \
-            desembolso_inicial_cliente, fcl, trees, monthly_generation, valor_presente, \
-            tasa_interna, cantidad_calc, life, recomendacion_inversor, lcoe, n_final, hsp_mensual_final, \
-            potencia_ac_inversor, ahorro_año1, area_requerida, capacidad_nominal_bateria, carbon_data = \
-                cotizacion(Load, size, quantity, cubierta, clima, index, dRate, costkWh, module,
-                          ciudad=ciudad, hsp_lista=hsp_lista,
-                          perc_financiamiento=perc_fin_escenario,
-                          tasa_interes_credito=tasa_interes_escenario,
-                          plazo_credito_años=plazo_escenario,
-                          incluir_baterias=incluir_baterias, costo_kwh_bateria=costo_kwh_bateria,
-                          profundidad_descarga=profundidad_descarga, eficiencia_bateria=eficiencia_bateria,
-                          dias_autonomia=dias_autonomia, horizonte_tiempo=horizonte_base,
-                          incluir_carbon=False, incluir_beneficios_tributarios=incluir_beneficios_tributarios,
-                          incluir_deduccion_renta=incluir_deduccion_renta,
-                          incluir_depreciacion_acelerada=incluir_depreciacion_acelerada,
-                          demora_6_meses=False, custom_params=custom_params)
+            resultado = cotizacion(Load, size, quantity, cubierta, clima, index, dRate, costkWh, module,
+                                   ciudad=ciudad, hsp_lista=hsp_lista,
+                                   perc_financiamiento=perc_fin_escenario,
+                                   tasa_interes_credito=tasa_interes_escenario,
+                                   plazo_credito_años=plazo_escenario,
+                                   incluir_baterias=incluir_baterias, costo_kwh_bateria=costo_kwh_bateria,
+                                   profundidad_descarga=profundidad_descarga, eficiencia_bateria=eficiencia_bateria,
+                                   dias_autonomia=dias_autonomia, horizonte_tiempo=horizonte_base,
+                                   incluir_carbon=False, incluir_beneficios_tributarios=incluir_beneficios_tributarios,
+                                   incluir_deduccion_renta=incluir_deduccion_renta,
+                                   incluir_depreciacion_acelerada=incluir_depreciacion_acelerada,
+                                   demora_6_meses=False, custom_params=custom_params)
+            valor_proyecto_total = resultado.valor_proyecto_total
+            monto_a_financiar = resultado.monto_a_financiar
+            cuota_mensual_credito = resultado.cuota_mensual_credito
+            desembolso_inicial_cliente = resultado.desembolso_inicial_cliente
+            monthly_generation = resultado.generacion_mensual
             
             # SIEMPRE recalcular el flujo de caja para asegurar consistencia
             if precio_manual is not None:
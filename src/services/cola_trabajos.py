@@ -0,0 +1,457 @@
+"""
+Cola de trabajos en segundo plano para los efectos secundarios lentos (Drive, Notion).
+
+Los trabajos se guardan en SQLite, así que sobreviven a un reinicio del proceso:
+los que quedaron "en_curso" al caerse el servidor vuelven a "pendiente" al abrir
+la cola. Unos hilos de trabajo los procesan con reintentos y espera exponencial.
+
+Cada trabajo lleva una clave de idempotencia (tipo, número de propuesta FVyyNNN):
+hay a lo sumo un trabajo de Drive y uno de Notion por propuesta. Encolar de nuevo
+la misma propuesta actualiza el payload del trabajo existente en vez de crear
+otro; si el trabajo ya se completó, solo vuelve a la cola cuando el payload cambió
+(un PDF regenerado), así que un doble clic o un rerun no repiten nada.
+"""
+import os
+import json
+import time
+import base64
+import random
+import sqlite3
+import hashlib
+import datetime
+import threading
+
+from src.utils.helpers import numero_propuesta
+
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_EN_CURSO = "en_curso"
+ESTADO_COMPLETADO = "completado"
+ESTADO_FALLIDO = "fallido"
+
+TIPO_DRIVE = "drive"
+TIPO_NOTION = "notion"
+
+MAX_INTENTOS_POR_DEFECTO = 5
+BACKOFF_BASE_SEGUNDOS = 2.0
+BACKOFF_MAX_SEGUNDOS = 300.0
+# Espera de los hilos cuando no hay trabajos listos (se despiertan antes al encolar)
+INTERVALO_SONDEO_SEGUNDOS = 1.0
+
+
+def _ruta_db():
+    return os.environ.get("COLA_TRABAJOS_PATH", os.path.join("datos", "cola_trabajos.db"))
+
+
+def _codificar(valor):
+    if isinstance(valor, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(bytes(valor)).decode("ascii")}
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable en la cola de trabajos: {type(valor).__name__}")
+
+
+def _decodificar(objeto):
+    if set(objeto) == {"__bytes__"}:
+        return base64.b64decode(objeto["__bytes__"])
+    return objeto
+
+
+def serializar_payload(payload):
+    """JSON del payload; los bytes (PDF, DOCX) van en base64 y las fechas en ISO."""
+    return json.dumps(payload, default=_codificar, sort_keys=True, ensure_ascii=False)
+
+
+def deserializar_payload(texto):
+    return json.loads(texto, object_hook=_decodificar) if texto else None
+
+
+class ColaTrabajos:
+    """
+    Cola durable respaldada por SQLite con hilos de trabajo.
+
+    Args:
+        ruta: archivo SQLite (por defecto COLA_TRABAJOS_PATH o datos/cola_trabajos.db).
+        manejadores: dict tipo -> función(payload) que retorna un resultado serializable
+            o lanza una excepción para que el trabajo se reintente.
+        num_workers: hilos de trabajo que inicia iniciar().
+        max_intentos: intentos antes de marcar el trabajo como fallido.
+        backoff_base: segundos de espera tras el primer fallo; se duplica en cada intento.
+        reloj: función que retorna la hora actual en segundos (inyectable para tests).
+    """
+
+    def __init__(self, ruta=None, manejadores=None, num_workers=2, max_intentos=MAX_INTENTOS_POR_DEFECTO,
+                 backoff_base=BACKOFF_BASE_SEGUNDOS, backoff_max=BACKOFF_MAX_SEGUNDOS, reloj=time.time):
+        self.ruta = ruta or _ruta_db()
+        self.manejadores = dict(manejadores or {})
+        self.num_workers = num_workers
+        self.max_intentos = max_intentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.reloj = reloj
+        self._local = threading.local()
+        self._hilos = []
+        self._detener = threading.Event()
+        self._hay_trabajo = threading.Event()
+
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._crear_tabla()
+        self._recuperar_huerfanos()
+
+    # --- Conexión -----------------------------------------------------------
+
+    def _conexion(self):
+        """Una conexión por hilo; SQLite serializa las escrituras entre ellas."""
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            self._local.conexion = conexion
+        return conexion
+
+    def _crear_tabla(self):
+        self._conexion().executescript("""
+            CREATE TABLE IF NOT EXISTS trabajos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                clave TEXT NOT NULL UNIQUE,
+                propuesta TEXT,
+                payload TEXT,
+                estado TEXT NOT NULL,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                max_intentos INTEGER NOT NULL,
+                proximo_intento REAL NOT NULL,
+                ultimo_error TEXT,
+                resultado TEXT,
+                creado REAL NOT NULL,
+                actualizado REAL NOT NULL,
+                digest TEXT,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_trabajos_listos ON trabajos (estado, proximo_intento);
+        """)
+        # Colas creadas antes de que la clave dejara de incluir el contenido
+        columnas = {f["name"] for f in self._conexion().execute("PRAGMA table_info(trabajos)")}
+        if "digest" not in columnas:
+            self._conexion().execute("ALTER TABLE trabajos ADD COLUMN digest TEXT")
+        if "version" not in columnas:
+            self._conexion().execute("ALTER TABLE trabajos ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def _recuperar_huerfanos(self):
+        """Trabajos que quedaron en curso al caerse el proceso vuelven a la cola."""
+        self._conexion().execute(
+            "UPDATE trabajos SET estado = ?, actualizado = ? WHERE estado = ?",
+            (ESTADO_PENDIENTE, self.reloj(), ESTADO_EN_CURSO),
+        )
+
+    # --- Encolar y consultar ------------------------------------------------
+
+    def encolar(self, tipo, payload, propuesta):
+        """
+        Agrega un trabajo y retorna su id.
+
+        Hay un solo trabajo por (tipo, propuesta). Si ya existe, se retorna su id y:
+        - pendiente o en curso: se reemplaza el payload (uno en curso se repite con
+          el payload nuevo al terminar);
+        - fallido: vuelve a la cola con el payload nuevo;
+        - completado: vuelve a la cola solo si el payload cambió.
+        """
+        texto = serializar_payload(payload)
+        digest = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+        clave = f"{tipo}:{propuesta}"
+        ahora = self.reloj()
+        conexion = self._conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conexion.execute("SELECT id, estado, digest FROM trabajos WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                cursor = conexion.execute(
+                    "INSERT INTO trabajos (tipo, clave, propuesta, payload, digest, estado, max_intentos, proximo_intento, creado, actualizado) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (tipo, clave, propuesta, texto, digest, ESTADO_PENDIENTE, self.max_intentos, ahora, ahora, ahora),
+                )
+                id_trabajo = cursor.lastrowid
+            else:
+                id_trabajo = fila["id"]
+                if fila["estado"] in (ESTADO_PENDIENTE, ESTADO_EN_CURSO):
+                    if fila["digest"] != digest:
+                        conexion.execute(
+                            "UPDATE trabajos SET payload = ?, digest = ?, version = version + 1, actualizado = ? WHERE id = ?",
+                            (texto, digest, ahora, id_trabajo),
+                        )
+                elif fila["estado"] == ESTADO_FALLIDO or fila["digest"] != digest:
+                    conexion.execute(
+                        "UPDATE trabajos SET estado = ?, intentos = 0, payload = ?, digest = ?, version = version + 1, "
+                        "proximo_intento = ?, actualizado = ? WHERE id = ?",
+                        (ESTADO_PENDIENTE, texto, digest, ahora, ahora, id_trabajo),
+                    )
+            conexion.execute("COMMIT")
+        except BaseException:
+            conexion.execute("ROLLBACK")
+            raise
+        self._hay_trabajo.set()
+        return id_trabajo
+
+    def reintentar(self, id_trabajo):
+        """Vuelve a poner en cola un trabajo fallido. Retorna True si se reactivó."""
+        ahora = self.reloj()
+        cursor = self._conexion().execute(
+            "UPDATE trabajos SET estado = ?, intentos = 0, proximo_intento = ?, actualizado = ? "
+            "WHERE id = ? AND estado = ? AND payload IS NOT NULL",
+            (ESTADO_PENDIENTE, ahora, ahora, id_trabajo, ESTADO_FALLIDO),
+        )
+        self._hay_trabajo.set()
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _fila_a_dict(fila):
+        return {
+            "id": fila["id"],
+            "tipo": fila["tipo"],
+            "propuesta": fila["propuesta"],
+            "estado": fila["estado"],
+            "intentos": fila["intentos"],
+            "max_intentos": fila["max_intentos"],
+            "proximo_intento": fila["proximo_intento"],
+            "ultimo_error": fila["ultimo_error"],
+            "resultado": json.loads(fila["resultado"]) if fila["resultado"] else None,
+            "creado": fila["creado"],
+            "actualizado": fila["actualizado"],
+        }
+
+    def obtener(self, id_trabajo):
+        """Estado de un trabajo (sin el payload), o None si no existe."""
+        fila = self._conexion().execute(
+            "SELECT id, tipo, propuesta, estado, intentos, max_intentos, proximo_intento, ultimo_error, resultado, creado, actualizado "
+            "FROM trabajos WHERE id = ?", (id_trabajo,)
+        ).fetchone()
+        return self._fila_a_dict(fila) if fila else None
+
+    def listar(self, limite=50):
+        """Trabajos más recientes primero (para la vista de estado)."""
+        filas = self._conexion().execute(
+            "SELECT id, tipo, propuesta, estado, intentos, max_intentos, proximo_intento, ultimo_error, resultado, creado, actualizado "
+            "FROM trabajos ORDER BY id DESC LIMIT ?", (limite,)
+        ).fetchall()
+        return [self._fila_a_dict(f) for f in filas]
+
+    def conteo_por_estado(self):
+        filas = self._conexion().execute("SELECT estado, COUNT(*) AS n FROM trabajos GROUP BY estado").fetchall()
+        return {f["estado"]: f["n"] for f in filas}
+
+    # --- Procesamiento ------------------------------------------------------
+
+    def _reclamar(self):
+        """Marca como en curso el siguiente trabajo listo y lo retorna, o None si no hay."""
+        conexion = self._conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conexion.execute(
+                "SELECT id, tipo, payload, intentos, version FROM trabajos WHERE estado = ? AND proximo_intento <= ? "
+                "ORDER BY proximo_intento, id LIMIT 1",
+                (ESTADO_PENDIENTE, self.reloj()),
+            ).fetchone()
+            if fila is not None:
+                conexion.execute(
+                    "UPDATE trabajos SET estado = ?, intentos = intentos + 1, actualizado = ? WHERE id = ?",
+                    (ESTADO_EN_CURSO, self.reloj(), fila["id"]),
+                )
+            conexion.execute("COMMIT")
+        except BaseException:
+            conexion.execute("ROLLBACK")
+            raise
+        return fila
+
+    def _espera_reintento(self, intentos):
+        espera = min(self.backoff_max, self.backoff_base * (2 ** (intentos - 1)))
+        return espera * random.uniform(0.8, 1.2)
+
+    def procesar_uno(self):
+        """Procesa un trabajo listo. Retorna True si había alguno."""
+        fila = self._reclamar()
+        if fila is None:
+            return False
+
+        intentos = fila["intentos"] + 1
+        manejador = self.manejadores.get(fila["tipo"])
+        try:
+            if manejador is None:
+                raise LookupError(f"No hay manejador registrado para trabajos '{fila['tipo']}'")
+            resultado = manejador(deserializar_payload(fila["payload"]))
+        except Exception as e:
+            ahora = self.reloj()
+            error = f"{type(e).__name__}: {e}"
+            if intentos >= self.max_intentos:
+                cursor = self._conexion().execute(
+                    "UPDATE trabajos SET estado = ?, ultimo_error = ?, actualizado = ? WHERE id = ? AND version = ?",
+                    (ESTADO_FALLIDO, error, ahora, fila["id"], fila["version"]),
+                )
+            else:
+                cursor = self._conexion().execute(
+                    "UPDATE trabajos SET estado = ?, ultimo_error = ?, proximo_intento = ?, actualizado = ? WHERE id = ? AND version = ?",
+                    (ESTADO_PENDIENTE, error, ahora + self._espera_reintento(intentos), ahora, fila["id"], fila["version"]),
+                )
+        else:
+            # El payload (PDF, contrato) ya no hace falta una vez completado
+            cursor = self._conexion().execute(
+                "UPDATE trabajos SET estado = ?, resultado = ?, payload = NULL, ultimo_error = NULL, actualizado = ? "
+                "WHERE id = ? AND version = ?",
+                (ESTADO_COMPLETADO, json.dumps(resultado, default=_codificar), self.reloj(), fila["id"], fila["version"]),
+            )
+        if cursor.rowcount == 0:
+            # El payload cambió mientras se procesaba: se repite enseguida con el nuevo
+            self._conexion().execute(
+                "UPDATE trabajos SET estado = ?, intentos = 0, proximo_intento = ?, actualizado = ? WHERE id = ?",
+                (ESTADO_PENDIENTE, self.reloj(), self.reloj(), fila["id"]),
+            )
+        return True
+
+    def procesar_pendientes(self, max_trabajos=None):
+        """Procesa en el hilo actual los trabajos listos. Retorna cuántos procesó."""
+        procesados = 0
+        while (max_trabajos is None or procesados < max_trabajos) and self.procesar_uno():
+            procesados += 1
+        return procesados
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                trabajo_procesado = self.procesar_uno()
+            except sqlite3.Error as e:
+                print(f"Error en la cola de trabajos: {e}")
+                trabajo_procesado = False
+            if not trabajo_procesado:
+                self._hay_trabajo.wait(INTERVALO_SONDEO_SEGUNDOS)
+                self._hay_trabajo.clear()
+
+    def iniciar(self):
+        """Inicia los hilos de trabajo (idempotente)."""
+        if any(h.is_alive() for h in self._hilos):
+            return
+        self._detener.clear()
+        self._hilos = [
+            threading.Thread(target=self._bucle, name=f"cola-trabajos-{i}", daemon=True)
+            for i in range(self.num_workers)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def detener(self, timeout=5.0):
+        self._detener.set()
+        self._hay_trabajo.set()
+        for hilo in self._hilos:
+            hilo.join(timeout)
+        self._hilos = []
+
+
+# =============================================================================
+# MANEJADORES DE DRIVE Y NOTION
+# =============================================================================
+
+def crear_manejador_drive(crear_servicio):
+    """
+    Manejador de trabajos de Drive. `crear_servicio()` retorna un cliente de Drive;
+    se crea uno por hilo porque los clientes de googleapiclient no son seguros entre hilos.
+    """
+    from src.services.drive_service import crear_proyecto_en_drive
+    local = threading.local()
+
+    def _manejar(payload):
+        if getattr(local, "servicio", None) is None:
+            local.servicio = crear_servicio()
+        link = crear_proyecto_en_drive(
+            local.servicio, payload["parent_folder_id"], payload["nombre_proyecto"],
+            payload["pdf_bytes"], payload["nombre_pdf"], payload.get("contrato_bytes"), payload["nombre_contrato"],
+            payload.get("csv_content"), payload.get("nombre_csv"),
+        )
+        return {"link_carpeta": link}
+
+    return _manejar
+
+
+def crear_manejador_notion(crear_cliente, database_id=None):
+    """
+    Manejador de trabajos de Notion. `crear_cliente()` retorna un cliente de Notion
+    (o None si la integración no está configurada, en cuyo caso no se reintenta).
+
+    El cliente, el esquema de la base de datos y el índice de propuestas se cargan
+    una vez y se reutilizan en todos los trabajos de la cola, de modo que cada
+    registro cuesta una sola petición.
+    """
+    from src.services.notion_service import CRMNotion
+    lock = threading.Lock()
+    estado = {"crm": None}
+
+    def _manejar(payload):
+        base = database_id or os.environ.get("NOTION_CRM_DATABASE_ID")
+        with lock:
+            if estado["crm"] is None or estado["crm"].database_id != base:
+                cliente = crear_cliente() if base else None
+                estado["crm"] = CRMNotion(cliente, base) if cliente is not None else None
+            crm = estado["crm"]
+        if crm is None:
+            return {"ok": False, "mensaje": "Integración Notion no configurada"}
+        mensaje = crm.registrar(
+            payload["nombre"], payload.get("documento"), payload.get("direccion"),
+            payload["proyecto"], payload.get("fecha"), payload.get("estado", "En conversaciones"),
+        )
+        return {"ok": True, "mensaje": mensaje}
+
+    return _manejar
+
+
+def _crear_cliente_notion_desde_entorno():
+    from src.services.notion_service import NotionClient
+    token = os.environ.get("NOTION_API_TOKEN")
+    if not token or NotionClient is None:
+        return None
+    return NotionClient(auth=token)
+
+
+_cola = None
+_lock_cola = threading.Lock()
+
+
+def obtener_cola():
+    """Cola del proceso con los manejadores de Drive y Notion, con los hilos ya iniciados."""
+    global _cola
+    with _lock_cola:
+        if _cola is None:
+            from src.services.drive_service import construir_servicio_drive
+            _cola = ColaTrabajos(manejadores={
+                TIPO_DRIVE: crear_manejador_drive(construir_servicio_drive),
+                TIPO_NOTION: crear_manejador_notion(_crear_cliente_notion_desde_entorno),
+            })
+            _cola.iniciar()
+        return _cola
+
+
+def encolar_drive(parent_folder_id, nombre_proyecto, pdf_bytes, nombre_pdf, contrato_bytes, nombre_contrato,
+                  csv_content=None, nombre_csv=None, cola=None):
+    """Encola la creación de la carpeta del proyecto y la subida de PDF, contrato y (opcional) CSV."""
+    cola = cola or obtener_cola()
+    return cola.encolar(TIPO_DRIVE, {
+        "parent_folder_id": parent_folder_id,
+        "nombre_proyecto": nombre_proyecto,
+        "pdf_bytes": pdf_bytes,
+        "nombre_pdf": nombre_pdf,
+        "contrato_bytes": contrato_bytes,
+        "nombre_contrato": nombre_contrato,
+        "csv_content": csv_content,
+        "nombre_csv": nombre_csv,
+    }, numero_propuesta(nombre_proyecto))
+
+
+def encolar_notion(nombre, documento, direccion, proyecto, fecha, estado="En conversaciones", cola=None):
+    """Encola el registro del cliente en el CRM de Notion."""
+    cola = cola or obtener_cola()
+    return cola.encolar(TIPO_NOTION, {
+        "nombre": nombre,
+        "documento": documento,
+        "direccion": direccion,
+        "proyecto": proyecto,
+        "fecha": fecha,
+        "estado": estado,
+    }, numero_propuesta(proyecto))
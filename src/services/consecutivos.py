@@ -0,0 +1,231 @@
+"""
+Asignación del consecutivo anual de proyectos (FVyyNNN).
+
+El último número usado de cada año se guarda en SQLite, así que cargar la app ya
+no lista la carpeta padre de Drive: la vista previa sale del contador local. El
+contador se reconcilia con Drive (recorriendo todas las páginas del listado) en
+un hilo en segundo plano, como máximo una vez cada RECONCILIAR_CADA_SEGUNDOS.
+
+reservar() toma el siguiente número dentro de una transacción BEGIN IMMEDIATE,
+de modo que dos sesiones que generan a la vez nunca reciben el mismo número. Con
+una clave (el borrador de la propuesta), regenerarla conserva su número aunque se
+corrija el nombre del cliente.
+
+Si la última reconciliación falló, el contador local puede estar atrasado frente
+a Drive (en un servidor nuevo empieza en 1). Con exigir_reconciliacion=True,
+reservar() se niega a asignar un número nuevo hasta que una reconciliación salga bien.
+"""
+import os
+import time
+import sqlite3
+import threading
+
+# Cada cuánto se vuelve a comparar el contador con las carpetas de Drive
+RECONCILIAR_CADA_SEGUNDOS = 3600
+
+
+def _ruta_db():
+    return os.environ.get("CONSECUTIVOS_PATH", os.path.join("datos", "consecutivos.db"))
+
+
+class AsignadorConsecutivos:
+    """
+    Contador persistente del consecutivo de proyectos por año.
+
+    Args:
+        ruta: archivo SQLite (por defecto CONSECUTIVOS_PATH o datos/consecutivos.db).
+        reconciliar_cada: segundos tras los cuales una reconciliación se considera vencida.
+        reloj: función que retorna la hora actual en segundos (inyectable para tests).
+    """
+
+    def __init__(self, ruta=None, reconciliar_cada=RECONCILIAR_CADA_SEGUNDOS, reloj=time.time):
+        self.ruta = ruta or _ruta_db()
+        self.reconciliar_cada = reconciliar_cada
+        self.reloj = reloj
+        self._local = threading.local()
+        self._lock_hilos = threading.Lock()
+        self._hilos = {}
+
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._crear_tablas()
+
+    def _conexion(self):
+        """Una conexión por hilo; SQLite serializa las escrituras entre ellas."""
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            self._local.conexion = conexion
+        return conexion
+
+    def _crear_tablas(self):
+        self._conexion().executescript("""
+            CREATE TABLE IF NOT EXISTS consecutivos (
+                anio TEXT PRIMARY KEY,
+                ultimo INTEGER NOT NULL DEFAULT 0,
+                reconciliado REAL,
+                error_reconciliacion TEXT
+            );
+            CREATE TABLE IF NOT EXISTS reservas (
+                clave TEXT NOT NULL,
+                anio TEXT NOT NULL,
+                numero INTEGER NOT NULL,
+                creado REAL NOT NULL,
+                PRIMARY KEY (anio, clave)
+            );
+        """)
+        columnas = {f["name"] for f in self._conexion().execute("PRAGMA table_info(consecutivos)")}
+        if "error_reconciliacion" not in columnas:
+            self._conexion().execute("ALTER TABLE consecutivos ADD COLUMN error_reconciliacion TEXT")
+
+    def _transaccion(self, anio, funcion):
+        """Ejecuta funcion(conexion) en una transacción exclusiva, con la fila del año ya creada."""
+        conexion = self._conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            conexion.execute("INSERT OR IGNORE INTO consecutivos (anio) VALUES (?)", (anio,))
+            resultado = funcion(conexion)
+            conexion.execute("COMMIT")
+        except BaseException:
+            conexion.execute("ROLLBACK")
+            raise
+        return resultado
+
+    # --- Consultas ----------------------------------------------------------
+
+    def ultimo(self, anio):
+        fila = self._conexion().execute("SELECT ultimo FROM consecutivos WHERE anio = ?", (anio,)).fetchone()
+        return fila["ultimo"] if fila else 0
+
+    def siguiente(self, anio):
+        """Número que recibiría la próxima reserva (vista previa, no reserva nada)."""
+        return self.ultimo(anio) + 1
+
+    def necesita_reconciliar(self, anio):
+        fila = self._conexion().execute(
+            "SELECT reconciliado, error_reconciliacion FROM consecutivos WHERE anio = ?", (anio,)
+        ).fetchone()
+        if fila is None or fila["reconciliado"] is None or fila["error_reconciliacion"] is not None:
+            return True
+        return self.reloj() - fila["reconciliado"] >= self.reconciliar_cada
+
+    def verificado(self, anio):
+        """True si el contador se reconcilió con Drive y el último intento no falló."""
+        fila = self._conexion().execute(
+            "SELECT reconciliado, error_reconciliacion FROM consecutivos WHERE anio = ?", (anio,)
+        ).fetchone()
+        return fila is not None and fila["reconciliado"] is not None and fila["error_reconciliacion"] is None
+
+    def error_reconciliacion(self, anio):
+        """Mensaje del último intento de reconciliación fallido, o None."""
+        fila = self._conexion().execute(
+            "SELECT error_reconciliacion FROM consecutivos WHERE anio = ?", (anio,)
+        ).fetchone()
+        return fila["error_reconciliacion"] if fila else None
+
+    # --- Escrituras ---------------------------------------------------------
+
+    def reservar(self, anio, clave=None, exigir_reconciliacion=False):
+        """
+        Reserva y retorna el siguiente número del año de forma atómica.
+
+        Si se indica `clave` y ya tiene un número reservado ese año, retorna el mismo.
+        Con exigir_reconciliacion=True lanza RuntimeError en vez de asignar un número
+        nuevo si el contador no está verificado contra Drive (ver verificado()).
+        """
+        def _reservar(conexion):
+            if clave is not None:
+                fila = conexion.execute(
+                    "SELECT numero FROM reservas WHERE anio = ? AND clave = ?", (anio, clave)
+                ).fetchone()
+                if fila is not None:
+                    return fila["numero"]
+            if exigir_reconciliacion:
+                estado = conexion.execute(
+                    "SELECT reconciliado, error_reconciliacion FROM consecutivos WHERE anio = ?", (anio,)
+                ).fetchone()
+                if estado["reconciliado"] is None or estado["error_reconciliacion"] is not None:
+                    raise RuntimeError(
+                        f"El consecutivo {anio} no se pudo verificar con Drive"
+                        + (f": {estado['error_reconciliacion']}" if estado["error_reconciliacion"] else "")
+                    )
+            conexion.execute("UPDATE consecutivos SET ultimo = ultimo + 1 WHERE anio = ?", (anio,))
+            numero = conexion.execute("SELECT ultimo FROM consecutivos WHERE anio = ?", (anio,)).fetchone()["ultimo"]
+            if clave is not None:
+                conexion.execute(
+                    "INSERT INTO reservas (clave, anio, numero, creado) VALUES (?, ?, ?, ?)",
+                    (clave, anio, numero, self.reloj()),
+                )
+            return numero
+
+        return self._transaccion(anio, _reservar)
+
+    def reconciliar(self, anio, maximo_externo):
+        """
+        Sube el contador al máximo visto fuera (p. ej. en Drive) si es mayor.
+        Nunca lo baja, para no reutilizar números ya reservados. Retorna el último número.
+        """
+        def _reconciliar(conexion):
+            conexion.execute(
+                "UPDATE consecutivos SET ultimo = MAX(ultimo, ?), reconciliado = ?, error_reconciliacion = NULL WHERE anio = ?",
+                (int(maximo_externo), self.reloj(), anio),
+            )
+            return conexion.execute("SELECT ultimo FROM consecutivos WHERE anio = ?", (anio,)).fetchone()["ultimo"]
+
+        return self._transaccion(anio, _reconciliar)
+
+    def registrar_fallo_reconciliacion(self, anio, error):
+        """Marca el contador como no verificado hasta la próxima reconciliación exitosa."""
+        self._transaccion(anio, lambda conexion: conexion.execute(
+            "UPDATE consecutivos SET error_reconciliacion = ? WHERE anio = ?", (str(error) or type(error).__name__, anio)
+        ))
+
+    # --- Reconciliación en segundo plano ------------------------------------
+
+    def reconciliar_en_segundo_plano(self, anio, escanear):
+        """
+        Lanza un hilo que ejecuta `escanear()` (retorna el mayor número existente fuera)
+        y reconcilia con él, si la última reconciliación está vencida y no hay otra en curso.
+        Retorna el hilo, o None si no hizo falta.
+        """
+        if not self.necesita_reconciliar(anio):
+            return None
+        with self._lock_hilos:
+            hilo = self._hilos.get(anio)
+            if hilo is not None and hilo.is_alive():
+                return hilo
+
+            def _ejecutar():
+                try:
+                    self.reconciliar(anio, escanear())
+                except Exception as e:
+                    print(f"No se pudo reconciliar el consecutivo {anio}: {e}")
+                    self.registrar_fallo_reconciliacion(anio, e)
+
+            hilo = threading.Thread(target=_ejecutar, name=f"consecutivo-{anio}", daemon=True)
+            self._hilos[anio] = hilo
+            hilo.start()
+            return hilo
+
+    def esperar_reconciliacion(self, anio, timeout=None):
+        """Espera a que termine la reconciliación en curso del año (si la hay)."""
+        with self._lock_hilos:
+            hilo = self._hilos.get(anio)
+        if hilo is not None:
+            hilo.join(timeout)
+
+
+_asignador = None
+_lock_asignador = threading.Lock()
+
+
+def obtener_asignador():
+    """Asignador de consecutivos compartido por todas las sesiones del proceso."""
+    global _asignador
+    with _lock_asignador:
+        if _asignador is None:
+            _asignador = AsignadorConsecutivos()
+        return _asignador
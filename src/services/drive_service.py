@@ -5,39 +5,102 @@ import os
 import io
 import re
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
 from src.config import ESTRUCTURA_CARPETAS
 
-def obtener_siguiente_consecutivo(service, id_carpeta_padre):
-    try:
-        año_actual_corto = str(datetime.datetime.now().year)[-2:]
-        query = f"'{id_carpeta_padre}' in parents and mimeType='application/vnd.google-apps.folder'"
+def maximo_consecutivo_en_drive(service, id_carpeta_padre, año_corto):
+    """
+    Mayor consecutivo FV<año>NNN entre las carpetas de proyecto de la carpeta padre.
+
+    Recorre todas las páginas del listado (sin el tope de 1000 de una sola página)
+    y solo pide las carpetas cuyo nombre contiene el prefijo del año. Lanza la
+    excepción original si Drive falla.
+    """
+    prefijo = f"FV{año_corto}"
+    query = (f"'{id_carpeta_padre}' in parents and mimeType='application/vnd.google-apps.folder' "
+             f"and name contains '{prefijo}' and trashed=false")
+    patron = re.compile(f"{prefijo}(\\d{{3,}})")
+    max_num = 0
+    page_token = None
+    while True:
         results = service.files().list(
-            q=query, pageSize=1000, fields="files(name)",
+            q=query, pageSize=1000, fields="nextPageToken, files(name)", pageToken=page_token,
             supportsAllDrives=True, includeItemsFromAllDrives=True
         ).execute()
-        items = results.get('files', [])
-        max_num = 0
-        patron = re.compile(f"FV{año_actual_corto}(\\d{{3}})")
-        if items:
-            for item in items:
-                match = patron.search(item['name'])
-                if match:
-                    numero = int(match.group(1))
-                    if numero > max_num: max_num = numero
-        return max_num + 1
+        for item in results.get('files', []):
+            match = patron.search(item['name'])
+            if match:
+                max_num = max(max_num, int(match.group(1)))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return max_num
+
+
+def obtener_siguiente_consecutivo(service, id_carpeta_padre):
+    try:
+        año_actual_corto = str(datetime.datetime.now().year)[-2:]
+        return maximo_consecutivo_en_drive(service, id_carpeta_padre, año_actual_corto) + 1
     except Exception as e:
         st.error(f"Error al buscar consecutivo en Drive: {e}")
         return 1
 
 def crear_subcarpetas(service, id_carpeta_padre, estructura):
-    for nombre_carpeta, sub_estructura in estructura.items():
-        file_metadata = {'name': nombre_carpeta, 'mimeType': 'application/vnd.google-apps.folder', 'parents': [id_carpeta_padre]}
-        subfolder = service.files().create(body=file_metadata, fields='id', supportsAllDrives=True).execute()
-        if sub_estructura:
-            crear_subcarpetas(service, subfolder.get('id'), sub_estructura)
+    """
+    Crea el árbol de subcarpetas con una petición HTTP por lote (batch) por nivel.
+
+    Retorna un dict con el ID de cada carpeta creada, indexado por su ruta
+    relativa ("01_Propuesta_y_Contratacion", "04_UPME/Planos", ...), para no
+    tener que volver a listar la carpeta después.
+    """
+    ids = {}
+    nivel = [(id_carpeta_padre, "", estructura)]
+    while nivel:
+        peticiones = []
+        for id_padre, ruta_padre, sub_estructura in nivel:
+            for nombre_carpeta, hijos in sub_estructura.items():
+                ruta = f"{ruta_padre}/{nombre_carpeta}" if ruta_padre else nombre_carpeta
+                file_metadata = {'name': nombre_carpeta, 'mimeType': 'application/vnd.google-apps.folder', 'parents': [id_padre]}
+                peticiones.append((ruta, hijos, service.files().create(body=file_metadata, fields='id', supportsAllDrives=True)))
+
+        respuestas = _ejecutar_en_lote(service, [(ruta, peticion) for ruta, _, peticion in peticiones])
+        siguiente = []
+        for ruta, hijos, _ in peticiones:
+            ids[ruta] = respuestas[ruta]['id']
+            if hijos:
+                siguiente.append((ids[ruta], ruta, hijos))
+        nivel = siguiente
+    return ids
+
+
+# Límite de peticiones por lote del API de Drive
+MAX_PETICIONES_POR_LOTE = 100
+
+
+def _ejecutar_en_lote(service, peticiones):
+    """
+    Ejecuta [(clave, peticion)] en lotes HTTP y retorna {clave: respuesta}.
+    Si alguna petición del lote falla, lanza su excepción.
+    """
+    respuestas = {}
+    errores = []
+
+    def _callback(request_id, response, exception):
+        if exception is not None:
+            errores.append(exception)
+        else:
+            respuestas[request_id] = response
+
+    for inicio in range(0, len(peticiones), MAX_PETICIONES_POR_LOTE):
+        lote = service.new_batch_http_request(callback=_callback)
+        for clave, peticion in peticiones[inicio:inicio + MAX_PETICIONES_POR_LOTE]:
+            lote.add(peticion, request_id=clave)
+        lote.execute()
+        if errores:
+            raise errores[0]
+    return respuestas
 
 def subir_pdf_a_drive(service, id_carpeta_destino, nombre_archivo, pdf_bytes):
     try:
@@ -75,38 +138,146 @@ def subir_docx_a_drive(service, id_carpeta_destino, nombre_archivo, docx_bytes):
     except Exception as e:
         st.error(f"Error al subir el contrato a Google Drive: {e}")
 
-def gestionar_creacion_drive(service, parent_folder_id, nombre_proyecto, pdf_bytes, nombre_pdf, contrato_bytes, nombre_contrato):
+def gestionar_creacion_drive(service, parent_folder_id, nombre_proyecto, pdf_bytes, nombre_pdf, contrato_bytes, nombre_contrato,
+                             csv_content=None, nombre_csv=None):
     try:
-        folder_metadata = {'name': nombre_proyecto, 'mimeType': 'application/vnd.google-apps.folder', 'parents': [parent_folder_id]}
-        folder = service.files().create(body=folder_metadata, fields='id, webViewLink', supportsAllDrives=True).execute()
-        id_carpeta_principal_nueva = folder.get('id')
-        
-        if id_carpeta_principal_nueva:
-            with st.spinner("Creando estructura de subcarpetas..."):
-                crear_subcarpetas(service, id_carpeta_principal_nueva, ESTRUCTURA_CARPETAS)
-            st.success("✅ Estructura de carpetas creada.")
-
-            with st.spinner("Buscando carpeta de destino para el PDF..."):
-                query = f"'{id_carpeta_principal_nueva}' in parents and name='01_Propuesta_y_Contratacion'"
-                results = service.files().list(q=query, fields="files(id)", supportsAllDrives=True, includeItemsFromAllDrives=True).execute()
-                items = results.get('files', [])
-            
-                if items:
-                    id_carpeta_propuesta = items[0].get('id')
-                    subir_pdf_a_drive(service, id_carpeta_propuesta, nombre_pdf, pdf_bytes)
-                else:
-                    st.warning("No se encontró la subcarpeta '01_Propuesta_y_Contratacion' para guardar el PDF.")
-            with st.spinner("Buscando carpeta de destino para el contrato..."):
-                query_contrato = f"'{id_carpeta_principal_nueva}' in parents and name='01_Propuesta_y_Contratacion'"
-                results_contrato = service.files().list(q=query_contrato, fields="files(id)", supportsAllDrives=True, includeItemsFromAllDrives=True).execute()
-                items_contrato = results_contrato.get('files', [])
-                if items_contrato:
-                    id_carpeta_contrato = items_contrato[0].get('id')
-                    subir_docx_a_drive(service, id_carpeta_contrato, nombre_contrato, contrato_bytes)
-                else:
-                    st.warning("No se encontró la subcarpeta '01_Propuesta_y_Contratacion'.")
-        return folder.get('webViewLink')
+        with st.spinner("Creando carpetas del proyecto y subiendo archivos..."):
+            link = crear_proyecto_en_drive(service, parent_folder_id, nombre_proyecto, pdf_bytes, nombre_pdf,
+                                           contrato_bytes, nombre_contrato, csv_content, nombre_csv)
+        st.success("✅ Estructura de carpetas creada y archivos guardados en 'Propuesta y Contratación'.")
+        return link
     except Exception as e:
         st.error(f"Error en el proceso de Google Drive: {e}")
         return None
 
+
+
+# =============================================================================
+# VERSIÓN IDEMPOTENTE PARA LA COLA DE TRABAJOS
+# =============================================================================
+
+CARPETA_PROPUESTA = '01_Propuesta_y_Contratacion'
+MIME_CARPETA = 'application/vnd.google-apps.folder'
+MIME_DOCX = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+def construir_servicio_drive():
+    """Crea un cliente de Drive con las credenciales OAuth de las variables de entorno."""
+    from google.oauth2.credentials import Credentials
+    creds = Credentials(
+        None, refresh_token=os.environ.get("GOOGLE_REFRESH_TOKEN"),
+        token_uri='https://oauth2.googleapis.com/token',
+        client_id=os.environ.get("GOOGLE_CLIENT_ID"),
+        client_secret=os.environ.get("GOOGLE_CLIENT_SECRET"),
+        scopes=['https://www.googleapis.com/auth/drive']
+    )
+    return build('drive', 'v3', credentials=creds)
+
+
+def _buscar_por_nombre(service, id_carpeta_padre, nombre, solo_carpetas=False, http=None):
+    """Primer archivo (o carpeta) con ese nombre dentro de la carpeta padre, o None."""
+    nombre_query = nombre.replace("\\", "\\\\").replace("'", "\\'")
+    query = f"'{id_carpeta_padre}' in parents and name='{nombre_query}' and trashed=false"
+    if solo_carpetas:
+        query += f" and mimeType='{MIME_CARPETA}'"
+    results = _ejecutar(service.files().list(
+        q=query, fields="files(id, webViewLink)",
+        supportsAllDrives=True, includeItemsFromAllDrives=True
+    ), http)
+    items = results.get('files', [])
+    return items[0] if items else None
+
+
+def _asegurar_subcarpetas(service, id_carpeta_padre, estructura):
+    """Como crear_subcarpetas, pero reutiliza las subcarpetas que ya existan."""
+    for nombre_carpeta, sub_estructura in estructura.items():
+        subfolder = _buscar_por_nombre(service, id_carpeta_padre, nombre_carpeta, solo_carpetas=True)
+        if subfolder is None:
+            file_metadata = {'name': nombre_carpeta, 'mimeType': MIME_CARPETA, 'parents': [id_carpeta_padre]}
+            subfolder = service.files().create(body=file_metadata, fields='id', supportsAllDrives=True).execute()
+        if sub_estructura:
+            _asegurar_subcarpetas(service, subfolder.get('id'), sub_estructura)
+
+
+def _http_para_hilo(service):
+    """
+    Conexión HTTP propia para usar el cliente desde otro hilo (httplib2 no es seguro
+    entre hilos). Retorna None si el cliente no expone credenciales (p. ej. fakes).
+    """
+    credenciales = getattr(getattr(service, '_http', None), 'credentials', None)
+    if credenciales is None:
+        return None
+    import httplib2
+    import google_auth_httplib2
+    return google_auth_httplib2.AuthorizedHttp(credenciales, http=httplib2.Http())
+
+
+def _ejecutar(peticion, http=None):
+    return peticion.execute(http=http) if http is not None else peticion.execute()
+
+
+def _subir_o_reemplazar(service, id_carpeta_destino, nombre_archivo, contenido, mimetype, reemplazar=True, http=None):
+    """
+    Sube el archivo; si `reemplazar` y ya existe uno con el mismo nombre en la carpeta,
+    reemplaza su contenido en lugar de crear un duplicado.
+    """
+    media = MediaIoBaseUpload(io.BytesIO(contenido), mimetype=mimetype)
+    existente = _buscar_por_nombre(service, id_carpeta_destino, nombre_archivo, http=http) if reemplazar else None
+    if existente:
+        return _ejecutar(service.files().update(
+            fileId=existente['id'], media_body=media, fields='id, webViewLink', supportsAllDrives=True
+        ), http)
+    file_metadata = {'name': nombre_archivo, 'parents': [id_carpeta_destino]}
+    return _ejecutar(service.files().create(
+        body=file_metadata, media_body=media, fields='id, webViewLink', supportsAllDrives=True
+    ), http)
+
+
+def subir_archivos_en_paralelo(service, id_carpeta_destino, archivos, reemplazar=True):
+    """
+    Sube [(nombre, contenido_bytes, mimetype)] a la misma carpeta en paralelo,
+    cada subida con su propia conexión HTTP. Lanza la primera excepción que ocurra.
+    """
+    if len(archivos) <= 1:
+        return [_subir_o_reemplazar(service, id_carpeta_destino, *archivo, reemplazar=reemplazar) for archivo in archivos]
+
+    def _subir(archivo):
+        return _subir_o_reemplazar(service, id_carpeta_destino, *archivo, reemplazar=reemplazar, http=_http_para_hilo(service))
+
+    with ThreadPoolExecutor(max_workers=len(archivos), thread_name_prefix="drive") as pool:
+        return list(pool.map(_subir, archivos))
+
+
+def crear_proyecto_en_drive(service, parent_folder_id, nombre_proyecto, pdf_bytes, nombre_pdf, contrato_bytes, nombre_contrato,
+                            csv_content=None, nombre_csv=None):
+    """
+    Crea la carpeta del proyecto con su árbol de subcarpetas y sube PDF, contrato y CSV.
+
+    - Proyecto nuevo: una petición para la carpeta, un lote para las subcarpetas
+      (cuyos IDs se conservan) y las subidas en paralelo, sin volver a listar.
+    - Proyecto existente (reintento o regeneración): reutiliza la carpeta y sus
+      subcarpetas y reemplaza los archivos con el mismo nombre, así que un
+      reintento tras un fallo parcial no duplica nada.
+
+    Lanza la excepción original si algo falla. Retorna el enlace de la carpeta del proyecto.
+    """
+    folder = _buscar_por_nombre(service, parent_folder_id, nombre_proyecto, solo_carpetas=True)
+    es_nueva = folder is None
+    if es_nueva:
+        folder_metadata = {'name': nombre_proyecto, 'mimeType': MIME_CARPETA, 'parents': [parent_folder_id]}
+        folder = service.files().create(body=folder_metadata, fields='id, webViewLink', supportsAllDrives=True).execute()
+        id_destino = crear_subcarpetas(service, folder.get('id'), ESTRUCTURA_CARPETAS).get(CARPETA_PROPUESTA)
+    else:
+        _asegurar_subcarpetas(service, folder.get('id'), ESTRUCTURA_CARPETAS)
+        destino = _buscar_por_nombre(service, folder.get('id'), CARPETA_PROPUESTA, solo_carpetas=True)
+        id_destino = destino['id'] if destino else None
+    if id_destino is None:
+        raise RuntimeError(f"No se encontró la subcarpeta '{CARPETA_PROPUESTA}'")
+
+    archivos = [(nombre_pdf, pdf_bytes, 'application/pdf')]
+    if contrato_bytes:
+        archivos.append((nombre_contrato, contrato_bytes, MIME_DOCX))
+    if csv_content:
+        archivos.append((nombre_csv, csv_content.encode('utf-8'), 'text/csv'))
+    subir_archivos_en_paralelo(service, id_destino, archivos, reemplazar=not es_nueva)
+    return folder.get('webViewLink')
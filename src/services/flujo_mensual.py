@@ -0,0 +1,139 @@
+"""
+Flujo de caja con resolución mensual en todo el horizonte.
+
+cotizacion() trabaja por años: la tarifa sube una vez al año, la demora de 6
+meses se aproxima con la mitad del ahorro del año 1 y las cuotas del crédito se
+agrupan por año. flujo_caja_mensual() arma el mismo proyecto mes a mes
+(horizonte × 12 periodos) como arreglos numpy, sin ciclos por mes:
+
+- la tarifa (y el precio de excedentes) sube cada mes con la tasa mensual
+  equivalente a la indexación anual;
+- la generación arranca en el mes de puesta en marcha, sigue el perfil de HSP
+  del mes calendario y se degrada mes a mes;
+- las cuotas salen de la tabla de amortización mensual (amortizacion.py);
+- el VPN descuenta cada mes con la tasa mensual equivalente a dRate, y la TIR
+  mensual se reporta también anualizada.
+
+El mes 0 es la firma (desembolso inicial) y el mes m cierra el mes m del proyecto.
+"""
+import math
+
+import numpy as np
+
+from src.config_parametros import get_param
+from src.services.amortizacion import tabla_amortizacion
+from src.services.motor_vectorizado import (
+    argumentos_vectorizados,
+    cotizacion_vectorizada,
+    payback_vectorizado,
+    tir_vectorizada,
+    vpn_vectorizado,
+)
+
+MESES_DEMORA = 6
+
+
+def flujo_caja_mensual(*args, mes_puesta_en_marcha=None, mes_calendario_inicio=1, mes_inicio_credito=0,
+                       meses_gracia_credito=0, precio_manual=None, **kwargs):
+    """
+    Flujo de caja mensual del proyecto.
+
+    Args:
+        *args, **kwargs: los mismos argumentos de cotizacion().
+        mes_puesta_en_marcha: meses entre la firma y la entrada en operación. Si se
+            omite es 6 con demora_6_meses y 0 sin ella.
+        mes_calendario_inicio: mes calendario (1 = enero) del primer mes del proyecto,
+            para tomar el HSP de cada mes.
+        mes_inicio_credito: mes del proyecto en que se paga la primera cuota (0 = mes 1).
+        meses_gracia_credito: meses del plazo en que solo se pagan intereses.
+        precio_manual: precio de venta opcional en vez del calculado.
+
+    Returns:
+        dict con arreglos de un valor por mes del proyecto (generacion, tarifa, ahorro,
+        mantenimiento, cuota_credito, beneficio_tributario), flujo_caja y flujo_acumulado
+        (con el mes 0), flujo_anual (sumado por año, comparable con cotizacion()),
+        valor_proyecto_total, monto_a_financiar, valor_presente, tasa_interna_mensual,
+        tasa_interna (anual efectiva; NaN si no existe) y payback en años (None si no se recupera).
+    """
+    argumentos = argumentos_vectorizados(*args, **kwargs)
+    params = argumentos["custom_params"]
+    if mes_puesta_en_marcha is None:
+        mes_puesta_en_marcha = MESES_DEMORA if argumentos["demora_6_meses"] else 0
+    años = int(argumentos["horizonte_tiempo"])
+    meses = años * 12
+    Load, costkWh, index = argumentos["Load"], argumentos["costkWh"], argumentos["index"]
+    tasa_degradacion = argumentos["tasa_degradacion"]
+    if tasa_degradacion is None:
+        tasa_degradacion = get_param("tasa_degradacion_anual", params)
+    precio_excedentes = argumentos["precio_excedentes"]
+    if precio_excedentes is None:
+        precio_excedentes = get_param("precio_excedentes", params)
+    porcentaje_mantenimiento = get_param("porcentaje_mantenimiento", params)
+
+    # CAPEX y generación del primer año con el motor vectorizado (un solo escenario)
+    base = cotizacion_vectorizada(**dict(argumentos, horizonte_tiempo=1, perc_financiamiento=0,
+                                         valor_proyecto=precio_manual))
+    valor_proyecto_total = float(base["valor_proyecto_total"][0])
+    generacion_calendario = base["generacion_mensual"][0]
+
+    # m: mes del proyecto (1..meses); edad: meses en operación antes del mes m
+    m = np.arange(1, meses + 1)
+    edad = m - 1 - mes_puesta_en_marcha
+    operando = edad >= 0
+    generacion = np.where(
+        operando,
+        generacion_calendario[(mes_calendario_inicio - 1 + m - 1) % 12] * (1 - tasa_degradacion) ** (np.maximum(edad, 0) / 12),
+        0.0)
+    indexacion = (1 + index) ** ((m - 1) / 12)
+    tarifa = costkWh * indexacion
+    if argumentos["incluir_baterias"]:
+        ahorro = np.where(operando, Load * tarifa, 0.0)
+    else:
+        ahorro = np.where(generacion >= Load, Load * tarifa + (generacion - Load) * precio_excedentes * indexacion,
+                          generacion * tarifa)
+    mantenimiento = porcentaje_mantenimiento * ahorro
+
+    # Crédito: mismas reglas de monto y condiciones que calcular_financiamiento()
+    monto_a_financiar = math.ceil(valor_proyecto_total * argumentos["perc_financiamiento"] / 100)
+    tasa_credito, plazo_meses = argumentos["tasa_interes_credito"], int(argumentos["plazo_credito_años"] * 12)
+    cuota_credito = np.zeros(meses)
+    if monto_a_financiar > 0 and plazo_meses > 0 and tasa_credito > 0:
+        cuotas = tabla_amortizacion(monto_a_financiar, tasa_credito, plazo_meses, meses_gracia_credito)["cuota"][0]
+        dentro = max(0, min(plazo_meses, meses - mes_inicio_credito))
+        cuota_credito[mes_inicio_credito:mes_inicio_credito + dentro] = cuotas[:dentro]
+        # Las cuotas después del horizonte se liquidan en el último mes
+        if meses:
+            cuota_credito[-1] += cuotas[dentro:].sum()
+
+    # Beneficios tributarios al cierre de cada año, como en cotizacion()
+    beneficio_tributario = np.zeros(meses)
+    if argumentos["incluir_beneficios_tributarios"]:
+        if argumentos["incluir_deduccion_renta"] and años > 1:
+            beneficio_tributario[23] += valor_proyecto_total * (1 + index) * 0.175
+        if argumentos["incluir_depreciacion_acelerada"]:
+            beneficio_tributario[11:min(años, 3) * 12:12] += valor_proyecto_total * 0.33
+
+    flujo = ahorro - mantenimiento - cuota_credito + beneficio_tributario
+    flujo_caja = np.concatenate(([monto_a_financiar - valor_proyecto_total], flujo))
+    tasa_mensual = (1 + argumentos["dRate"]) ** (1 / 12) - 1
+    # Newton desde 0 llega a la TIR mensual por la izquierda sin saltar a tasas cercanas a -100%
+    tasa_interna_mensual = float(tir_vectorizada(flujo_caja, tir_positiva_unica=True, tasa_inicial=0.0)[0])
+    payback = float(payback_vectorizado(flujo_caja)[0])
+
+    return {
+        "generacion": generacion,
+        "tarifa": tarifa,
+        "ahorro": ahorro,
+        "mantenimiento": mantenimiento,
+        "cuota_credito": cuota_credito,
+        "beneficio_tributario": beneficio_tributario,
+        "flujo_caja": flujo_caja,
+        "flujo_acumulado": np.cumsum(flujo_caja),
+        "flujo_anual": np.concatenate((flujo_caja[:1], flujo.reshape(años, 12).sum(axis=1))),
+        "valor_proyecto_total": valor_proyecto_total,
+        "monto_a_financiar": monto_a_financiar,
+        "valor_presente": float(vpn_vectorizado(tasa_mensual, flujo_caja)),
+        "tasa_interna_mensual": tasa_interna_mensual,
+        "tasa_interna": (1 + tasa_interna_mensual) ** 12 - 1,
+        "payback": None if math.isnan(payback) else payback / 12,
+    }
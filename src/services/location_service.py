@@ -2,31 +2,341 @@
 Servicio para geolocalización y mapas.
 """
 import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
 import requests
 import streamlit as st
 from geopy.geocoders import Nominatim
 
+# Política de uso de Nominatim: máximo 1 petición por segundo
+NOMINATIM_PETICIONES_POR_SEGUNDO = 1.0
+# Entradas que conserva la caché de geocodificación antes de descartar las menos usadas
+MAX_ENTRADAS_GEOCODIFICACION = 5000
+# Las direcciones no encontradas se vuelven a consultar pasado este tiempo
+TTL_NO_ENCONTRADA_SEGUNDOS = 24 * 3600
+
+PROVEEDOR_NOMINATIM = "nominatim"
+PROVEEDOR_GOOGLE = "google"
+
+# Abreviaturas de nomenclatura colombiana, para que "Calle 10 # 5-20" y "Cl. 10 No. 5 - 20" coincidan
+_ABREVIATURAS = {
+    "calle": "cl", "cll": "cl", "carrera": "cr", "cra": "cr", "kr": "cr", "kra": "cr", "carrea": "cr",
+    "avenida": "av", "diagonal": "dg", "diag": "dg", "transversal": "tv", "tr": "tv", "trans": "tv",
+    "circular": "cq", "numero": "#", "no": "#", "nro": "#", "n": "#",
+}
+
+
+def normalizar_direccion(address):
+    """
+    Clave canónica de una dirección: minúsculas, sin tildes ni signos, con las
+    abreviaturas de nomenclatura unificadas y espacios colapsados.
+    """
+    texto = unicodedata.normalize("NFKD", address or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = re.sub(r"[^a-z0-9#\- ]", " ", texto.replace("°", " ").replace("º", " "))
+    texto = re.sub(r"\s*-\s*", "-", texto)
+    texto = re.sub(r"#", " # ", texto)
+    palabras = [_ABREVIATURAS.get(p, p) for p in texto.split()]
+    return " ".join(palabras)
+
+
+def _ruta_db():
+    return os.environ.get("GEOCODIFICACION_PATH", os.path.join("datos", "geocodificacion.db"))
+
+
+class CacheGeocodificacion:
+    """
+    Caché en disco (SQLite) de direcciones normalizadas -> coordenadas, compartida
+    por todas las sesiones. Descarta las entradas usadas hace más tiempo (LRU)
+    cuando supera `max_entradas`.
+    """
+
+    def __init__(self, ruta=None, max_entradas=MAX_ENTRADAS_GEOCODIFICACION, reloj=time.time):
+        self.ruta = ruta or _ruta_db()
+        self.max_entradas = max_entradas
+        self.reloj = reloj
+        self._local = threading.local()
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._conexion().executescript("""
+            CREATE TABLE IF NOT EXISTS geocodificacion (
+                proveedor TEXT NOT NULL,
+                clave TEXT NOT NULL,
+                lat REAL,
+                lon REAL,
+                direccion TEXT,
+                creado REAL NOT NULL,
+                usado REAL NOT NULL,
+                PRIMARY KEY (proveedor, clave)
+            );
+            CREATE INDEX IF NOT EXISTS idx_geocodificacion_usado ON geocodificacion (usado);
+        """)
+
+    def _conexion(self):
+        """Una conexión por hilo; SQLite serializa las escrituras entre ellas."""
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            self._local.conexion = conexion
+        return conexion
+
+    def obtener(self, proveedor, clave):
+        """
+        Retorna (encontrada, coords): encontrada=False si no hay entrada válida;
+        coords es (lat, lon), o None si la dirección se buscó y no existe.
+        """
+        conexion = self._conexion()
+        fila = conexion.execute(
+            "SELECT lat, lon, creado FROM geocodificacion WHERE proveedor = ? AND clave = ?", (proveedor, clave)
+        ).fetchone()
+        if fila is None:
+            return False, None
+        ahora = self.reloj()
+        if fila["lat"] is None and ahora - fila["creado"] >= TTL_NO_ENCONTRADA_SEGUNDOS:
+            return False, None
+        conexion.execute("UPDATE geocodificacion SET usado = ? WHERE proveedor = ? AND clave = ?", (ahora, proveedor, clave))
+        return True, (fila["lat"], fila["lon"]) if fila["lat"] is not None else None
+
+    def guardar(self, proveedor, clave, coords, direccion=None):
+        """Guarda el resultado (coords None = no encontrada) y aplica el límite de entradas."""
+        ahora = self.reloj()
+        lat, lon = coords if coords else (None, None)
+        conexion = self._conexion()
+        conexion.execute(
+            "INSERT OR REPLACE INTO geocodificacion (proveedor, clave, lat, lon, direccion, creado, usado) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (proveedor, clave, lat, lon, direccion, ahora, ahora),
+        )
+        conexion.execute(
+            "DELETE FROM geocodificacion WHERE rowid IN ("
+            "SELECT rowid FROM geocodificacion ORDER BY usado DESC LIMIT -1 OFFSET ?)",
+            (self.max_entradas,),
+        )
+
+    def __len__(self):
+        return self._conexion().execute("SELECT COUNT(*) FROM geocodificacion").fetchone()[0]
+
+
+class LimitadorTasa:
+    """
+    Token bucket seguro entre hilos: `tasa` peticiones por segundo con ráfagas de
+    hasta `capacidad`. adquirir() bloquea hasta que haya un token disponible.
+    """
+
+    def __init__(self, tasa, capacidad=1, reloj=time.monotonic, dormir=time.sleep):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.reloj = reloj
+        self.dormir = dormir
+        self._tokens = float(capacidad)
+        self._ultimo = reloj()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Toma un token, esperando lo necesario. Retorna los segundos esperados."""
+        esperado = 0.0
+        while True:
+            with self._lock:
+                ahora = self.reloj()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return esperado
+                espera = (1 - self._tokens) / self.tasa
+            self.dormir(espera)
+            esperado += espera
+
+
+_cache_geocodificacion = None
+_limitador_nominatim = LimitadorTasa(NOMINATIM_PETICIONES_POR_SEGUNDO)
+_geolocalizador = None
+_lock_geocodificacion = threading.Lock()
+
+
+def obtener_cache_geocodificacion():
+    """Caché de geocodificación compartida por todas las sesiones del proceso."""
+    global _cache_geocodificacion
+    with _lock_geocodificacion:
+        if _cache_geocodificacion is None:
+            _cache_geocodificacion = CacheGeocodificacion()
+        return _cache_geocodificacion
+
+
+def _obtener_geolocalizador():
+    global _geolocalizador
+    with _lock_geocodificacion:
+        if _geolocalizador is None:
+            _geolocalizador = Nominatim(user_agent="mirac_solar_calculator")
+        return _geolocalizador
+
+
+def geocodificar_nominatim(address, cache=None, limitador=None, geolocalizador=None):
+    """
+    Coordenadas (lat, lon) de la dirección con Nominatim, o None si no existe.
+    Consulta primero la caché; las peticiones reales respetan 1 petición/segundo
+    entre todas las sesiones. Lanza la excepción de geopy si el servicio falla.
+    """
+    if cache is None:
+        cache = obtener_cache_geocodificacion()
+    clave = normalizar_direccion(address)
+    encontrada, coords = cache.obtener(PROVEEDOR_NOMINATIM, clave)
+    if encontrada:
+        return coords
+    (limitador or _limitador_nominatim).adquirir()
+    # El timeout es importante para no sobrecargar el servidor gratuito
+    location = (geolocalizador or _obtener_geolocalizador()).geocode(address, timeout=10)
+    coords = (location.latitude, location.longitude) if location else None
+    cache.guardar(PROVEEDOR_NOMINATIM, clave, coords, getattr(location, "address", None))
+    return coords
+
+
+def geocodificar_google(gmaps, address, cache=None):
+    """
+    Coordenadas (lat, lon) de la dirección con Google Geocoding (región CO), o None
+    si no existe. Consulta primero la caché. Lanza las excepciones de googlemaps.
+    """
+    if cache is None:
+        cache = obtener_cache_geocodificacion()
+    clave = normalizar_direccion(address)
+    encontrada, coords = cache.obtener(PROVEEDOR_GOOGLE, clave)
+    if encontrada:
+        return coords
+    resultado = gmaps.geocode(address, region='CO')
+    coords = None
+    direccion = None
+    if resultado:
+        location = resultado[0]['geometry']['location']
+        coords = (location['lat'], location['lng'])
+        direccion = resultado[0].get('formatted_address')
+    cache.guardar(PROVEEDOR_GOOGLE, clave, coords, direccion)
+    return coords
+
+
 def get_coords_from_address(address):
     """Convierte una dirección de texto en coordenadas (lat, lon)."""
     try:
-        geolocator = Nominatim(user_agent="mirac_solar_calculator")
-        # El timeout es importante para no sobrecargar el servidor gratuito
-        location = geolocator.geocode(address, timeout=10)
-        if location:
-            return (location.latitude, location.longitude)
-        else:
-            return None
+        return geocodificar_nominatim(address)
     except Exception as e:
         st.error(f"Error en la geocodificación: {e}")
         return None
     
-def get_static_map_image(lat, lon, api_key):
+# Decimales con que se redondean las coordenadas en la clave del mapa (~1 m)
+DECIMALES_CLAVE_MAPA = 5
+# Tamaño máximo en disco de la caché de mapas y entradas que se mantienen en memoria
+MAX_BYTES_CACHE_MAPAS = 200 * 1024 * 1024
+MAX_MAPAS_EN_MEMORIA = 32
+
+
+def clave_mapa(lat, lon, zoom, size, maptype, scale):
+    """Clave de contenido de una imagen de mapa: hash de sus parámetros (sin la API key)."""
+    parametros = (round(float(lat), DECIMALES_CLAVE_MAPA), round(float(lon), DECIMALES_CLAVE_MAPA), zoom, size, maptype, scale)
+    return hashlib.sha256(repr(parametros).encode("utf-8")).hexdigest()
+
+
+class CacheMapas:
     """
-    Genera una URL para la API de Google Maps Static con alta resolución y
-    capa híbrida, y descarga la imagen del mapa.
+    Caché de imágenes de Google Static Maps direccionada por contenido.
+
+    Las imágenes se guardan en disco (un archivo por clave, escrito de forma atómica)
+    con un límite de tamaño total; al superarlo se borran las usadas hace más tiempo.
+    Las más recientes se mantienen además en memoria para no releer el disco.
+    """
+
+    def __init__(self, directorio=None, max_bytes=MAX_BYTES_CACHE_MAPAS, max_en_memoria=MAX_MAPAS_EN_MEMORIA):
+        self.directorio = directorio or os.environ.get("MAPAS_CACHE_DIR", os.path.join("datos", "mapas"))
+        self.max_bytes = max_bytes
+        self.max_en_memoria = max_en_memoria
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.img")
+
+    def obtener(self, clave):
+        """Bytes de la imagen o None si no está en caché."""
+        with self._lock:
+            imagen = self._memoria.get(clave)
+            if imagen is not None:
+                self._memoria.move_to_end(clave)
+                return imagen
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, "rb") as f:
+                imagen = f.read()
+            os.utime(ruta)
+        except OSError:
+            return None
+        self._recordar(clave, imagen)
+        return imagen
+
+    def guardar(self, clave, imagen):
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self._ruta(clave)
+        temporal = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(imagen)
+        os.replace(temporal, ruta)
+        self._recordar(clave, imagen)
+        self._recortar()
+
+    def _recordar(self, clave, imagen):
+        with self._lock:
+            self._memoria[clave] = imagen
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.max_en_memoria:
+                self._memoria.popitem(last=False)
+
+    def _recortar(self):
+        """Borra del disco las imágenes usadas hace más tiempo hasta quedar bajo max_bytes."""
+        try:
+            archivos = [e for e in os.scandir(self.directorio) if e.name.endswith(".img")]
+        except OSError:
+            return
+        info = [(e.stat().st_mtime, e.stat().st_size, e.path, e.name[:-4]) for e in archivos]
+        total = sum(tamano for _, tamano, _, _ in info)
+        for _, tamano, ruta, clave in sorted(info):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+            total -= tamano
+            with self._lock:
+                self._memoria.pop(clave, None)
+
+
+_cache_mapas = None
+_lock_cache_mapas = threading.Lock()
+
+
+def obtener_cache_mapas():
+    """Caché de mapas compartida por todas las sesiones del proceso."""
+    global _cache_mapas
+    with _lock_cache_mapas:
+        if _cache_mapas is None:
+            _cache_mapas = CacheMapas()
+        return _cache_mapas
+
+
+def get_static_map_image(lat, lon, api_key, cache=None):
+    """
+    Imagen (bytes JPEG/PNG) de Google Maps Static con alta resolución y capa
+    híbrida, o None si no se pudo obtener.
+
+    Las imágenes se guardan en una caché por (lat, lon redondeadas, zoom, tamaño,
+    tipo de mapa), así que regenerar o duplicar una cotización no vuelve a pagar
+    la descarga.
     """
-    image_path = "assets/mapa_ubicacion.jpg"
-    
     try:
         # Validar parámetros de entrada
         if not api_key or not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
@@ -38,6 +348,13 @@ def get_static_map_image(lat, lon, api_key):
         size = "600x400"
         maptype = "hybrid"
         scale = 2
+
+        if cache is None:
+            cache = obtener_cache_mapas()
+        clave = clave_mapa(lat, lon, zoom, size, maptype, scale)
+        imagen = cache.obtener(clave)
+        if imagen is not None:
+            return imagen
         
         # Construimos la URL con los nuevos parámetros
         url = (f"https://maps.googleapis.com/maps/api/staticmap?center={lat},{lon}&zoom={zoom}"
@@ -50,19 +367,13 @@ def get_static_map_image(lat, lon, api_key):
             st.error(f"Google Maps API devolvió un error {response.status_code}.")
             return None
 
-        # Crear directorio si no existe
-        os.makedirs(os.path.dirname(image_path), exist_ok=True)
-
-        with open(image_path, "wb") as f:
-            f.write(response.content)
-
-        if os.path.exists(image_path) and os.path.getsize(image_path) > 1000:
-            return image_path
-        else:
+        if len(response.content) <= 1000:
             st.error("Se descargó un archivo de mapa vacío o inválido.")
             return None
 
+        cache.guardar(clave, response.content)
+        return response.content
+
     except Exception as e:
         st.error(f"Error al generar la imagen del mapa: {e}")
         return None
-
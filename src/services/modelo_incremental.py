@@ -0,0 +1,237 @@
+"""
+Modelo incremental de la cotización para análisis what-if.
+
+La cotización se arma como un grafo acíclico de nodos con nombre:
+
+    hsp_mensual → generacion_mensual → ahorros → flujo_caja → valor_presente / tasa_interna
+    size → valor_proyecto_fv → valor_proyecto_total → financiamiento → flujo_caja
+
+Cada nodo guarda su último resultado junto con las versiones de las entradas con
+que se calculó. Al cambiar una entrada solo se recalculan los nodos que dependen
+de ella, y solo cuando se leen: mover la tasa de descuento recalcula el VPN y el
+LCOE sin volver a tocar la generación, el inversor ni la curva de costos. Si un
+nodo recalculado da el mismo valor que antes, los nodos siguientes no se
+recalculan.
+
+Los nodos usan las mismas funciones que cotizacion(), así que
+ModeloCotizacion(...).resultado() da el mismo ResultadoCotizacion.
+"""
+import inspect
+import math
+
+import numpy as np
+import numpy_financial as npf
+
+from src.config import HSP_MENSUAL_POR_CIUDAD
+from src.config_parametros import compilar_parametros, get_param
+from src.services.calculator_service import (
+    calcular_ahorros_anuales,
+    calcular_area_requerida,
+    calcular_bateria,
+    calcular_datos_carbono,
+    calcular_factor_clipping,
+    calcular_financiamiento,
+    calcular_flujo_caja_libre,
+    calcular_generacion_mensual,
+    calcular_lcoe,
+    calcular_performance_ratio,
+    calcular_valor_proyecto_fv,
+    cotizacion,
+    recomendar_inversor,
+)
+from src.services.resultado_cotizacion import ResultadoCotizacion
+
+
+def _iguales(a, b):
+    """Igualdad de valores de nodo (listas, tuplas, arreglos numpy, escalares)."""
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, np.ndarray):
+        return a.shape == b.shape and bool(np.array_equal(a, b))
+    try:
+        return bool(a == b)
+    except (ValueError, TypeError):
+        return False
+
+
+class _Nodo:
+    __slots__ = ("nombre", "funcion", "entradas", "firma", "valor")
+
+    def __init__(self, nombre, funcion, entradas):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.entradas = tuple(entradas)
+        self.firma = None
+        self.valor = None
+
+
+class ModeloIncremental:
+    """
+    Grafo de nodos memoizados con recálculo perezoso.
+
+    Las entradas se fijan con actualizar(); los nodos se registran con nodo() y
+    se evalúan con obtener(). Tras cada lectura, `recalculados` lista los nodos
+    que se volvieron a calcular.
+    """
+
+    def __init__(self):
+        self._nodos = {}
+        self._valores = {}
+        self._versiones = {}
+        self.recalculados = []
+
+    def entrada(self, nombre, valor):
+        """Registra una entrada con su valor inicial."""
+        if nombre in self._nodos or nombre in self._valores:
+            raise ValueError(f"'{nombre}' ya existe en el modelo")
+        self._valores[nombre] = valor
+        self._versiones[nombre] = 0
+        return self
+
+    def nodo(self, nombre, funcion, entradas):
+        """Registra un nodo calculado a partir de entradas u otros nodos ya registrados."""
+        if nombre in self._nodos or nombre in self._valores:
+            raise ValueError(f"'{nombre}' ya existe en el modelo")
+        faltantes = [e for e in entradas if e not in self._nodos and e not in self._valores]
+        if faltantes:
+            raise ValueError(f"El nodo '{nombre}' depende de nombres no registrados: {', '.join(faltantes)}")
+        self._nodos[nombre] = _Nodo(nombre, funcion, entradas)
+        self._versiones[nombre] = 0
+        return self
+
+    def actualizar(self, **valores):
+        """Cambia entradas; las que no cambian de valor no invalidan nada. Retorna las que cambiaron."""
+        desconocidas = [n for n in valores if n not in self._valores]
+        if desconocidas:
+            raise KeyError(f"Entradas desconocidas: {', '.join(desconocidas)}")
+        cambiadas = []
+        for nombre, valor in valores.items():
+            if not _iguales(self._valores[nombre], valor):
+                self._valores[nombre] = valor
+                self._versiones[nombre] += 1
+                cambiadas.append(nombre)
+        return cambiadas
+
+    def obtener(self, *nombres):
+        """Valor de una entrada o nodo (o tupla de valores si se piden varios)."""
+        self.recalculados = []
+        valores = tuple(self._evaluar(nombre) for nombre in nombres)
+        return valores[0] if len(valores) == 1 else valores
+
+    def _evaluar(self, nombre):
+        if nombre in self._valores:
+            return self._valores[nombre]
+        nodo = self._nodos[nombre]
+        argumentos = [self._evaluar(e) for e in nodo.entradas]
+        firma = tuple(self._versiones[e] for e in nodo.entradas)
+        if firma != nodo.firma:
+            valor = nodo.funcion(*argumentos)
+            # Corte temprano: si el valor no cambió, los nodos siguientes siguen vigentes
+            if nodo.firma is None or not _iguales(valor, nodo.valor):
+                nodo.valor = valor
+                self._versiones[nombre] += 1
+            nodo.firma = firma
+            self.recalculados.append(nombre)
+        return nodo.valor
+
+
+# Entradas del modelo: los mismos argumentos (y valores por defecto) de cotizacion()
+_FIRMA_COTIZACION = inspect.signature(cotizacion)
+
+
+def _valor_proyecto_total(valor_proyecto_fv, bateria):
+    return math.ceil(valor_proyecto_fv + bateria[1])
+
+
+class ModeloCotizacion(ModeloIncremental):
+    """
+    Cotización solar como grafo incremental.
+
+    Recibe los mismos argumentos que cotizacion(). Uso típico con sliders:
+
+        modelo = ModeloCotizacion(Load, size, quantity, ...)
+        modelo.actualizar(dRate=0.12)
+        vpn, tir = modelo.obtener("valor_presente", "tasa_interna")
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        argumentos = _FIRMA_COTIZACION.bind(*args, **kwargs)
+        argumentos.apply_defaults()
+        for nombre, valor in argumentos.arguments.items():
+            self.entrada(nombre, valor)
+
+        # Parámetros (prioridad: argumento directo > custom_params > default)
+        self.nodo("params", compilar_parametros, ("custom_params",))
+        self.nodo("tasa_degradacion_efectiva",
+                  lambda tasa, params: tasa if tasa is not None else get_param("tasa_degradacion_anual", params),
+                  ("tasa_degradacion", "params"))
+        self.nodo("precio_excedentes_efectivo",
+                  lambda precio, params: precio if precio is not None else get_param("precio_excedentes", params),
+                  ("precio_excedentes", "params"))
+        self.nodo("porcentaje_mantenimiento", lambda params: get_param("porcentaje_mantenimiento", params), ("params",))
+
+        # Rama técnica: HSP → generación
+        self.nodo("hsp_mensual",
+                  lambda hsp_lista, ciudad: hsp_lista if hsp_lista is not None else HSP_MENSUAL_POR_CIUDAD.get(
+                      ciudad.upper(), HSP_MENSUAL_POR_CIUDAD["MEDELLIN"]),
+                  ("hsp_lista", "ciudad"))
+        self.nodo("performance_ratio", calcular_performance_ratio, ("clima", "cubierta", "params"))
+        self.nodo("inversor", recomendar_inversor, ("size",))
+        self.nodo("factor_clipping",
+                  lambda size, inversor: calcular_factor_clipping(size / inversor[1] if inversor[1] > 0 else 1.0),
+                  ("size", "inversor"))
+        self.nodo("generacion_mensual", calcular_generacion_mensual,
+                  ("size", "hsp_mensual", "performance_ratio", "factor_clipping"))
+        self.nodo("area_requerida", calcular_area_requerida, ("quantity",))
+
+        # Rama de costos: tamaño → CAPEX → financiamiento
+        self.nodo("valor_proyecto_fv", calcular_valor_proyecto_fv, ("size", "cubierta", "params"))
+        self.nodo("bateria",
+                  lambda incluir, Load, dias, dod, costo_kwh: calcular_bateria(Load, dias, dod, costo_kwh) if incluir else (0, 0),
+                  ("incluir_baterias", "Load", "dias_autonomia", "profundidad_descarga", "costo_kwh_bateria"))
+        self.nodo("valor_proyecto_total", _valor_proyecto_total, ("valor_proyecto_fv", "bateria"))
+        self.nodo("financiamiento", calcular_financiamiento,
+                  ("valor_proyecto_total", "perc_financiamiento", "tasa_interes_credito", "plazo_credito_años"))
+
+        # Ahorros y flujo de caja
+        self.nodo("ahorros", calcular_ahorros_anuales,
+                  ("generacion_mensual", "horizonte_tiempo", "tasa_degradacion_efectiva", "Load", "costkWh",
+                   "precio_excedentes_efectivo", "incluir_baterias"))
+        self.nodo("flujo_caja",
+                  lambda ahorros, index, mant, fin, plazo, capex, demora, trib, deduccion, depreciacion:
+                  calcular_flujo_caja_libre(ahorros[0], index, mant, fin[1], plazo, fin[2], capex, demora, trib,
+                                            deduccion, depreciacion),
+                  ("ahorros", "index", "porcentaje_mantenimiento", "financiamiento", "plazo_credito_años",
+                   "valor_proyecto_total", "demora_6_meses", "incluir_beneficios_tributarios",
+                   "incluir_deduccion_renta", "incluir_depreciacion_acelerada"))
+        self.nodo("valor_presente", npf.npv, ("dRate", "flujo_caja"))
+        self.nodo("tasa_interna", npf.irr, ("flujo_caja",))
+        self.nodo("lcoe",
+                  lambda fin, ahorros, index, dRate: calcular_lcoe(fin[2], ahorros[0], index, dRate, ahorros[1]),
+                  ("financiamiento", "ahorros", "index", "dRate"))
+        self.nodo("arboles", lambda Load: round(Load * 12 * 0.154 * 22 / 1000, 0), ("Load",))
+        self.nodo("carbon_data",
+                  lambda incluir, generacion, ciudad, life: calcular_datos_carbono(generacion, ciudad, life) if incluir else {},
+                  ("incluir_carbon", "generacion_mensual", "ciudad", "horizonte_tiempo"))
+
+    def resultado(self):
+        """ResultadoCotizacion con los valores actuales (igual al de cotizacion())."""
+        nombres = ("financiamiento", "inversor", "ahorros", "bateria", "valor_proyecto_total", "size", "flujo_caja",
+                   "arboles", "generacion_mensual", "valor_presente", "tasa_interna", "quantity", "horizonte_tiempo",
+                   "lcoe", "performance_ratio", "hsp_mensual", "area_requerida", "carbon_data")
+        v = dict(zip(nombres, self.obtener(*nombres)))
+        monto, cuota, desembolso = v["financiamiento"]
+        ahorros = v["ahorros"][0]
+        return ResultadoCotizacion(
+            valor_proyecto_total=v["valor_proyecto_total"], size=v["size"], monto_a_financiar=monto,
+            cuota_mensual_credito=cuota, desembolso_inicial_cliente=desembolso, flujo_caja=v["flujo_caja"],
+            arboles=v["arboles"], generacion_mensual=v["generacion_mensual"], valor_presente=v["valor_presente"],
+            tasa_interna=v["tasa_interna"], cantidad_paneles=v["quantity"], vida_util=v["horizonte_tiempo"],
+            recomendacion_inversor=v["inversor"][0], lcoe=v["lcoe"], performance_ratio=v["performance_ratio"],
+            hsp_mensual=v["hsp_mensual"], potencia_ac_inversor=v["inversor"][1],
+            ahorro_año1=ahorros[0] if ahorros else 0, area_requerida=v["area_requerida"],
+            capacidad_nominal_bateria=v["bateria"][0], carbon_data=v["carbon_data"],
+        )
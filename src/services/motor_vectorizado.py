@@ -0,0 +1,261 @@
+"""
+Motor de cotización vectorizado: muchos escenarios en una sola llamada.
+
+Replica las cuentas de cotizacion() (generación, ahorros, CAPEX, financiamiento,
+flujo de caja, VPN, TIR y payback) sobre arreglos numpy: cada argumento numérico
+puede ser un escalar o un arreglo, y todos se combinan con las reglas de
+broadcasting de numpy en un lote de n escenarios. Lo usan los análisis que
+comparan muchos escenarios, como el tornado de sensibilidad.
+
+Las funciones que dependen solo del tamaño (inversor, clipping y curva de costos)
+se evalúan una vez por tamaño distinto con las mismas funciones de
+calculator_service.
+"""
+import inspect
+import math
+
+import numpy as np
+import numpy_financial as npf
+
+from src.config import HSP_MENSUAL_POR_CIUDAD
+from src.config_parametros import compilar_parametros, get_param
+from src.services.calculator_service import (
+    calcular_bateria,
+    calcular_factor_clipping,
+    calcular_performance_ratio,
+    calcular_valor_proyecto_fv,
+    cotizacion,
+    recomendar_inversor,
+)
+
+DIAS_POR_MES = np.array([31, 28.25, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+_FIRMA_COTIZACION = inspect.signature(cotizacion)
+# Argumentos de cotizacion() que no cambian las métricas del motor vectorizado
+_SIN_EFECTO_EN_METRICAS = ("quantity", "module", "eficiencia_bateria", "incluir_carbon")
+
+
+def vpn_vectorizado(tasa, flujos):
+    """npf.npv para cada fila de `flujos` (n, periodos) con su tasa (escalar o arreglo de n)."""
+    flujos = np.asarray(flujos, dtype=float)
+    tasa = np.asarray(tasa, dtype=float)[..., None]
+    return (flujos / (1 + tasa) ** np.arange(flujos.shape[-1])).sum(axis=-1)
+
+
+def tir_vectorizada(flujos, max_iteraciones=50, tir_positiva_unica=False, tasa_inicial=0.1):
+    """
+    npf.irr para cada fila de `flujos` (n, periodos).
+
+    Usa Newton sobre todas las filas a la vez. Con un solo cambio de signo la TIR
+    es única (regla de Descartes); las filas con varios cambios de signo o que no
+    convergen se resuelven con npf.irr, así que el resultado y los NaN coinciden
+    con la versión escalar.
+
+    Con tir_positiva_unica=True también se acepta la tasa positiva de Newton cuando el
+    flujo acumulado cambia de signo una sola vez (criterio de Norström): es la única TIR
+    positiva, aunque npf.irr podría elegir una raíz negativa más cercana a cero. Evita
+    npf.irr (raíces de un polinomio del grado del horizonte) en flujos mensuales largos,
+    junto con una tasa_inicial por periodo cercana a la esperada.
+    """
+    flujos = np.atleast_2d(np.asarray(flujos, dtype=float))
+    periodos = np.arange(flujos.shape[1])
+
+    # Cambios de signo de cada fila, ignorando los ceros
+    signo = np.sign(flujos)
+    ultimo_no_cero = np.maximum.accumulate(np.where(signo != 0, periodos, 0), axis=1)
+    signo = np.take_along_axis(signo, ultimo_no_cero, axis=1)
+    cambios_signo = (signo[:, 1:] * signo[:, :-1] < 0).sum(axis=1)
+
+    tasa = np.full(len(flujos), float(tasa_inicial))
+    paso = np.full(len(flujos), np.inf)
+    with np.errstate(all="ignore"):
+        for _ in range(max_iteraciones):
+            base = 1 + tasa[:, None]
+            descuento = base ** -periodos
+            valor = (flujos * descuento).sum(axis=1)
+            derivada = -(flujos * periodos * descuento / base).sum(axis=1)
+            paso = valor / derivada
+            tasa = tasa - paso
+            if np.all(np.abs(paso) < 1e-12 * (1 + np.abs(tasa))):
+                break
+    unica = cambios_signo == 1
+    if tir_positiva_unica:
+        signo_acumulado = np.sign(np.cumsum(flujos, axis=1))
+        cambios_acumulado = (signo_acumulado[:, 1:] * signo_acumulado[:, :-1] < 0).sum(axis=1)
+        unica |= (cambios_acumulado == 1) & (signo_acumulado[:, -1] > 0) & (tasa > 0)
+    convergida = unica & np.isfinite(tasa) & (tasa > -1) & (np.abs(paso) < 1e-9 * (1 + np.abs(tasa)))
+    for i in np.flatnonzero(~convergida):
+        tasa[i] = npf.irr(flujos[i])
+    return tasa
+
+
+def payback_vectorizado(flujos):
+    """Años (con fracción interpolada) hasta que el flujo acumulado es >= 0; NaN si no se recupera."""
+    acumulado = np.cumsum(np.atleast_2d(np.asarray(flujos, dtype=float)), axis=1)
+    recuperado = acumulado >= 0
+    k = recuperado.argmax(axis=1)
+    filas = np.arange(len(acumulado))
+    actual = acumulado[filas, k]
+    anterior = acumulado[filas, np.maximum(k - 1, 0)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interpolado = np.where((k > 0) & (actual != anterior), (k - 1) + np.abs(anterior) / (actual - anterior), k)
+    return np.where(recuperado.any(axis=1), interpolado, np.nan)
+
+
+def _por_tamano(sizes, cubierta, params):
+    """Potencia AC, clipping y valor FV de cada tamaño (evaluados una vez por tamaño distinto)."""
+    unicos, inversa = np.unique(sizes, return_inverse=True)
+    potencia_ac = np.array([recomendar_inversor(float(s))[1] for s in unicos], dtype=float)
+    clipping = np.array([
+        calcular_factor_clipping(s / p if p > 0 else 1.0) for s, p in zip(unicos, potencia_ac)
+    ])
+    valor_fv = np.array([calcular_valor_proyecto_fv(float(s), cubierta, params) for s in unicos])
+    return potencia_ac[inversa], clipping[inversa], valor_fv[inversa]
+
+
+def argumentos_vectorizados(*args, **kwargs):
+    """
+    Traduce argumentos de cotizacion() a argumentos de cotizacion_vectorizada().
+
+    Resuelve el HSP por ciudad como cotizacion() y compila los parámetros, así que el
+    resultado se puede reutilizar en varios lotes: cotizacion_vectorizada(**dict(base, costkWh=tarifas)).
+    """
+    argumentos = _FIRMA_COTIZACION.bind(*args, **kwargs)
+    argumentos.apply_defaults()
+    resultado = dict(argumentos.arguments)
+    for nombre in _SIN_EFECTO_EN_METRICAS:
+        del resultado[nombre]
+    ciudad = resultado.pop("ciudad")
+    hsp_lista = resultado.pop("hsp_lista")
+    resultado["hsp_mensual"] = hsp_lista if hsp_lista is not None else HSP_MENSUAL_POR_CIUDAD.get(
+        (ciudad or "MEDELLIN").upper(), HSP_MENSUAL_POR_CIUDAD["MEDELLIN"])
+    resultado["custom_params"] = compilar_parametros(resultado["custom_params"])
+    return resultado
+
+
+def valor_proyecto_calculado(argumentos):
+    """Precio calculado (curva de costos y baterías) para argumentos escalares de cotizacion_vectorizada()."""
+    costo_bateria = 0
+    if argumentos.get("incluir_baterias"):
+        costo_bateria = calcular_bateria(argumentos["Load"], argumentos.get("dias_autonomia", 2),
+                                         argumentos.get("profundidad_descarga", 0.9),
+                                         argumentos.get("costo_kwh_bateria", 0))[1]
+    valor_fv = calcular_valor_proyecto_fv(argumentos["size"], argumentos.get("cubierta", "LÁMINA"),
+                                          argumentos.get("custom_params"))
+    return math.ceil(valor_fv + costo_bateria)
+
+
+def cotizacion_vectorizada(Load, size, costkWh, hsp_mensual, index, dRate, cubierta="LÁMINA", clima="SOL",
+                           perc_financiamiento=0, tasa_interes_credito=0, plazo_credito_años=0,
+                           horizonte_tiempo=25, incluir_baterias=False, costo_kwh_bateria=0,
+                           profundidad_descarga=0.9, dias_autonomia=2, demora_6_meses=False,
+                           incluir_beneficios_tributarios=False, incluir_deduccion_renta=False,
+                           incluir_depreciacion_acelerada=False, tasa_degradacion=None, precio_excedentes=None,
+                           porcentaje_mantenimiento=None, valor_proyecto=None, custom_params=None):
+    """
+    Evalúa un lote de cotizaciones.
+
+    Args:
+        Load, size, costkWh, index, dRate, perc_financiamiento, tasa_interes_credito,
+        plazo_credito_años, costo_kwh_bateria, profundidad_descarga, dias_autonomia:
+            escalares o arreglos (se combinan por broadcasting), con las mismas
+            unidades que en cotizacion().
+        hsp_mensual: 12 valores, o un arreglo (n, 12) con un perfil por escenario.
+        tasa_degradacion, precio_excedentes, porcentaje_mantenimiento: opcionales,
+            por escenario; si se omiten se toman de custom_params.
+        valor_proyecto: precio total opcional por escenario (NaN usa el calculado),
+            como el precio manual de la interfaz.
+        Los argumentos de texto, booleanos y horizonte_tiempo son comunes al lote.
+
+    Returns:
+        dict de arreglos con una fila por escenario: valor_proyecto_total, monto_a_financiar,
+        cuota_mensual_credito, desembolso_inicial_cliente, generacion_mensual (n, 12),
+        generacion_anual, generacion_total, ahorro_año1, flujo_caja (n, horizonte + 1),
+        valor_presente, tasa_interna y payback.
+    """
+    params = compilar_parametros(custom_params)
+    if tasa_degradacion is None:
+        tasa_degradacion = get_param("tasa_degradacion_anual", params)
+    if precio_excedentes is None:
+        precio_excedentes = get_param("precio_excedentes", params)
+    if porcentaje_mantenimiento is None:
+        porcentaje_mantenimiento = get_param("porcentaje_mantenimiento", params)
+    if valor_proyecto is None:
+        valor_proyecto = np.nan
+
+    (Load, size, costkWh, index, dRate, perc_financiamiento, tasa_interes_credito, plazo_credito_años,
+     costo_kwh_bateria, profundidad_descarga, dias_autonomia, tasa_degradacion, precio_excedentes,
+     porcentaje_mantenimiento, valor_proyecto) = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in (
+        Load, size, costkWh, index, dRate, perc_financiamiento, tasa_interes_credito, plazo_credito_años,
+        costo_kwh_bateria, profundidad_descarga, dias_autonomia, tasa_degradacion, precio_excedentes,
+        porcentaje_mantenimiento, valor_proyecto)))
+    n = len(size)
+    hsp = np.broadcast_to(np.asarray(hsp_mensual, dtype=float), (n, 12))
+    life = int(horizonte_tiempo)
+    años = np.arange(life)
+
+    # CAPEX
+    performance_ratio = calcular_performance_ratio(clima, cubierta, params)
+    _, clipping, valor_fv = _por_tamano(size, cubierta, params)
+    costo_bateria = np.zeros(n)
+    capacidad_nominal_bateria = np.zeros(n)
+    if incluir_baterias:
+        capacidad_util = Load / 30 * dias_autonomia
+        dod_valida = (profundidad_descarga > 0) & (profundidad_descarga <= 1.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            capacidad_nominal_bateria = np.where(dod_valida, capacidad_util / profundidad_descarga, capacidad_util / 0.8)
+        costo_bateria = capacidad_nominal_bateria * costo_kwh_bateria
+    valor_proyecto_total = np.where(np.isnan(valor_proyecto), np.ceil(valor_fv + costo_bateria), valor_proyecto)
+
+    # Financiamiento
+    monto_a_financiar = np.ceil(valor_proyecto_total * (perc_financiamiento / 100))
+    con_credito = (monto_a_financiar > 0) & (plazo_credito_años > 0) & (tasa_interes_credito > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cuota = np.abs(npf.pmt(tasa_interes_credito / 12, plazo_credito_años * 12, -monto_a_financiar))
+    cuota_mensual_credito = np.where(con_credito & np.isfinite(cuota), np.ceil(cuota), 0.0)
+    desembolso_inicial_cliente = valor_proyecto_total - monto_a_financiar
+
+    # Generación y ahorros por año (n, años, meses)
+    generacion_mensual = size[:, None] * hsp * DIAS_POR_MES * performance_ratio * (1 - clipping[:, None])
+    generacion = generacion_mensual[:, None, :] * ((1 - tasa_degradacion[:, None]) ** años)[:, :, None]
+    if incluir_baterias:
+        ahorros = np.broadcast_to(((Load * 12) * costkWh)[:, None], (n, life))
+    else:
+        consumo = Load[:, None, None]
+        tarifa = costkWh[:, None, None]
+        ahorro_mes = np.where(generacion >= consumo,
+                              consumo * tarifa + (generacion - consumo) * precio_excedentes[:, None, None],
+                              generacion * tarifa)
+        ahorros = ahorro_mes.sum(axis=2)
+
+    # Flujo de caja
+    ahorro_indexado = ahorros * (1 + index[:, None]) ** años
+    if demora_6_meses and life:
+        ahorro_indexado = ahorro_indexado.copy()
+        ahorro_indexado[:, 0] *= 0.5
+    cuotas = np.where(años < plazo_credito_años[:, None], cuota_mensual_credito[:, None] * 12, 0)
+    flujo = ahorro_indexado - porcentaje_mantenimiento[:, None] * ahorro_indexado - cuotas
+    if incluir_beneficios_tributarios:
+        beneficio = np.zeros((n, life))
+        if incluir_deduccion_renta and life > 1:
+            beneficio[:, 1] += valor_proyecto_total * (1 + index) * 0.175
+        if incluir_depreciacion_acelerada:
+            beneficio[:, :3] += (valor_proyecto_total * 0.33)[:, None]
+        flujo = flujo + beneficio
+    flujo_caja = np.concatenate([-desembolso_inicial_cliente[:, None], flujo], axis=1)
+
+    return {
+        "valor_proyecto_total": valor_proyecto_total,
+        "monto_a_financiar": monto_a_financiar,
+        "cuota_mensual_credito": cuota_mensual_credito,
+        "desembolso_inicial_cliente": desembolso_inicial_cliente,
+        "capacidad_nominal_bateria": capacidad_nominal_bateria,
+        "generacion_mensual": generacion_mensual,
+        "generacion_anual": generacion_mensual.sum(axis=1),
+        "generacion_total": generacion.sum(axis=(1, 2)),
+        "ahorro_año1": ahorros[:, 0] if life else np.zeros(n),
+        "flujo_caja": flujo_caja,
+        "valor_presente": vpn_vectorizado(dRate, flujo_caja),
+        "tasa_interna": tir_vectorizada(flujo_caja),
+        "payback": payback_vectorizado(flujo_caja),
+    }
@@ -2,74 +2,198 @@
 Servicio de integración con Notion para CRM.
 """
 import os
+import threading
 try:
     from notion_client import Client as NotionClient
 except ImportError:
     NotionClient = None
 
-def _build_notion_properties(nombre: str, estado: str, documento: str, direccion: str, proyecto: str, fecha):
-    """Crea el diccionario de propiedades para la página de Notion según nombres configurables."""
-    # Nombres de propiedades configurables por env
-    prop_name = os.environ.get("NOTION_PROP_NAME", "Name")
-    prop_status = os.environ.get("NOTION_PROP_STATUS", "Estado")
-    prop_doc = os.environ.get("NOTION_PROP_DOCUMENTO", "Documento")
-    prop_dir = os.environ.get("NOTION_PROP_DIRECCION", "Direccion")
-    prop_project = os.environ.get("NOTION_PROP_PROYECTO", "Proyecto")
-    prop_date = os.environ.get("NOTION_PROP_FECHA", "Fecha")
-
-    # Fecha a ISO
-    fecha_iso = None
-    try:
-        if hasattr(fecha, 'isoformat'):
-            fecha_iso = fecha.isoformat()
-        elif isinstance(fecha, str):
-            fecha_iso = fecha
-    except Exception:
-        fecha_iso = None
-
-    properties = {
-        prop_name: {"title": [{"text": {"content": nombre or ""}}]},
-        prop_doc: {"rich_text": [{"text": {"content": documento or ""}}]},
-        prop_dir: {"rich_text": [{"text": {"content": direccion or ""}}]},
-        prop_project: {"rich_text": [{"text": {"content": proyecto or ""}}]},
+from src.utils.helpers import numero_propuesta
+
+
+def _nombres_propiedades():
+    """Nombres de las propiedades de la base de datos, configurables por env."""
+    return {
+        "nombre": os.environ.get("NOTION_PROP_NAME", "Name"),
+        "estado": os.environ.get("NOTION_PROP_STATUS", "Estado"),
+        "documento": os.environ.get("NOTION_PROP_DOCUMENTO", "Documento"),
+        "direccion": os.environ.get("NOTION_PROP_DIRECCION", "Direccion"),
+        "proyecto": os.environ.get("NOTION_PROP_PROYECTO", "Proyecto"),
+        "fecha": os.environ.get("NOTION_PROP_FECHA", "Fecha"),
     }
-    if fecha_iso:
-        properties[prop_date] = {"date": {"start": fecha_iso}}
 
-    # Intento 1: status
-    properties_status = properties.copy()
-    properties_status[prop_status] = {"status": {"name": estado}}
 
-    # Intento 2: select
-    properties_select = properties.copy()
-    properties_select[prop_status] = {"select": {"name": estado}}
+def _fecha_iso(fecha):
+    if hasattr(fecha, 'isoformat'):
+        return fecha.isoformat()
+    if isinstance(fecha, str) and fecha:
+        return fecha
+    return None
 
-    return properties_status, properties_select
 
+def _valor_propiedad(tipo, valor):
+    """Valor de una propiedad de Notion según su tipo en el esquema, o None si no se puede representar."""
+    if tipo in ("title", "rich_text"):
+        return {tipo: [{"text": {"content": valor or ""}}]}
+    if tipo in ("status", "select"):
+        return {tipo: {"name": valor}} if valor else None
+    if tipo == "multi_select":
+        return {tipo: [{"name": valor}]} if valor else None
+    if tipo == "date":
+        fecha_iso = _fecha_iso(valor)
+        return {tipo: {"start": fecha_iso}} if fecha_iso else None
+    if tipo in ("email", "phone_number", "url"):
+        return {tipo: valor or None}
+    if tipo == "number":
+        try:
+            return {tipo: float(valor)}
+        except (TypeError, ValueError):
+            return None
+    return None
 
-def agregar_cliente_a_notion_crm(nombre: str, documento: str, direccion: str, proyecto: str, fecha, estado: str = "En conversaciones"):
-    """Agrega un registro en la base de datos de Notion CRM si las credenciales están disponibles.
-    Usa el nombre de estado 'En conversaciones' por defecto.
+
+def _texto_propiedad(valor):
+    """Texto plano de una propiedad title/rich_text/select/status leída de una página."""
+    tipo = valor.get("type")
+    contenido = valor.get(tipo)
+    if isinstance(contenido, list):
+        return "".join(t.get("plain_text") or t.get("text", {}).get("content", "") for t in contenido)
+    if isinstance(contenido, dict):
+        return contenido.get("name", "")
+    return contenido if isinstance(contenido, str) else ""
+
+
+class CRMNotion:
+    """
+    Cliente de larga vida para la base de datos del CRM.
+
+    - El esquema (tipo de cada propiedad) se consulta una sola vez, así que el
+      estado se envía directamente como "status" o "select" según corresponda.
+    - La página de una propuesta (FVyyNNN, o el nombre completo del proyecto si no
+      tiene número) se busca con una consulta filtrada por la propiedad del
+      proyecto; registrar una propuesta que ya existe actualiza su página en lugar
+      de crear un duplicado. Las páginas encontradas o creadas quedan en memoria.
+
+    Una propuesta nueva cuesta la consulta y el create; registrarla de nuevo es una
+    sola petición (update). Es seguro compartirlo entre hilos: el esquema y las
+    páginas conocidas están protegidos por un lock.
     """
+
+    def __init__(self, notion, database_id):
+        self.notion = notion
+        self.database_id = database_id
+        self._lock = threading.Lock()
+        self._esquema = None
+        self._data_source_id = None
+        self._paginas = {}
+
+    def esquema(self):
+        """Dict nombre de propiedad -> tipo. Se consulta una vez por instancia."""
+        with self._lock:
+            if self._esquema is None:
+                base = self.notion.databases.retrieve(database_id=self.database_id)
+                propiedades = base.get("properties")
+                if propiedades is None and base.get("data_sources"):
+                    # API 2025-09 en adelante: el esquema vive en la fuente de datos
+                    self._data_source_id = base["data_sources"][0]["id"]
+                    propiedades = self.notion.data_sources.retrieve(data_source_id=self._data_source_id)["properties"]
+                self._esquema = {nombre: prop.get("type") for nombre, prop in (propiedades or {}).items()}
+            return self._esquema
+
+    def _consultar(self, **kwargs):
+        if self._data_source_id:
+            return self.notion.data_sources.query(data_source_id=self._data_source_id, **kwargs)
+        return self.notion.databases.query(database_id=self.database_id, **kwargs)
+
+    def _buscar_pagina(self, propuesta):
+        """Id de la página de la propuesta, o None si no existe. Consulta solo las páginas que la mencionan."""
+        esquema = self.esquema()
+        with self._lock:
+            if propuesta in self._paginas:
+                return self._paginas[propuesta]
+        prop_proyecto = _nombres_propiedades()["proyecto"]
+        tipo = esquema.get(prop_proyecto)
+        if not propuesta or tipo not in ("title", "rich_text"):
+            return None
+        filtro = {"property": prop_proyecto, tipo: {"contains": propuesta}}
+        cursor = None
+        while True:
+            kwargs = {"filter": filtro, "page_size": 100}
+            if cursor:
+                kwargs["start_cursor"] = cursor
+            respuesta = self._consultar(**kwargs)
+            for pagina in respuesta.get("results", []):
+                valor = pagina.get("properties", {}).get(prop_proyecto)
+                # "contains" también trae FV250010 al buscar FV25001, o "Casa 2" al buscar "Casa"
+                if valor and numero_propuesta(_texto_propiedad(valor)) == propuesta:
+                    with self._lock:
+                        self._paginas.setdefault(propuesta, pagina["id"])
+                        return self._paginas[propuesta]
+            cursor = respuesta.get("next_cursor")
+            if not respuesta.get("has_more") or not cursor:
+                return None
+
+    def propiedades(self, nombre, documento, direccion, proyecto, fecha, estado):
+        """Propiedades de la página con el tipo que indica el esquema; omite las que no existen."""
+        esquema = self.esquema()
+        valores = {
+            "nombre": nombre, "estado": estado, "documento": documento,
+            "direccion": direccion, "proyecto": proyecto, "fecha": fecha,
+        }
+        properties = {}
+        for campo, prop in _nombres_propiedades().items():
+            if prop not in esquema:
+                continue
+            valor = _valor_propiedad(esquema[prop], valores[campo])
+            if valor is not None:
+                properties[prop] = valor
+        return properties
+
+    def registrar(self, nombre, documento, direccion, proyecto, fecha, estado="En conversaciones"):
+        """
+        Crea la página del cliente, o actualiza la de la misma propuesta si ya existe.
+        Lanza la excepción del API si falla. Retorna el mensaje de éxito.
+        """
+        properties = self.propiedades(nombre, documento, direccion, proyecto, fecha, estado)
+        propuesta = numero_propuesta(proyecto)
+        id_pagina = self._buscar_pagina(propuesta)
+        if id_pagina:
+            self.notion.pages.update(page_id=id_pagina, properties=properties)
+            return "Cliente actualizado en Notion"
+        pagina = self.notion.pages.create(parent={"database_id": self.database_id}, properties=properties)
+        if propuesta:
+            with self._lock:
+                self._paginas[propuesta] = pagina["id"]
+        return "Cliente agregado a Notion"
+
+
+_crm = None
+_lock_crm = threading.Lock()
+
+
+def obtener_crm_notion():
+    """CRM compartido por el proceso con las credenciales del entorno, o None si no está configurado."""
+    global _crm
     token = os.environ.get("NOTION_API_TOKEN")
     database_id = os.environ.get("NOTION_CRM_DATABASE_ID")
     if not token or not database_id or NotionClient is None:
+        return None
+    with _lock_crm:
+        if _crm is None or _crm.database_id != database_id:
+            _crm = CRMNotion(NotionClient(auth=token), database_id)
+        return _crm
+
+
+def agregar_cliente_a_notion_crm(nombre: str, documento: str, direccion: str, proyecto: str, fecha, estado: str = "En conversaciones"):
+    """Agrega un registro en la base de datos de Notion CRM si las credenciales están disponibles.
+    Usa el nombre de estado 'En conversaciones' por defecto.
+    """
+    crm = obtener_crm_notion()
+    if crm is None:
         # Integración deshabilitada
         return False, "Integración Notion no configurada"
 
     try:
-        notion = NotionClient(auth=token)
-        props_status, props_select = _build_notion_properties(nombre, estado, documento, direccion, proyecto, fecha)
-
-        # Intentar crear con "status" primero
-        try:
-            notion.pages.create(parent={"database_id": database_id}, properties=props_status)
-            return True, "Cliente agregado a Notion (status)"
-        except Exception:
-            # Reintentar con select
-            notion.pages.create(parent={"database_id": database_id}, properties=props_select)
-            return True, "Cliente agregado a Notion (select)"
-
+        return True, crm.registrar(nombre, documento, direccion, proyecto, fecha, estado)
     except Exception as e:
         return False, f"Error Notion: {e}"
-
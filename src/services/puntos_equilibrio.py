@@ -0,0 +1,189 @@
+"""
+Puntos de equilibrio y metas de retorno sobre el motor de cotización.
+
+Responden preguntas de venta sin regenerar la propuesta una y otra vez:
+
+- precio_maximo_para_tir / precio_maximo_para_payback: el mayor precio de venta
+  (precio manual) que todavía cumple una TIR mínima o un payback máximo.
+- tarifa_equilibrio: la tarifa de energía a la que el VPN es cero.
+- tamano_minimo_para_cobertura: el menor número de paneles que cubre una
+  fracción del consumo anual.
+
+Cada búsqueda evalúa una malla de candidatos en un solo lote del motor
+vectorizado, toma el tramo donde la condición deja de cumplirse y lo vuelve a
+dividir: con 33 candidatos por lote el tramo se reduce 32 veces por evaluación,
+así que bastan unas pocas evaluaciones para llegar a la tolerancia.
+"""
+import inspect
+import math
+
+import numpy as np
+
+from src.services.calculator_service import calcular_performance_ratio, cotizacion
+from src.services.motor_vectorizado import (
+    DIAS_POR_MES,
+    argumentos_vectorizados,
+    cotizacion_vectorizada,
+    valor_proyecto_calculado,
+)
+
+CANDIDATOS_POR_LOTE = 33
+MAX_EVALUACIONES = 12
+
+_FIRMA_COTIZACION = inspect.signature(cotizacion)
+
+
+def _buscar_limite(cumple, malla, tolerancia, cumple_abajo=True):
+    """
+    Límite de una condición monótona buscado por tramos, un lote por evaluación.
+
+    cumple(valores) recibe un arreglo de candidatos y retorna un arreglo booleano. Con
+    cumple_abajo=True la condición se cumple por debajo del límite (se retorna el mayor
+    valor que cumple); si no, por encima (se retorna el menor). Retorna (valor, evaluaciones),
+    o (None, evaluaciones) si no cumple el extremo favorable de la malla inicial. Si la
+    condición se cumple en toda la malla, se retorna el extremo desfavorable.
+    """
+    malla = np.asarray(malla, dtype=float)
+    for evaluaciones in range(1, MAX_EVALUACIONES + 1):
+        ok = np.asarray(cumple(malla), dtype=bool)
+        if cumple_abajo:
+            if not ok[0]:
+                return None, evaluaciones
+            # El límite queda entre el último candidato que cumple y el primero que no
+            fallan = np.flatnonzero(~ok)
+            if not len(fallan):
+                return float(malla[-1]), evaluaciones
+            bajo, alto = malla[fallan[0] - 1], malla[fallan[0]]
+            resultado = bajo
+        else:
+            if not ok.any():
+                return None, evaluaciones
+            j = int(np.flatnonzero(ok)[0])
+            if j == 0:
+                return float(malla[0]), evaluaciones
+            bajo, alto = malla[j - 1], malla[j]
+            resultado = alto
+        if alto - bajo <= tolerancia * max(abs(resultado), 1.0):
+            return float(resultado), evaluaciones
+        malla = np.linspace(bajo, alto, CANDIDATOS_POR_LOTE)
+    return float(resultado), MAX_EVALUACIONES
+
+
+def _resumen(argumentos, campo, valor, evaluaciones):
+    """Métricas de la cotización en el valor encontrado (una evaluación más del motor)."""
+    resultado = cotizacion_vectorizada(**dict(argumentos, **{campo: valor}))
+    payback = float(resultado["payback"][0])
+    return {
+        "valor": valor,
+        "valor_presente": float(resultado["valor_presente"][0]),
+        "tasa_interna": float(resultado["tasa_interna"][0]),
+        "payback": None if math.isnan(payback) else payback,
+        "evaluaciones": evaluaciones,
+    }
+
+
+def _malla_precios(argumentos):
+    """Precios candidatos en escala geométrica alrededor del precio calculado (de 1/100 a 100 veces)."""
+    return valor_proyecto_calculado(argumentos) * np.geomspace(0.01, 100, CANDIDATOS_POR_LOTE)
+
+
+def precio_maximo_para_tir(tir_objetivo, *args, tolerancia=1e-7, **kwargs):
+    """
+    Mayor precio de venta (COP, entero) con el que la TIR es al menos tir_objetivo (fracción).
+
+    Recibe los mismos argumentos que cotizacion(). Retorna un dict con valor (el precio),
+    valor_presente, tasa_interna, payback y evaluaciones, o None si ni con un precio 100
+    veces menor al calculado se alcanza la TIR.
+    """
+    argumentos = argumentos_vectorizados(*args, **kwargs)
+
+    def cumple(precios):
+        tir = cotizacion_vectorizada(**dict(argumentos, valor_proyecto=precios))["tasa_interna"]
+        return np.nan_to_num(tir, nan=-np.inf) >= tir_objetivo
+
+    precio, evaluaciones = _buscar_limite(cumple, _malla_precios(argumentos), tolerancia)
+    if precio is None:
+        return None
+    return _resumen(argumentos, "valor_proyecto", math.floor(precio), evaluaciones)
+
+
+def precio_maximo_para_payback(payback_objetivo, *args, tolerancia=1e-7, **kwargs):
+    """
+    Mayor precio de venta (COP, entero) con el que la inversión se recupera en payback_objetivo años o menos.
+
+    Mismos argumentos y resultado que precio_maximo_para_tir().
+    """
+    argumentos = argumentos_vectorizados(*args, **kwargs)
+
+    def cumple(precios):
+        payback = cotizacion_vectorizada(**dict(argumentos, valor_proyecto=precios))["payback"]
+        return np.nan_to_num(payback, nan=np.inf) <= payback_objetivo
+
+    precio, evaluaciones = _buscar_limite(cumple, _malla_precios(argumentos), tolerancia)
+    if precio is None:
+        return None
+    return _resumen(argumentos, "valor_proyecto", math.floor(precio), evaluaciones)
+
+
+def tarifa_equilibrio(*args, precio_manual=None, tolerancia=1e-7, **kwargs):
+    """
+    Tarifa de energía (COP/kWh) a la que el VPN es cero.
+
+    Recibe los mismos argumentos que cotizacion() y el precio manual opcional. Con una
+    tarifa mayor el VPN es positivo. Retorna el mismo dict que precio_maximo_para_tir()
+    (valor es la tarifa), o None si el VPN sigue negativo con 20 veces la tarifa actual.
+    """
+    argumentos = argumentos_vectorizados(*args, **kwargs)
+    if precio_manual is not None:
+        argumentos["valor_proyecto"] = precio_manual
+
+    def cumple(tarifas):
+        return cotizacion_vectorizada(**dict(argumentos, costkWh=tarifas))["valor_presente"] >= 0
+
+    malla = np.linspace(0, 20 * max(argumentos["costkWh"], 1), CANDIDATOS_POR_LOTE)
+    tarifa, evaluaciones = _buscar_limite(cumple, malla, tolerancia, cumple_abajo=False)
+    if tarifa is None:
+        return None
+    return _resumen(argumentos, "costkWh", tarifa, evaluaciones)
+
+
+def tamano_minimo_para_cobertura(cobertura_objetivo, *args, **kwargs):
+    """
+    Menor número de paneles cuya generación del primer año cubre cobertura_objetivo (fracción) del consumo.
+
+    Recibe los mismos argumentos que cotizacion() (module define la potencia del panel;
+    size y quantity se ignoran). Todos los candidatos se evalúan en un lote porque la
+    generación no siempre crece con el tamaño: un inversor con más clipping puede
+    quitar más de lo que suma un panel.
+
+    Returns:
+        dict con cantidad_paneles, size (kWp), cobertura, generacion_anual y evaluaciones,
+        o None si el consumo es cero.
+    """
+    argumentos = argumentos_vectorizados(*args, **kwargs)
+    potencia_panel = float(_FIRMA_COTIZACION.bind(*args, **kwargs).arguments["module"]) / 1000
+    consumo_anual = argumentos["Load"] * 12
+    if consumo_anual <= 0:
+        return None
+
+    # Solo importa la generación del primer año
+    argumentos["horizonte_tiempo"] = 1
+    generacion_por_panel = potencia_panel * float(np.dot(argumentos["hsp_mensual"], DIAS_POR_MES)) * \
+        calcular_performance_ratio(argumentos["clima"], argumentos["cubierta"], argumentos["custom_params"])
+    # El clipping quita a lo sumo 5%: con este margen el primer lote casi siempre alcanza
+    maximo = max(2, math.ceil(1.1 * cobertura_objetivo * consumo_anual / generacion_por_panel) + 2)
+    for evaluaciones in range(1, MAX_EVALUACIONES + 1):
+        cantidades = np.arange(1, maximo + 1)
+        generacion = cotizacion_vectorizada(**dict(argumentos, size=cantidades * potencia_panel))["generacion_anual"]
+        cumplen = np.flatnonzero(generacion >= cobertura_objetivo * consumo_anual)
+        if len(cumplen):
+            i = int(cumplen[0])
+            return {
+                "cantidad_paneles": int(cantidades[i]),
+                "size": float(cantidades[i] * potencia_panel),
+                "cobertura": float(generacion[i] / consumo_anual),
+                "generacion_anual": float(generacion[i]),
+                "evaluaciones": evaluaciones,
+            }
+        maximo *= 2
+    return None
@@ -0,0 +1,197 @@
+"""
+Tipos de resultado de la cotización.
+
+ResultadoCotizacion reemplaza la tupla posicional de 21 elementos que retornaba
+cotizacion(): los campos se leen por nombre y los arreglos (generación mensual y
+flujo de caja) son arreglos numpy de solo lectura. Para no romper a quien todavía
+desempaca la tupla, el objeto se puede iterar e indexar como antes, en el mismo
+orden y con listas en lugar de arreglos.
+
+El LCOE y los datos de carbono se calculan solo la primera vez que se leen. Los
+datos de carbono son el único campo mutable (un dict): cada lectura entrega una
+copia, así que un mismo resultado se puede compartir entre sesiones.
+
+LoteCotizaciones agrupa varios resultados por columnas (struct-of-arrays): cada
+campo escalar es un arreglo con un valor por cotización y los arreglos forman
+matrices, de modo que las comparaciones entre escenarios se vectorizan.
+"""
+import copy
+
+import numpy as np
+
+# Orden de los campos en la tupla histórica de cotizacion()
+CAMPOS_COTIZACION = (
+    "valor_proyecto_total", "size", "monto_a_financiar", "cuota_mensual_credito",
+    "desembolso_inicial_cliente", "flujo_caja", "arboles", "generacion_mensual",
+    "valor_presente", "tasa_interna", "cantidad_paneles", "vida_util", "recomendacion_inversor",
+    "lcoe", "performance_ratio", "hsp_mensual", "potencia_ac_inversor", "ahorro_año1",
+    "area_requerida", "capacidad_nominal_bateria", "carbon_data",
+)
+
+# Campos numpy que en la tupla se entregan como listas (hsp_mensual se guarda como tupla)
+CAMPOS_ARREGLO = ("flujo_caja", "generacion_mensual")
+
+# Campos que se calculan al primer acceso
+CAMPOS_PEREZOSOS = ("lcoe", "carbon_data")
+
+
+class _Pendiente:
+    """Función de un campo perezoso que todavía no se ha evaluado."""
+
+    __slots__ = ("funcion",)
+
+    def __init__(self, funcion):
+        self.funcion = funcion
+
+
+def _arreglo_solo_lectura(valores):
+    arreglo = np.array(valores, dtype=float)
+    arreglo.flags.writeable = False
+    return arreglo
+
+
+class ResultadoCotizacion:
+    """
+    Resultado inmutable de una cotización.
+
+    `lcoe` y `carbon_data` pueden recibirse ya calculados o como una función sin
+    argumentos que los calcula; en ese caso se evalúa una sola vez, al primer acceso
+    (o al llamar evaluar_perezosos()).
+    """
+
+    __slots__ = tuple(f"_{campo}" for campo in CAMPOS_COTIZACION)
+
+    def __init__(self, valor_proyecto_total, size, monto_a_financiar, cuota_mensual_credito,
+                 desembolso_inicial_cliente, flujo_caja, arboles, generacion_mensual,
+                 valor_presente, tasa_interna, cantidad_paneles, vida_util, recomendacion_inversor,
+                 lcoe, performance_ratio, hsp_mensual, potencia_ac_inversor, ahorro_año1,
+                 area_requerida, capacidad_nominal_bateria, carbon_data):
+        valores = dict(locals())
+        del valores["self"]
+        valores["flujo_caja"] = _arreglo_solo_lectura(flujo_caja)
+        valores["generacion_mensual"] = _arreglo_solo_lectura(generacion_mensual)
+        valores["hsp_mensual"] = tuple(hsp_mensual)
+        for campo in CAMPOS_PEREZOSOS:
+            if callable(valores[campo]):
+                # Se guarda la función; la propiedad la reemplaza por su valor al primer acceso
+                valores[campo] = _Pendiente(valores[campo])
+        for campo, valor in valores.items():
+            object.__setattr__(self, f"_{campo}", valor)
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("ResultadoCotizacion es inmutable")
+
+    def _perezoso(self, campo):
+        valor = object.__getattribute__(self, f"_{campo}")
+        if isinstance(valor, _Pendiente):
+            valor = valor.funcion()
+            object.__setattr__(self, f"_{campo}", valor)
+        return valor
+
+    @property
+    def lcoe(self):
+        return self._perezoso("lcoe")
+
+    def evaluar_perezosos(self):
+        """Evalúa los campos perezosos pendientes y suelta sus funciones. Retorna el mismo objeto."""
+        for campo in CAMPOS_PEREZOSOS:
+            self._perezoso(campo)
+        return self
+
+    @property
+    def carbon_data(self):
+        return copy.deepcopy(self._perezoso("carbon_data"))
+
+    # --- Compatibilidad con la tupla de 21 elementos --------------------------
+
+    def __len__(self):
+        return len(CAMPOS_COTIZACION)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return tuple(self)[indice]
+        campo = CAMPOS_COTIZACION[indice]
+        valor = getattr(self, campo)
+        if campo in CAMPOS_ARREGLO:
+            return valor.tolist()
+        return list(valor) if campo == "hsp_mensual" else valor
+
+    def __iter__(self):
+        return (self[i] for i in range(len(CAMPOS_COTIZACION)))
+
+    def __reduce__(self):
+        return (_desde_tupla, (tuple(self),))
+
+    def como_dict(self):
+        """Dict campo -> valor (evalúa los campos perezosos)."""
+        return {campo: getattr(self, campo) for campo in CAMPOS_COTIZACION}
+
+    def __repr__(self):
+        return (f"ResultadoCotizacion(size={self.size}, valor_proyecto_total={self.valor_proyecto_total}, "
+                f"tasa_interna={self.tasa_interna}, vida_util={self.vida_util})")
+
+
+def _propiedad(campo):
+    return property(lambda self: object.__getattribute__(self, f"_{campo}"))
+
+
+for _campo in CAMPOS_COTIZACION:
+    if _campo not in CAMPOS_PEREZOSOS:
+        setattr(ResultadoCotizacion, _campo, _propiedad(_campo))
+
+
+def _desde_tupla(valores):
+    return ResultadoCotizacion(*valores)
+
+
+class LoteCotizaciones:
+    """
+    Varias cotizaciones organizadas por columnas.
+
+    Cada campo escalar es un arreglo numpy de longitud n; `flujo_caja` y
+    `generacion_mensual` son matrices (n, años + 1) y (n, 12). Si los horizontes
+    difieren, los años faltantes del flujo de caja quedan en NaN. Los campos
+    perezosos se evalúan al leerlos.
+    """
+
+    def __init__(self, resultados):
+        self.resultados = list(resultados)
+        self._columnas = {}
+
+    @classmethod
+    def desde_resultados(cls, resultados):
+        return cls(resultados)
+
+    def __len__(self):
+        return len(self.resultados)
+
+    def __getitem__(self, indice):
+        return self.resultados[indice]
+
+    def __getattr__(self, campo):
+        if campo.startswith("_") or campo not in CAMPOS_COTIZACION:
+            raise AttributeError(campo)
+        columnas = self.__dict__["_columnas"]
+        if campo not in columnas:
+            columnas[campo] = self._columna(campo)
+        return columnas[campo]
+
+    def _columna(self, campo):
+        valores = [getattr(r, campo) for r in self.resultados]
+        if campo == "flujo_caja":
+            ancho = max((len(v) for v in valores), default=1)
+            matriz = np.full((len(valores), ancho), np.nan)
+            for i, v in enumerate(valores):
+                matriz[i, :len(v)] = v
+            return matriz
+        if campo in ("generacion_mensual", "hsp_mensual"):
+            return np.array(valores, dtype=float).reshape(len(valores), 12)
+        if campo in ("recomendacion_inversor", "carbon_data"):
+            return valores
+        return np.array(valores, dtype=float)
+
+    def payback(self):
+        """Primer año con flujo acumulado >= 0 de cada cotización (NaN si no se recupera)."""
+        acumulado = np.nancumsum(self.flujo_caja, axis=1)
+        recuperado = acumulado >= 0
+        return np.where(recuperado.any(axis=1), recuperado.argmax(axis=1), np.nan)
@@ -0,0 +1,223 @@
+"""
+Superficie de respuesta precalculada para el resumen financiero de la barra lateral.
+
+El resumen muestra VPN, TIR, payback y generación mientras el usuario mueve los
+controles, antes de generar la propuesta. En vez de aproximaciones propias, usa
+las mismas cuentas de cotizacion() con un perfil de HSP plano (el promedio).
+
+Lo costoso y no lineal de la cotización son los ahorros año a año: cada mes se
+compara la generación degradada con el consumo. Divididos por el consumo, esos
+ahorros solo dependen de la cobertura (generación anual / consumo anual):
+
+    ahorro_año_t / Load = tarifa * autoconsumo_t(cobertura) + precio_excedentes * excedentes_t(cobertura)
+
+La superficie guarda autoconsumo_t y excedentes_t sobre una malla fina de
+coberturas (comprimida en disco, float32). Así tamaño, consumo y HSP se reducen
+a un eje, y la tarifa entra de forma exacta. Lo que depende del tamaño en
+escalones (inversor, clipping, curva de costos) y el financiamiento se calculan
+exactos en cada consulta con las funciones de calculator_service. El resultado
+coincide con cotizacion() salvo el error de interpolación (muy pequeño) y tarda
+bastante menos de un milisegundo.
+
+La superficie depende del horizonte y de los parámetros compilados. Ambos forman
+su clave, así que se regenera sola si cambian los DEFAULT_PARAMS.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import numpy_financial as npf
+
+from src.config_parametros import compilar_parametros, get_param
+from src.services.calculator_service import (
+    calcular_factor_clipping,
+    calcular_financiamiento,
+    calcular_flujo_caja_libre,
+    calcular_performance_ratio,
+    calcular_valor_proyecto_fv,
+    recomendar_inversor,
+)
+
+# Cambiar al modificar la construcción de la superficie para invalidar las guardadas
+VERSION_SUPERFICIE = 1
+
+DIAS_POR_MES = np.array([31, 28.25, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# Malla de coberturas. Por encima del máximo todos los meses tienen excedentes
+# (autoconsumo constante y excedentes lineales), así que se extrapola sin error.
+COBERTURA_MAXIMA = 10.0
+PUNTOS_COBERTURA = 4001
+
+MAX_SUPERFICIES_EN_MEMORIA = 8
+
+
+def _ruta_directorio():
+    return os.environ.get("SUPERFICIES_DIR", os.path.join("datos", "superficies"))
+
+
+class SuperficieRespuesta:
+    """Autoconsumo y excedentes por año (por kWh/mes de consumo) sobre una malla de coberturas."""
+
+    def __init__(self, cobertura, autoconsumo, excedentes):
+        self.cobertura = np.asarray(cobertura, dtype=float)
+        # (años, coberturas)
+        self.autoconsumo = np.asarray(autoconsumo)
+        self.excedentes = np.asarray(excedentes)
+
+    @property
+    def nbytes(self):
+        return self.cobertura.nbytes + self.autoconsumo.nbytes + self.excedentes.nbytes
+
+    def interpolar(self, cobertura):
+        """(autoconsumo, excedentes) por año para una cobertura; se extrapola linealmente fuera de la malla."""
+        i = int(np.clip(np.searchsorted(self.cobertura, cobertura) - 1, 0, len(self.cobertura) - 2))
+        peso = (cobertura - self.cobertura[i]) / (self.cobertura[i + 1] - self.cobertura[i])
+        autoconsumo = self.autoconsumo[:, i] * (1 - peso) + self.autoconsumo[:, i + 1] * peso
+        excedentes = self.excedentes[:, i] * (1 - peso) + self.excedentes[:, i + 1] * peso
+        return autoconsumo.astype(float), excedentes.astype(float)
+
+
+def construir_superficie(horizonte_tiempo, custom_params=None):
+    """Calcula la superficie con la degradación de los parámetros y el reparto mensual de cotizacion()."""
+    params = compilar_parametros(custom_params)
+    degradacion = get_param("tasa_degradacion_anual", params)
+    cobertura = np.linspace(0.0, COBERTURA_MAXIMA, PUNTOS_COBERTURA)
+    reparto_mensual = 12 * DIAS_POR_MES / DIAS_POR_MES.sum()
+    factor_año = (1 - degradacion) ** np.arange(int(horizonte_tiempo))
+    # Generación / consumo de cada (año, mes, cobertura)
+    relacion = factor_año[:, None, None] * reparto_mensual[None, :, None] * cobertura[None, None, :]
+    autoconsumo = np.minimum(relacion, 1.0).sum(axis=1)
+    excedentes = np.maximum(relacion - 1.0, 0.0).sum(axis=1)
+    return SuperficieRespuesta(cobertura, autoconsumo.astype(np.float32), excedentes.astype(np.float32))
+
+
+def clave_superficie(horizonte_tiempo, custom_params=None):
+    """Hash de la versión, el horizonte y los parámetros compilados (cambia si cambian los DEFAULT_PARAMS)."""
+    contenido = [VERSION_SUPERFICIE, COBERTURA_MAXIMA, PUNTOS_COBERTURA, int(horizonte_tiempo),
+                 dict(compilar_parametros(custom_params))]
+    return hashlib.sha256(json.dumps(contenido, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class CacheSuperficies:
+    """Superficies por clave: en memoria las más recientes y comprimidas en disco."""
+
+    def __init__(self, directorio=None, max_en_memoria=MAX_SUPERFICIES_EN_MEMORIA):
+        self.directorio = directorio or _ruta_directorio()
+        self.max_en_memoria = max_en_memoria
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.npz")
+
+    def obtener(self, horizonte_tiempo, custom_params=None):
+        """Superficie para el horizonte y los parámetros dados; la construye y la guarda si no existe."""
+        # Los parámetros compilados son hashables: en memoria no hace falta serializarlos
+        params = compilar_parametros(custom_params)
+        clave_memoria = (int(horizonte_tiempo), params)
+        with self._lock:
+            superficie = self._memoria.get(clave_memoria)
+            if superficie is not None:
+                self._memoria.move_to_end(clave_memoria)
+                return superficie
+
+        clave = clave_superficie(horizonte_tiempo, params)
+        superficie = self._leer(clave)
+        if superficie is None:
+            superficie = construir_superficie(horizonte_tiempo, params)
+            self._guardar(clave, superficie)
+
+        with self._lock:
+            self._memoria[clave_memoria] = superficie
+            while len(self._memoria) > self.max_en_memoria:
+                self._memoria.popitem(last=False)
+        return superficie
+
+    def _leer(self, clave):
+        try:
+            with np.load(self._ruta(clave)) as datos:
+                return SuperficieRespuesta(datos["cobertura"], datos["autoconsumo"], datos["excedentes"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _guardar(self, clave, superficie):
+        """Escritura atómica; si el disco falla la superficie igual queda en memoria."""
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            ruta = self._ruta(clave)
+            temporal = f"{ruta}.{threading.get_ident()}.tmp.npz"
+            np.savez_compressed(temporal, cobertura=superficie.cobertura,
+                                autoconsumo=superficie.autoconsumo, excedentes=superficie.excedentes)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            print(f"No se pudo guardar la superficie de respuesta: {e}")
+
+
+_cache_superficies = None
+_lock_cache_superficies = threading.Lock()
+
+
+def obtener_cache_superficies():
+    """Caché de superficies compartida por todas las sesiones del proceso."""
+    global _cache_superficies
+    with _lock_cache_superficies:
+        if _cache_superficies is None:
+            _cache_superficies = CacheSuperficies()
+        return _cache_superficies
+
+
+def _payback(flujo_caja):
+    """Años (con fracción interpolada) hasta recuperar la inversión, como el payback exacto de la propuesta."""
+    acumulado = np.cumsum(flujo_caja)
+    recuperado = np.flatnonzero(acumulado >= 0)
+    if not len(recuperado):
+        return None
+    k = int(recuperado[0])
+    if k > 0 and acumulado[k] != acumulado[k - 1]:
+        return (k - 1) + abs(acumulado[k - 1]) / (acumulado[k] - acumulado[k - 1])
+    return float(k)
+
+
+def estimar_resumen(size, Load, costkWh, hsp_promedio, index, dRate, cubierta="LÁMINA", clima="SOL",
+                    perc_financiamiento=0, tasa_interes_credito=0, plazo_credito_años=0, horizonte_tiempo=25,
+                    custom_params=None, cache=None):
+    """
+    Estimación instantánea para el resumen financiero (sin baterías ni beneficios tributarios).
+
+    Returns:
+        dict con generacion_anual (kWh), performance_ratio, cobertura (fracción del consumo),
+        valor_proyecto_total, valor_presente, tasa_interna (NaN si no existe) y payback (años, None si no se recupera).
+    """
+    params = compilar_parametros(custom_params)
+    cache = cache or obtener_cache_superficies()
+    superficie = cache.obtener(horizonte_tiempo, params)
+
+    # Generación exacta de cotizacion() con HSP plano
+    potencia_ac = recomendar_inversor(size)[1]
+    factor_clipping = calcular_factor_clipping(size / potencia_ac if potencia_ac > 0 else 1.0)
+    performance_ratio = calcular_performance_ratio(clima, cubierta, params)
+    generacion_anual = size * hsp_promedio * DIAS_POR_MES.sum() * performance_ratio * (1 - factor_clipping)
+    cobertura = generacion_anual / (Load * 12) if Load > 0 else 0.0
+
+    valor_proyecto_total = int(np.ceil(calcular_valor_proyecto_fv(size, cubierta, params)))
+    _, cuota_mensual, desembolso = calcular_financiamiento(
+        valor_proyecto_total, perc_financiamiento, tasa_interes_credito, plazo_credito_años)
+
+    autoconsumo, excedentes = superficie.interpolar(cobertura)
+    ahorros = Load * (costkWh * autoconsumo + get_param("precio_excedentes", params) * excedentes)
+    flujo_caja = calcular_flujo_caja_libre(
+        ahorros, index, get_param("porcentaje_mantenimiento", params), cuota_mensual, plazo_credito_años,
+        desembolso, valor_proyecto_total)
+
+    return {
+        "generacion_anual": generacion_anual,
+        "performance_ratio": performance_ratio,
+        "cobertura": cobertura,
+        "valor_proyecto_total": valor_proyecto_total,
+        "valor_presente": npf.npv(dRate, flujo_caja),
+        "tasa_interna": npf.irr(flujo_caja),
+        "payback": _payback(flujo_caja),
+    }
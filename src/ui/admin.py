@@ -0,0 +1,128 @@
+"""
+Panel de administración: métricas internas del proceso.
+
+Solo se muestra con la variable de entorno PANEL_ADMIN activa: expone tiempos,
+perfiles y botones que afectan a todos los usuarios (reintentar trabajos, vaciar
+la caché).
+"""
+import os
+
+import streamlit as st
+import pandas as pd
+
+from src.utils.telemetria import registro_tiempos
+from src.utils.perfilado import perfiles_recientes, perfilado_habilitado
+from src.services.cola_trabajos import obtener_cola, ESTADO_FALLIDO
+from src.services.cache_resultados import obtener_cache_resultados
+
+
+def render_panel_tiempos():
+    """Muestra los tiempos por etapa de la generación de reportes."""
+    st.subheader("⏱️ Tiempos por etapa")
+
+    resumen = registro_tiempos.resumen()
+    if not resumen:
+        st.caption("Aún no se ha generado ningún reporte en este proceso.")
+        return
+
+    df_resumen = pd.DataFrame(resumen).sort_values("total_s", ascending=False)
+    st.dataframe(df_resumen, use_container_width=True, hide_index=True)
+
+    recientes = registro_tiempos.reportes_recientes()
+    if recientes:
+        ultimo = recientes[0]
+        st.markdown(f"**Último reporte** ({ultimo['flujo']}, {ultimo['timestamp']}): "
+                    f"{ultimo['total_segundos']:.2f} s")
+        df_ultimo = pd.DataFrame(ultimo["etapas"])
+        if not df_ultimo.empty:
+            st.bar_chart(df_ultimo.set_index("etapa")["segundos"])
+
+
+def render_panel_perfilado():
+    """Toggle de perfilado y resumen del último perfil capturado."""
+    st.subheader("🔬 Perfilado")
+    st.checkbox("Perfilar la próxima generación de reporte", key="perfilar_reporte",
+                help="Ejecuta la generación bajo cProfile y tracemalloc. Es más lenta; úsalo solo para investigar.")
+    if perfilado_habilitado() and not st.session_state.get("perfilar_reporte"):
+        st.caption("PERFILAR_REPORTES está activo: todas las generaciones se perfilan.")
+
+    perfiles = perfiles_recientes()
+    if not perfiles:
+        return
+    perfil = perfiles[0]
+    st.markdown(f"**Último perfil** ({perfil.flujo}, {perfil.timestamp:%Y-%m-%d %H:%M:%S}) · "
+                f"pico de memoria {perfil.memoria_pico_kb:,.0f} KB")
+    if perfil.ruta_perfil:
+        st.caption(f"Guardado en {perfil.ruta_perfil} y {perfil.ruta_snapshot}")
+    st.markdown("Funciones más costosas (tiempo acumulado)")
+    st.dataframe(pd.DataFrame(perfil.top_funciones), use_container_width=True, hide_index=True)
+    st.markdown("Líneas que más memoria asignan")
+    st.dataframe(pd.DataFrame(perfil.top_lineas), use_container_width=True, hide_index=True)
+
+
+def render_panel_cola():
+    """Estado de la cola de trabajos en segundo plano (Drive, Notion)."""
+    st.subheader("📬 Cola de trabajos")
+    cola = obtener_cola()
+    conteo = cola.conteo_por_estado()
+    if not conteo:
+        st.caption("No hay trabajos registrados.")
+        return
+    st.caption(" · ".join(f"{estado}: {n}" for estado, n in sorted(conteo.items())))
+
+    trabajos = cola.listar(limite=20)
+    st.dataframe(pd.DataFrame([{
+        "id": t["id"],
+        "tipo": t["tipo"],
+        "propuesta": t["propuesta"],
+        "estado": t["estado"],
+        "intentos": f"{t['intentos']}/{t['max_intentos']}",
+        "último error": t["ultimo_error"] or "",
+    } for t in trabajos]), use_container_width=True, hide_index=True)
+
+    fallidos = [t for t in trabajos if t["estado"] == ESTADO_FALLIDO]
+    if fallidos and st.button(f"🔁 Reintentar fallidos ({len(fallidos)})", key="reintentar_trabajos"):
+        for trabajo in fallidos:
+            cola.reintentar(trabajo["id"])
+        st.rerun()
+
+
+def render_panel_cache():
+    """Aciertos y ocupación de la caché de resultados de cotización."""
+    st.subheader("🗃️ Caché de resultados")
+    cache = obtener_cache_resultados()
+    stats = cache.estadisticas()
+    if not stats["aciertos"] and not stats["fallos"]:
+        st.caption("Aún no se ha consultado la caché en este proceso.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Tasa de aciertos", f"{stats['tasa_aciertos']:.0%}", help=f"{stats['aciertos']} aciertos, {stats['fallos']} fallos")
+    col2.metric("Entradas", f"{stats['entradas']}/{stats['max_entradas']}")
+    col3.metric("Memoria", f"{stats['bytes'] / 2**20:.1f}/{stats['max_bytes'] / 2**20:.0f} MB",
+                help=f"{stats['desalojos']} desalojos por LRU")
+    df = pd.DataFrame(stats["por_funcion"])
+    df["tasa_aciertos"] = (df["tasa_aciertos"] * 100).round(1)
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+    if st.button("🧹 Vaciar caché", key="vaciar_cache_resultados"):
+        cache.limpiar()
+        st.rerun()
+
+
+def panel_admin_habilitado():
+    """True si la variable de entorno PANEL_ADMIN habilita el panel de administración."""
+    return os.environ.get("PANEL_ADMIN", "").lower() in ("1", "true", "si", "sí")
+
+
+def render_panel_admin(puerto=None):
+    """Panel de administración mostrado en la barra lateral; puerto es el del endpoint de métricas."""
+    with st.expander("🛠️ Panel de administración", expanded=False):
+        render_panel_tiempos()
+        if puerto:
+            st.caption(f"Métricas Prometheus en http://127.0.0.1:{puerto}/metrics")
+        else:
+            st.caption("Define METRICS_PORT para exponer las métricas en formato Prometheus.")
+        render_panel_cache()
+        render_panel_perfilado()
+        render_panel_cola()
@@ -7,6 +7,8 @@ import datetime
 import os
 import math
 import base64
+import uuid
+import zipfile
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
@@ -15,21 +17,40 @@ import folium
 from streamlit_folium import st_folium
 import googlemaps
 from src.config import HSP_MENSUAL_POR_CIUDAD, PROMEDIOS_COSTO, HSP_POR_CIUDAD
-from src.config_parametros import DEFAULT_PARAMS, PARAM_DESCRIPTIONS, PARAM_LIMITS, get_param
+from src.config_parametros import DEFAULT_PARAMS, PARAM_DESCRIPTIONS, PARAM_LIMITS, compilar_parametros, get_param
 from src.services.calculator_service import (
-    cotizacion, calcular_costo_por_kwp, generar_csv_flujo_caja_detallado,
-    calcular_analisis_sensibilidad, calcular_lista_materiales, redondear_a_par
+    calcular_costo_por_kwp, calcular_flujo_caja_detallado, exportar_flujo_caja,
+    calcular_lista_materiales, redondear_a_par
 )
-from src.services.drive_service import obtener_siguiente_consecutivo, gestionar_creacion_drive
-from src.services.location_service import get_static_map_image
+from src.services.drive_service import maximo_consecutivo_en_drive, construir_servicio_drive
+from src.services.consecutivos import obtener_asignador
+from src.services.resultado_cotizacion import LoteCotizaciones
+from src.services.cache_resultados import cotizacion_en_cache, analisis_sensibilidad_en_cache
+from src.services.modelo_incremental import ModeloCotizacion
+from src.services.analisis_tornado import calcular_analisis_tornado, ordenar_tornado
+from src.services.amortizacion import comparar_financiamientos, malla_productos, tabla_amortizacion
+from src.services.flujo_mensual import flujo_caja_mensual
+from src.services.puntos_equilibrio import (
+    precio_maximo_para_payback,
+    precio_maximo_para_tir,
+    tamano_minimo_para_cobertura,
+    tarifa_equilibrio,
+)
+from src.services.superficie_respuesta import estimar_resumen
+from src.services.cola_trabajos import obtener_cola, encolar_drive, encolar_notion, ESTADO_COMPLETADO
+from src.services.location_service import get_static_map_image, geocodificar_google
 from src.services.pvgis_service import get_pvgis_hsp_alternative, get_data_source_label, DATA_SOURCE_PVGIS
-from src.services.notion_service import agregar_cliente_a_notion_crm
 from src.utils.pdf_generator import PropuestaPDF
 from src.utils.contract_generator import generar_contrato_docx
-from src.utils.chargers import generar_pdf_cargadores
+from src.utils.chargers import generar_pdf_cargadores, generar_pdfs_cargadores
+from src.utils.planificador_cargadores import planificar_sitio, sitios_para_cotizacion
 from src.utils.helpers import validar_datos_entrada, formatear_moneda
 from src.utils.plotting import generar_grafica_generacion
 from src.utils.excel_generator import generar_excel_financiero
+from src.utils.telemetria import iniciar_reporte
+from src.utils.perfilado import perfilar_reporte, perfilado_habilitado
+from src.utils.grafo_tareas import GrafoTareas
+from src.utils.ui_helpers import mostrar_progreso_tarea, describir_trabajo
 
 
 
@@ -53,6 +74,227 @@ def init_form_defaults():
         if key not in st.session_state:
             st.session_state[key] = value
 
+def render_analisis_what_if(res):
+    """Sliders de tarifa, indexación y tasa de descuento sobre el modelo incremental de la cotización."""
+    argumentos = res.get('argumentos_cotizacion')
+    if not argumentos:
+        return
+    with st.expander("🎚️ Análisis What-If (tarifa, indexación y tasa de descuento)"):
+        # El modelo vive con el resultado: cada movimiento de slider solo recalcula los nodos afectados
+        if res.get('modelo_what_if') is None:
+            res['modelo_what_if'] = ModeloCotizacion(**argumentos)
+        modelo = res['modelo_what_if']
+        base = cotizacion_en_cache(**argumentos)
+        if res['precio_manual'] and res['precio_manual_valor']:
+            st.caption("Las métricas parten del precio calculado, no del precio manual.")
+
+        sufijo = res['nombre_proyecto']
+        col1, col2, col3 = st.columns(3)
+        costo_kwh = col1.slider("Tarifa (COP/kWh)", 200, max(2 * int(argumentos['costkWh']), 400),
+                                int(argumentos['costkWh']), 10, key=f"what_if_tarifa_{sufijo}")
+        indexacion = col2.slider("Indexación (%)", 0.0, 20.0, float(argumentos['index'] * 100), 0.5,
+                                 key=f"what_if_index_{sufijo}")
+        tasa_descuento = col3.slider("Tasa de descuento (%)", 0.0, 25.0, float(argumentos['dRate'] * 100), 0.5,
+                                     key=f"what_if_drate_{sufijo}")
+
+        modelo.actualizar(costkWh=costo_kwh, index=indexacion / 100, dRate=tasa_descuento / 100)
+        vpn, tir, flujo = modelo.obtener("valor_presente", "tasa_interna", "flujo_caja")
+        recalculados = modelo.recalculados
+        payback = next((i for i, x in enumerate(np.cumsum(flujo)) if x >= 0), None)
+        payback_base = next((i for i, x in enumerate(np.cumsum(base.flujo_caja)) if x >= 0), None)
+
+        col_m1, col_m2, col_m3 = st.columns(3)
+        col_m1.metric("VPN", f"${vpn:,.0f}", delta=f"{vpn - base.valor_presente:,.0f}")
+        col_m2.metric("TIR", f"{tir:.1%}", delta=f"{(tir - base.tasa_interna) * 100:.1f} pp")
+        col_m3.metric("Payback (años)", payback if payback is not None else "N/A",
+                      delta=(payback - payback_base) if payback is not None and payback_base is not None else None,
+                      delta_color="inverse")
+        st.caption(f"Nodos recalculados: {', '.join(recalculados) if recalculados else 'ninguno'}")
+
+
+def render_metas_venta(res):
+    """Precio máximo para una TIR o un payback objetivo, tarifa de equilibrio y tamaño mínimo por cobertura."""
+    argumentos = res.get('argumentos_cotizacion')
+    if not argumentos:
+        return
+    with st.expander("🎯 Metas de Venta y Puntos de Equilibrio"):
+        sufijo = res['nombre_proyecto']
+        col1, col2, col3 = st.columns(3)
+        tir_objetivo = col1.number_input("TIR objetivo (%)", 1.0, 100.0, 15.0, 0.5, key=f"meta_tir_{sufijo}")
+        payback_objetivo = col2.number_input("Payback objetivo (años)", 1.0, float(argumentos['horizonte_tiempo']),
+                                             min(6.0, float(argumentos['horizonte_tiempo'])), 0.5,
+                                             key=f"meta_payback_{sufijo}")
+        cobertura_objetivo = col3.number_input("Cobertura objetivo (%)", 10, 300, 100, 5, key=f"meta_cobertura_{sufijo}")
+
+        precio_manual = res['precio_manual_valor'] if res['precio_manual'] and res['precio_manual_valor'] else None
+        por_tir = precio_maximo_para_tir(tir_objetivo / 100, **argumentos)
+        por_payback = precio_maximo_para_payback(payback_objetivo, **argumentos)
+        equilibrio = tarifa_equilibrio(**argumentos, precio_manual=precio_manual)
+        tamano = tamano_minimo_para_cobertura(cobertura_objetivo / 100, **argumentos)
+
+        col_m1, col_m2 = st.columns(2)
+        col_m1.metric(f"Precio máximo para TIR ≥ {tir_objetivo:.1f}%",
+                      f"${por_tir['valor']:,.0f}" if por_tir else "No alcanzable")
+        col_m2.metric(f"Precio máximo para payback ≤ {payback_objetivo:.1f} años",
+                      f"${por_payback['valor']:,.0f}" if por_payback else "No alcanzable")
+        col_m3, col_m4 = st.columns(2)
+        col_m3.metric("Tarifa de equilibrio (VPN = 0)",
+                      f"${equilibrio['valor']:,.0f} COP/kWh" if equilibrio else "No alcanzable")
+        col_m4.metric(f"Tamaño mínimo para cubrir {cobertura_objetivo}%",
+                      f"{tamano['size']:.2f} kWp ({tamano['cantidad_paneles']} paneles)" if tamano else "N/A")
+        st.caption(f"Precio actual: ${res['val_total']:,.0f} COP. Los precios máximos parten de las condiciones "
+                   "de esta propuesta; la tarifa de equilibrio usa el precio actual.")
+
+
+def render_comparacion_creditos(res):
+    """Compara una malla de productos de crédito (tasa × plazo × cuota inicial × gracia) por VPN."""
+    argumentos = res.get('argumentos_cotizacion')
+    if not argumentos:
+        return
+    with st.expander("🏦 Comparar Productos de Crédito"):
+        sufijo = res['nombre_proyecto']
+        st.caption("Valores separados por comas. Se evalúan todas las combinaciones.")
+        col1, col2 = st.columns(2)
+        tasas = col1.text_input("Tasas de interés anual (%)", "12, 14, 16", key=f"credito_tasas_{sufijo}")
+        plazos = col2.text_input("Plazos (meses)", "36, 60, 84", key=f"credito_plazos_{sufijo}")
+        col3, col4, col5 = st.columns(3)
+        cuotas_iniciales = col3.text_input("Cuotas iniciales (%)", "0, 20, 30", key=f"credito_iniciales_{sufijo}")
+        gracias = col4.text_input("Meses de gracia", "0, 6", key=f"credito_gracia_{sufijo}")
+        mes_inicio = col5.number_input("Mes de la primera cuota", 0, 24, 0, key=f"credito_inicio_{sufijo}",
+                                       help="Meses desde la entrada en operación hasta la primera cuota")
+        try:
+            productos = malla_productos(
+                [float(t) / 100 for t in tasas.split(",")], [int(p) for p in plazos.split(",")],
+                [float(c) for c in cuotas_iniciales.split(",")], [int(g) for g in gracias.split(",")])
+        except ValueError as e:
+            st.error(f"❌ Revisa los valores del crédito: {e}")
+            return
+
+        precio_manual = res['precio_manual_valor'] if res['precio_manual'] and res['precio_manual_valor'] else None
+        comparacion = comparar_financiamientos(productos, **argumentos, mes_inicio_credito=mes_inicio,
+                                               precio_manual=precio_manual)
+        contado = comparacion['contado']
+        st.markdown(f"**De contado:** VPN ${contado['valor_presente']:,.0f} | "
+                    f"TIR {contado['tasa_interna']:.1%} | {comparacion['evaluados']} productos evaluados")
+        st.dataframe(pd.DataFrame([{
+            "Tasa": f"{p['tasa_anual']:.1%}",
+            "Plazo (meses)": p['plazo_meses'],
+            "Cuota inicial": f"{p['cuota_inicial']:.0f}%",
+            "Gracia (meses)": p['meses_gracia'],
+            "Cuota mensual": f"${p['cuota_fija']:,.0f}",
+            "Intereses totales": f"${p['intereses_totales']:,.0f}",
+            "VPN": f"${p['valor_presente']:,.0f}",
+            "TIR": f"{p['tasa_interna']:.1%}" if not np.isnan(p['tasa_interna']) else "N/A",
+        } for p in comparacion['productos']]), use_container_width=True, hide_index=True)
+
+        mejor = comparacion['productos'][0]
+        if st.toggle("Ver tabla de amortización del mejor producto", key=f"credito_tabla_{sufijo}"):
+            tabla = tabla_amortizacion(mejor['monto'], mejor['tasa_anual'], mejor['plazo_meses'], mejor['meses_gracia'])
+            st.dataframe(pd.DataFrame({
+                "Mes": np.arange(1, mejor['plazo_meses'] + 1) + mes_inicio,
+                "Cuota": tabla['cuota'][0],
+                "Interés": tabla['interes'][0],
+                "Abono a capital": tabla['abono_capital'][0],
+                "Saldo": tabla['saldo'][0],
+            }).style.format({c: "${:,.0f}" for c in ("Cuota", "Interés", "Abono a capital", "Saldo")}),
+                use_container_width=True, hide_index=True)
+
+
+def render_flujo_mensual(res):
+    """Flujo de caja mes a mes: puesta en marcha, indexación y cuotas mensuales y descuento mensual."""
+    argumentos = res.get('argumentos_cotizacion')
+    if not argumentos:
+        return
+    with st.expander("📅 Flujo de Caja Mensual"):
+        sufijo = res['nombre_proyecto']
+        hoy = datetime.date.today()
+        col1, col2, col3 = st.columns(3)
+        fecha_firma = col1.date_input("Fecha de firma", hoy, key=f"mensual_firma_{sufijo}")
+        demora = 6 if argumentos.get('demora_6_meses') else 0
+        fecha_operacion = col2.date_input(
+            "Fecha de puesta en marcha",
+            datetime.date(hoy.year + (hoy.month - 1 + demora) // 12, (hoy.month - 1 + demora) % 12 + 1, 1),
+            key=f"mensual_operacion_{sufijo}")
+        mes_inicio = col3.number_input("Mes de la primera cuota", 0, 24, 0, key=f"mensual_credito_{sufijo}",
+                                       help="Meses desde la firma hasta la primera cuota del crédito")
+        mes_puesta_en_marcha = (fecha_operacion.year - fecha_firma.year) * 12 + fecha_operacion.month - fecha_firma.month
+        if mes_puesta_en_marcha < 0:
+            st.error("❌ La puesta en marcha no puede ser anterior a la firma")
+            return
+
+        precio_manual = res['precio_manual_valor'] if res['precio_manual'] and res['precio_manual_valor'] else None
+        mensual = flujo_caja_mensual(**argumentos, mes_puesta_en_marcha=mes_puesta_en_marcha,
+                                     mes_calendario_inicio=fecha_firma.month, mes_inicio_credito=mes_inicio,
+                                     precio_manual=precio_manual)
+        col_m1, col_m2, col_m3 = st.columns(3)
+        col_m1.metric("VPN (descuento mensual)", f"${mensual['valor_presente']:,.0f}")
+        col_m2.metric("TIR (anual efectiva)",
+                      f"{mensual['tasa_interna']:.1%}" if not np.isnan(mensual['tasa_interna']) else "N/A")
+        col_m3.metric("Payback (años)", f"{mensual['payback']:.2f}" if mensual['payback'] is not None else "N/A")
+        st.caption(f"{len(mensual['flujo_caja']) - 1} meses desde la firma, con {mes_puesta_en_marcha} meses "
+                   "sin operación. La tarifa se indexa cada mes.")
+
+        meses = pd.period_range(pd.Timestamp(fecha_firma).to_period("M"), periods=len(mensual['flujo_caja']), freq="M")
+        st.line_chart(pd.DataFrame({"Flujo de Caja Acumulado": mensual['flujo_acumulado']},
+                                   index=meses.to_timestamp()))
+        if st.toggle("Ver tabla mensual", key=f"mensual_tabla_{sufijo}"):
+            st.dataframe(pd.DataFrame({
+                "Mes": meses[1:].strftime("%Y-%m"),
+                "Generación (kWh)": mensual['generacion'],
+                "Tarifa (COP/kWh)": mensual['tarifa'],
+                "Ahorro": mensual['ahorro'],
+                "Mantenimiento": mensual['mantenimiento'],
+                "Cuota Crédito": mensual['cuota_credito'],
+                "Flujo Neto": mensual['flujo_caja'][1:],
+                "Flujo Acumulado": mensual['flujo_acumulado'][1:],
+            }).style.format({"Generación (kWh)": "{:,.0f}", "Tarifa (COP/kWh)": "{:,.1f}",
+                             **{c: "${:,.0f}" for c in ("Ahorro", "Mantenimiento", "Cuota Crédito",
+                                                        "Flujo Neto", "Flujo Acumulado")}}),
+                use_container_width=True, hide_index=True)
+
+
+def render_analisis_tornado(res):
+    """Tornado de VPN/TIR: cada supuesto ±X% evaluado en un solo lote vectorizado."""
+    argumentos = res.get('argumentos_cotizacion')
+    if not argumentos:
+        return
+    st.subheader("🌪️ ¿De qué supuesto depende el retorno?")
+    sufijo = res['nombre_proyecto']
+    col1, col2 = st.columns(2)
+    variacion = col1.slider("Variación de cada supuesto (±%)", 5, 50, 10, 5, key=f"tornado_variacion_{sufijo}")
+    metrica = col2.radio("Ordenar por", ["VPN", "TIR"], horizontal=True, key=f"tornado_metrica_{sufijo}")
+
+    precio_manual = res['precio_manual_valor'] if res['precio_manual'] and res['precio_manual_valor'] else None
+    tornado = calcular_analisis_tornado(**argumentos, variacion=variacion / 100, precio_manual=precio_manual)
+    clave = metrica.lower()
+    variables = ordenar_tornado(tornado['variables'], clave)
+    base = tornado[f'{clave}_base']
+
+    # Barras horizontales: la variable de mayor impacto arriba
+    fig, ax = plt.subplots(figsize=(10, 0.5 * len(variables) + 1.5))
+    escala = 1e6 if clave == 'vpn' else 0.01
+    for i, v in enumerate(reversed(variables)):
+        bajo, alto = (v[f'{clave}_bajo'] - base) / escala, (v[f'{clave}_alto'] - base) / escala
+        ax.barh(i, bajo, color='#FA323F', alpha=0.8, label=f'-{variacion}%' if i == 0 else None)
+        ax.barh(i, alto, color='#2E86AB', alpha=0.8, label=f'+{variacion}%' if i == 0 else None)
+    ax.set_yticks(range(len(variables)))
+    ax.set_yticklabels([v['etiqueta'] for v in reversed(variables)])
+    ax.axvline(0, color='grey', linewidth=0.8)
+    ax.set_xlabel("Cambio en VPN (millones COP)" if clave == 'vpn' else "Cambio en TIR (puntos porcentuales)")
+    ax.set_title(f"Sensibilidad del {metrica} a cada supuesto (±{variacion}%)", fontweight="bold")
+    ax.legend()
+    st.pyplot(fig)
+    plt.close(fig)
+
+    st.dataframe(pd.DataFrame([{
+        "Supuesto": v['etiqueta'],
+        f"VPN -{variacion}%": f"${v['vpn_bajo']:,.0f}",
+        f"VPN +{variacion}%": f"${v['vpn_alto']:,.0f}",
+        f"TIR -{variacion}%": f"{v['tir_bajo']:.1%}" if not np.isnan(v['tir_bajo']) else "N/A",
+        f"TIR +{variacion}%": f"{v['tir_alto']:.1%}" if not np.isnan(v['tir_alto']) else "N/A",
+    } for v in variables]), use_container_width=True, hide_index=True)
+
+
 def render_desktop_interface():
     """Interfaz optimizada para desktop"""
     st.title("☀️ Calculadora y Cotizador Solar Profesional")
@@ -92,8 +334,13 @@ def render_desktop_interface():
 
     # --- INICIALIZACIÓN DE SERVICIOS Y DATOS ---
     drive_service = None
-    numero_proyecto_del_año = 1
     parent_folder_id = None
+    año_corto = str(datetime.datetime.now().year)[-2:]
+    asignador = obtener_asignador()
+    escanear_drive = None
+    # El número del proyecto se reserva por borrador: corregir el cliente no gasta otro número
+    if 'id_borrador' not in st.session_state:
+        st.session_state.id_borrador = uuid.uuid4().hex
     try:
         creds = Credentials(
             None, refresh_token=os.environ.get("GOOGLE_REFRESH_TOKEN"),
@@ -108,12 +355,17 @@ def render_desktop_interface():
         
         parent_folder_id = os.environ.get("PARENT_FOLDER_ID")
         if parent_folder_id:
-            numero_proyecto_del_año = obtener_siguiente_consecutivo(drive_service, parent_folder_id)
+            # El contador local se pone al día con Drive en segundo plano (máx. una vez por hora)
+            escanear_drive = lambda: maximo_consecutivo_en_drive(construir_servicio_drive(), parent_folder_id, año_corto)
+            asignador.reconciliar_en_segundo_plano(año_corto, escanear_drive)
         else:
-            st.warning("ID de la carpeta padre no encontrado. El consecutivo iniciará en 1.")
+            st.warning("ID de la carpeta padre no encontrado. El consecutivo se tomará solo del contador local.")
     except Exception as e:
         st.warning(f"Secretos de Google Drive no configurados o inválidos. La creación de carpetas está desactivada.")
 
+    # Vista previa; el número se reserva al generar el reporte
+    numero_proyecto_del_año = asignador.siguiente(año_corto)
+
     # ==============================================================================
     # INTERFAZ EN LA BARRA LATERAL (SIDEBAR)
     # ==============================================================================
@@ -164,6 +416,8 @@ def render_desktop_interface():
         st.subheader("Información del Proyecto (Interna)")
         ubicacion = st.text_input("Ubicación (Etiqueta para carpeta)", key="form_ubicacion")
         st.text_input("Número de Proyecto del Año (Automático)", value=numero_proyecto_del_año, disabled=True)
+        if escanear_drive is not None and asignador.error_reconciliacion(año_corto):
+            st.warning("⚠️ No se pudo verificar el consecutivo con Drive; se reintentará al generar la propuesta.")
         
         st.subheader("Ubicación Geográfica")
         gmaps = None
@@ -234,10 +488,9 @@ def render_desktop_interface():
             else:
                 try:
                     with st.spinner("Buscando dirección..."):
-                        geocode_result = gmaps.geocode(address, region='CO')
+                        geocode_result = geocodificar_google(gmaps, address)
                     if geocode_result:
-                        location = geocode_result[0]['geometry']['location']
-                        coords = [location['lat'], location['lng']]
+                        coords = list(geocode_result)
                         if "map_state" not in st.session_state:
                              st.session_state.map_state = {}
                         st.session_state.map_state["marker"] = coords
@@ -684,6 +937,13 @@ def render_desktop_interface():
                 | Performance Ratio | {custom_params['performance_ratio_base']*100:.1f}% | {DEFAULT_PARAMS['performance_ratio_base']*100:.1f}% |
                 """)
 
+        # Compilar una sola vez: todos los cálculos de esta ejecución reutilizan el mismo conjunto validado
+        try:
+            custom_params = compilar_parametros(custom_params)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            st.stop()
+
         st.markdown("---")
         st.subheader("💼 Resumen Financiero para Financieros")
         mostrar_resumen_financiero = st.toggle(
@@ -731,11 +991,14 @@ def render_desktop_interface():
             else:
                 hsp_promedio = HSP_POR_CIUDAD.get(ciudad_input, 4.5)
 
-            # Generación anual inicial
-            potencia_efectiva = min(size_calc, size_calc / 1.2)  # Aproximación
-            # Use default efficiency if n_aprox is not available
-            n_aprox = 0.85  # Default efficiency value
-            generacion_anual_inicial = potencia_efectiva * hsp_promedio * 365 * n_aprox
+            # Estimación instantánea con el motor de cotización (superficie de respuesta precalculada)
+            estimacion = estimar_resumen(
+                size_calc, Load, costkWh, hsp_promedio, index_input / 100, dRate_input / 100,
+                cubierta=cubierta, clima=clima, perc_financiamiento=perc_financiamiento,
+                tasa_interes_credito=tasa_interes_input / 100, plazo_credito_años=plazo_credito_años,
+                horizonte_tiempo=horizonte_tiempo, custom_params=custom_params,
+            )
+            generacion_anual_inicial = estimacion['generacion_anual']
 
             # O&M anual (2% del CAPEX)
             om_anual = valor_proyecto_total * 0.02  # 2% del valor total del proyecto
@@ -755,13 +1018,25 @@ def render_desktop_interface():
                 st.metric("🏗️ Tamaño del Sistema", f"{size_calc:.1f} kWp")
                 st.metric("🔌 Potencia del Panel", f"{module} Wp")
 
+            if incluir_baterias:
+                st.caption("VPN, TIR y payback estimados no disponibles con baterías; genera la propuesta para verlos.")
+            else:
+                col_vpn, col_tir, col_payback = st.columns(3)
+                col_vpn.metric("📈 VPN estimado", f"${estimacion['valor_presente']:,.0f} COP")
+                tir_estimada = estimacion['tasa_interna']
+                col_tir.metric("📊 TIR estimada", f"{tir_estimada:.1%}" if not np.isnan(tir_estimada) else "N/A")
+                payback_estimado = estimacion['payback']
+                col_payback.metric("⏱️ Payback estimado", f"{payback_estimado:.1f} años" if payback_estimado is not None else "N/A")
+                st.caption("Estimación con HSP promedio y precio calculado; la propuesta usa el perfil mensual completo.")
+
             # Información adicional
             with st.expander("📋 Información Técnica para Financieros"):
                 st.markdown(f"""
                 **📊 Parámetros Técnicos:**
                 - **Sistema**: {size_calc:.1f} kWp con {int(quantity_calc)} paneles
                 - **HSP Promedio**: {hsp_promedio:.2f} kWh/m²/día
-                - **Eficiencia del Sistema**: {n_aprox:.1%}
+                - **Eficiencia del Sistema**: {estimacion['performance_ratio']:.1%}
+                - **Cobertura del Consumo**: {estimacion['cobertura']:.0%}
                 - **Tipo de Cubierta**: {cubierta}
                 - **Ubicación**: {ciudad_input}
 
@@ -862,6 +1137,51 @@ def render_desktop_interface():
             except Exception as ev_ex:
                 st.error(f"❌ Error generando la cotización de cargadores: {ev_ex}")
 
+        with st.expander("🅿️ Sitio con varios puntos de carga (flotas, condominios)"):
+            st.caption("Coordenadas en metros sobre el plano del parqueadero. La canalización se comparte entre puntos cercanos.")
+            col_sub1, col_sub2 = st.columns(2)
+            with col_sub1:
+                sub_x = st.number_input("Subestación X (m)", value=0.0, step=1.0, key="ev_sitio_sub_x")
+            with col_sub2:
+                sub_y = st.number_input("Subestación Y (m)", value=0.0, step=1.0, key="ev_sitio_sub_y")
+            puntos_sitio = st.data_editor(
+                pd.DataFrame({"Punto": ["P1", "P2", "P3"], "X (m)": [10.0, 15.0, 20.0], "Y (m)": [5.0, 5.0, 5.0]}),
+                num_rows="dynamic", use_container_width=True, key="ev_sitio_puntos",
+            ).dropna()
+
+            if st.button("Planificar Sitio", use_container_width=True, key="ev_sitio_planificar") and not puntos_sitio.empty:
+                try:
+                    plan = planificar_sitio(puntos_sitio[["X (m)", "Y (m)"]].to_numpy(), (sub_x, sub_y))
+                    nombres_puntos = puntos_sitio["Punto"].astype(str).tolist()
+                    col_s1, col_s2, col_s3 = st.columns(3)
+                    col_s1.metric("Costo Total del Sitio", formatear_moneda(plan["totales"]["costo_total"]))
+                    col_s2.metric("Canalización compartida", f"{plan['canalizacion_m']:,.1f} m")
+                    col_s3.metric("Canalización individual", f"{plan['canalizacion_individual_m']:,.1f} m")
+                    st.dataframe(pd.DataFrame({
+                        "Punto": nombres_puntos,
+                        "Recorrido cable (m)": plan["recorridos_m"].round(1),
+                        "Canalización asignada (m)": plan["canalizacion_asignada_m"].round(1),
+                        "Costo Total": [formatear_moneda(v) for v in plan["costos"]["costo_total"]],
+                    }), use_container_width=True)
+                    st.dataframe(pd.DataFrame(plan["materiales"], columns=["Item", "Cantidad", "Unidad"]), use_container_width=True)
+
+                    # Una cotización por punto, con su parte del costo del sitio
+                    nombre_sitio = ev_nombre or "Cliente"
+                    cotizaciones = generar_pdfs_cargadores(
+                        sitios_para_cotizacion(plan, [f"{nombre_sitio} - {p}" for p in nombres_puntos]))
+                    if cotizaciones is None:
+                        st.warning("⚠️ No se pudieron generar los PDF del sitio (plantilla de cargadores no disponible).")
+                    else:
+                        zip_buffer = io.BytesIO()
+                        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_sitio:
+                            for punto, (pdf_punto, _) in zip(nombres_puntos, cotizaciones):
+                                zip_sitio.writestr(f"Propuesta Mirac {nombre_sitio} - {punto}.pdf", pdf_punto)
+                        st.download_button("📥 Descargar PDFs del Sitio (.zip)", data=zip_buffer.getvalue(),
+                                           file_name=f"Propuestas Mirac {nombre_sitio}.zip", mime="application/zip",
+                                           use_container_width=True, key="ev_sitio_zip")
+                except Exception as sitio_ex:
+                    st.error(f"❌ Error planificando el sitio: {sitio_ex}")
+
 
     # ==============================================================================
     # LÓGICA DE CÁLCULO Y VISUALIZACIÓN
@@ -875,27 +1195,49 @@ def render_desktop_interface():
             for error in errores_validacion:
                 st.error(f"• {error}")
         else:
-            with st.status("Generando propuesta...", expanded=True) as status:
+            perfilar = perfilado_habilitado(st.session_state.get("perfilar_reporte"))
+            with st.status("Generando propuesta...", expanded=True) as status, iniciar_reporte("desktop") as reporte, \
+                    perfilar_reporte("desktop", perfilar) as perfil:
                 status.update(label="📊 Calculando dimensionamiento y análisis financiero...", state="running")
-                nombre_proyecto = f"FV{str(datetime.datetime.now().year)[-2:]}{numero_proyecto_del_año:03d} - {nombre_cliente}" + (f" - {ubicacion}" if ubicacion else "")
+                reporte.iniciar_etapa("calculo")
+                if escanear_drive is not None:
+                    # Vuelve a intentar si la reconciliación anterior falló
+                    asignador.reconciliar_en_segundo_plano(año_corto, escanear_drive)
+                asignador.esperar_reconciliacion(año_corto, timeout=30)
+                try:
+                    numero_proyecto_del_año = asignador.reservar(
+                        año_corto, clave=st.session_state.id_borrador,
+                        exigir_reconciliacion=escanear_drive is not None,
+                    )
+                except RuntimeError as e:
+                    status.update(label="❌ No se pudo asignar el número de proyecto", state="error")
+                    st.error(f"❌ {str(e).rstrip('.')}. No se asignó un número para no duplicar uno existente; "
+                             "intenta de nuevo en unos segundos.")
+                    st.stop()
+                nombre_proyecto = f"FV{año_corto}{numero_proyecto_del_año:03d} - {nombre_cliente}" + (f" - {ubicacion}" if ubicacion else "")
                 
+                # Se guardan para el análisis what-if (ModeloCotizacion recibe los mismos argumentos)
+                argumentos_cotizacion = dict(
+                    Load=Load, size=size, quantity=quantity, cubierta=cubierta, clima=clima,
+                    index=index_input / 100, dRate=dRate_input / 100, costkWh=costkWh, module=module,
+                    ciudad=ciudad_para_calculo, hsp_lista=hsp_a_usar,
+                    perc_financiamiento=perc_financiamiento, tasa_interes_credito=tasa_interes_input / 100,
+                    plazo_credito_años=plazo_credito_años,
+                    incluir_baterias=incluir_baterias, costo_kwh_bateria=costo_kwh_bateria,
+                    profundidad_descarga=profundidad_descarga / 100,
+                    eficiencia_bateria=eficiencia_bateria / 100, dias_autonomia=dias_autonomia,
+                    horizonte_tiempo=horizonte_tiempo, incluir_carbon=incluir_carbon,
+                    incluir_beneficios_tributarios=incluir_beneficios_tributarios,
+                    incluir_deduccion_renta=incluir_deduccion_renta,
+                    incluir_depreciacion_acelerada=incluir_depreciacion_acelerada,
+                    demora_6_meses=demora_6_meses,
+                    custom_params=custom_params,
+                )
                 valor_proyecto_total, size_calc, monto_a_financiar, cuota_mensual_credito, \
                 desembolso_inicial_cliente, fcl, trees, monthly_generation, valor_presente, \
                 tasa_interna, cantidad_calc, life, recomendacion_inversor, lcoe, n_final, hsp_mensual_final, \
                 potencia_ac_inversor, ahorro_año1, area_requerida, capacidad_nominal_bateria, carbon_data = \
-                    cotizacion(Load, size, quantity, cubierta, clima, index_input / 100, dRate_input / 100, costkWh, module,
-                                 ciudad=ciudad_para_calculo, hsp_lista=hsp_a_usar,
-                                 perc_financiamiento=perc_financiamiento, tasa_interes_credito=tasa_interes_input / 100,
-                                 plazo_credito_años=plazo_credito_años,
-                                 incluir_baterias=incluir_baterias, costo_kwh_bateria=costo_kwh_bateria,
-                                 profundidad_descarga=profundidad_descarga / 100,
-                                 eficiencia_bateria=eficiencia_bateria / 100, dias_autonomia=dias_autonomia,
-                                 horizonte_tiempo=horizonte_tiempo, incluir_carbon=incluir_carbon,
-                                 incluir_beneficios_tributarios=incluir_beneficios_tributarios,
-                                 incluir_deduccion_renta=incluir_deduccion_renta,
-                                 incluir_depreciacion_acelerada=incluir_depreciacion_acelerada,
-                                 demora_6_meses=demora_6_meses,
-                                 custom_params=custom_params)
+                    cotizacion_en_cache(**argumentos_cotizacion)
                 
                 # Aplicar precio manual si está activado
                 val_total = valor_proyecto_total
@@ -968,9 +1310,10 @@ def render_desktop_interface():
                         payback_exacto = float(payback_simple)
 
                 # Análisis de Sensibilidad
+                reporte.iniciar_etapa("sensibilidad")
                 analisis_sensibilidad = None
                 if incluir_analisis_sensibilidad:
-                    analisis_sensibilidad = calcular_analisis_sensibilidad(
+                    analisis_sensibilidad = analisis_sensibilidad_en_cache(
                         Load, size, quantity, cubierta, clima, index_input / 100, dRate_input / 100,
                         costkWh, module, ciudad=ciudad_para_calculo, hsp_lista=hsp_a_usar,
                         incluir_baterias=incluir_baterias, costo_kwh_bateria=costo_kwh_bateria,
@@ -990,55 +1333,51 @@ def render_desktop_interface():
                     comparacion_tamanos = {}
                     escalas = [('Económico (80%)', 0.8), ('Recomendado (100%)', 1.0), ('Premium (120%)', 1.2)]
                     
+                    calculadas = []
                     for nombre_escala, factor in escalas:
                         size_escala = round(size * factor, 2)
                         quantity_escala = redondear_a_par(size_escala * 1000 / module)
                         size_escala = round(quantity_escala * module / 1000, 2)
                         
                         try:
-                            val_proy, size_c, _, _, desemb, fcl_c, _, monthly_gen, vpn_c, tir_c, \
-                            qty_c, _, inv_rec, _, _, _, pot_ac, ahorro_c, area_c, _, _ = \
-                                cotizacion(Load, size_escala, quantity_escala, cubierta, clima, 
+                            calculadas.append((nombre_escala, size_escala, quantity_escala,
+                                cotizacion_en_cache(Load, size_escala, quantity_escala, cubierta, clima, 
                                           index_input / 100, dRate_input / 100, costkWh, module,
                                           ciudad=ciudad_para_calculo, hsp_lista=hsp_a_usar,
                                           perc_financiamiento=0, horizonte_tiempo=horizonte_tiempo,
-                                          incluir_carbon=False, custom_params=custom_params)
-                            
-                            # Calculate payback
-                            cumsum_fcl = np.cumsum(fcl_c)
-                            pb = next((i for i, x in enumerate(cumsum_fcl) if x >= 0), None)
-                            
-                            gen_anual = sum(monthly_gen) if monthly_gen else 0
-                            cobertura = (gen_anual / (Load * 12) * 100) if Load > 0 else 0
-                            
-                            comparacion_tamanos[nombre_escala] = {
-                                'size_kwp': size_escala,
-                                'paneles': quantity_escala,
-                                'valor': val_proy,
-                                'tir': tir_c,
-                                'payback': pb,
-                                'ahorro_ano1': ahorro_c,
-                                'generacion_anual': gen_anual,
-                                'cobertura': min(cobertura, 100),
-                                'inversor': inv_rec
-                            }
+                                          incluir_carbon=False, custom_params=custom_params)))
                         except Exception as e:
                             comparacion_tamanos[nombre_escala] = {'error': str(e)}
 
+                    # Payback, generación y cobertura de todas las escalas a la vez
+                    lote = LoteCotizaciones([resultado for *_, resultado in calculadas])
+                    paybacks = lote.payback()
+                    gen_anual = lote.generacion_mensual.sum(axis=1)
+                    for i, (nombre_escala, size_escala, quantity_escala, resultado) in enumerate(calculadas):
+                        generacion_anual = float(gen_anual[i])
+                        cobertura = (generacion_anual / (Load * 12) * 100) if Load > 0 else 0
+                        comparacion_tamanos[nombre_escala] = {
+                            'size_kwp': size_escala,
+                            'paneles': quantity_escala,
+                            'valor': resultado.valor_proyecto_total,
+                            'tir': resultado.tasa_interna,
+                            'payback': None if np.isnan(paybacks[i]) else int(paybacks[i]),
+                            'ahorro_ano1': resultado.ahorro_año1,
+                            'generacion_anual': generacion_anual,
+                            'cobertura': min(cobertura, 100),
+                            'inversor': resultado.recomendacion_inversor
+                        }
+                    comparacion_tamanos = {nombre: comparacion_tamanos[nombre] for nombre, _ in escalas}
+
                 # Lista de Materiales
                 lista_materiales = calcular_lista_materiales(cantidad_calc, cubierta, module, recomendacion_inversor)
 
-                status.update(label="📈 Generando gráficas...", state="running")
-                # --- GENERAR GRÁFICA PARA PDF ---
-                generar_grafica_generacion(monthly_generation, Load, incluir_baterias)
-
                 # Generación de Documentos
                 lat, lon = None, None
+                api_key = None
                 if st.session_state.map_state.get("marker"):
                     lat, lon = st.session_state.map_state["marker"]
-                    api_key = os.environ.get("Maps_API_KEY") 
-                    if api_key and gmaps:
-                        get_static_map_image(lat, lon, api_key)
+                    api_key = os.environ.get("Maps_API_KEY")
 
                 presupuesto_equipos = valor_proyecto_total * (PROMEDIOS_COSTO['Equipos'] / 100)
                 presupuesto_materiales = valor_proyecto_total * (PROMEDIOS_COSTO['Materiales'] / 100)
@@ -1124,7 +1463,11 @@ def render_desktop_interface():
                 datos_para_contrato = datos_para_pdf.copy()
                 datos_para_contrato['Fecha de la Propuesta'] = fecha_propuesta
 
-                status.update(label="📄 Generando PDF de propuesta...", state="running")
+                reporte.cerrar_etapa()
+                nombre_pdf_final = f"{nombre_proyecto}.pdf"
+                nombre_contrato_final = f"Contrato - {nombre_proyecto}.docx"
+                nombre_csv = f"Flujo_Caja_Detallado_{nombre_proyecto}.csv"
+                nombre_parquet = f"Flujo_Caja_Detallado_{nombre_proyecto}.parquet"
                 pdf = PropuestaPDF(
                     client_name=nombre_cliente, 
                     project_name=nombre_proyecto,
@@ -1133,26 +1476,18 @@ def render_desktop_interface():
                     fecha=fecha_propuesta 
                 )
 
-                pdf_bytes = pdf.generar(datos_para_pdf, usa_financiamiento, lat, lon, incluir_smartmeter=incluir_smartmeter)
-                nombre_pdf_final = f"{nombre_proyecto}.pdf"
-                
-                status.update(label="📝 Generando contrato...", state="running")
-                nombre_contrato_final = f"Contrato - {nombre_proyecto}.docx"
-                contrato_bytes = generar_contrato_docx(datos_para_contrato)
-
-                link_carpeta = None
-                if drive_service:
-                    status.update(label="☁️ Subiendo archivos a Google Drive...", state="running")
-                    link_carpeta = gestionar_creacion_drive(
-                        drive_service, parent_folder_id, nombre_proyecto, pdf_bytes, nombre_pdf_final,contrato_bytes, nombre_contrato_final
-                    )
-
-                # CSV
-                status.update(label="📊 Generando archivo de flujo de caja...", state="running")
-                csv_content = None
-                nombre_csv = f"Flujo_Caja_Detallado_{nombre_proyecto}.csv"
-                try:
-                    csv_content = generar_csv_flujo_caja_detallado(
+                # Documentos y servicios externos: las tareas independientes corren en paralelo
+                # (en el hilo actual si se perfila, porque cProfile no ve los otros hilos)
+                grafo = GrafoTareas(en_linea=perfil.activo)
+                grafo.agregar("graficas", lambda: generar_grafica_generacion(monthly_generation, Load, incluir_baterias),
+                              etiqueta="📈 Gráficas")
+                grafo.agregar("mapa", lambda: get_static_map_image(lat, lon, api_key) if lat is not None and api_key and gmaps else None,
+                              etiqueta="🗺️ Mapa de ubicación")
+                grafo.agregar("pdf", lambda graficas, mapa: pdf.generar(datos_para_pdf, usa_financiamiento, lat, lon, incluir_smartmeter=incluir_smartmeter,
+                                                                        imagen_mapa=mapa),
+                              depende_de=("graficas", "mapa"), etiqueta="📄 PDF de propuesta")
+                grafo.agregar("contrato", lambda: generar_contrato_docx(datos_para_contrato), etiqueta="📝 Contrato")
+                grafo.agregar("flujo_detallado", lambda: calcular_flujo_caja_detallado(
                         Load, size, quantity, cubierta, clima, index_input / 100, dRate_input / 100, costkWh, module,
                         ciudad=ciudad_para_calculo, hsp_lista=hsp_a_usar,
                         perc_financiamiento=perc_financiamiento, tasa_interes_credito=tasa_interes_input / 100,
@@ -1164,25 +1499,38 @@ def render_desktop_interface():
                         incluir_beneficios_tributarios=incluir_beneficios_tributarios,
                         incluir_deduccion_renta=incluir_deduccion_renta,
                         incluir_depreciacion_acelerada=incluir_depreciacion_acelerada
-                    )
-                    
-                    if drive_service:
-                        # Lógica simplificada para guardar en Drive si es necesario
-                        pass 
+                    ), etiqueta="📊 Flujo de caja detallado")
 
-                except Exception as csv_error:
-                    st.warning(f"No se pudo generar el CSV: {csv_error}")
+                with reporte.etapa("documentos"):
+                    grafo.ejecutar(al_progresar=lambda evento: mostrar_progreso_tarea(status, reporte, evento))
 
-                # Notion
-                status.update(label="📋 Registrando en Notion CRM...", state="running")
-                agregado_notion, msg_notion = agregar_cliente_a_notion_crm(
-                    nombre=nombre_cliente,
-                    documento=documento_cliente,
-                    direccion=direccion_proyecto,
-                    proyecto=nombre_proyecto,
-                    fecha=fecha_propuesta,
-                    estado="En conversaciones"
-                )
+                # El PDF y el contrato son obligatorios; el resto degrada con aviso
+                for obligatoria in ("pdf", "contrato"):
+                    if grafo.errores.get(obligatoria):
+                        raise grafo.errores[obligatoria]
+                pdf_bytes = grafo.resultados["pdf"]
+                contrato_bytes = grafo.resultados["contrato"]
+
+                csv_content = parquet_content = None
+                if grafo.errores.get("flujo_detallado"):
+                    st.warning(f"No se pudo generar el CSV: {grafo.errores['flujo_detallado']}")
+                else:
+                    flujo_detallado = grafo.resultados["flujo_detallado"]
+                    csv_content = exportar_flujo_caja(flujo_detallado, "csv").decode("utf-8")
+                    try:
+                        parquet_content = exportar_flujo_caja(flujo_detallado, "parquet")
+                    except Exception as e:
+                        st.warning(f"No se pudo generar el Parquet del flujo de caja: {e}")
+
+                # Drive y Notion se procesan en segundo plano; la propuesta ya está lista
+                status.update(label="📬 Encolando Google Drive y Notion...", state="running")
+                with reporte.etapa("encolar"):
+                    trabajo_drive = None
+                    if drive_service and parent_folder_id:
+                        trabajo_drive = encolar_drive(parent_folder_id, nombre_proyecto, pdf_bytes, nombre_pdf_final,
+                                                      contrato_bytes, nombre_contrato_final, csv_content, nombre_csv)
+                    trabajo_notion = encolar_notion(nombre_cliente, documento_cliente, direccion_proyecto,
+                                                    nombre_proyecto, fecha_propuesta, estado="En conversaciones")
 
                 # Guardar TODO en session_state
                 st.session_state.desktop_results = {
@@ -1201,11 +1549,12 @@ def render_desktop_interface():
                     'nombre_pdf_final': nombre_pdf_final,
                     'contrato_bytes': contrato_bytes,
                     'nombre_contrato_final': nombre_contrato_final,
-                    'link_carpeta': link_carpeta,
+                    'trabajo_drive': trabajo_drive,
                     'csv_content': csv_content,
                     'nombre_csv': nombre_csv,
-                    'agregado_notion': agregado_notion,
-                    'msg_notion': msg_notion,
+                    'parquet_content': parquet_content,
+                    'nombre_parquet': nombre_parquet,
+                    'trabajo_notion': trabajo_notion,
                     'fcl': fcl,
                     'life': life,
                     'monthly_generation': monthly_generation,
@@ -1229,6 +1578,7 @@ def render_desktop_interface():
                     'cubierta': cubierta,
                     'lat': lat,
                     'lon': lon,
+                    'imagen_mapa': grafo.resultados.get("mapa"),
                     'marca_inversor': marca_inversor,
                     'modelo_inversor': modelo_inversor,
                     'incluir_smartmeter': incluir_smartmeter,
@@ -1241,6 +1591,8 @@ def render_desktop_interface():
                     'costkWh': costkWh,
                     'index_input': index_input,
                     'dRate_input': dRate_input,
+                    'argumentos_cotizacion': argumentos_cotizacion,
+                    'modelo_what_if': None,
                 }
                 
                 # === GUARDAR EN HISTORIAL ===
@@ -1291,9 +1643,12 @@ def render_desktop_interface():
             if st.button("➕ Nueva Cotización", use_container_width=True, type="primary"):
                 # Limpiar resultados para empezar de nuevo
                 st.session_state.desktop_results = None
+                st.session_state.id_borrador = uuid.uuid4().hex
                 st.rerun()
         with col_action2:
             if st.button("🔄 Duplicar y Ajustar", use_container_width=True):
+                # La copia es otra propuesta: recibe su propio número
+                st.session_state.id_borrador = uuid.uuid4().hex
                 # Guardar datos para duplicar en el próximo ciclo
                 st.session_state.duplicar_datos = {
                     'nombre_cliente': res.get('nombre_cliente', '') + " (copia)",
@@ -1368,6 +1723,8 @@ def render_desktop_interface():
                 })
             st.dataframe(pd.DataFrame(datos_tabla), use_container_width=True)
 
+            render_analisis_tornado(res)
+
         # Comparación de Tamaños de Sistema
         if res.get('comparacion_tamanos'):
             st.header("🔄 Comparación de Tamaños de Sistema")
@@ -1418,6 +1775,11 @@ def render_desktop_interface():
                             st.metric("TIR", f"{datos['tir']:.1%}" if datos['tir'] else "N/A")
                             st.metric("Cobertura", f"{datos['cobertura']:.0f}%")
 
+        render_analisis_what_if(res)
+        render_metas_venta(res)
+        render_comparacion_creditos(res)
+        render_flujo_mensual(res)
+
         # Presupuesto Guía
         with st.expander("📊 Ver Análisis Financiero Interno (Presupuesto Guía)"):
             st.subheader("Desglose Basado en Promedios Históricos")
@@ -1447,8 +1809,8 @@ def render_desktop_interface():
         st.header("Análisis Gráfico")
         if res['lat'] and res['lon']:
              # Mostrar mapa estático si existe (se generó en el cálculo)
-             if os.path.exists("static_map.png"):
-                 st.image("static_map.png", caption="Ubicación del Proyecto")
+             if res.get('imagen_mapa'):
+                 st.image(res['imagen_mapa'], caption="Ubicación del Proyecto")
 
         if os.path.exists("grafica_generacion.png"):
             st.image("grafica_generacion.png", caption="Generación Mensual Estimada", use_container_width=True)
@@ -1488,8 +1850,11 @@ def render_desktop_interface():
         
         # Descargas y Links
         st.subheader("📁 Descargas y Enlaces")
-        if res['link_carpeta']:
-            st.info(f"➡️ [Abrir carpeta del proyecto en Google Drive]({res['link_carpeta']})")
+        trabajo_drive = obtener_cola().obtener(res['trabajo_drive']) if res.get('trabajo_drive') else None
+        if trabajo_drive and trabajo_drive['estado'] == ESTADO_COMPLETADO:
+            st.info(f"➡️ [Abrir carpeta del proyecto en Google Drive]({trabajo_drive['resultado']['link_carpeta']})")
+        elif trabajo_drive:
+            st.caption(f"☁️ Google Drive: {describir_trabajo(trabajo_drive)}")
         
         st.download_button("📥 Descargar Reporte en PDF (Copia Local)", data=res['pdf_bytes'], file_name=res['nombre_pdf_final'], mime="application/pdf", use_container_width=True)
         
@@ -1498,6 +1863,8 @@ def render_desktop_interface():
 
         if res['csv_content']:
             st.download_button("📊 Descargar Flujo de Caja en CSV (Detallado)", data=res['csv_content'], file_name=res['nombre_csv'], mime="text/csv", use_container_width=True)
+        if res.get('parquet_content'):
+            st.download_button("🗃️ Descargar Flujo de Caja en Parquet (para análisis)", data=res['parquet_content'], file_name=res['nombre_parquet'], mime="application/vnd.apache.parquet", use_container_width=True)
 
         # Excel Export
         try:
@@ -1543,7 +1910,10 @@ def render_desktop_interface():
         except Exception as excel_error:
             st.warning(f"No se pudo generar el Excel: {excel_error}")
 
-        if res['agregado_notion']:
+        trabajo_notion = obtener_cola().obtener(res['trabajo_notion']) if res.get('trabajo_notion') else None
+        if trabajo_notion and trabajo_notion['estado'] == ESTADO_COMPLETADO and trabajo_notion['resultado']['ok']:
             st.info("🗂️ Cliente agregado a Notion: En conversaciones")
-        else:
-            st.caption(f"Notion: {res['msg_notion']}")
+        elif trabajo_notion and trabajo_notion['estado'] == ESTADO_COMPLETADO:
+            st.caption(f"Notion: {trabajo_notion['resultado']['mensaje']}")
+        elif trabajo_notion:
+            st.caption(f"Notion: {describir_trabajo(trabajo_notion)}")
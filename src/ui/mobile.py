@@ -12,20 +12,25 @@ import pandas as pd
 import matplotlib.pyplot as plt
 
 from src.config import HSP_MENSUAL_POR_CIUDAD, PROMEDIOS_COSTO, ESTRUCTURA_CARPETAS, HSP_POR_CIUDAD
-from src.config_parametros import DEFAULT_PARAMS, PARAM_DESCRIPTIONS, get_param
+from src.config_parametros import DEFAULT_PARAMS, PARAM_DESCRIPTIONS, compilar_parametros, get_param
 from src.services.pvgis_service import get_pvgis_hsp_alternative, get_data_source_label, DATA_SOURCE_PVGIS
 from src.services.calculator_service import (
     calcular_costo_por_kwp,
-    cotizacion, 
     redondear_a_par,
     calcular_lista_materiales
 )
-from src.services.drive_service import gestionar_creacion_drive, obtener_siguiente_consecutivo
-from src.services.notion_service import agregar_cliente_a_notion_crm
+from src.services.cache_resultados import cotizacion_en_cache
+from src.services.superficie_respuesta import estimar_resumen
+from src.services.cola_trabajos import obtener_cola, encolar_drive, encolar_notion, ESTADO_COMPLETADO
+from src.services.location_service import geocodificar_google, get_static_map_image
 from src.utils.pdf_generator import PropuestaPDF
 from src.utils.contract_generator import generar_contrato_docx
 from src.utils.chargers import generar_pdf_cargadores, cotizacion_cargadores_costos, calcular_materiales_cargador
 from src.utils.helpers import validar_datos_entrada, formatear_moneda
+from src.utils.telemetria import iniciar_reporte
+from src.utils.perfilado import perfilar_reporte, perfilado_habilitado
+from src.utils.grafo_tareas import GrafoTareas
+from src.utils.ui_helpers import mostrar_progreso_tarea, describir_trabajo
 
 try:
     from carbon_calculator import CarbonEmissionsCalculator
@@ -191,10 +196,9 @@ def render_tab_ubicacion_mobile():
         else:
             try:
                 with st.spinner("Buscando dirección..."):
-                    res = gmaps.geocode(address, region='CO')
+                    res = geocodificar_google(gmaps, address)
                 if res:
-                    loc = res[0]['geometry']['location']
-                    coords = [loc['lat'], loc['lng']]
+                    coords = list(res)
                     st.session_state.map_state = st.session_state.get('map_state', {"center":[4.5709,-74.2973],"zoom":6,"marker":None})
                     st.session_state.map_state["marker"] = coords
                     st.session_state.map_state["center"] = coords
@@ -541,9 +545,22 @@ def render_tab_resultados_mobile():
         hsp_data = st.session_state.get('pvgis_data') or HSP_MENSUAL_POR_CIUDAD.get(st.session_state.get('ciudad_mobile', 'MEDELLIN'), HSP_MENSUAL_POR_CIUDAD["MEDELLIN"])
         hsp_promedio = sum(hsp_data) / len(hsp_data) if hsp_data else 4.5
 
-        # Generación anual inicial
-        potencia_efectiva = min(size_calc, size_calc / 1.2)  # Aproximación
-        generacion_anual_inicial = potencia_efectiva * hsp_promedio * 365 * 0.8  # 80% eficiencia
+        # Estimación instantánea con el motor de cotización (superficie de respuesta precalculada)
+        try:
+            estimacion = estimar_resumen(
+                size_calc, consumo, float(fin.get('costo_kwh', 850)), hsp_promedio,
+                float(fin.get('indexacion', 5)) / 100, float(fin.get('tasa_descuento', 10)) / 100,
+                cubierta=cubierta, clima=sistema.get('clima', 'SOL'),
+                perc_financiamiento=float(fin.get('porcentaje') or 0),
+                tasa_interes_credito=float(fin.get('tasa_interes') or 0) / 100,
+                plazo_credito_años=int(fin.get('plazo') or 0),
+                horizonte_tiempo=int(fin.get('horizonte_tiempo', 25)),
+                custom_params=fin.get('custom_params', None),
+            )
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            return
+        generacion_anual_inicial = estimacion['generacion_anual']
 
         # O&M anual (2% del CAPEX)
         om_anual = valor_proyecto_total * 0.02  # 2% del valor total del proyecto
@@ -556,10 +573,17 @@ def render_tab_resultados_mobile():
         st.metric("🔧 O&M Anual", f"${om_anual:,.0f} COP")
         st.metric("⚡ Generación Anual Inicial", f"{generacion_anual_inicial:,.0f} kWh")
         st.metric("📉 Degradación Anual", f"{tasa_degradacion_anual:.1f}%")
+        if not fin.get('incluir_baterias', False):
+            st.metric("📈 VPN estimado", f"${estimacion['valor_presente']:,.0f} COP")
+            tir_estimada = estimacion['tasa_interna']
+            st.metric("📊 TIR estimada", f"{tir_estimada:.1%}" if not math.isnan(tir_estimada) else "N/A")
+            payback_estimado = estimacion['payback']
+            st.metric("⏱️ Payback estimado", f"{payback_estimado:.1f} años" if payback_estimado is not None else "N/A")
 
         with st.expander("📋 Detalles Técnicos"):
             st.write(f"**Sistema**: {size_calc:.1f} kWp con {cantidad} paneles")
             st.write(f"**HSP Promedio**: {hsp_promedio:.2f} kWh/m²/día")
+            st.write(f"**Cobertura del Consumo**: {estimacion['cobertura']:.0%}")
             st.write(f"**Tipo de Cubierta**: {cubierta}")
 
     if incluir_carbon:
@@ -611,7 +635,10 @@ def render_tab_archivos_mobile():
     if st.button("📄 Generar Documentos y Guardar", use_container_width=True, key="generar_mobile"):
         # Obtener datos
         try:
-            with st.spinner("Generando documentos y procesando..."):
+            perfilar = perfilado_habilitado(st.session_state.get("perfilar_reporte"))
+            with st.status("Generando documentos y procesando...", expanded=True) as status, iniciar_reporte("mobile") as reporte, \
+                    perfilar_reporte("mobile", perfilar) as perfil:
+                reporte.iniciar_etapa("calculo")
                 # Preparar datos para cotización
                 hsp_data = st.session_state.get('pvgis_data') or HSP_MENSUAL_POR_CIUDAD.get(ciudad_input, HSP_MENSUAL_POR_CIUDAD["MEDELLIN"])
                 
@@ -621,9 +648,9 @@ def render_tab_archivos_mobile():
                 incluir_deduccion_renta = incluir_beneficios_tributarios and tipo_beneficio == 'deduccion_renta'
                 incluir_depreciacion_acelerada = incluir_beneficios_tributarios and tipo_beneficio == 'depreciacion_acelerada'
                 demora_6_meses = fin.get('demora_6_meses', False)
-                custom_params = fin.get('custom_params', None)
+                custom_params = compilar_parametros(fin.get('custom_params', None))
 
-                valor_total, size, monto_fin, cuota_mensual, desembolso_ini, flujo_caja, arboles, gen_mensual, vpn, tir, cantidad, vida_util, rec_inv, lcoe, pr, hsp_mensual, pot_ac, ahorro_a1, area_req, cap_bat, carbon_data = cotizacion(
+                valor_total, size, monto_fin, cuota_mensual, desembolso_ini, flujo_caja, arboles, gen_mensual, vpn, tir, cantidad, vida_util, rec_inv, lcoe, pr, hsp_mensual, pot_ac, ahorro_a1, area_req, cap_bat, carbon_data = cotizacion_en_cache(
                     Load=float(sistema.get('consumo')),
                     size=float(sistema.get('size')),
                     quantity=int(sistema.get('quantity')),
@@ -656,6 +683,7 @@ def render_tab_archivos_mobile():
                 
                 # 2. Generar PDF
                 lat, lon = st.session_state.map_state["marker"] if st.session_state.get("map_state") else (0,0)
+                api_key = os.environ.get("Maps_API_KEY") if st.session_state.get("map_state") else None
                 pot_panel = float(sistema.get('potencia_panel'))
                 
                 # Calcular desglose de precios
@@ -705,51 +733,43 @@ def render_tab_archivos_mobile():
                 usa_financiamiento = fin.get('usa_financiamiento', False)
                 
                 pdf = PropuestaPDF(client_name=cliente.get('nombre','Cliente'), project_name=datos_pdf["Nombre del Proyecto"], documento=cliente.get('documento',''), direccion=cliente.get('direccion',''), fecha=cliente.get('fecha', datetime.date.today()))
-                pdf_bytes = pdf.generar(datos_pdf, usa_financiamiento, lat, lon)
                 nombre_proyecto = datos_pdf["Nombre del Proyecto"]
                 nombre_pdf_final = f"{nombre_proyecto}.pdf"
                 datos_contrato = datos_pdf.copy(); datos_contrato['Fecha de la Propuesta'] = cliente.get('fecha', datetime.date.today())
-                contrato_bytes = generar_contrato_docx(datos_contrato)
-                
-                # Subida a Drive (si hay credenciales)
-                link_carpeta = None
-                try:
+                reporte.cerrar_etapa()
+
+                # Documentos: el mapa, el PDF y el contrato se generan en paralelo
+                grafo = GrafoTareas(en_linea=perfil.activo)
+                grafo.agregar("mapa", lambda: get_static_map_image(lat, lon, api_key) if api_key else None,
+                              etiqueta="🗺️ Mapa de ubicación")
+                grafo.agregar("pdf", lambda mapa: pdf.generar(datos_pdf, usa_financiamiento, lat, lon, imagen_mapa=mapa),
+                              depende_de=("mapa",), etiqueta="📄 PDF de propuesta")
+                grafo.agregar("contrato", lambda: generar_contrato_docx(datos_contrato), etiqueta="📝 Contrato")
+
+                with reporte.etapa("documentos"):
+                    grafo.ejecutar(al_progresar=lambda evento: mostrar_progreso_tarea(status, reporte, evento))
+
+                for obligatoria in ("pdf", "contrato"):
+                    if grafo.errores.get(obligatoria):
+                        raise grafo.errores[obligatoria]
+                pdf_bytes = grafo.resultados["pdf"]
+                contrato_bytes = grafo.resultados["contrato"]
+
+                # Drive y Notion se procesan en segundo plano (si hay credenciales)
+                with reporte.etapa("encolar"):
+                    trabajo_drive = None
                     parent_folder_id = os.environ.get("PARENT_FOLDER_ID")
                     if parent_folder_id:
-                        # Ensure drive service is available
-                        if 'drive_service' not in st.session_state:
-                             from google.oauth2.credentials import Credentials
-                             from googleapiclient.discovery import build
-                             creds = Credentials(
-                                None, refresh_token=os.environ.get("GOOGLE_REFRESH_TOKEN"),
-                                token_uri='https://oauth2.googleapis.com/token',
-                                client_id=os.environ.get("GOOGLE_CLIENT_ID"), 
-                                client_secret=os.environ.get("GOOGLE_CLIENT_SECRET"),
-                                scopes=['https://www.googleapis.com/auth/drive']
-                            )
-                             st.session_state.drive_service = build('drive', 'v3', credentials=creds)
-
-                        link_carpeta = gestionar_creacion_drive(
-                            st.session_state.drive_service,
-                            parent_folder_id,
-                            nombre_proyecto,
-                            pdf_bytes,
-                            nombre_pdf_final,
-                            contrato_bytes,
-                            f"Contrato_{nombre_proyecto}.docx"
-                        )
-                except Exception as e:
-                    st.warning(f"No se pudo conectar con Drive: {e}")
-                
-                # Notion CRM
-                crm_ok, crm_msg = agregar_cliente_a_notion_crm(
-                    cliente.get('nombre'),
-                    cliente.get('documento'),
-                    cliente.get('direccion'),
-                    nombre_proyecto,
-                    cliente.get('fecha'),
-                    estado="Propuesta Generada"
-                )
+                        trabajo_drive = encolar_drive(parent_folder_id, nombre_proyecto, pdf_bytes, nombre_pdf_final,
+                                                      contrato_bytes, f"Contrato_{nombre_proyecto}.docx")
+                    trabajo_notion = encolar_notion(
+                        cliente.get('nombre'),
+                        cliente.get('documento'),
+                        cliente.get('direccion'),
+                        nombre_proyecto,
+                        cliente.get('fecha'),
+                        estado="Propuesta Generada"
+                    )
 
                 # Guardar resultados en session state
                 st.session_state.mobile_results = {
@@ -759,12 +779,12 @@ def render_tab_archivos_mobile():
                     'nombre_pdf_final': nombre_pdf_final,
                     'contrato_bytes': contrato_bytes,
                     'nombre_contrato_final': f"Contrato_{nombre_proyecto}.docx",
-                    'link_carpeta': link_carpeta,
-                    'crm_ok': crm_ok,
-                    'crm_msg': crm_msg,
+                    'trabajo_drive': trabajo_drive,
+                    'trabajo_notion': trabajo_notion,
                     'consumo': float(sistema.get('consumo')),
                     'incluir_baterias': fin.get('incluir_baterias', False)
                 }
+                status.update(label="✅ ¡Documentos generados!", state="complete", expanded=False)
                 st.rerun()
                 
         except Exception as e:
@@ -805,13 +825,19 @@ def render_tab_archivos_mobile():
         with col2:
             st.download_button("⬇️ Descargar Contrato Word", res['contrato_bytes'], file_name=res['nombre_contrato_final'], mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document", use_container_width=True)
         
-        if res['link_carpeta']:
-            st.markdown(f"[📂 Abrir Carpeta en Google Drive]({res['link_carpeta']})")
+        trabajo_drive = obtener_cola().obtener(res['trabajo_drive']) if res.get('trabajo_drive') else None
+        if trabajo_drive and trabajo_drive['estado'] == ESTADO_COMPLETADO:
+            st.markdown(f"[📂 Abrir Carpeta en Google Drive]({trabajo_drive['resultado']['link_carpeta']})")
+        elif trabajo_drive:
+            st.caption(f"☁️ Google Drive: {describir_trabajo(trabajo_drive)}")
         
-        if res['crm_ok']:
-            st.info(f"🗂️ {res['crm_msg']}")
-        else:
-            st.warning(f"⚠️ Notion: {res['crm_msg']}")
+        trabajo_notion = obtener_cola().obtener(res['trabajo_notion']) if res.get('trabajo_notion') else None
+        if trabajo_notion and trabajo_notion['estado'] == ESTADO_COMPLETADO and trabajo_notion['resultado']['ok']:
+            st.info(f"🗂️ {trabajo_notion['resultado']['mensaje']}")
+        elif trabajo_notion and trabajo_notion['estado'] == ESTADO_COMPLETADO:
+            st.warning(f"⚠️ Notion: {trabajo_notion['resultado']['mensaje']}")
+        elif trabajo_notion:
+            st.caption(f"🗂️ Notion: {describir_trabajo(trabajo_notion)}")
 
 def render_tab_cargadores_mobile():
     """Tab de cargadores para interfaz móvil"""
@@ -3,6 +3,7 @@ Utilidades para el cálculo y generación de cotizaciones de cargadores eléctri
 """
 import os
 import datetime
+import threading
 from io import BytesIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
@@ -55,79 +56,151 @@ def calcular_materiales_cargador(distancia_metros: float):
     return lista
 
 
-def generar_pdf_cargadores(nombre_cliente_lugar: str, distancia_metros: float, precio_manual: float = None):
-    """Genera el PDF de cotización de cargadores usando la plantilla en assets y retorna (bytes_pdf, desglose_dict)."""
-    
-    plantilla_path = os.path.join("assets", "Plantilla_MIRAC_CARGADORES.pdf")
-    fecha_actual = datetime.datetime.now().strftime("%d-%m-%Y")
+RUTA_PLANTILLA_CARGADORES = os.path.join("assets", "Plantilla_MIRAC_CARGADORES.pdf")
 
-    iva, diseno, materiales, costo_total, costo_base, subtotal_antes_iva = cotizacion_cargadores_costos(distancia_metros, precio_manual)
 
-    # PDFs temporales en memoria
-    temp1 = BytesIO()
-    temp2 = BytesIO()
-
-    # Página 1 temporal (costo total y fecha y nombre)
-    c1 = canvas.Canvas(temp1, pagesize=letter)
-    c1.setFont("Helvetica-Bold", 26)
-    c1.drawString(100, 82, f"{costo_total:,.0f}")
-    c1.setFont("Helvetica-Bold", 13)
-    c1.drawString(462, 757, fecha_actual)
-    c1.setFont("Helvetica-Bold", 14)
-    c1.drawString(195, 624, nombre_cliente_lugar)
-    c1.save()
-    temp1.seek(0)
-
-    # Página 2 temporal (tabla de costos)
-    c2 = canvas.Canvas(temp2, pagesize=letter)
-    c2.setFont("Helvetica-Bold", 14)
+def _desglose_cargador(distancia_metros, precio_manual=None):
+    """Costos de un punto de carga: (valores para el PDF, desglose_dict)."""
+    iva, diseno, materiales, costo_total, costo_base, subtotal_antes_iva = cotizacion_cargadores_costos(distancia_metros, precio_manual)
+    valores = {
+        "iva": iva, "diseno": diseno, "materiales": materiales,
+        "costo_total": costo_total, "subtotal_antes_iva": subtotal_antes_iva,
+    }
+    desglose = {
+        "Costo Base": costo_base,
+        "AIU (20%)": subtotal_antes_iva - costo_base,
+        "Subtotal (Base + AIU)": subtotal_antes_iva,
+        "IVA (19% sobre Subtotal)": iva,
+        "Diseño (35% del Base)": diseno,
+        "Materiales (65% del Base)": materiales,
+        "Costo Total": costo_total,
+    }
+    return valores, desglose
+
+
+def _dibujar_capas(c, nombre_cliente_lugar, fecha_actual, valores):
+    """Dibuja en el canvas las dos páginas de texto dinámico de una cotización."""
+    # Página 1 (costo total y fecha y nombre)
+    c.setFont("Helvetica-Bold", 26)
+    c.drawString(100, 82, f"{valores['costo_total']:,.0f}")
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(462, 757, fecha_actual)
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(195, 624, nombre_cliente_lugar)
+    c.showPage()
+
+    # Página 2 (tabla de costos)
+    c.setFont("Helvetica-Bold", 14)
     offset_y = 56
-    c2.drawString(462, 757, fecha_actual)
-    c2.drawString(465, 576 + offset_y, f"${diseno:,.0f}")
-    c2.drawString(465, 551 + offset_y, f"${materiales:,.0f}")
-    
+    c.drawString(462, 757, fecha_actual)
+    c.drawString(465, 576 + offset_y, f"${valores['diseno']:,.0f}")
+    c.drawString(465, 551 + offset_y, f"${valores['materiales']:,.0f}")
+
     # Subtotal = Base + AIU (para que el IVA cuadre)
     # Esto es lo que realmente se usa para calcular el IVA
-    c2.drawString(465, 500 + offset_y, f"${subtotal_antes_iva:,.0f}")
-    c2.drawString(465, 474 + offset_y, f"${iva:,.0f}")
-    c2.drawString(465, 448 + offset_y, f"${costo_total:,.0f}")
-    c2.save()
-    temp2.seek(0)
-
-    # Combinar con plantilla (3 páginas)
-    output_buffer = BytesIO()
-    
-    try:
-        reader = PdfReader(plantilla_path)
-        writer = PdfWriter()
+    c.drawString(465, 500 + offset_y, f"${valores['subtotal_antes_iva']:,.0f}")
+    c.drawString(465, 474 + offset_y, f"${valores['iva']:,.0f}")
+    c.drawString(465, 448 + offset_y, f"${valores['costo_total']:,.0f}")
+    c.showPage()
 
-        if len(reader.pages) < 3:
-            raise ValueError("La plantilla de cargadores debe tener 3 páginas")
 
-        pagina1 = reader.pages[0]
-        pagina1.merge_page(PdfReader(temp1).pages[0])
-        writer.add_page(pagina1)
+def _clonar_capa(pagina, writer):
+    """
+    Copia la página de la capa dentro del documento de salida, con sus recursos (fuentes).
+    Sin /Parent, para no arrastrar al documento las capas de las demás cotizaciones del lote.
+    """
+    return pagina.clone(writer, ignore_fields=("/Parent",))
 
-        pagina2 = reader.pages[1]
-        pagina2.merge_page(PdfReader(temp2).pages[0])
-        writer.add_page(pagina2)
 
-        writer.add_page(reader.pages[2])
-        writer.write(output_buffer)
-        output_buffer.seek(0)
+class MotorCotizacionCargadores:
+    """
+    Genera cotizaciones de cargadores sobre la plantilla, leída una sola vez.
+
+    La plantilla (3 páginas) se analiza al crear el motor y sus páginas se reutilizan
+    en cada cotización: la tercera pasa sin cambios y a las dos primeras solo se les
+    superpone la capa de texto dinámico (fecha, nombre, valores). En un lote, las
+    capas de todas las cotizaciones se dibujan en un único canvas y se leen una vez.
+    """
+
+    def __init__(self, ruta_plantilla=RUTA_PLANTILLA_CARGADORES):
+        with open(ruta_plantilla, "rb") as f:
+            self._plantilla = PdfReader(BytesIO(f.read()))
+        if len(self._plantilla.pages) < 3:
+            raise ValueError("La plantilla de cargadores debe tener 3 páginas")
+        self._paginas = [self._plantilla.pages[i] for i in range(3)]
+        # PdfReader carga objetos de forma perezosa; no es seguro usarlo desde varios hilos a la vez
+        self._lock = threading.Lock()
+
+    def generar(self, nombre_cliente_lugar, distancia_metros, precio_manual=None, fecha=None):
+        """Retorna (bytes_pdf, desglose_dict) de una cotización."""
+        return self.generar_lote([(nombre_cliente_lugar, distancia_metros, precio_manual)], fecha)[0]
+
+    def generar_lote(self, sitios, fecha=None):
+        """
+        Cotizaciones de varios sitios (p. ej. las sedes de una flota) en una pasada.
+
+        `sitios` es una lista de (nombre_cliente_lugar, distancia_metros, precio_manual).
+        Retorna una lista de (bytes_pdf, desglose_dict) en el mismo orden.
+        """
+        fecha_actual = (fecha or datetime.datetime.now()).strftime("%d-%m-%Y")
+        costos = [_desglose_cargador(distancia, precio) for _, distancia, precio in sitios]
+
+        capas_buffer = BytesIO()
+        c = canvas.Canvas(capas_buffer, pagesize=letter)
+        for (nombre, _, _), (valores, _) in zip(sitios, costos):
+            _dibujar_capas(c, nombre, fecha_actual, valores)
+        c.save()
+        capas = PdfReader(BytesIO(capas_buffer.getvalue())).pages
+
+        resultados = []
+        with self._lock:
+            for i, (_, desglose) in enumerate(costos):
+                writer = PdfWriter()
+                # add_page copia la página de la plantilla en el documento nuevo, así que la fusión
+                # no toca la original
+                writer.add_page(self._paginas[0]).merge_page(_clonar_capa(capas[2 * i], writer))
+                writer.add_page(self._paginas[1]).merge_page(_clonar_capa(capas[2 * i + 1], writer))
+                writer.add_page(self._paginas[2])
+                salida = BytesIO()
+                writer.write(salida)
+                resultados.append((salida.getvalue(), desglose))
+        return resultados
+
+
+_motores = {}
+_lock_motores = threading.Lock()
+
+
+def obtener_motor_cargadores(ruta_plantilla=RUTA_PLANTILLA_CARGADORES):
+    """Motor con la plantilla ya leída, reutilizado mientras el archivo no cambie (mtime y tamaño)."""
+    info = os.stat(ruta_plantilla)
+    firma = (info.st_mtime_ns, info.st_size)
+    with _lock_motores:
+        guardado = _motores.get(ruta_plantilla)
+        if guardado is not None and guardado[0] == firma:
+            return guardado[1]
+    motor = MotorCotizacionCargadores(ruta_plantilla)
+    with _lock_motores:
+        _motores[ruta_plantilla] = (firma, motor)
+    return motor
+
+
+def generar_pdf_cargadores(nombre_cliente_lugar: str, distancia_metros: float, precio_manual: float = None):
+    """Genera el PDF de cotización de cargadores usando la plantilla en assets y retorna (bytes_pdf, desglose_dict)."""
+    try:
+        return obtener_motor_cargadores().generar(nombre_cliente_lugar, distancia_metros, precio_manual)
     except Exception as e:
         print(f"Error generando PDF: {e}")
         return None, None
 
-    desglose = {
-        "Costo Base": costo_base,
-        "AIU (20%)": subtotal_antes_iva - costo_base,
-        "Subtotal (Base + AIU)": subtotal_antes_iva,
-        "IVA (19% sobre Subtotal)": iva,
-        "Diseño (35% del Base)": diseno,
-        "Materiales (65% del Base)": materiales,
-        "Costo Total": costo_total,
-    }
-
-    return output_buffer.getvalue(), desglose
 
+def generar_pdfs_cargadores(sitios):
+    """
+    Genera en una pasada las cotizaciones de varios sitios [(nombre, distancia, precio_manual)].
+    Retorna una lista de (bytes_pdf, desglose_dict), o None si la plantilla no está disponible.
+    """
+    try:
+        return obtener_motor_cargadores().generar_lote(sitios)
+    except Exception as e:
+        print(f"Error generando PDFs: {e}")
+        return None
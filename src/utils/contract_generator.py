@@ -2,19 +2,179 @@
 Utilidad para generar contratos en formato Word.
 """
 import io
+import os
+import re
+import bisect
 import datetime
+import threading
+import zipfile
+from collections import OrderedDict
+from xml.sax.saxutils import escape
 import streamlit as st
-from docx import Document
 from num2words import num2words
 
+RUTA_PLANTILLA_CONTRATO = 'assets/contrato_plantilla.docx'
+
+# Contratos ya generados, indexados por los valores finales de sus placeholders
+MAX_CONTRATOS_CACHE = 32
+_cache_contratos = OrderedDict()
+# La caché la comparten las sesiones y los hilos de GrafoTareas
+_lock_cache_contratos = threading.Lock()
+
+# Partes del DOCX que pueden contener texto con placeholders
+_PATRON_PARTES_TEXTO = re.compile(r"word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$")
+_PATRON_NODO_TEXTO = re.compile(r"(<w:t(?:\s[^>]*)?>)(.*?)(</w:t>)", re.DOTALL)
+_PATRON_FIN_PARRAFO = re.compile(r"</w:p>")
+_PATRON_PLACEHOLDER = re.compile(r"\{\{([A-Z0-9_]+)\}\}")
+
+
+def _compilar_parte(xml):
+    """
+    Divide el XML de una parte en segmentos: texto literal (str) o huecos
+    (nombre, texto_original) donde va el valor de un placeholder.
+
+    Los placeholders se buscan en el texto concatenado de cada párrafo, así que
+    también se encuentran cuando Word los partió en varios runs: el valor se
+    escribe en el run donde empieza el placeholder (conservando su formato) y el
+    resto del placeholder se borra de los runs siguientes.
+    """
+    nodos = list(_PATRON_NODO_TEXTO.finditer(xml))
+    fines_parrafo = [m.start() for m in _PATRON_FIN_PARRAFO.finditer(xml)]
+
+    # Agrupar los nodos <w:t> por párrafo
+    parrafos = OrderedDict()
+    for i, nodo in enumerate(nodos):
+        parrafos.setdefault(bisect.bisect_left(fines_parrafo, nodo.start()), []).append(i)
+
+    # Para cada nodo: lista de piezas (str o hueco) que reemplaza su contenido
+    piezas_por_nodo = {}
+    for indices in parrafos.values():
+        textos = [nodos[i].group(2) for i in indices]
+        texto = "".join(textos)
+        coincidencias = list(_PATRON_PLACEHOLDER.finditer(texto))
+        if not coincidencias:
+            continue
+        inicio_nodo = 0
+        for i, contenido in zip(indices, textos):
+            fin_nodo = inicio_nodo + len(contenido)
+            piezas = []
+            cursor = inicio_nodo
+            for m in coincidencias:
+                if m.end() <= inicio_nodo or m.start() >= fin_nodo:
+                    continue
+                if m.start() > cursor:
+                    piezas.append(texto[cursor:m.start()])
+                if m.start() >= inicio_nodo:
+                    piezas.append((m.group(1), m.group(0)))
+                cursor = min(m.end(), fin_nodo)
+            if cursor < fin_nodo:
+                piezas.append(texto[cursor:fin_nodo])
+            if piezas != [contenido]:
+                piezas_por_nodo[i] = piezas
+            inicio_nodo = fin_nodo
+
+    segmentos = []
+    cursor = 0
+    for i, nodo in enumerate(nodos):
+        if i not in piezas_por_nodo:
+            continue
+        etiqueta = nodo.group(1)
+        if any(isinstance(p, tuple) for p in piezas_por_nodo[i]) and 'xml:space=' not in etiqueta:
+            # Los valores pueden empezar o terminar en espacio
+            etiqueta = etiqueta[:-1] + ' xml:space="preserve">'
+        segmentos.append(xml[cursor:nodo.start()] + etiqueta)
+        segmentos.extend(piezas_por_nodo[i])
+        cursor = nodo.start(3)
+    segmentos.append(xml[cursor:])
+
+    # Unir literales consecutivos
+    compactos = []
+    for segmento in segmentos:
+        if isinstance(segmento, str) and compactos and isinstance(compactos[-1], str):
+            compactos[-1] += segmento
+        else:
+            compactos.append(segmento)
+    return compactos
+
+
+class PlantillaCompilada:
+    """
+    Plantilla DOCX analizada una sola vez.
+
+    Guarda el contenido de todas las partes del archivo y, para las que tienen
+    texto, la posición de cada placeholder {{...}} (ver _compilar_parte). Rellenar
+    un contrato es concatenar segmentos y volver a comprimir, sin abrir el DOCX
+    con python-docx ni recorrer párrafos y runs.
+    """
+
+    def __init__(self, contenido_docx):
+        self._partes = []
+        self.placeholders = set()
+        with zipfile.ZipFile(io.BytesIO(contenido_docx)) as zf:
+            for info in zf.infolist():
+                datos = zf.read(info)
+                if _PATRON_PARTES_TEXTO.match(info.filename):
+                    segmentos = _compilar_parte(datos.decode('utf-8'))
+                    huecos = [s[0] for s in segmentos if isinstance(s, tuple)]
+                    if huecos:
+                        self.placeholders.update(huecos)
+                        self._partes.append((info, segmentos))
+                        continue
+                self._partes.append((info, datos))
+
+    @classmethod
+    def desde_archivo(cls, ruta):
+        with open(ruta, 'rb') as f:
+            return cls(f.read())
+
+    def rellenar(self, valores):
+        """
+        Retorna los bytes del DOCX con los placeholders reemplazados.
+
+        `valores` es un dict nombre -> texto (sin llaves); los placeholders sin
+        valor se dejan tal cual.
+        """
+        salida = io.BytesIO()
+        with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for info, contenido in self._partes:
+                if isinstance(contenido, list):
+                    contenido = "".join(
+                        s if isinstance(s, str)
+                        else (escape(str(valores[s[0]])) if s[0] in valores else s[1])
+                        for s in contenido
+                    ).encode('utf-8')
+                # writestr anota tamaños y posición en el ZipInfo: cada contrato usa uno propio,
+                # porque la plantilla se comparte entre hilos
+                copia = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                copia.compress_type = info.compress_type
+                copia.external_attr = info.external_attr
+                zf.writestr(copia, contenido)
+        return salida.getvalue()
+
+
+_plantillas = {}
+_lock_plantillas = threading.Lock()
+
+
+def obtener_plantilla(ruta=RUTA_PLANTILLA_CONTRATO):
+    """Plantilla compilada, reutilizada mientras el archivo no cambie (mtime y tamaño)."""
+    info = os.stat(ruta)
+    firma = (info.st_mtime_ns, info.st_size)
+    with _lock_plantillas:
+        guardada = _plantillas.get(ruta)
+        if guardada is not None and guardada[0] == firma:
+            return guardada[1]
+    plantilla = PlantillaCompilada.desde_archivo(ruta)
+    with _lock_plantillas:
+        _plantillas[ruta] = (firma, plantilla)
+    return plantilla
+
+
 def generar_contrato_docx(datos_contrato):
     """
-    Carga la plantilla de Word, reemplaza los placeholders y devuelve el documento en bytes.
+    Rellena la plantilla de Word compilada con los datos del contrato y devuelve el documento en bytes.
     """
     try:
-        # Cargamos la plantilla desde la carpeta assets
-        doc = Document('assets/contrato_plantilla.docx')
-
         # Creamos un diccionario con los placeholders y sus valores
         context = {
             '{{NOMBRE_CLIENTE}}': datos_contrato.get('Cliente', ''),
@@ -87,25 +247,28 @@ def generar_contrato_docx(datos_contrato):
             except:
                 context['{{FECHA_FIRMA}}'] = "fecha no disponible"
 
-        # Reemplazamos los placeholders en los párrafos
-        for p in doc.paragraphs:
-            for key, value in context.items():
-                if key in p.text:
-                    inline = p.runs
-                    # Reemplazamos el texto manteniendo el formato original
-                    for i in range(len(inline)):
-                        if key in inline[i].text:
-                            text = inline[i].text.replace(key, value)
-                            inline[i].text = text
-        
-        # Guardamos el documento en la memoria
-        file_stream = io.BytesIO()
-        doc.save(file_stream)
-        file_stream.seek(0)
-        
-        return file_stream.getvalue()
+        # Si ya generamos un contrato con exactamente los mismos valores, lo reutilizamos
+        clave_cache = tuple(sorted(context.items()))
+        with _lock_cache_contratos:
+            guardado = _cache_contratos.get(clave_cache)
+            if guardado is not None:
+                _cache_contratos.move_to_end(clave_cache)
+                return guardado
+
+        # Reemplazamos los placeholders (párrafos, tablas, encabezados) sobre la plantilla compilada
+        contrato_bytes = obtener_plantilla().rellenar({clave.strip('{}'): valor for clave, valor in context.items()})
+        with _lock_cache_contratos:
+            _cache_contratos[clave_cache] = contrato_bytes
+            while len(_cache_contratos) > MAX_CONTRATOS_CACHE:
+                _cache_contratos.popitem(last=False)
+
+        return contrato_bytes
 
     except Exception as e:
         st.error(f"Error al generar el contrato: {e}")
         return None
 
+
+def generar_contratos_docx(lista_datos_contrato):
+    """Genera varios contratos reutilizando la misma plantilla compilada. Retorna una lista de bytes (o None)."""
+    return [generar_contrato_docx(datos) for datos in lista_datos_contrato]
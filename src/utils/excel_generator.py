@@ -3,7 +3,7 @@ Utilidad para generar reportes en Excel con formato profesional.
 """
 import io
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime
 
 def generar_excel_financiero(datos_proyecto: dict, flujo_caja: list, monthly_generation: list, 
                               horizonte: int, analisis_sensibilidad: dict = None) -> bytes:
@@ -221,3 +221,197 @@ def generar_excel_financiero(datos_proyecto: dict, flujo_caja: list, monthly_gen
     
     output.seek(0)
     return output.getvalue()
+
+
+# =============================================================================
+# EXPORTACIÓN DE PORTAFOLIOS
+# =============================================================================
+
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+         'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+COLUMNAS_PORTAFOLIO = [
+    # (encabezado, clave en datos_proyecto, formato, ancho)
+    ('Cliente', 'cliente', None, 30),
+    ('Proyecto', 'proyecto', None, 30),
+    ('Fecha', 'fecha', None, 12),
+    ('Tamaño del Sistema (kWp)', 'tamano_kwp', 'numero', 14),
+    ('Cantidad de Paneles', 'cantidad_paneles', None, 12),
+    ('Inversor Recomendado', 'inversor', None, 25),
+    ('Valor del Proyecto (COP)', 'valor_proyecto', 'moneda', 20),
+    ('TIR', 'tir', 'porcentaje', 10),
+    ('VPN (COP)', 'vpn', 'moneda', 20),
+    ('Payback (años)', 'payback', 'numero', 12),
+    ('Ahorro Año 1 (COP)', 'ahorro_ano1', 'moneda', 20),
+    ('Generación Anual (kWh)', 'generacion_anual', 'numero', 18),
+]
+
+
+def _columna(indice):
+    """Letra de columna de Excel (0 -> A, 26 -> AA)."""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _valor_celda(valor):
+    """Convierte valores numpy/pandas a tipos que xlsxwriter escribe directamente.
+
+    Las fechas se escriben como texto ISO, igual que en generar_excel_financiero;
+    sin formato de fecha xlsxwriter las dejaría como número de serie.
+    """
+    if valor is None:
+        return ''
+    if isinstance(valor, date):
+        return valor.strftime('%Y-%m-%d')
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return valor
+
+
+def generar_excel_portafolio(proyectos, horizonte: int, destino=None):
+    """
+    Exporta un portafolio completo a Excel con memoria constante.
+
+    Los proyectos se consumen uno a uno desde `proyectos` (puede ser un generador)
+    y cada fila se escribe y se descarta enseguida: el workbook usa el modo
+    constant_memory de xlsxwriter, así que la memoria no crece con el número de
+    proyectos. Al final se agregan filas de totales y gráficos sobre los rangos
+    completos (si hay al menos un proyecto).
+
+    Args:
+        proyectos: Iterable de tuplas (datos_proyecto, flujo_caja, monthly_generation),
+            con el mismo formato que recibe generar_excel_financiero.
+        horizonte: Años de análisis (columnas Año 0..horizonte del flujo de caja).
+        destino: Ruta del archivo a escribir. Si es None se retornan los bytes.
+
+    Returns:
+        int (número de proyectos exportados) si se indicó destino; bytes si no.
+    """
+    import xlsxwriter
+
+    output = io.BytesIO() if destino is None else destino
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+
+    header_format = workbook.add_format({
+        'bold': True,
+        'bg_color': '#FA323F',  # Brand color
+        'font_color': 'white',
+        'border': 1,
+        'align': 'center',
+        'valign': 'vcenter'
+    })
+    total_format = workbook.add_format({'bold': True, 'num_format': '#,##0', 'top': 1})
+    formatos = {
+        'moneda': workbook.add_format({'num_format': '$ #,##0', 'align': 'right'}),
+        'porcentaje': workbook.add_format({'num_format': '0.00%', 'align': 'center'}),
+        'numero': workbook.add_format({'num_format': '#,##0.00', 'align': 'right'}),
+    }
+
+    # En modo constant_memory las filas se escriben en orden: primero título y encabezados
+    ws_resumen = workbook.add_worksheet('Portafolio')
+    ws_resumen.merge_range(0, 0, 0, len(COLUMNAS_PORTAFOLIO) - 1, 'PORTAFOLIO DE PROYECTOS SOLARES', header_format)
+    for j, (encabezado, _, _, ancho) in enumerate(COLUMNAS_PORTAFOLIO):
+        ws_resumen.set_column(j, j, ancho)
+        ws_resumen.write(1, j, encabezado, header_format)
+
+    columnas_flujo = horizonte + 1
+    ws_flujo = workbook.add_worksheet('Flujos de Caja')
+    ws_flujo.merge_range(0, 0, 0, columnas_flujo, 'FLUJO DE CAJA ANUAL POR PROYECTO (COP)', header_format)
+    ws_flujo.set_column(0, 0, 30)
+    ws_flujo.set_column(1, columnas_flujo, 15, formatos['moneda'])
+    ws_flujo.write(1, 0, 'Proyecto', header_format)
+    for anio in range(columnas_flujo):
+        ws_flujo.write(1, anio + 1, f'Año {anio}', header_format)
+
+    ws_gen = workbook.add_worksheet('Generación Mensual')
+    ws_gen.merge_range(0, 0, 0, 13, 'GENERACIÓN MENSUAL ESTIMADA POR PROYECTO (kWh)', header_format)
+    ws_gen.set_column(0, 0, 30)
+    ws_gen.set_column(1, 13, 12, formatos['numero'])
+    ws_gen.write(1, 0, 'Proyecto', header_format)
+    for j, mes in enumerate(MESES + ['Total'], start=1):
+        ws_gen.write(1, j, mes, header_format)
+
+    fila = 2
+    for datos_proyecto, flujo_caja, monthly_generation in proyectos:
+        nombre = datos_proyecto.get('proyecto', 'N/A')
+
+        for j, (_, clave, formato, _) in enumerate(COLUMNAS_PORTAFOLIO):
+            ws_resumen.write(fila, j, _valor_celda(datos_proyecto.get(clave, 'N/A')), formatos.get(formato))
+
+        ws_flujo.write(fila, 0, nombre)
+        flujo = list(flujo_caja or [])[:columnas_flujo]
+        for anio, valor in enumerate(flujo):
+            ws_flujo.write_number(fila, anio + 1, float(valor))
+
+        ws_gen.write(fila, 0, nombre)
+        generacion = list(monthly_generation) if monthly_generation else [0] * 12
+        for mes, valor in enumerate(generacion[:12]):
+            ws_gen.write_number(fila, mes + 1, float(valor))
+        ws_gen.write_formula(fila, 13, f'=SUM(B{fila + 1}:M{fila + 1})')
+
+        fila += 1
+
+    cantidad = fila - 2
+    primera, ultima = 3, fila  # filas de datos en notación de Excel (1-indexada)
+
+    # Sin proyectos no hay rango de datos: los totales sumarían su propia fila
+    # (referencia circular) y los gráficos quedarían sin series
+    if cantidad > 0:
+        # Filas de totales con fórmulas sobre los rangos completos
+        ws_flujo.write(fila, 0, 'Total Portafolio', total_format)
+        for anio in range(columnas_flujo):
+            col = _columna(anio + 1)
+            ws_flujo.write_formula(fila, anio + 1, f'=SUM({col}{primera}:{col}{ultima})', total_format)
+        ws_gen.write(fila, 0, 'Total Portafolio', total_format)
+        for j in range(1, 14):
+            col = _columna(j)
+            ws_gen.write_formula(fila, j, f'=SUM({col}{primera}:{col}{ultima})', total_format)
+        fila_total = fila + 1
+
+        # Gráficos
+        chart_vpn = workbook.add_chart({'type': 'column'})
+        chart_vpn.add_series({
+            'name': 'VPN',
+            'categories': f"='Portafolio'!$B${primera}:$B${ultima}",
+            'values': f"='Portafolio'!$I${primera}:$I${ultima}",
+            'fill': {'color': '#FA323F'}
+        })
+        chart_vpn.set_title({'name': 'VPN por Proyecto'})
+        chart_vpn.set_y_axis({'name': 'COP', 'num_format': '$ #,##0'})
+        chart_vpn.set_legend({'none': True})
+        chart_vpn.set_size({'width': 720, 'height': 360})
+        ws_resumen.insert_chart(0, len(COLUMNAS_PORTAFOLIO) + 1, chart_vpn)
+
+        ultima_col_flujo = _columna(columnas_flujo)
+        chart_flujo = workbook.add_chart({'type': 'line'})
+        chart_flujo.add_series({
+            'name': 'Flujo del Portafolio',
+            'categories': f"='Flujos de Caja'!$B$2:${ultima_col_flujo}$2",
+            'values': f"='Flujos de Caja'!$B${fila_total}:${ultima_col_flujo}${fila_total}",
+            'line': {'color': '#FA323F', 'width': 2}
+        })
+        chart_flujo.set_title({'name': 'Flujo de Caja del Portafolio'})
+        chart_flujo.set_y_axis({'name': 'COP', 'num_format': '$ #,##0'})
+        chart_flujo.set_size({'width': 600, 'height': 350})
+        ws_flujo.insert_chart(0, columnas_flujo + 2, chart_flujo)
+
+        chart_gen = workbook.add_chart({'type': 'column'})
+        chart_gen.add_series({
+            'name': 'Generación kWh',
+            'categories': "='Generación Mensual'!$B$2:$M$2",
+            'values': f"='Generación Mensual'!$B${fila_total}:$M${fila_total}",
+            'fill': {'color': '#4ECDC4'}
+        })
+        chart_gen.set_title({'name': 'Generación Mensual del Portafolio'})
+        chart_gen.set_y_axis({'name': 'kWh'})
+        chart_gen.set_size({'width': 600, 'height': 350})
+        ws_gen.insert_chart(0, 15, chart_gen)
+
+    workbook.close()
+    if destino is None:
+        return output.getvalue()
+    return cantidad
@@ -0,0 +1,173 @@
+"""
+Ejecutor de un grafo de tareas con dependencias sobre un pool de hilos.
+
+Se usa para los efectos secundarios de una propuesta (PDF, contrato, CSV, Drive,
+Notion), que en su mayoría son independientes entre sí y están dominados por
+E/S de red. Cada tarea recibe como argumentos con nombre los resultados de las
+tareas de las que depende:
+
+    grafo = GrafoTareas()
+    grafo.agregar("grafica", lambda: generar_grafica_generacion(...))
+    grafo.agregar("pdf", lambda grafica: pdf.generar(...), depende_de=("grafica",))
+    resultados = grafo.ejecutar(al_progresar=callback)
+
+El callback de progreso se invoca siempre en el hilo que llama a ejecutar(),
+así que puede actualizar widgets de Streamlit (p. ej. st.status) sin problemas.
+Si una tarea falla, las que dependen de ella se omiten y el resto continúa;
+los errores quedan en grafo.errores. Una tarea omitida tiene como error un
+RuntimeError que nombra la dependencia que falló (con su error como causa).
+
+Con en_linea=True las tareas se ejecutan una por una en el hilo llamador, en el
+mismo orden de dependencias. Así las ve cProfile, que solo perfila el hilo que lo
+activó (ver perfilado.py).
+"""
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # Fuera de Streamlit (tests, scripts)
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+ESTADO_INICIADA = "iniciada"
+ESTADO_COMPLETADA = "completada"
+ESTADO_FALLIDA = "fallida"
+ESTADO_OMITIDA = "omitida"
+
+
+class EventoTarea:
+    """Notificación de progreso de una tarea."""
+
+    __slots__ = ("nombre", "etiqueta", "estado", "duracion", "error", "completadas", "total")
+
+    def __init__(self, nombre, etiqueta, estado, completadas, total, duracion=None, error=None):
+        self.nombre = nombre
+        self.etiqueta = etiqueta
+        self.estado = estado
+        self.duracion = duracion
+        self.error = error
+        self.completadas = completadas
+        self.total = total
+
+
+class _Tarea:
+    __slots__ = ("nombre", "funcion", "depende_de", "etiqueta")
+
+    def __init__(self, nombre, funcion, depende_de, etiqueta):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.depende_de = tuple(depende_de)
+        self.etiqueta = etiqueta or nombre
+
+
+class _EjecutorEnLinea:
+    """Ejecutor con la interfaz de ThreadPoolExecutor que corre cada tarea al enviarla, en el hilo llamador."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        try:
+            futuro.set_result(funcion(*args))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+
+class GrafoTareas:
+    """Grafo acíclico de tareas; las que no dependen entre sí se ejecutan en paralelo."""
+
+    def __init__(self, max_workers=4, en_linea=False):
+        self.max_workers = max_workers
+        self.en_linea = en_linea
+        self._tareas = {}
+        self.resultados = {}
+        self.errores = {}
+        self.duraciones = {}
+
+    def agregar(self, nombre, funcion, depende_de=(), etiqueta=None):
+        """Registra una tarea. Las dependencias deben agregarse antes que la tarea."""
+        if nombre in self._tareas:
+            raise ValueError(f"La tarea '{nombre}' ya existe en el grafo")
+        faltantes = [d for d in depende_de if d not in self._tareas]
+        if faltantes:
+            raise ValueError(f"La tarea '{nombre}' depende de tareas no registradas: {', '.join(faltantes)}")
+        self._tareas[nombre] = _Tarea(nombre, funcion, depende_de, etiqueta)
+        return self
+
+    def _ejecutar_tarea(self, tarea, ctx):
+        if ctx is not None and add_script_run_ctx is not None:
+            add_script_run_ctx(ctx=ctx)
+        kwargs = {dep: self.resultados[dep] for dep in tarea.depende_de}
+        t0 = time.perf_counter()
+        try:
+            return tarea.funcion(**kwargs)
+        finally:
+            self.duraciones[tarea.nombre] = time.perf_counter() - t0
+
+    def ejecutar(self, al_progresar=None):
+        """
+        Ejecuta todas las tareas respetando dependencias.
+
+        Args:
+            al_progresar: callback(EventoTarea) invocado en el hilo llamador.
+
+        Returns:
+            dict: nombre de tarea -> resultado (solo las tareas completadas).
+        """
+        total = len(self._tareas)
+        pendientes = dict(self._tareas)
+        en_curso = {}
+        terminadas = set()
+        ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+
+        def _notificar(tarea, estado, **kwargs):
+            if al_progresar is not None:
+                al_progresar(EventoTarea(tarea.nombre, tarea.etiqueta, estado, len(terminadas), total, **kwargs))
+
+        if self.en_linea:
+            pool = _EjecutorEnLinea()
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="grafo")
+        with pool:
+            while pendientes or en_curso:
+                # Omitir tareas cuyas dependencias fallaron
+                for nombre, tarea in list(pendientes.items()):
+                    fallida = next((dep for dep in tarea.depende_de if dep in self.errores), None)
+                    if fallida is not None:
+                        del pendientes[nombre]
+                        error = RuntimeError(f"'{nombre}' se omitió porque falló '{fallida}': {self.errores[fallida]}")
+                        error.__cause__ = self.errores[fallida]
+                        self.errores[nombre] = error
+                        terminadas.add(nombre)
+                        _notificar(tarea, ESTADO_OMITIDA, error=error)
+
+                # Lanzar las tareas listas
+                for nombre, tarea in list(pendientes.items()):
+                    if all(dep in self.resultados for dep in tarea.depende_de):
+                        del pendientes[nombre]
+                        _notificar(tarea, ESTADO_INICIADA)
+                        en_curso[pool.submit(self._ejecutar_tarea, tarea, ctx)] = tarea
+
+                if not en_curso:
+                    continue
+
+                listos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    tarea = en_curso.pop(futuro)
+                    terminadas.add(tarea.nombre)
+                    duracion = self.duraciones.get(tarea.nombre)
+                    try:
+                        self.resultados[tarea.nombre] = futuro.result()
+                    except Exception as e:
+                        self.errores[tarea.nombre] = e
+                        _notificar(tarea, ESTADO_FALLIDA, duracion=duracion, error=e)
+                    else:
+                        _notificar(tarea, ESTADO_COMPLETADA, duracion=duracion)
+
+        return self.resultados
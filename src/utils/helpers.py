@@ -1,6 +1,16 @@
 """
 Funciones de utilidad y validación para la aplicación.
 """
+import re
+
+_PATRON_PROPUESTA = re.compile(r"FV\d{5,}")
+
+
+def numero_propuesta(nombre_proyecto):
+    """Número de propuesta (FVyyNNN) contenido en el nombre del proyecto, o el nombre completo si no lo tiene."""
+    match = _PATRON_PROPUESTA.search(nombre_proyecto or "")
+    return match.group(0) if match else (nombre_proyecto or "")
+
 
 def validar_datos_entrada(Load, size, quantity, cubierta, clima, costkWh, module):
     """Valida que los datos de entrada sean coherentes y válidos"""
@@ -2,25 +2,139 @@
 Utilidad para generar el PDF de la propuesta solar.
 """
 from fpdf import FPDF
+from PyPDF2 import PdfReader, PdfWriter
+from collections import OrderedDict
 import datetime
+import hashlib
+import io
 import os
 import math
 import re
+import threading
 import streamlit as st
 
+# =============================================================================
+# CACHÉ DE PÁGINAS
+# =============================================================================
+
+# Claves de datos_calculadora que lee cada método crear_pagina_*.
+# Una página solo se vuelve a renderizar cuando cambia alguno de estos valores.
+DEPENDENCIAS_PAGINAS = {
+    'crear_resumen_ejecutivo': (
+        'Tamano del Sistema (kWp)', 'Cantidad de Paneles',
+        'Árboles Equivalentes Ahorrados', 'CO2 Evitado Anual (Toneladas)',
+    ),
+    'crear_pagina_generacion_mensual': ('Generacion Promedio Mensual (kWh)',),
+    'crear_pagina_tecnica': (
+        'Tipo de Cubierta', 'Área Requerida Aprox. (m²)', 'Potencia de Paneles',
+        'Cantidad de Paneles', 'Tamano del Sistema (kWp)', 'Inversor Recomendado',
+        'Referencia Inversor', 'Potencia AC Inversor',
+    ),
+    'crear_pagina_terminos': (
+        'Valor Sistema FV (sin IVA)', 'Valor IVA', 'Valor Total del Proyecto (COP)',
+        'O&M (Operation & Maintenance)',
+    ),
+    'crear_pagina_info_financiera': (
+        'TIR (Tasa Interna de Retorno)', 'Periodo de Retorno (anos)',
+        'Ahorro Estimado Primer Ano (COP)', 'O&M (Operation & Maintenance)',
+        'Valor Sistema FV (sin IVA)',
+    ),
+    'crear_pagina_financiacion': (
+        'Desembolso Inicial (COP)', 'Cuota Mensual del Credito (COP)',
+        'Ahorro Estimado Primer Ano (COP)', 'Plazo del Crédito',
+    ),
+}
+
+# Páginas que solo contienen la imagen de fondo y no necesitan cargar fuentes TTF
+PAGINAS_ESTATICAS = (
+    'crear_pagina_smartmeter', 'crear_pagina_alcance', 'crear_pagina_aspectos_a',
+    'crear_pagina_aspectos_b', 'crear_pagina_proyectos', 'crear_pagina_contacto',
+)
+
+# Archivos externos que leen algunas páginas (su contenido también forma parte de la clave)
+ARCHIVOS_PAGINAS = {
+    'crear_pagina_generacion_mensual': ('grafica_generacion.png',),
+}
+
+MAX_BYTES_CACHE_PAGINAS = 96 * 1024 * 1024  # 96 MB
+
+_cache_paginas = OrderedDict()
+_bytes_cache_paginas = 0
+_lock_cache_paginas = threading.Lock()
+
+
+def _firma_archivo(ruta):
+    """Firma barata de un archivo (ruta, mtime, tamaño) para detectar cambios."""
+    try:
+        info = os.stat(ruta)
+        return (ruta, info.st_mtime_ns, info.st_size)
+    except OSError:
+        return (ruta, None, None)
+
+
+def _clave_pagina(metodo, args, datos, extras=()):
+    """Construye la clave de caché de una página a partir de las entradas que realmente lee."""
+    valores = tuple((k, str(datos.get(k))) for k in DEPENDENCIAS_PAGINAS.get(metodo, ()))
+    archivos = tuple(_firma_archivo(r) for r in ARCHIVOS_PAGINAS.get(metodo, ()))
+    contenido = repr((metodo, args, valores, archivos, extras)).encode('utf-8')
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def _cache_paginas_get(clave):
+    with _lock_cache_paginas:
+        pagina = _cache_paginas.get(clave)
+        if pagina is not None:
+            _cache_paginas.move_to_end(clave)
+        return pagina
+
+
+def _cache_paginas_put(clave, pagina):
+    global _bytes_cache_paginas
+    with _lock_cache_paginas:
+        if clave in _cache_paginas:
+            return
+        _cache_paginas[clave] = pagina
+        _bytes_cache_paginas += len(pagina)
+        while _bytes_cache_paginas > MAX_BYTES_CACHE_PAGINAS and len(_cache_paginas) > 1:
+            _, antigua = _cache_paginas.popitem(last=False)
+            _bytes_cache_paginas -= len(antigua)
+
+
+def _extraer_paginas(paginas):
+    """Copia un rango de páginas de un PdfReader a un PDF independiente (para la caché)."""
+    writer = PdfWriter()
+    for page in paginas:
+        writer.add_page(page)
+    salida = io.BytesIO()
+    writer.write(salida)
+    return salida.getvalue()
+
+
+def limpiar_cache_paginas():
+    """Vacía la caché de páginas renderizadas."""
+    global _bytes_cache_paginas
+    with _lock_cache_paginas:
+        _cache_paginas.clear()
+        _bytes_cache_paginas = 0
+
+
 class PropuestaPDF(FPDF):
     BRAND_COLOR = (250, 50, 63)
     TEXT_COLOR = (0, 0, 0)
 
     def __init__(self, client_name="Cliente", project_name="Proyecto", 
-                 documento="", direccion="", fecha=None, *args, **kwargs):
+                 documento="", direccion="", fecha=None, *args, cargar_fuentes=True, **kwargs):
         super().__init__(*args, **kwargs)
         self.client_name = client_name
         self.project_name = project_name
         self.documento_cliente = documento
         self.direccion_proyecto = direccion
         self.fecha_propuesta = fecha if fecha else datetime.date.today()
-        
+
+        if not cargar_fuentes:
+            self.font_family = 'Arial'
+            return
+
         try:
             self.add_font('DMSans', '', 'assets/DMSans-Regular.ttf')
             self.add_font('DMSans', 'B', 'assets/DMSans-Bold.ttf')
@@ -199,7 +313,7 @@ class PropuestaPDF(FPDF):
             self.set_xy(20, 100)
             self.cell(0, 10, "Smart Meter", align='C')
     
-    def crear_pagina_ubicacion(self, lat, lon):
+    def crear_pagina_ubicacion(self, lat, lon, imagen_mapa=None):
         self.add_page()
         self.image('assets/6.jpg', x=0, y=0, w=210)
         
@@ -215,8 +329,8 @@ class PropuestaPDF(FPDF):
         y_mapa = 120
         ancho_mapa = 180
         
-        if os.path.exists("assets/mapa_ubicacion.jpg"):
-            self.image("assets/mapa_ubicacion.jpg", x=x_mapa, y=y_mapa, w=ancho_mapa)
+        if imagen_mapa:
+            self.image(io.BytesIO(imagen_mapa), x=x_mapa, y=y_mapa, w=ancho_mapa)
         else:
             self.set_xy(x_mapa, y_mapa)
             self.cell(w=ancho_mapa, h=100, txt="No se pudo generar el mapa.", border=1, align='C')
@@ -488,7 +602,66 @@ class PropuestaPDF(FPDF):
         self.set_xy(19,214)
         self.cell(w=50, txt=str(vida_util), align='C')
 
-    def generar(self, datos_calculadora, usa_financiamiento, lat=None, lon=None, incluir_smartmeter=False):
+    def _plan_paginas(self, datos_calculadora, usa_financiamiento, lat, lon, incluir_smartmeter, imagen_mapa=None):
+        """Lista ordenada de (método, argumentos) que componen el documento."""
+        plan = [
+            ('crear_portada', ()),
+            ('crear_resumen_ejecutivo', (datos_calculadora,)),
+            ('crear_pagina_generacion_mensual', (datos_calculadora,)),
+        ]
+        if lat is not None and lon is not None:
+            plan.append(('crear_pagina_ubicacion', (lat, lon, imagen_mapa)))
+
+        # Página de Smart Meter (después de ubicación)
+        if incluir_smartmeter:
+            plan.append(('crear_pagina_smartmeter', ()))
+
+        plan += [
+            ('crear_pagina_tecnica', (datos_calculadora,)),
+            ('crear_pagina_alcance', ()),
+            ('crear_pagina_terminos', (datos_calculadora,)),
+            ('crear_pagina_info_financiera', (datos_calculadora,)),
+        ]
+
+        # Página de financiación solo si se requiere
+        if usa_financiamiento:
+            plan.append(('crear_pagina_financiacion', (datos_calculadora,)))
+
+        plan += [
+            ('crear_pagina_aspectos_a', ()),
+            ('crear_pagina_aspectos_b', ()),
+            ('crear_pagina_proyectos', ()),
+            ('crear_pagina_contacto', ()),
+        ]
+        return plan
+
+    def _renderizar_pagina(self, documento, metodo, args):
+        """Dibuja una página del plan en documento y devuelve el rango (inicio, fin) de páginas que ocupa."""
+        inicio = documento.page_no()
+        getattr(documento, metodo)(*args)
+        return inicio, documento.page_no()
+
+    def _renderizar_pendientes(self, pendientes):
+        """
+        Renderiza las páginas que no están en caché en un único documento.
+
+        Las fuentes TTF se cargan una sola vez por llamada (y no una vez por página) y
+        el resultado se parte en rangos de páginas. Devuelve {clave: páginas del PdfReader}.
+        """
+        documento = PropuestaPDF(
+            client_name=self.client_name,
+            project_name=self.project_name,
+            documento=self.documento_cliente,
+            direccion=self.direccion_proyecto,
+            fecha=self.fecha_propuesta,
+            cargar_fuentes=any(metodo not in PAGINAS_ESTATICAS for _, metodo, _ in pendientes),
+        )
+        rangos = [(clave, self._renderizar_pagina(documento, metodo, args)) for clave, metodo, args in pendientes]
+        lector = PdfReader(io.BytesIO(bytes(documento.output())))
+        return {clave: lector.pages[inicio:fin] for clave, (inicio, fin) in rangos}
+
+    def generar(self, datos_calculadora, usa_financiamiento, lat=None, lon=None, incluir_smartmeter=False,
+                usar_cache=True, imagen_mapa=None):
         """
         Llama a todos los métodos en orden para construir el documento.
         
@@ -507,30 +680,55 @@ class PropuestaPDF(FPDF):
         12. Aspectos B
         13. Proyectos
         14. Contacto
+
+        Con usar_cache=True cada página se renderiza por separado y se guarda en una
+        caché indexada por las entradas que lee (ver DEPENDENCIAS_PAGINAS). Al regenerar
+        tras un cambio menor (nombre del cliente, precio) solo se vuelven a dibujar las
+        páginas afectadas y el documento se reensambla a partir de la caché.
+
+        imagen_mapa son los bytes de la imagen del mapa (ver get_static_map_image);
+        sin ella la página de ubicación muestra un recuadro en su lugar.
         """
-        self.crear_portada()
-        self.crear_resumen_ejecutivo(datos_calculadora)
-        self.crear_pagina_generacion_mensual(datos_calculadora)
-        if lat is not None and lon is not None:
-            self.crear_pagina_ubicacion(lat, lon)
-        
-        # Página de Smart Meter (después de ubicación)
-        if incluir_smartmeter:
-            self.crear_pagina_smartmeter()
-        
-        self.crear_pagina_tecnica(datos_calculadora)
-        self.crear_pagina_alcance()
-        self.crear_pagina_terminos(datos_calculadora)
-        self.crear_pagina_info_financiera(datos_calculadora)
-        
-        # Página de financiación solo si se requiere
-        if usa_financiamiento:
-            self.crear_pagina_financiacion(datos_calculadora)
-        
-        self.crear_pagina_aspectos_a()
-        self.crear_pagina_aspectos_b()
-        self.crear_pagina_proyectos()
-        self.crear_pagina_contacto()
-    
-        return bytes(self.output(dest='S'))
+        plan = self._plan_paginas(datos_calculadora, usa_financiamiento, lat, lon, incluir_smartmeter, imagen_mapa)
+
+        if not usar_cache:
+            for metodo, args in plan:
+                getattr(self, metodo)(*args)
+            return bytes(self.output(dest='S'))
+
+        # La portada depende de los datos del cliente, no de datos_calculadora
+        datos_cliente = (
+            self.client_name, self.direccion_proyecto,
+            self.fecha_propuesta.strftime('%d/%m/%Y') if hasattr(self.fecha_propuesta, 'strftime') else str(self.fecha_propuesta),
+        )
+
+        claves = []
+        paginas = {}
+        pendientes = []
+        for metodo, args in plan:
+            # La imagen del mapa entra en la clave por su hash, no por su contenido
+            args_clave = (lat, lon, hashlib.sha256(imagen_mapa).hexdigest() if imagen_mapa else None) \
+                if metodo == 'crear_pagina_ubicacion' else ()
+            extras = datos_cliente if metodo == 'crear_portada' else ()
+            clave = _clave_pagina(metodo, args_clave, datos_calculadora, extras)
+            claves.append(clave)
+
+            pagina = _cache_paginas_get(clave)
+            if pagina is None:
+                pendientes.append((clave, metodo, args))
+            else:
+                paginas[clave] = PdfReader(io.BytesIO(pagina)).pages
+
+        if pendientes:
+            for clave, nuevas in self._renderizar_pendientes(pendientes).items():
+                paginas[clave] = nuevas
+                _cache_paginas_put(clave, _extraer_paginas(nuevas))
+
+        writer = PdfWriter()
+        for clave in claves:
+            for page in paginas[clave]:
+                writer.add_page(page)
 
+        salida = io.BytesIO()
+        writer.write(salida)
+        return salida.getvalue()
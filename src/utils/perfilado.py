@@ -0,0 +1,141 @@
+"""
+Perfilado opcional de una generación de reporte (CPU con cProfile y memoria con tracemalloc).
+
+Se activa con la variable de entorno PERFILAR_REPORTES=1 o desde el panel de
+administración. Cada generación perfilada deja en PERFILES_DIR:
+- <timestamp>_<flujo>.prof      (abrir con pstats, snakeviz, etc.)
+- <timestamp>_<flujo>.snapshot  (tracemalloc.Snapshot.load)
+y un resumen con las funciones más costosas y las líneas que más memoria asignan
+disponible en perfiles_recientes() para mostrarlo en la interfaz.
+"""
+import os
+import pstats
+import cProfile
+import datetime
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+MAX_PERFILES_RECIENTES = 5
+TOP_FUNCIONES = 15
+TOP_LINEAS = 15
+# Profundidad de la pila guardada por asignación (1 = solo la línea que asigna)
+FRAMES_TRACEMALLOC = 1
+
+_lock_perfilado = threading.Lock()
+_perfiles_recientes = []
+_lock_recientes = threading.Lock()
+
+
+def _directorio_perfiles():
+    return os.environ.get("PERFILES_DIR", os.path.join("logs", "perfiles"))
+
+
+def perfilado_habilitado(toggle=False):
+    """True si el perfilado está pedido desde la interfaz o por la variable de entorno."""
+    return bool(toggle) or os.environ.get("PERFILAR_REPORTES", "").lower() in ("1", "true", "si", "sí")
+
+
+class ResultadoPerfil:
+    """Resumen de una generación perfilada."""
+
+    def __init__(self, flujo):
+        self.flujo = flujo
+        self.timestamp = datetime.datetime.now()
+        self.activo = False
+        self.ruta_perfil = None
+        self.ruta_snapshot = None
+        self.top_funciones = []
+        self.top_lineas = []
+        self.memoria_pico_kb = 0.0
+
+
+def _resumir_funciones(profiler, limite):
+    stats = pstats.Stats(profiler)
+    filas = []
+    for (archivo, linea, funcion), (_, llamadas, propio, acumulado, _) in stats.stats.items():
+        filas.append({
+            "funcion": funcion,
+            "ubicacion": f"{archivo}:{linea}",
+            "llamadas": llamadas,
+            "propio_s": round(propio, 4),
+            "acumulado_s": round(acumulado, 4),
+        })
+    filas.sort(key=lambda f: f["acumulado_s"], reverse=True)
+    return filas[:limite]
+
+
+def _resumir_lineas(snapshot, limite):
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    filas = []
+    for estadistica in snapshot.statistics("lineno")[:limite]:
+        frame = estadistica.traceback[0]
+        filas.append({
+            "ubicacion": f"{frame.filename}:{frame.lineno}",
+            "kb": round(estadistica.size / 1024, 1),
+            "asignaciones": estadistica.count,
+        })
+    return filas
+
+
+@contextmanager
+def perfilar_reporte(flujo, activo=True):
+    """
+    Perfila el bloque si `activo`. Entrega un ResultadoPerfil que se completa al salir.
+
+    Solo se perfila una generación a la vez por proceso (tracemalloc es global);
+    si ya hay otra en curso, el bloque se ejecuta sin perfilar.
+    """
+    resultado = ResultadoPerfil(flujo)
+    if not activo or not _lock_perfilado.acquire(blocking=False):
+        yield resultado
+        return
+
+    ya_trazando = tracemalloc.is_tracing()
+    if not ya_trazando:
+        tracemalloc.start(FRAMES_TRACEMALLOC)
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    resultado.activo = True
+    try:
+        profiler.enable()
+        try:
+            yield resultado
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            resultado.memoria_pico_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            if not ya_trazando:
+                tracemalloc.stop()
+            _guardar_perfil(resultado, profiler, snapshot)
+    finally:
+        _lock_perfilado.release()
+
+
+def _guardar_perfil(resultado, profiler, snapshot):
+    resultado.top_funciones = _resumir_funciones(profiler, TOP_FUNCIONES)
+    resultado.top_lineas = _resumir_lineas(snapshot, TOP_LINEAS)
+
+    directorio = _directorio_perfiles()
+    base = os.path.join(directorio, f"{resultado.timestamp:%Y%m%d_%H%M%S}_{resultado.flujo}")
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        profiler.dump_stats(base + ".prof")
+        snapshot.dump(base + ".snapshot")
+        resultado.ruta_perfil = base + ".prof"
+        resultado.ruta_snapshot = base + ".snapshot"
+    except OSError as e:
+        print(f"No se pudo guardar el perfil: {e}")
+
+    with _lock_recientes:
+        _perfiles_recientes.insert(0, resultado)
+        del _perfiles_recientes[MAX_PERFILES_RECIENTES:]
+
+
+def perfiles_recientes():
+    """Últimos perfiles generados en este proceso (el más reciente primero)."""
+    with _lock_recientes:
+        return list(_perfiles_recientes)
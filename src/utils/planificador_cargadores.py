@@ -0,0 +1,206 @@
+"""
+Planificador de sitios con varios puntos de carga (parqueaderos de flotas y condominios).
+
+A partir de las coordenadas de los puntos y de la subestación (en metros sobre el
+plano del sitio) se arma la canalización compartida como un árbol de expansión
+mínima con raíz en la subestación: cada tramo de tubería se instala una sola vez
+y los cables de cada cargador recorren el camino del árbol hasta la subestación.
+
+El costo por metro de cotizacion_cargadores_costos cubre canalización y cable.
+En el sitio la canalización se cobra una vez por tramo del árbol (repartida por
+partes iguales entre los puntos que pasan por él) y el cable por el recorrido de
+cada punto, así que un sitio agrupado cuesta menos que cotizar cada punto por
+separado. Con un solo punto el resultado es el de la cotización individual.
+"""
+import numpy as np
+
+# Fórmula de cotizacion_cargadores_costos: (COSTO_METRO * d + COSTO_FIJO_PUNTO) * 1.1
+COSTO_FIJO_PUNTO = 857195
+COSTO_METRO = 63640
+# Parte del costo por metro que corresponde a la canalización (tubería EMT, uniones,
+# curvas y su instalación); el resto es el cable que recorre cada cargador
+FRACCION_CANALIZACION_METRO = 0.6
+
+
+def arbol_expansion_minima(coordenadas):
+    """
+    Árbol de expansión mínima (Prim) sobre distancias euclidianas.
+
+    `coordenadas` es un arreglo (n, 2); el nodo 0 es la raíz (la subestación).
+    Retorna (padres, longitudes): padre de cada nodo en el árbol (-1 para la raíz)
+    y longitud del tramo que lo une a su padre (0 para la raíz).
+    """
+    puntos = np.asarray(coordenadas, dtype=float).reshape(-1, 2)
+    n = len(puntos)
+    padres = np.full(n, -1, dtype=int)
+    longitudes = np.zeros(n)
+    if n == 0:
+        return padres, longitudes
+
+    en_arbol = np.zeros(n, dtype=bool)
+    en_arbol[0] = True
+    # Distancia de cada nodo al árbol actual y nodo del árbol que la logra
+    mejor = np.hypot(*(puntos - puntos[0]).T)
+    mejor_padre = np.zeros(n, dtype=int)
+    for _ in range(n - 1):
+        candidatas = np.where(en_arbol, np.inf, mejor)
+        nodo = int(np.argmin(candidatas))
+        en_arbol[nodo] = True
+        padres[nodo] = mejor_padre[nodo]
+        longitudes[nodo] = mejor[nodo]
+
+        distancias = np.hypot(*(puntos - puntos[nodo]).T)
+        mas_cerca = ~en_arbol & (distancias < mejor)
+        mejor[mas_cerca] = distancias[mas_cerca]
+        mejor_padre[mas_cerca] = nodo
+    return padres, longitudes
+
+
+def longitudes_de_recorrido(padres, longitudes):
+    """Distancia de cada nodo a la raíz siguiendo el árbol (recorrido de su cable)."""
+    n = len(padres)
+    recorrido = np.full(n, np.nan)
+    if n:
+        recorrido[0] = 0.0
+    for nodo in range(n):
+        camino = []
+        actual = nodo
+        while np.isnan(recorrido[actual]):
+            camino.append(actual)
+            actual = padres[actual]
+        for paso in reversed(camino):
+            recorrido[paso] = recorrido[padres[paso]] + longitudes[paso]
+    return recorrido
+
+
+def puntos_por_tramo(padres):
+    """Cantidad de nodos que cuelgan de cada nodo, contándolo (los puntos que usan su tramo)."""
+    padres = np.asarray(padres)
+    cantidad = np.ones(len(padres))
+    profundidad = longitudes_de_recorrido(padres, np.ones(len(padres)))
+    # De las hojas hacia la raíz, cada nodo suma lo suyo a su padre
+    for nodo in np.argsort(-profundidad, kind="stable"):
+        if padres[nodo] >= 0:
+            cantidad[padres[nodo]] += cantidad[nodo]
+    return cantidad
+
+
+def costos_cargadores_vectorizado(distancias_metros, precios_manuales=None):
+    """
+    Versión vectorizada de cotizacion_cargadores_costos para muchos puntos.
+
+    `precios_manuales` (opcional) tiene un precio total por punto; los valores
+    None, NaN o <= 0 usan el cálculo por distancia. Retorna un dict de arreglos con
+    las claves iva, diseno, materiales, costo_total, costo_base y subtotal_antes_iva.
+    """
+    d = np.asarray(distancias_metros, dtype=float)
+    return _desglose_vectorizado((COSTO_METRO * d + COSTO_FIJO_PUNTO) * 1.1, precios_manuales)
+
+
+def _desglose_vectorizado(costo_base, precios_manuales=None):
+    """AIU, IVA y reparto diseño/materiales a partir del costo base de cada punto."""
+    costo_base = np.asarray(costo_base, dtype=float)
+    subtotal_antes_iva = costo_base * 1.20
+    costo_total = subtotal_antes_iva * 1.19
+
+    if precios_manuales is not None:
+        manual = np.array([np.nan if p is None else p for p in precios_manuales], dtype=float)
+        usar_manual = np.nan_to_num(manual, nan=0.0) > 0
+        # Cálculo inverso desde el total, igual que en la cotización individual
+        costo_total = np.where(usar_manual, manual, costo_total)
+        subtotal_antes_iva = np.where(usar_manual, manual / 1.19, subtotal_antes_iva)
+        costo_base = np.where(usar_manual, subtotal_antes_iva / 1.20, costo_base)
+
+    return {
+        "iva": subtotal_antes_iva * 0.19,
+        "diseno": 0.35 * subtotal_antes_iva,
+        "materiales": 0.65 * subtotal_antes_iva,
+        "costo_total": costo_total,
+        "costo_base": costo_base,
+        "subtotal_antes_iva": subtotal_antes_iva,
+    }
+
+
+def materiales_sitio(longitudes_tramos, recorridos):
+    """
+    Lista de materiales agregada del sitio, en el formato de calcular_materiales_cargador.
+
+    La tubería, uniones y curvas se cuentan por tramo del árbol (canalización
+    compartida); el cable, las entradas y la caja se cuentan por punto de carga,
+    con el recorrido completo de cada cargador hasta la subestación.
+    """
+    tramos = np.asarray(longitudes_tramos, dtype=float)
+    d = np.asarray(recorridos, dtype=float)
+    puntos = len(d)
+    # np.round redondea igual que round() (mitades al par)
+    lista = [
+        ("TUBERIA EMT 3/4 Pulg", int(np.sum(np.round(tramos / 3.0) + 1)), "UNIDADES"),
+        ("UNION EMT 3/4 Pulg", int(np.sum(np.round(tramos / 3.0) + np.round(tramos / 6.0))), "UNIDADES"),
+        ("CURVA EMT 3/4 Pulg", int(np.sum(np.round(tramos / 6.0))), "UNIDADES"),
+        ("ENTRADA CAJA EMT 3/4 Pulg", 2 * puntos, "UNIDADES"),
+        ("CABLE 8 AWG NEGRO", int(np.sum(np.round(d + 3.0) * 2)), "METROS"),
+        ("CABLE 8 AWG VERDE", int(np.sum(np.round(d + 3.0))), "METROS"),
+        ("CAJA DEXSON 18X14", puntos, "UNIDAD"),
+    ]
+    return lista
+
+
+def planificar_sitio(puntos, subestacion=(0.0, 0.0), precios_manuales=None):
+    """
+    Planifica y costea todos los puntos de carga de un sitio en una pasada.
+
+    Args:
+        puntos: lista de coordenadas (x, y) en metros de cada cargador.
+        subestacion: coordenadas (x, y) en metros de la subestación.
+        precios_manuales: precio total opcional por punto (ver costos_cargadores_vectorizado).
+
+    Returns:
+        dict con:
+        - "tramos": lista de (origen, destino, metros); 0 es la subestación y el punto i es el nodo i + 1.
+        - "recorridos_m": arreglo con el recorrido de cable de cada punto.
+        - "canalizacion_asignada_m": metros de canalización que paga cada punto (su parte
+          de cada tramo de su camino); suman canalizacion_m.
+        - "canalizacion_m": metros totales de canalización compartida.
+        - "canalizacion_individual_m": metros si cada punto tuviera su propia canalización directa.
+        - "costos": dict de arreglos por punto (ver costos_cargadores_vectorizado), con la
+          canalización compartida y el cable propio de cada punto.
+        - "totales": dict con la suma de cada costo.
+        - "materiales": lista agregada de materiales del sitio.
+    """
+    puntos = np.asarray(puntos, dtype=float).reshape(-1, 2)
+    if len(puntos) == 0:
+        raise ValueError("El sitio debe tener al menos un punto de carga")
+    if precios_manuales is not None and len(precios_manuales) != len(puntos):
+        raise ValueError("Debe haber un precio manual (o None) por cada punto de carga")
+
+    nodos = np.vstack([np.asarray(subestacion, dtype=float).reshape(1, 2), puntos])
+    padres, longitudes = arbol_expansion_minima(nodos)
+    recorridos = longitudes_de_recorrido(padres, longitudes)[1:]
+    asignada = longitudes_de_recorrido(padres, longitudes / puntos_por_tramo(padres))[1:]
+    metros_equivalentes = FRACCION_CANALIZACION_METRO * asignada + (1 - FRACCION_CANALIZACION_METRO) * recorridos
+    costos = _desglose_vectorizado((COSTO_METRO * metros_equivalentes + COSTO_FIJO_PUNTO) * 1.1, precios_manuales)
+
+    return {
+        "tramos": [(int(padres[i]), i, float(longitudes[i])) for i in range(1, len(nodos))],
+        "recorridos_m": recorridos,
+        "canalizacion_asignada_m": asignada,
+        "canalizacion_m": float(longitudes.sum()),
+        "canalizacion_individual_m": float(np.hypot(*(puntos - nodos[0]).T).sum()),
+        "costos": costos,
+        "totales": {clave: float(valores.sum()) for clave, valores in costos.items()},
+        "materiales": materiales_sitio(longitudes[1:], recorridos),
+    }
+
+
+def sitios_para_cotizacion(plan, nombres):
+    """
+    Lista [(nombre, distancia, precio)] lista para generar_pdfs_cargadores.
+
+    El precio de cada punto es su costo total en el plan del sitio, para que cada
+    PDF cobre la canalización compartida y no la de un recorrido propio.
+    """
+    return [
+        (nombre, float(distancia), float(precio))
+        for nombre, distancia, precio in zip(nombres, plan["recorridos_m"], plan["costos"]["costo_total"])
+    ]
+
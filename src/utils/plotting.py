@@ -1,11 +1,22 @@
+import matplotlib
+# Backend sin ventana: las gráficas del PDF se dibujan desde hilos de trabajo
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import os
 
+# Última firma de entradas renderizada por archivo, para no redibujar gráficas idénticas
+_firmas_graficas = {}
+
 def generar_grafica_generacion(monthly_generation, Load, incluir_baterias, filename="grafica_generacion.png"):
     """
     Genera y guarda la gráfica de generación mensual.
     Retorna True si se generó correctamente, False si hubo error.
+    Si el archivo ya existe y las entradas no cambiaron, no se vuelve a dibujar.
     """
+    firma = (tuple(round(float(g), 6) for g in monthly_generation), float(Load), bool(incluir_baterias))
+    if _firmas_graficas.get(filename) == firma and os.path.exists(filename):
+        return True
+
     try:
         fig, ax = plt.subplots(figsize=(10, 5))
         meses_grafico = ["ene", "feb", "mar", "abr", "may", "jun", "jul", "ago", "sep", "oct", "nov", "dic"]
@@ -45,6 +56,7 @@ def generar_grafica_generacion(monthly_generation, Load, incluir_baterias, filen
         plt.tight_layout()
         plt.savefig(filename, dpi=100)
         plt.close(fig)
+        _firmas_graficas[filename] = firma
         return True
     except Exception as e:
         print(f"Error generando gráfica: {e}")
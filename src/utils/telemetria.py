@@ -0,0 +1,279 @@
+"""
+Instrumentación de tiempos por etapa del flujo de generación de reportes.
+
+Uso típico:
+
+    with iniciar_reporte("desktop") as reporte:
+        with reporte.etapa("calculo"):
+            ...
+        with reporte.etapa("pdf"):
+            ...
+
+En flujos lineales (como los que ya avanzan con status.update) también se puede
+marcar el inicio de cada etapa; la anterior se cierra automáticamente:
+
+    reporte.iniciar_etapa("calculo")
+    ...
+    reporte.iniciar_etapa("pdf")
+
+Cada etapa queda registrada en tres lugares:
+- El agregado en memoria del proceso (contadores e histogramas por etapa).
+- Un log JSON estructurado (una línea por reporte) en TIEMPOS_LOG_PATH.
+- Un endpoint local con formato de texto de Prometheus (ver iniciar_servidor_metricas).
+"""
+import os
+import json
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Límites superiores (segundos) de los buckets del histograma por etapa
+BUCKETS_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Reportes recientes que se conservan para el panel de administración
+MAX_REPORTES_RECIENTES = 20
+
+
+def _ruta_log():
+    return os.environ.get("TIEMPOS_LOG_PATH", os.path.join("logs", "tiempos_reportes.jsonl"))
+
+
+class _MetricasEtapa:
+    """Contador, suma e histograma acumulados de una etapa."""
+
+    __slots__ = ("conteo", "errores", "suma", "buckets")
+
+    def __init__(self):
+        self.conteo = 0
+        self.errores = 0
+        self.suma = 0.0
+        self.buckets = [0] * len(BUCKETS_SEGUNDOS)
+
+    def observar(self, duracion, ok):
+        self.conteo += 1
+        self.suma += duracion
+        if not ok:
+            self.errores += 1
+        for i, limite in enumerate(BUCKETS_SEGUNDOS):
+            if duracion <= limite:
+                self.buckets[i] += 1
+
+
+class RegistroTiempos:
+    """Agregado de tiempos por (flujo, etapa) compartido por todas las sesiones del proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metricas = {}
+        self._recientes = []
+
+    def observar(self, flujo, etapa, duracion, ok=True):
+        with self._lock:
+            metricas = self._metricas.setdefault((flujo, etapa), _MetricasEtapa())
+            metricas.observar(duracion, ok)
+
+    def agregar_reporte(self, reporte):
+        with self._lock:
+            self._recientes.insert(0, reporte)
+            del self._recientes[MAX_REPORTES_RECIENTES:]
+
+    def reportes_recientes(self):
+        with self._lock:
+            return list(self._recientes)
+
+    def resumen(self):
+        """Lista de dicts con conteo, promedio y errores por etapa (para mostrar en tablas)."""
+        with self._lock:
+            filas = []
+            for (flujo, etapa), m in sorted(self._metricas.items()):
+                filas.append({
+                    "flujo": flujo,
+                    "etapa": etapa,
+                    "conteo": m.conteo,
+                    "errores": m.errores,
+                    "total_s": round(m.suma, 4),
+                    "promedio_s": round(m.suma / m.conteo, 4) if m.conteo else 0.0,
+                })
+            return filas
+
+    def exportar_prometheus(self):
+        """Devuelve las métricas en formato de texto de exposición de Prometheus."""
+        lineas = [
+            "# HELP calculadora_etapa_total Numero de ejecuciones de cada etapa del reporte.",
+            "# TYPE calculadora_etapa_total counter",
+        ]
+        with self._lock:
+            items = sorted(self._metricas.items())
+            for (flujo, etapa), m in items:
+                lineas.append(f'calculadora_etapa_total{{flujo="{flujo}",etapa="{etapa}"}} {m.conteo}')
+
+            lineas += [
+                "# HELP calculadora_etapa_errores_total Numero de ejecuciones de cada etapa que fallaron.",
+                "# TYPE calculadora_etapa_errores_total counter",
+            ]
+            for (flujo, etapa), m in items:
+                lineas.append(f'calculadora_etapa_errores_total{{flujo="{flujo}",etapa="{etapa}"}} {m.errores}')
+
+            lineas += [
+                "# HELP calculadora_etapa_segundos Duracion de cada etapa del reporte en segundos.",
+                "# TYPE calculadora_etapa_segundos histogram",
+            ]
+            for (flujo, etapa), m in items:
+                etiquetas = f'flujo="{flujo}",etapa="{etapa}"'
+                for limite, acumulado in zip(BUCKETS_SEGUNDOS, m.buckets):
+                    lineas.append(f'calculadora_etapa_segundos_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+                lineas.append(f'calculadora_etapa_segundos_bucket{{{etiquetas},le="+Inf"}} {m.conteo}')
+                lineas.append(f'calculadora_etapa_segundos_sum{{{etiquetas}}} {m.suma:.6f}')
+                lineas.append(f'calculadora_etapa_segundos_count{{{etiquetas}}} {m.conteo}')
+        return "\n".join(lineas) + "\n"
+
+    def reiniciar(self):
+        with self._lock:
+            self._metricas.clear()
+            self._recientes.clear()
+
+
+# Registro global del proceso
+registro_tiempos = RegistroTiempos()
+
+
+class ReporteTiempos:
+    """Spans de una única generación de reporte."""
+
+    def __init__(self, flujo, registro=None):
+        self.flujo = flujo
+        self.registro = registro or registro_tiempos
+        self.inicio = datetime.datetime.now()
+        self.etapas = []
+        self._t0 = time.perf_counter()
+        self.duracion_total = None
+        self._etapa_abierta = None
+
+    def iniciar_etapa(self, nombre):
+        """Cierra la etapa en curso (si la hay) y empieza a medir la siguiente."""
+        self.cerrar_etapa()
+        self._etapa_abierta = (nombre, time.perf_counter())
+
+    def cerrar_etapa(self, ok=True):
+        """Cierra la etapa abierta con iniciar_etapa. No hace nada si no hay ninguna."""
+        if self._etapa_abierta is None:
+            return
+        nombre, t0 = self._etapa_abierta
+        self._etapa_abierta = None
+        self.registrar(nombre, time.perf_counter() - t0, ok)
+
+    @contextmanager
+    def etapa(self, nombre):
+        """Mide la duración de una etapa; si lanza excepción se registra como error y se propaga."""
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.registrar(nombre, time.perf_counter() - t0, ok)
+
+    def registrar(self, nombre, duracion, ok=True):
+        """Registra una etapa medida externamente (p. ej. en otro hilo)."""
+        self.etapas.append({"etapa": nombre, "segundos": round(duracion, 6), "ok": ok})
+        self.registro.observar(self.flujo, nombre, duracion, ok)
+
+    def finalizar(self):
+        self.cerrar_etapa()
+        self.duracion_total = time.perf_counter() - self._t0
+        datos = self.como_dict()
+        self.registro.agregar_reporte(datos)
+        _escribir_log(datos)
+        return datos
+
+    def como_dict(self):
+        return {
+            "timestamp": self.inicio.isoformat(timespec="seconds"),
+            "flujo": self.flujo,
+            "total_segundos": round(self.duracion_total, 6) if self.duracion_total is not None else None,
+            "etapas": list(self.etapas),
+        }
+
+
+@contextmanager
+def iniciar_reporte(flujo, registro=None):
+    """
+    Abre un reporte de tiempos; al salir se agrega al registro y al log JSON.
+
+    Si el bloque termina con una excepción, la etapa abierta se registra como fallida.
+    """
+    reporte = ReporteTiempos(flujo, registro)
+    try:
+        yield reporte
+    except BaseException:
+        reporte.cerrar_etapa(ok=False)
+        raise
+    finally:
+        reporte.finalizar()
+
+
+def _escribir_log(datos):
+    """Agrega una línea JSON al log de tiempos. Los errores de escritura no interrumpen el reporte."""
+    ruta = _ruta_log()
+    try:
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with open(ruta, "a", encoding="utf-8") as f:
+            f.write(json.dumps(datos, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"No se pudo escribir el log de tiempos: {e}")
+
+
+# =============================================================================
+# ENDPOINT LOCAL DE MÉTRICAS
+# =============================================================================
+
+_servidor_metricas = None
+_lock_servidor = threading.Lock()
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        cuerpo = registro_tiempos.exportar_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def iniciar_servidor_metricas(puerto=None, host="127.0.0.1"):
+    """
+    Inicia (una sola vez por proceso) un servidor HTTP local que expone /metrics.
+
+    El puerto se toma de la variable de entorno METRICS_PORT si no se indica.
+    Retorna el puerto en uso, o None si está deshabilitado o no se pudo iniciar.
+    """
+    global _servidor_metricas
+    if puerto is None:
+        puerto = os.environ.get("METRICS_PORT")
+    if puerto is None or puerto == "":
+        return None
+
+    with _lock_servidor:
+        if _servidor_metricas is not None:
+            return _servidor_metricas.server_address[1]
+        try:
+            _servidor_metricas = ThreadingHTTPServer((host, int(puerto)), _ManejadorMetricas)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo iniciar el endpoint de métricas: {e}")
+            return None
+        hilo = threading.Thread(target=_servidor_metricas.serve_forever, name="metricas", daemon=True)
+        hilo.start()
+        return _servidor_metricas.server_address[1]
@@ -3,6 +3,8 @@ Utilidades para la interfaz de usuario.
 """
 import streamlit as st
 
+from src.utils.grafo_tareas import ESTADO_INICIADA, ESTADO_COMPLETADA, ESTADO_FALLIDA, ESTADO_OMITIDA
+
 def detect_mobile_device():
     """Función simple para detectar modo móvil"""
     return st.session_state.get('force_mobile', False)
@@ -177,3 +179,33 @@ def detect_device_type():
     </script>
     """, unsafe_allow_html=True)
 
+
+def mostrar_progreso_tarea(status, reporte, evento):
+    """
+    Refleja en un st.status el progreso de una tarea del grafo de generación
+    y registra su duración en el reporte de tiempos.
+    """
+    if evento.estado == ESTADO_INICIADA:
+        status.update(label=f"{evento.etiqueta}... ({evento.completadas}/{evento.total} listas)", state="running")
+    elif evento.estado == ESTADO_COMPLETADA:
+        status.write(f"✅ {evento.etiqueta} ({evento.duracion:.1f} s)")
+        reporte.registrar(evento.nombre, evento.duracion)
+    elif evento.estado == ESTADO_FALLIDA:
+        status.write(f"❌ {evento.etiqueta}: {evento.error}")
+        reporte.registrar(evento.nombre, evento.duracion or 0.0, ok=False)
+    elif evento.estado == ESTADO_OMITIDA:
+        status.write(f"⏭️ {evento.etiqueta} omitida (falló una tarea previa)")
+
+
+def describir_trabajo(trabajo):
+    """Texto corto con el estado de un trabajo de la cola en segundo plano."""
+    estado = trabajo['estado']
+    if estado == 'pendiente' and trabajo['intentos']:
+        return f"⏳ reintentando ({trabajo['intentos']}/{trabajo['max_intentos']}): {trabajo['ultimo_error']}"
+    if estado == 'pendiente':
+        return "⏳ en cola"
+    if estado == 'en_curso':
+        return "🔄 procesando..."
+    if estado == 'fallido':
+        return f"❌ falló tras {trabajo['intentos']} intentos: {trabajo['ultimo_error']}"
+    return "✅ completado"
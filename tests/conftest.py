@@ -90,3 +90,219 @@ def custom_params_conservative():
         'porcentaje_mantenimiento': 0.07,  # 7%
         'performance_ratio_base': 0.70,  # 70%
     }
+
+
+# =============================================================================
+# FAKES DE SERVICIOS EXTERNOS (Drive, Notion)
+# =============================================================================
+
+class _PeticionFake:
+    """Imita el objeto de petición de googleapiclient (se ejecuta con .execute())."""
+
+    def __init__(self, servicio, funcion):
+        self._servicio = servicio
+        self._funcion = funcion
+
+    def execute(self, *args, **kwargs):
+        self._servicio._ida_y_vuelta()
+        return self._funcion()
+
+
+class _LoteFake:
+    """Imita BatchHttpRequest: todas las peticiones agregadas viajan en una sola llamada."""
+
+    def __init__(self, servicio, callback=None):
+        self._servicio = servicio
+        self._callback = callback
+        self._peticiones = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._peticiones.append((request_id or str(len(self._peticiones)), request, callback or self._callback))
+
+    def execute(self, *args, **kwargs):
+        self._servicio._ida_y_vuelta()
+        self._servicio.lotes += 1
+        for request_id, peticion, callback in self._peticiones:
+            try:
+                respuesta, error = peticion._funcion(), None
+            except Exception as e:
+                respuesta, error = None, e
+            if callback is not None:
+                callback(request_id, respuesta, error)
+
+
+class _ArchivosFake:
+    def __init__(self, servicio):
+        self._servicio = servicio
+
+    def create(self, body, media_body=None, fields=None, **kwargs):
+        def _crear():
+            servicio = self._servicio
+            with servicio._lock:
+                servicio._siguiente_id += 1
+                id_archivo = f"id{servicio._siguiente_id}"
+            servicio.archivos[id_archivo] = {
+                'id': id_archivo,
+                'name': body['name'],
+                'mimeType': body.get('mimeType'),
+                'parents': list(body.get('parents', [])),
+                'contenido': media_body.getbytes(0, media_body.size()) if media_body is not None else None,
+                'webViewLink': f"https://drive.fake/{id_archivo}",
+            }
+            return {'id': id_archivo, 'webViewLink': f"https://drive.fake/{id_archivo}"}
+        return _PeticionFake(self._servicio, _crear)
+
+    def update(self, fileId, media_body=None, fields=None, **kwargs):
+        def _actualizar():
+            archivo = self._servicio.archivos[fileId]
+            if media_body is not None:
+                archivo['contenido'] = media_body.getbytes(0, media_body.size())
+            return {'id': fileId, 'webViewLink': archivo['webViewLink']}
+        return _PeticionFake(self._servicio, _actualizar)
+
+    def list(self, q, fields=None, pageSize=None, pageToken=None, **kwargs):
+        import re
+        padre = re.search(r"'([^']+)' in parents", q)
+        nombre = re.search(r"name='((?:[^'\\]|\\.)*)'", q)
+        solo_carpetas = "mimeType='application/vnd.google-apps.folder'" in q
+
+        def _listar():
+            archivos = [
+                {'id': a['id'], 'name': a['name'], 'webViewLink': a['webViewLink']}
+                for a in self._servicio.archivos.values()
+                if (padre is None or padre.group(1) in a['parents'])
+                and (nombre is None or a['name'] == re.sub(r"\\(.)", r"\1", nombre.group(1)))
+                and (not solo_carpetas or a['mimeType'] == 'application/vnd.google-apps.folder')
+            ]
+            tamano = pageSize or 100
+            inicio = int(pageToken or 0)
+            pagina = {'files': archivos[inicio:inicio + tamano]}
+            if inicio + tamano < len(archivos):
+                pagina['nextPageToken'] = str(inicio + tamano)
+            return pagina
+        return _PeticionFake(self._servicio, _listar)
+
+
+class FakeDriveService:
+    """Sustituto en memoria del cliente de Google Drive v3 (files().create/list/update y lotes)."""
+
+    def __init__(self, fallas=0):
+        import threading
+        self.archivos = {}
+        self.llamadas = 0
+        self.lotes = 0
+        self.fallas_pendientes = fallas
+        self._siguiente_id = 0
+        self._lock = threading.Lock()
+
+    def files(self):
+        return _ArchivosFake(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _LoteFake(self, callback)
+
+    def _ida_y_vuelta(self):
+        """Cuenta una petición HTTP al servidor y simula las fallas configuradas."""
+        with self._lock:
+            self.llamadas += 1
+            if self.fallas_pendientes > 0:
+                self.fallas_pendientes -= 1
+                raise ConnectionError("Drive no disponible (fake)")
+
+    def hijos(self, id_padre):
+        return [a for a in self.archivos.values() if id_padre in a['parents']]
+
+    def por_nombre(self, nombre):
+        return [a for a in self.archivos.values() if a['name'] == nombre]
+
+
+class _PaginasNotionFake:
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def create(self, parent, properties):
+        self._cliente._llamada()
+        if not self._cliente.acepta_status and any('status' in v for v in properties.values()):
+            raise ValueError("La propiedad de estado es de tipo select")
+        id_pagina = f"pagina{len(self._cliente.paginas) + 1}"
+        self._cliente.paginas.append({'id': id_pagina, 'parent': parent, 'properties': properties})
+        return {'id': id_pagina}
+
+    def update(self, page_id, properties):
+        self._cliente._llamada()
+        pagina = next(p for p in self._cliente.paginas if p['id'] == page_id)
+        pagina['properties'] = {**pagina['properties'], **properties}
+        return {'id': page_id}
+
+
+def _cumple_filtro(pagina, filtro):
+    """Evalúa un filtro de texto de Notion ({"property": ..., "rich_text": {"contains": ...}})."""
+    valor = pagina['properties'].get(filtro['property'], {})
+    tipo = next(iter(valor), None)
+    if tipo not in ('title', 'rich_text') or tipo not in filtro:
+        return False
+    texto = "".join(t['text']['content'] for t in valor[tipo])
+    (condicion, buscado), = filtro[tipo].items()
+    return buscado in texto if condicion == 'contains' else texto == buscado
+
+
+class _BasesNotionFake:
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def retrieve(self, database_id):
+        self._cliente._llamada()
+        tipo_estado = 'status' if self._cliente.acepta_status else 'select'
+        return {'id': database_id, 'properties': {
+            'Name': {'type': 'title'}, 'Estado': {'type': tipo_estado}, 'Documento': {'type': 'rich_text'},
+            'Direccion': {'type': 'rich_text'}, 'Proyecto': {'type': 'rich_text'}, 'Fecha': {'type': 'date'},
+        }}
+
+    def query(self, database_id, page_size=100, start_cursor=None, filter=None):
+        self._cliente._llamada()
+        self._cliente.consultas.append(filter)
+        paginas = [p for p in self._cliente.paginas if filter is None or _cumple_filtro(p, filter)]
+        inicio = int(start_cursor or 0)
+        resultados = []
+        for pagina in paginas[inicio:inicio + page_size]:
+            propiedades = {}
+            for nombre, valor in pagina['properties'].items():
+                tipo = next(iter(valor))
+                contenido = valor[tipo]
+                if isinstance(contenido, list):
+                    contenido = [{'plain_text': t['text']['content']} for t in contenido]
+                propiedades[nombre] = {'type': tipo, tipo: contenido}
+            resultados.append({'id': pagina['id'], 'properties': propiedades})
+        hay_mas = inicio + page_size < len(paginas)
+        return {'results': resultados, 'has_more': hay_mas, 'next_cursor': str(inicio + page_size) if hay_mas else None}
+
+
+class FakeNotionClient:
+    """Sustituto en memoria de notion_client.Client (pages.create/update y databases.retrieve/query)."""
+
+    def __init__(self, fallas=0, acepta_status=True):
+        self.paginas = []
+        self.llamadas = 0
+        self.consultas = []
+        self.fallas_pendientes = fallas
+        self.acepta_status = acepta_status
+        self.pages = _PaginasNotionFake(self)
+        self.databases = _BasesNotionFake(self)
+
+    def _llamada(self):
+        self.llamadas += 1
+        if self.fallas_pendientes > 0:
+            self.fallas_pendientes -= 1
+            raise ConnectionError("Notion no disponible (fake)")
+
+
+@pytest.fixture
+def fake_drive():
+    """Cliente de Drive falso en memoria"""
+    return FakeDriveService()
+
+
+@pytest.fixture
+def fake_notion():
+    """Cliente de Notion falso en memoria"""
+    return FakeNotionClient()
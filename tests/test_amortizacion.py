@@ -0,0 +1,95 @@
+"""
+Unit tests for amortizacion.py - monthly loan schedules and product comparison.
+"""
+import numpy as np
+import numpy_financial as npf
+import pytest
+
+from src.services.amortizacion import comparar_financiamientos, malla_productos, pagos_anuales, tabla_amortizacion
+from src.services.calculator_service import cotizacion
+
+
+@pytest.fixture
+def argumentos(medium_system_params, default_hsp_medellin):
+    """Argumentos de cotizacion() de un sistema comercial"""
+    return dict(medium_system_params, hsp_lista=default_hsp_medellin)
+
+
+class TestTablaAmortizacion:
+    """Tests for the vectorized amortization schedules."""
+
+    def test_french_schedule(self):
+        tabla = tabla_amortizacion(10_000_000, 0.15, 60)
+        assert tabla["cuota_fija"][0] == pytest.approx(npf.pmt(0.15 / 12, 60, -10_000_000))
+        np.testing.assert_allclose(tabla["interes"][0] + tabla["abono_capital"][0], tabla["cuota"][0])
+        assert tabla["abono_capital"][0].sum() == pytest.approx(10_000_000)
+        assert tabla["saldo"][0][-1] == 0
+        # El interés baja y el abono a capital sube mes a mes
+        assert np.all(np.diff(tabla["interes"][0]) < 0)
+        assert np.all(np.diff(tabla["abono_capital"][0]) > 0)
+
+    def test_grace_period_pays_interest_only(self):
+        tabla = tabla_amortizacion(12_000_000, 0.12, 24, meses_gracia=6)
+        np.testing.assert_allclose(tabla["cuota"][0][:6], 120_000)
+        np.testing.assert_allclose(tabla["saldo"][0][:6], 12_000_000)
+        assert tabla["cuota_fija"][0] == pytest.approx(npf.pmt(0.01, 18, -12_000_000))
+        assert tabla["saldo"][0][-1] == 0
+
+    def test_many_loans_at_once(self):
+        tabla = tabla_amortizacion([1e6, 2e6, 3e6], [0.1, 0.0, 0.2], [12, 24, 36], [0, 0, 3])
+        assert tabla["cuota"].shape == (3, 36)
+        # Sin interés la cuota es el monto entre los meses
+        assert tabla["cuota_fija"][1] == pytest.approx(2e6 / 24)
+        # Los meses después del plazo quedan en cero
+        assert not tabla["cuota"][0][12:].any()
+        np.testing.assert_allclose(tabla["abono_capital"].sum(axis=1), [1e6, 2e6, 3e6])
+
+    def test_invalid_grace(self):
+        with pytest.raises(ValueError):
+            tabla_amortizacion(1e6, 0.1, 12, meses_gracia=12)
+
+
+class TestPagosAnuales:
+    """Tests for bucketing monthly payments into project years."""
+
+    def test_start_month_shifts_payments(self):
+        cuotas = np.ones((1, 24))
+        np.testing.assert_array_equal(pagos_anuales(cuotas, 3), [[12, 12, 0]])
+        np.testing.assert_array_equal(pagos_anuales(cuotas, 3, mes_inicio=6), [[6, 12, 6]])
+
+    def test_payments_after_horizon_go_to_last_year(self):
+        np.testing.assert_array_equal(pagos_anuales(np.ones((1, 36)), 2, mes_inicio=6), [[6, 30]])
+
+
+class TestCompararFinanciamientos:
+    """Tests for the batched loan product comparison."""
+
+    def test_matches_cotizacion_financing(self, argumentos):
+        productos = malla_productos([0.14], [84], [50])
+        comparacion = comparar_financiamientos(productos, **argumentos)
+        esperado = cotizacion(**argumentos, perc_financiamiento=50, tasa_interes_credito=0.14, plazo_credito_años=7)
+        # cotizacion() redondea monto y cuota hacia arriba
+        mejor = comparacion["productos"][0]
+        assert mejor["valor_presente"] == pytest.approx(esperado.valor_presente, rel=1e-6)
+        assert mejor["tasa_interna"] == pytest.approx(esperado.tasa_interna, rel=1e-5)
+        contado = cotizacion(**argumentos)
+        assert comparacion["contado"]["valor_presente"] == pytest.approx(contado.valor_presente, rel=1e-9)
+
+    def test_ranks_products_by_npv(self, argumentos):
+        productos = malla_productos([0.10, 0.16, 0.22], [36, 60, 84], [0, 30], [0, 6])
+        comparacion = comparar_financiamientos(productos, **argumentos, mejores=4)
+        assert comparacion["evaluados"] == 36
+        vpns = [p["valor_presente"] for p in comparacion["productos"]]
+        assert len(vpns) == 4 and vpns == sorted(vpns, reverse=True)
+        # Con tasa de descuento del 10%, la tasa más baja es la mejor
+        assert comparacion["productos"][0]["tasa_anual"] == 0.10
+
+    def test_later_first_payment_raises_npv(self, argumentos):
+        productos = malla_productos([0.14], [60], [20])
+        inmediato = comparar_financiamientos(productos, **argumentos)["productos"][0]
+        diferido = comparar_financiamientos(productos, **argumentos, mes_inicio_credito=6)["productos"][0]
+        assert diferido["valor_presente"] > inmediato["valor_presente"]
+
+    def test_invalid_grid(self):
+        with pytest.raises(ValueError):
+            malla_productos([0.1], [12], [0], [12])
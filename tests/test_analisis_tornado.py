@@ -0,0 +1,76 @@
+"""
+Unit tests for analisis_tornado.py - one-at-a-time sensitivity.
+"""
+import numpy as np
+import pytest
+
+from src.services import analisis_tornado
+from src.services.analisis_tornado import VARIABLES_TORNADO, calcular_analisis_tornado, ordenar_tornado
+from src.services.calculator_service import cotizacion
+
+
+@pytest.fixture
+def argumentos(medium_system_params, default_hsp_medellin):
+    """Argumentos de cotizacion() para un sistema comercial financiado"""
+    return dict(medium_system_params, hsp_lista=default_hsp_medellin, perc_financiamiento=50,
+                tasa_interes_credito=0.14, plazo_credito_años=7)
+
+
+class TestAnalisisTornado:
+    """Tests for the batched tornado analysis."""
+
+    def test_base_and_perturbations_match_cotizacion(self, argumentos):
+        tornado = calcular_analisis_tornado(**argumentos, variacion=0.2)
+        base = cotizacion(**argumentos)
+        assert tornado["vpn_base"] == pytest.approx(base.valor_presente, rel=1e-9)
+        assert tornado["tir_base"] == pytest.approx(base.tasa_interna, rel=1e-8)
+
+        por_variable = {v["variable"]: v for v in tornado["variables"]}
+        tarifa = por_variable["costkWh"]
+        alta = cotizacion(**dict(argumentos, costkWh=argumentos["costkWh"] * 1.2))
+        assert tarifa["vpn_alto"] == pytest.approx(alta.valor_presente, rel=1e-9)
+
+        radiacion = por_variable["escala_hsp"]
+        baja = cotizacion(**dict(argumentos, hsp_lista=[h * 0.8 for h in argumentos["hsp_lista"]]))
+        assert radiacion["tir_bajo"] == pytest.approx(baja.tasa_interna, rel=1e-8)
+
+    def test_all_cases_run_in_one_batch(self, argumentos, monkeypatch):
+        llamadas = []
+        original = analisis_tornado.cotizacion_vectorizada
+
+        def _contar(*args, **kwargs):
+            llamadas.append(1)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(analisis_tornado, "cotizacion_vectorizada", _contar)
+        tornado = calcular_analisis_tornado(**argumentos)
+        assert len(llamadas) == 1
+        assert len(tornado["variables"]) == len(VARIABLES_TORNADO)
+
+    def test_variables_are_ranked_by_impact(self, argumentos):
+        tornado = calcular_analisis_tornado(**argumentos)
+        variables = tornado["variables"]
+        impactos = [v["impacto_vpn"] for v in variables]
+        assert impactos == sorted(impactos, reverse=True)
+        # Más tarifa y menos CAPEX siempre mejoran el VPN
+        por_variable = {v["variable"]: v for v in variables}
+        assert por_variable["costkWh"]["vpn_alto"] > tornado["vpn_base"]
+        assert por_variable["valor_proyecto"]["vpn_bajo"] > por_variable["valor_proyecto"]["vpn_alto"]
+
+        por_tir = ordenar_tornado(variables, "tir")
+        impactos_tir = [v["impacto_tir"] for v in por_tir]
+        assert impactos_tir == sorted(impactos_tir, reverse=True)
+
+    def test_manual_price_is_the_capex_base(self, argumentos):
+        tornado = calcular_analisis_tornado(**argumentos, precio_manual=40_000_000, variacion=0.1)
+        capex = next(v for v in tornado["variables"] if v["variable"] == "valor_proyecto")
+        assert capex["valor_base"] == 40_000_000
+        assert capex["valor_bajo"] == pytest.approx(36_000_000)
+
+    def test_nan_impacts_go_last(self):
+        variables = [{"impacto_tir": np.nan}, {"impacto_tir": 0.01}, {"impacto_tir": 0.03}]
+        assert [v["impacto_tir"] for v in ordenar_tornado(variables, "tir")][:2] == [0.03, 0.01]
+
+    def test_invalid_variation(self, argumentos):
+        with pytest.raises(ValueError):
+            calcular_analisis_tornado(**argumentos, variacion=1.5)
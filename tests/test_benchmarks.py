@@ -0,0 +1,190 @@
+"""
+Benchmarks of the quoting core with regression thresholds.
+
+Opt-in: these tests only run with RUN_BENCHMARKS=1.
+
+    RUN_BENCHMARKS=1 python -m pytest tests/test_benchmarks.py
+
+Each benchmark takes the best of several timed samples (as timeit does) and compares it with the
+stored baseline in tests/benchmarks_baseline.json. A benchmark fails when it
+is slower than the baseline by more than BENCHMARK_TOLERANCIA percent
+(default 50). Run with BENCHMARK_ACTUALIZAR=1 to (re)write the baseline on
+the current machine; that is the only case in which the file is written. A
+benchmark without a baseline entry fails until the baseline is updated.
+"""
+import os
+import json
+import time
+import datetime
+from pathlib import Path
+
+import pytest
+
+from src.services.calculator_service import (
+    cotizacion,
+    calcular_analisis_sensibilidad,
+    generar_csv_flujo_caja_detallado,
+    recomendar_inversor,
+)
+from src.utils.pdf_generator import PropuestaPDF
+from src.utils.contract_generator import generar_contrato_docx
+from src.utils.excel_generator import generar_excel_financiero
+from src.utils.chargers import generar_pdf_cargadores
+
+pytestmark = [
+    pytest.mark.benchmark,
+    pytest.mark.skipif(not os.environ.get("RUN_BENCHMARKS"), reason="Benchmarks deshabilitados (RUN_BENCHMARKS=1)"),
+]
+
+RUTA_BASELINE = Path(__file__).parent / "benchmarks_baseline.json"
+TOLERANCIA_POR_DEFECTO = 50.0
+DURACION_MINIMA_MUESTRA = 0.05
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    """Baseline guardado; solo se reescribe al final si BENCHMARK_ACTUALIZAR está activo"""
+    datos = json.loads(RUTA_BASELINE.read_text(encoding="utf-8")) if RUTA_BASELINE.exists() else {}
+    medidos = {}
+    yield datos, medidos
+    if os.environ.get("BENCHMARK_ACTUALIZAR") and medidos:
+        nuevos = dict(datos, **medidos)
+        RUTA_BASELINE.write_text(json.dumps(dict(sorted(nuevos.items())), indent=2) + "\n", encoding="utf-8")
+
+
+@pytest.fixture
+def medir(baseline):
+    """Mide el mejor tiempo de `repeticiones` muestras y lo compara con el baseline"""
+    datos, medidos = baseline
+    tolerancia = float(os.environ.get("BENCHMARK_TOLERANCIA", TOLERANCIA_POR_DEFECTO))
+
+    def _medir(nombre, funcion, repeticiones=5):
+        # Calentamiento (imports perezosos, fuentes, cachés de archivos) y calibración:
+        # las funciones muy rápidas se agrupan en lotes de al menos DURACION_MINIMA_MUESTRA
+        t0 = time.perf_counter()
+        funcion()
+        primera = time.perf_counter() - t0
+        por_muestra = max(1, int(DURACION_MINIMA_MUESTRA / max(primera, 1e-6)))
+
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            for _ in range(por_muestra):
+                funcion()
+            tiempos.append((time.perf_counter() - t0) / por_muestra)
+        mejor = min(tiempos)
+        medidos[nombre] = round(mejor, 6)
+
+        if os.environ.get("BENCHMARK_ACTUALIZAR"):
+            return mejor
+        referencia = datos.get(nombre)
+        assert referencia is not None, (
+            f"{nombre}: no hay baseline en {RUTA_BASELINE.name} "
+            f"({mejor * 1000:.2f} ms); ejecuta con BENCHMARK_ACTUALIZAR=1 para registrarlo"
+        )
+        limite = referencia * (1 + tolerancia / 100)
+        assert mejor <= limite, (
+            f"{nombre}: {mejor * 1000:.2f} ms supera el baseline {referencia * 1000:.2f} ms "
+            f"en más de {tolerancia:.0f}%"
+        )
+        return mejor
+
+    return _medir
+
+
+def _args(params):
+    return (params['Load'], params['size'], params['quantity'], params['cubierta'], params['clima'],
+            params['index'], params['dRate'], params['costkWh'], params['module'])
+
+
+@pytest.fixture
+def datos_documento():
+    """Datos de propuesta como los arma la interfaz de escritorio"""
+    return {
+        "Nombre del Proyecto": "FV25001 - Cliente Benchmark - Medellín",
+        "Cliente": "Cliente Benchmark",
+        "Valor Total del Proyecto (COP)": "$25,000,000",
+        "Valor Sistema FV (sin IVA)": "$23,000,000",
+        "Valor IVA": "$2,000,000",
+        "Tamano del Sistema (kWp)": "5.0",
+        "Cantidad de Paneles": "10 de 500W",
+        "Área Requerida Aprox. (m²)": "30",
+        "Inversor Recomendado": "1x5kW",
+        "Referencia Inversor": "1x5kW",
+        "Generacion Promedio Mensual (kWh)": "620.0",
+        "Ahorro Estimado Primer Ano (COP)": "6,300,000.00",
+        "TIR (Tasa Interna de Retorno)": "18.5%",
+        "VPN (Valor Presente Neto) (COP)": "12,000,000.00",
+        "Periodo de Retorno (anos)": "4.20",
+        "Tipo de Cubierta": "LÁMINA",
+        "Potencia de Paneles": "500",
+        "Potencia AC Inversor": "5",
+        "Árboles Equivalentes Ahorrados": "12",
+        "CO2 Evitado Anual (Toneladas)": "1.20",
+        "Fecha de la Propuesta": datetime.date(2025, 1, 15),
+    }
+
+
+class TestBenchmarkCalculo:
+    """Benchmarks of the financial model."""
+
+    @pytest.mark.parametrize("sistema", ["small_system_params", "medium_system_params", "large_system_params"])
+    def test_cotizacion(self, medir, request, sistema, default_hsp_medellin):
+        params = request.getfixturevalue(sistema)
+        medir(f"cotizacion[{sistema}]",
+              lambda: cotizacion(*_args(params), hsp_lista=default_hsp_medellin, incluir_carbon=False))
+
+    def test_cotizacion_financiada(self, medir, medium_system_params, default_hsp_medellin):
+        medir("cotizacion_financiada",
+              lambda: cotizacion(*_args(medium_system_params), hsp_lista=default_hsp_medellin,
+                                 perc_financiamiento=70, tasa_interes_credito=0.15,
+                                 plazo_credito_años=5, incluir_carbon=False))
+
+    def test_analisis_sensibilidad(self, medir, medium_system_params, default_hsp_medellin):
+        medir("calcular_analisis_sensibilidad",
+              lambda: calcular_analisis_sensibilidad(*_args(medium_system_params), hsp_lista=default_hsp_medellin),
+              repeticiones=3)
+
+    def test_csv_flujo_caja(self, medir, medium_system_params, default_hsp_medellin):
+        medir("generar_csv_flujo_caja_detallado",
+              lambda: generar_csv_flujo_caja_detallado(*_args(medium_system_params), hsp_lista=default_hsp_medellin))
+
+    def test_recomendar_inversor(self, medir):
+        tamanos = [s / 2 for s in range(2, 401)]  # 1 a 200 kWp
+        medir("recomendar_inversor[1-200kWp]", lambda: [recomendar_inversor(s) for s in tamanos])
+
+
+class TestBenchmarkDocumentos:
+    """Benchmarks of document generation."""
+
+    def test_pdf_propuesta(self, medir, datos_documento):
+        def _generar():
+            pdf = PropuestaPDF(client_name="Cliente Benchmark", project_name=datos_documento["Nombre del Proyecto"],
+                               documento="900123456", direccion="Calle 10 # 20-30", fecha=datetime.date(2025, 1, 15))
+            return pdf.generar(datos_documento, False, usar_cache=False)
+        medir("PropuestaPDF.generar", _generar, repeticiones=3)
+
+    def test_pdf_propuesta_cache(self, medir, datos_documento):
+        def _generar():
+            pdf = PropuestaPDF(client_name="Cliente Benchmark", project_name=datos_documento["Nombre del Proyecto"],
+                               documento="900123456", direccion="Calle 10 # 20-30", fecha=datetime.date(2025, 1, 15))
+            return pdf.generar(datos_documento, False)
+        medir("PropuestaPDF.generar[cache]", _generar)
+
+    def test_contrato_docx(self, medir, datos_documento):
+        contador = iter(range(10**6))
+        # Cambiar el cliente en cada corrida evita medir solo la caché de contratos
+        medir("generar_contrato_docx",
+              lambda: generar_contrato_docx({**datos_documento, "Cliente": f"Cliente {next(contador)}"}))
+
+    def test_excel_financiero(self, medir, medium_system_params, default_hsp_medellin):
+        resultado = cotizacion(*_args(medium_system_params), hsp_lista=default_hsp_medellin, incluir_carbon=False)
+        datos_proyecto = {"Cliente": "Cliente Benchmark", "Proyecto": "FV25001", "Valor Total": resultado[0],
+                          "Tamaño (kWp)": resultado[1], "TIR": resultado[9], "VPN": resultado[8]}
+        medir("generar_excel_financiero",
+              lambda: generar_excel_financiero(datos_proyecto, resultado[5], resultado[7], 25))
+
+    @pytest.mark.skipif(not os.path.exists(os.path.join("assets", "Plantilla_MIRAC_CARGADORES.pdf")),
+                        reason="Plantilla de cargadores no disponible")
+    def test_pdf_cargadores(self, medir):
+        medir("generar_pdf_cargadores", lambda: generar_pdf_cargadores("Cliente Benchmark - Sede", 35))
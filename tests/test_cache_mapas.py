@@ -0,0 +1,92 @@
+"""
+Tests for the content-addressed static map image cache.
+"""
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import location_service
+from src.services.location_service import CacheMapas, clave_mapa, get_static_map_image
+
+IMAGEN = b"\xff\xd8" + b"x" * 2000
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Caché de mapas en un directorio temporal"""
+    return CacheMapas(directorio=str(tmp_path / "mapas"), max_bytes=10_000, max_en_memoria=2)
+
+
+@pytest.fixture
+def descargas(monkeypatch):
+    """Sustituye requests.get y registra las URLs descargadas"""
+    urls = []
+
+    def _get(url, timeout=None):
+        urls.append(url)
+        return SimpleNamespace(status_code=200, content=IMAGEN)
+
+    monkeypatch.setattr(location_service.requests, "get", _get)
+    return urls
+
+
+class TestClaveMapa:
+    """Tests for the map cache key."""
+
+    def test_nearby_coordinates_share_key(self):
+        """Coordinates equal after rounding (~1 m) map to the same image."""
+        assert clave_mapa(6.2000001, -75.5, 16, "600x400", "hybrid", 2) == clave_mapa(6.2, -75.5000004, 16, "600x400", "hybrid", 2)
+
+    def test_parameters_change_key(self):
+        base = clave_mapa(6.2, -75.5, 16, "600x400", "hybrid", 2)
+        assert clave_mapa(6.2, -75.5, 17, "600x400", "hybrid", 2) != base
+        assert clave_mapa(6.2, -75.5, 16, "600x400", "roadmap", 2) != base
+
+
+class TestGetStaticMapImage:
+    """Tests for cached map downloads."""
+
+    def test_repeat_request_does_not_download(self, cache, descargas):
+        """Regenerating a quote for the same place reuses the stored image."""
+        assert get_static_map_image(6.2, -75.5, "clave", cache=cache) == IMAGEN
+        assert get_static_map_image(6.2, -75.5, "otra-clave", cache=cache) == IMAGEN
+        assert len(descargas) == 1
+
+    def test_image_survives_new_process(self, cache, descargas):
+        """A new cache on the same directory (restart) reads the image from disk."""
+        get_static_map_image(6.2, -75.5, "clave", cache=cache)
+        nueva = CacheMapas(directorio=cache.directorio)
+
+        assert get_static_map_image(6.2, -75.5, "clave", cache=nueva) == IMAGEN
+        assert len(descargas) == 1
+
+    def test_error_response_is_not_cached(self, cache, monkeypatch):
+        """Failed downloads return None and are retried next time."""
+        monkeypatch.setattr(location_service.requests, "get",
+                            lambda url, timeout=None: SimpleNamespace(status_code=403, content=b""))
+        assert get_static_map_image(6.2, -75.5, "clave", cache=cache) is None
+        assert not os.path.isdir(cache.directorio) or os.listdir(cache.directorio) == []
+
+
+class TestCacheMapas:
+    """Tests for size-bounded eviction."""
+
+    def test_disk_usage_is_bounded(self, cache):
+        """Past max_bytes the least recently used images are removed."""
+        for i in range(8):
+            cache.guardar(f"clave{i}", IMAGEN)
+            ruta = cache._ruta(f"clave{i}")
+            os.utime(ruta, (1000 + i, 1000 + i))
+        cache.guardar("ultima", IMAGEN)
+
+        en_disco = sorted(os.listdir(cache.directorio))
+        assert sum(os.path.getsize(os.path.join(cache.directorio, n)) for n in en_disco) <= cache.max_bytes
+        assert "ultima.img" in en_disco
+        assert "clave0.img" not in en_disco
+
+    def test_hot_set_is_bounded(self, cache):
+        """Only the most recent images stay in memory."""
+        for i in range(3):
+            cache.guardar(f"clave{i}", IMAGEN)
+        assert list(cache._memoria) == ["clave1", "clave2"]
@@ -0,0 +1,133 @@
+"""
+Tests for the in-process quote result cache.
+"""
+import inspect
+
+import numpy as np
+import pytest
+
+from src.config_parametros import compilar_parametros
+from src.services import cache_resultados
+from src.services.cache_resultados import (
+    CacheResultados,
+    analisis_sensibilidad_en_cache,
+    clave_resultado,
+    cotizacion_en_cache,
+    tamano_aproximado,
+)
+from src.services.calculator_service import cotizacion
+from src.services.resultado_cotizacion import CAMPOS_PEREZOSOS, _Pendiente
+
+
+@pytest.fixture
+def cache():
+    """Caché de resultados vacía para cada test"""
+    return CacheResultados(max_entradas=4, max_bytes=10_000_000)
+
+
+@pytest.fixture
+def llamadas(monkeypatch):
+    """Cuenta las llamadas reales a cotizacion() detrás de la caché"""
+    contador = []
+
+    def _cotizacion(*args, **kwargs):
+        contador.append(1)
+        return cotizacion(*args, **kwargs)
+
+    _cotizacion.__signature__ = inspect.signature(cotizacion)
+    _cotizacion.__name__ = "cotizacion"
+    monkeypatch.setattr(cache_resultados, "cotizacion", _cotizacion)
+    return contador
+
+
+class TestClaveResultado:
+    """Tests for the canonical cache key."""
+
+    def test_positional_and_keyword_arguments_share_key(self, small_system_params):
+        valores = list(small_system_params.values())
+        por_posicion, _ = clave_resultado(cotizacion, valores, {"ciudad": "MEDELLIN"})
+        por_nombre, _ = clave_resultado(cotizacion, (), dict(small_system_params, ciudad="MEDELLIN"))
+        assert por_posicion == por_nombre
+
+    def test_default_params_share_key(self, small_system_params):
+        claves = {
+            clave_resultado(cotizacion, (), dict(small_system_params, ciudad="MEDELLIN", custom_params=custom))[0]
+            for custom in (None, {}, compilar_parametros())
+        }
+        assert len(claves) == 1
+
+    def test_hsp_list_and_params_change_key(self, small_system_params, default_hsp_medellin):
+        base = dict(small_system_params, hsp_lista=default_hsp_medellin)
+        clave, _ = clave_resultado(cotizacion, (), base)
+        assert clave == clave_resultado(cotizacion, (), dict(base, hsp_lista=np.array(default_hsp_medellin)))[0]
+        otra_hsp = [h + 0.1 for h in default_hsp_medellin]
+        assert clave != clave_resultado(cotizacion, (), dict(base, hsp_lista=otra_hsp))[0]
+        assert clave != clave_resultado(cotizacion, (), dict(base, custom_params={"precio_excedentes": 310.0}))[0]
+
+
+class TestCacheResultados:
+    """Tests for LRU eviction and statistics."""
+
+    def test_evicts_least_recently_used_entry(self, cache):
+        for i in range(4):
+            cache.guardar(f"c{i}", i)
+        cache.obtener("c0")
+        cache.guardar("c4", 4)
+        assert cache.obtener("c1") == (False, None)
+        assert cache.obtener("c0") == (True, 0)
+        assert cache.estadisticas()["desalojos"] == 1
+
+    def test_byte_limit(self):
+        cache = CacheResultados(max_entradas=100, max_bytes=3000)
+        cache.guardar("grande", np.zeros(1000))
+        assert cache.estadisticas()["entradas"] == 0
+        for i in range(10):
+            cache.guardar(i, np.zeros(100))
+        stats = cache.estadisticas()
+        assert stats["bytes"] <= 3000
+        assert 0 < stats["entradas"] < 10
+
+    def test_hit_rate_by_function(self, cache):
+        cache.guardar("a", 1)
+        cache.obtener("a", "cotizacion")
+        cache.obtener("b", "cotizacion")
+        cache.obtener("c", "calcular_analisis_sensibilidad")
+        stats = cache.estadisticas()
+        assert stats["aciertos"] == 1 and stats["fallos"] == 2
+        assert stats["por_funcion"][1] == {"funcion": "cotizacion", "aciertos": 1, "fallos": 1, "tasa_aciertos": 0.5}
+
+
+class TestCotizacionEnCache:
+    """Tests for the memoized quote wrappers."""
+
+    def test_identical_inputs_are_computed_once(self, cache, llamadas, small_system_params, default_hsp_medellin):
+        primero = cotizacion_en_cache(**small_system_params, hsp_lista=default_hsp_medellin, cache=cache)
+        segundo = cotizacion_en_cache(*small_system_params.values(), hsp_lista=list(default_hsp_medellin), cache=cache)
+        assert segundo is primero
+        assert len(llamadas) == 1
+        assert tuple(primero) == tuple(cotizacion(**small_system_params, hsp_lista=default_hsp_medellin))
+
+    def test_lazy_fields_are_evaluated_before_storing(self, cache, small_system_params, default_hsp_medellin):
+        """The cached result holds values, not closures over cotizacion()'s frame, and is not mutable."""
+        argumentos = dict(small_system_params, ciudad="MEDELLIN", hsp_lista=default_hsp_medellin, incluir_carbon=True)
+        resultado = cotizacion_en_cache(**argumentos, cache=cache)
+        for campo in CAMPOS_PEREZOSOS:
+            assert not isinstance(object.__getattribute__(resultado, f"_{campo}"), _Pendiente)
+        assert cache.estadisticas()["bytes"] == tamano_aproximado(resultado)
+
+        resultado.carbon_data.clear()
+        otra_sesion = cotizacion_en_cache(**argumentos, cache=cache)
+        assert otra_sesion.carbon_data
+        assert otra_sesion.carbon_data == cotizacion(**argumentos).carbon_data
+
+    def test_sensitivity_returns_independent_copies(self, cache, small_system_params, default_hsp_medellin):
+        primero = analisis_sensibilidad_en_cache(**small_system_params, hsp_lista=default_hsp_medellin, cache=cache)
+        primero.clear()
+        segundo = analisis_sensibilidad_en_cache(**small_system_params, hsp_lista=default_hsp_medellin, cache=cache)
+        assert len(segundo) == 4
+        assert cache.estadisticas()["aciertos"] == 1
+
+    def test_errors_are_not_cached(self, cache, small_system_params):
+        with pytest.raises(ValueError):
+            cotizacion_en_cache(**small_system_params, custom_params={"performance_ratio_base": 2}, cache=cache)
+        assert cache.estadisticas()["entradas"] == 0
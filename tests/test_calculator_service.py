@@ -660,4 +660,84 @@ class TestFinancialCalculationsAccuracy:
         lcoe = result[13]  # LCOE
         
         # LCOE for solar in Colombia should be between 100-600 COP/kWh
-        assert 100 < lcoe < 600, f"LCOE {lcoe} COP/kWh seems out of range"
\ No newline at end of file
+        assert 100 < lcoe < 600, f"LCOE {lcoe} COP/kWh seems out of range"
+
+
+# =============================================================================
+# Tests for the columnar detailed cash flow
+# =============================================================================
+
+class TestFlujoCajaDetallado:
+    """Tests for calcular_flujo_caja_detallado and its Parquet/Feather/CSV export."""
+
+    @pytest.fixture
+    def columnas(self, small_system_params, default_hsp_medellin):
+        """Flujo detallado de un sistema residencial con crédito y beneficios tributarios."""
+        from src.services.calculator_service import calcular_flujo_caja_detallado
+        return calcular_flujo_caja_detallado(
+            **small_system_params, hsp_lista=default_hsp_medellin,
+            perc_financiamiento=50, tasa_interes_credito=0.12, plazo_credito_años=5,
+            incluir_beneficios_tributarios=True, incluir_deduccion_renta=True,
+            incluir_depreciacion_acelerada=True,
+        )
+
+    def test_columns_are_typed_arrays(self, columnas):
+        from src.services.calculator_service import TIPOS_FLUJO_CAJA_DETALLADO
+        assert list(columnas) == list(TIPOS_FLUJO_CAJA_DETALLADO)
+        for nombre, valores in columnas.items():
+            assert valores.dtype == np.dtype(TIPOS_FLUJO_CAJA_DETALLADO[nombre])
+            assert len(valores) == 26
+        assert columnas['Año'].tolist() == list(range(26))
+
+    def test_metrics_match_row_by_row_definition(self, columnas, small_system_params):
+        """Surplus and accumulated flow follow the per-year definitions."""
+        load = small_system_params['Load']
+        generacion_año1 = columnas['Generación_Anual_kWh'][1]
+        assert columnas['Consumo_Anual_kWh'][1] == load * 12
+        assert columnas['Excedentes_Vendidos_kWh'][1] >= max(0.0, generacion_año1 - load * 12) - 1e-6
+        np.testing.assert_allclose(columnas['Flujo_Acumulado_COP'], np.cumsum(columnas['Flujo_Neto_Anual_COP']))
+        # Crédito a 5 años y beneficios: depreciación en años 1-3, deducción en el año 2
+        assert (columnas['Cuotas_Credito_COP'][1:6] > 0).all() and (columnas['Cuotas_Credito_COP'][6:] == 0).all()
+        assert (columnas['Beneficio_Depreciacion_Acelerada_COP'][1:4] > 0).all()
+        assert np.flatnonzero(columnas['Beneficio_Deduccion_Renta_COP'][1:]).tolist() == [1]
+        assert np.isnan(columnas['Beneficio_Tributario_Total_COP'][0])
+
+    @pytest.mark.parametrize("formato", ["parquet", "feather"])
+    def test_columnar_export_keeps_types(self, columnas, formato):
+        pa = pytest.importorskip("pyarrow")
+        import io
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+        from src.services.calculator_service import exportar_flujo_caja
+
+        contenido = exportar_flujo_caja(columnas, formato)
+        leer = pq.read_table if formato == "parquet" else feather.read_table
+        tabla = leer(io.BytesIO(contenido))
+
+        assert tabla.schema.field('Año').type == pa.int64()
+        assert tabla.schema.field('Flujo_Neto_Anual_COP').type == pa.float64()
+        assert tabla.column('Beneficio_Tributario_Total_COP').null_count == 1
+        np.testing.assert_array_equal(tabla.column('VPN_Parcial_COP').to_numpy(), columnas['VPN_Parcial_COP'])
+
+    @pytest.mark.parametrize("archivo, cambios", [
+        ("flujo_caja_legacy_credito.csv", dict(
+            perc_financiamiento=50, tasa_interes_credito=0.12, plazo_credito_años=5,
+            incluir_beneficios_tributarios=True, incluir_deduccion_renta=True, incluir_depreciacion_acelerada=True)),
+        ("flujo_caja_legacy_sin_excedentes.csv", dict(Load=800, precio_manual=20000000)),
+    ])
+    def test_csv_export_is_the_legacy_csv(self, small_system_params, default_hsp_medellin, archivo, cambios):
+        """The CSV matches, byte for byte, the output captured from the row-by-row implementation."""
+        from pathlib import Path
+        from src.services.calculator_service import (
+            calcular_flujo_caja_detallado, exportar_flujo_caja, generar_csv_flujo_caja_detallado)
+
+        legado = (Path(__file__).parent / archivo).read_bytes()
+        argumentos = dict(small_system_params, hsp_lista=default_hsp_medellin, **cambios)
+        assert exportar_flujo_caja(calcular_flujo_caja_detallado(**argumentos), "csv") == legado
+        assert generar_csv_flujo_caja_detallado(**argumentos).encode("utf-8") == legado
+
+    def test_unknown_format(self, columnas):
+        from src.services.calculator_service import exportar_flujo_caja
+        with pytest.raises(ValueError):
+            exportar_flujo_caja(columnas, "xls")
+
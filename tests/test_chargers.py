@@ -0,0 +1,83 @@
+"""
+Unit tests for chargers.py - EV charger quote engine with a cached template.
+"""
+import io
+
+import pytest
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from src.utils import chargers
+from src.utils.chargers import MotorCotizacionCargadores, obtener_motor_cargadores, cotizacion_cargadores_costos
+
+
+@pytest.fixture
+def plantilla(tmp_path):
+    """Plantilla sintética de 3 páginas (la real no se distribuye con el repositorio)."""
+    ruta = tmp_path / "plantilla_cargadores.pdf"
+    c = canvas.Canvas(str(ruta), pagesize=letter)
+    for i in range(3):
+        c.drawString(72, 700, f"PLANTILLA PAGINA {i + 1}")
+        c.showPage()
+    c.save()
+    return str(ruta)
+
+
+def _texto_paginas(pdf_bytes):
+    return [p.extract_text() for p in PdfReader(io.BytesIO(pdf_bytes)).pages]
+
+
+class TestMotorCotizacionCargadores:
+    """Tests for the cached template and overlay engine."""
+
+    def test_quote_overlays_dynamic_text(self, plantilla):
+        """Pages 1-2 get name, date and amounts on top of the template; page 3 is untouched."""
+        pdf_bytes, desglose = MotorCotizacionCargadores(plantilla).generar("Sede Norte", 20)
+        paginas = _texto_paginas(pdf_bytes)
+        costo_total = cotizacion_cargadores_costos(20)[3]
+
+        assert len(paginas) == 3
+        assert "PLANTILLA PAGINA 1" in paginas[0] and "Sede Norte" in paginas[0]
+        assert f"{costo_total:,.0f}" in paginas[0]
+        assert f"${desglose['IVA (19% sobre Subtotal)']:,.0f}" in paginas[1]
+        assert paginas[2].strip() == "PLANTILLA PAGINA 3"
+
+    def test_cached_template_is_not_modified(self, plantilla):
+        """Consecutive quotes from one engine do not carry over previous overlays."""
+        motor = MotorCotizacionCargadores(plantilla)
+        motor.generar("Cliente Uno", 10)
+        segunda = _texto_paginas(motor.generar("Cliente Dos", 10)[0])
+
+        assert "Cliente Dos" in segunda[0]
+        assert "Cliente Uno" not in segunda[0]
+
+    def test_batch_matches_individual_quotes(self, plantilla):
+        """A fleet batch yields one document per site, in order."""
+        motor = MotorCotizacionCargadores(plantilla)
+        sitios = [("Sede A", 10, None), ("Sede B", 40, None), ("Sede C", 5, 9_000_000)]
+        resultados = motor.generar_lote(sitios)
+
+        assert len(resultados) == 3
+        for (nombre, distancia, precio), (pdf_bytes, desglose) in zip(sitios, resultados):
+            assert nombre in _texto_paginas(pdf_bytes)[0]
+            assert desglose["Costo Total"] == pytest.approx(cotizacion_cargadores_costos(distancia, precio)[3])
+
+    def test_template_must_have_three_pages(self, tmp_path):
+        ruta = tmp_path / "corta.pdf"
+        c = canvas.Canvas(str(ruta), pagesize=letter)
+        c.showPage()
+        c.save()
+        with pytest.raises(ValueError):
+            MotorCotizacionCargadores(str(ruta))
+
+    def test_engine_is_reused_until_template_changes(self, plantilla, monkeypatch):
+        """The template is parsed once per file version."""
+        monkeypatch.setattr(chargers, "_motores", {})
+        motor = obtener_motor_cargadores(plantilla)
+        assert obtener_motor_cargadores(plantilla) is motor
+
+        import os
+        info = os.stat(plantilla)
+        os.utime(plantilla, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000_000))
+        assert obtener_motor_cargadores(plantilla) is not motor
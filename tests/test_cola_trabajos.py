@@ -0,0 +1,212 @@
+"""
+Tests for the SQLite-backed background job queue (Drive and Notion side effects).
+"""
+import time
+import datetime
+
+import pytest
+
+from src.services.cola_trabajos import (
+    ColaTrabajos, crear_manejador_drive, crear_manejador_notion, encolar_drive, encolar_notion,
+    ESTADO_PENDIENTE, ESTADO_COMPLETADO, ESTADO_FALLIDO, TIPO_DRIVE, TIPO_NOTION,
+)
+from src.services.drive_service import crear_proyecto_en_drive
+from src.config import ESTRUCTURA_CARPETAS
+from src.utils.helpers import numero_propuesta
+
+
+class RelojFake:
+    """Reloj controlable para probar la espera entre reintentos"""
+
+    def __init__(self):
+        self.ahora = 1_000_000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj():
+    return RelojFake()
+
+
+@pytest.fixture
+def cola(tmp_path, reloj, fake_drive, fake_notion):
+    """Cola con manejadores conectados a los fakes de Drive y Notion"""
+    return ColaTrabajos(
+        ruta=str(tmp_path / "cola.db"),
+        manejadores={
+            TIPO_DRIVE: crear_manejador_drive(lambda: fake_drive),
+            TIPO_NOTION: crear_manejador_notion(lambda: fake_notion, database_id="db-crm"),
+        },
+        max_intentos=3,
+        backoff_base=10.0,
+        reloj=reloj,
+    )
+
+
+def _encolar_propuesta(cola, pdf=b"%PDF-1.4 propuesta", nombre="FV25007 - Cliente Prueba - Medellin"):
+    return encolar_drive("carpeta-padre", nombre, pdf, f"{nombre}.pdf", b"docx", f"Contrato - {nombre}.docx", cola=cola)
+
+
+class TestColaTrabajos:
+    """Tests for enqueueing, processing, retries and idempotency."""
+
+    def test_drive_job_creates_folder_tree_and_uploads(self, cola, fake_drive):
+        """A processed Drive job leaves the project tree and both files in Drive."""
+        id_trabajo = _encolar_propuesta(cola)
+        assert cola.procesar_pendientes() == 1
+
+        trabajo = cola.obtener(id_trabajo)
+        assert trabajo["estado"] == ESTADO_COMPLETADO
+        assert trabajo["propuesta"] == "FV25007"
+        assert trabajo["resultado"]["link_carpeta"].startswith("https://drive.fake/")
+
+        carpeta = fake_drive.por_nombre("FV25007 - Cliente Prueba - Medellin")[0]
+        assert {a["name"] for a in fake_drive.hijos(carpeta["id"])} == set(ESTRUCTURA_CARPETAS)
+        destino = fake_drive.por_nombre("01_Propuesta_y_Contratacion")[0]
+        assert len(fake_drive.hijos(destino["id"])) == 2
+
+    def test_same_proposal_is_not_enqueued_twice(self, cola, fake_drive):
+        """Double-clicking with identical data reuses the job."""
+        primero = _encolar_propuesta(cola)
+        segundo = _encolar_propuesta(cola)
+        assert primero == segundo
+        cola.procesar_pendientes()
+        _encolar_propuesta(cola)
+        assert cola.procesar_pendientes() == 0
+        assert len(fake_drive.por_nombre("FV25007 - Cliente Prueba - Medellin")) == 1
+
+    def test_updated_proposal_replaces_files_in_same_folder(self, cola, fake_drive):
+        """A new PDF for the same proposal updates the existing files."""
+        _encolar_propuesta(cola, pdf=b"%PDF v1")
+        cola.procesar_pendientes()
+        _encolar_propuesta(cola, pdf=b"%PDF v2")
+        cola.procesar_pendientes()
+
+        assert len(fake_drive.por_nombre("FV25007 - Cliente Prueba - Medellin")) == 1
+        pdfs = fake_drive.por_nombre("FV25007 - Cliente Prueba - Medellin.pdf")
+        assert len(pdfs) == 1 and pdfs[0]["contenido"] == b"%PDF v2"
+
+    def test_changed_payload_updates_the_pending_job(self, cola, fake_drive):
+        """A regenerated PDF before processing updates the one job instead of adding another."""
+        primero = _encolar_propuesta(cola, pdf=b"%PDF v1")
+        segundo = _encolar_propuesta(cola, pdf=b"%PDF v2")
+        assert primero == segundo
+        assert cola.procesar_pendientes() == 1
+        assert len(cola.listar()) == 1
+        pdfs = fake_drive.por_nombre("FV25007 - Cliente Prueba - Medellin.pdf")
+        assert len(pdfs) == 1 and pdfs[0]["contenido"] == b"%PDF v2"
+
+    def test_changed_notion_date_does_not_add_a_page(self, cola, fake_notion):
+        """Re-registering a proposal with another date keeps a single Notion job and page."""
+        encolar_notion("Cliente", "123", "Calle 1", "FV25010 - Cliente", "2025-01-15", cola=cola)
+        encolar_notion("Cliente", "123", "Calle 1", "FV25010 - Cliente", "2025-01-16", cola=cola)
+        cola.procesar_pendientes()
+        assert len(cola.listar()) == 1
+        assert len(fake_notion.paginas) == 1
+
+    def test_payload_changed_while_running_is_processed_again(self, tmp_path, reloj):
+        """An update that arrives while the job runs is applied right after it finishes."""
+        vistos = []
+
+        def _manejar(payload):
+            vistos.append(payload["version"])
+            if len(vistos) == 1:
+                cola.encolar("prueba", {"version": 2}, "FV25011")
+            return {}
+
+        cola = ColaTrabajos(ruta=str(tmp_path / "cola.db"), manejadores={"prueba": _manejar}, reloj=reloj)
+        id_trabajo = cola.encolar("prueba", {"version": 1}, "FV25011")
+        assert cola.procesar_pendientes() == 2
+        assert vistos == [1, 2]
+        assert cola.obtener(id_trabajo)["estado"] == ESTADO_COMPLETADO
+
+    def test_failures_are_retried_with_backoff(self, cola, fake_drive, reloj):
+        """A transient failure is retried only after the backoff delay."""
+        fake_drive.fallas_pendientes = 1
+        id_trabajo = _encolar_propuesta(cola)
+
+        cola.procesar_pendientes()
+        trabajo = cola.obtener(id_trabajo)
+        assert trabajo["estado"] == ESTADO_PENDIENTE
+        assert trabajo["intentos"] == 1
+        assert "ConnectionError" in trabajo["ultimo_error"]
+
+        assert cola.procesar_pendientes() == 0  # Aún en espera
+        reloj.ahora += 15
+        assert cola.procesar_pendientes() == 1
+        assert cola.obtener(id_trabajo)["estado"] == ESTADO_COMPLETADO
+        assert len(fake_drive.por_nombre("FV25007 - Cliente Prueba - Medellin")) == 1
+
+    def test_job_fails_after_max_attempts_and_can_be_retried(self, cola, fake_notion, reloj):
+        """After max_intentos the job is marked failed; reintentar re-queues it."""
+        fake_notion.fallas_pendientes = 10
+        id_trabajo = encolar_notion("Cliente", "123", "Calle 1", "FV25008 - Cliente", datetime.date(2025, 1, 15), cola=cola)
+        for _ in range(3):
+            cola.procesar_pendientes()
+            reloj.ahora += 1000
+        assert cola.obtener(id_trabajo)["estado"] == ESTADO_FALLIDO
+
+        fake_notion.fallas_pendientes = 0
+        assert cola.reintentar(id_trabajo)
+        cola.procesar_pendientes()
+        trabajo = cola.obtener(id_trabajo)
+        assert trabajo["estado"] == ESTADO_COMPLETADO
+        assert trabajo["resultado"]["ok"]
+        assert len(fake_notion.paginas) == 1
+
+    def test_notion_select_status_column(self, cola, fake_notion):
+        """Databases whose status column is a select get the record on the first try."""
+        fake_notion.acepta_status = False
+        id_trabajo = encolar_notion("Cliente", "123", "Calle 1", "FV25009 - Cliente", "2025-01-15", cola=cola)
+        cola.procesar_pendientes()
+        assert cola.obtener(id_trabajo)["resultado"]["ok"]
+        assert fake_notion.paginas[0]["properties"]["Estado"] == {"select": {"name": "En conversaciones"}}
+
+    def test_jobs_survive_restart(self, tmp_path, reloj, fake_drive):
+        """Pending and interrupted jobs are picked up by a new queue on the same file."""
+        ruta = str(tmp_path / "cola.db")
+        cola = ColaTrabajos(ruta=ruta, reloj=reloj)
+        id_trabajo = _encolar_propuesta(cola)
+        cola._reclamar()  # Simula un proceso que se cae a mitad del trabajo
+
+        reiniciada = ColaTrabajos(ruta=ruta, manejadores={TIPO_DRIVE: crear_manejador_drive(lambda: fake_drive)}, reloj=reloj)
+        assert reiniciada.obtener(id_trabajo)["estado"] == ESTADO_PENDIENTE
+        assert reiniciada.procesar_pendientes() == 1
+        assert reiniciada.obtener(id_trabajo)["estado"] == ESTADO_COMPLETADO
+
+    def test_worker_threads_process_in_background(self, tmp_path, fake_drive):
+        """iniciar() processes jobs without blocking the caller."""
+        cola = ColaTrabajos(ruta=str(tmp_path / "cola.db"),
+                            manejadores={TIPO_DRIVE: crear_manejador_drive(lambda: fake_drive)})
+        cola.iniciar()
+        try:
+            id_trabajo = _encolar_propuesta(cola)
+            limite = time.time() + 5
+            while cola.obtener(id_trabajo)["estado"] != ESTADO_COMPLETADO and time.time() < limite:
+                time.sleep(0.02)
+            assert cola.obtener(id_trabajo)["estado"] == ESTADO_COMPLETADO
+        finally:
+            cola.detener()
+
+    def test_numero_propuesta(self):
+        assert numero_propuesta("FV25012 - Cliente - Rionegro") == "FV25012"
+        assert numero_propuesta("Cliente - Proyecto") == "Cliente - Proyecto"
+        # Desde la propuesta 1000 del año el número tiene cuatro dígitos
+        assert numero_propuesta("FV251000 - Cliente") == "FV251000"
+
+
+class TestCrearProyectoEnDrive:
+    """Tests for the retry-safe Drive routine used by the queue."""
+
+    def test_partial_tree_is_completed_on_retry(self, fake_drive):
+        """If a previous attempt left the folder half-built, missing subfolders are created."""
+        carpeta = fake_drive.files().create(body={
+            'name': "FV25010 - Cliente", 'mimeType': 'application/vnd.google-apps.folder', 'parents': ["padre"]
+        }).execute()
+
+        crear_proyecto_en_drive(fake_drive, "padre", "FV25010 - Cliente", b"pdf", "p.pdf", b"docx", "c.docx")
+
+        assert len(fake_drive.por_nombre("FV25010 - Cliente")) == 1
+        assert {a["name"] for a in fake_drive.hijos(carpeta["id"])} == set(ESTRUCTURA_CARPETAS)
@@ -0,0 +1,88 @@
+"""
+Unit tests for config_parametros.py - compiled parameter bundles.
+"""
+import pickle
+
+import pytest
+
+from src.config_parametros import (
+    DEFAULT_PARAMS,
+    ParametrosCompilados,
+    compilar_parametros,
+    get_param,
+)
+from src.services.calculator_service import calcular_analisis_sensibilidad, cotizacion
+
+
+class TestCompilarParametros:
+    """Tests for compilar_parametros and ParametrosCompilados."""
+
+    def test_merges_defaults_with_custom_values(self):
+        params = compilar_parametros({'precio_excedentes': 450.0})
+        assert params['precio_excedentes'] == 450.0
+        assert params['porcentaje_om_anual'] == DEFAULT_PARAMS['porcentaje_om_anual']
+        assert len(params) == len(DEFAULT_PARAMS)
+
+    def test_get_param_reads_the_bundle(self):
+        params = compilar_parametros({'performance_ratio_base': 0.8})
+        assert get_param('performance_ratio_base', params) == 0.8
+        assert get_param('tasa_degradacion_anual', params) == DEFAULT_PARAMS['tasa_degradacion_anual']
+        assert get_param('no_existe', params) == 0
+
+    def test_compiling_a_bundle_returns_it_unchanged(self):
+        params = compilar_parametros()
+        assert compilar_parametros(params) is params
+
+    def test_hashable_and_usable_as_cache_key(self):
+        a = compilar_parametros({'precio_excedentes': 350.0})
+        b = compilar_parametros({'precio_excedentes': 350.0})
+        c = compilar_parametros({'precio_excedentes': 360.0})
+        assert a == b and hash(a) == hash(b)
+        assert a != c
+        cache = {a: 'resultado'}
+        assert cache[b] == 'resultado'
+        assert c not in cache
+
+    def test_is_immutable(self):
+        params = compilar_parametros()
+        with pytest.raises(TypeError):
+            params['precio_excedentes'] = 0
+        with pytest.raises(AttributeError):
+            params._valores = {}
+        assert not hasattr(params, '__dict__')
+
+    def test_pickle_round_trip(self):
+        params = compilar_parametros({'porcentaje_mantenimiento': 0.07})
+        copia = pickle.loads(pickle.dumps(params))
+        assert copia == params and hash(copia) == hash(params)
+        assert isinstance(copia, ParametrosCompilados)
+
+    def test_validation_lists_every_out_of_range_parameter(self):
+        with pytest.raises(ValueError) as excinfo:
+            compilar_parametros({'precio_excedentes': -1, 'performance_ratio_base': 0.99})
+        mensaje = str(excinfo.value)
+        assert 'precio_excedentes' in mensaje
+        assert 'performance_ratio_base' in mensaje
+
+
+class TestCalculosConParametrosCompilados:
+    """Calculations give the same results with a dict or a compiled bundle."""
+
+    def test_cotizacion_matches_plain_dict(self, small_system_params, default_hsp_medellin):
+        custom = {'precio_excedentes': 400.0, 'tasa_degradacion_anual': 0.004, 'porcentaje_mantenimiento': 0.08}
+        con_dict = cotizacion(**small_system_params, hsp_lista=default_hsp_medellin, custom_params=custom)
+        compilado = cotizacion(**small_system_params, hsp_lista=default_hsp_medellin,
+                               custom_params=compilar_parametros(custom))
+        assert tuple(con_dict) == tuple(compilado)
+
+    def test_invalid_dict_is_rejected_by_cotizacion(self, small_system_params, default_hsp_medellin):
+        with pytest.raises(ValueError):
+            cotizacion(**small_system_params, hsp_lista=default_hsp_medellin,
+                       custom_params={'porcentaje_mantenimiento': 0.5})
+
+    def test_sensitivity_accepts_bundle(self, small_system_params, default_hsp_medellin):
+        params = compilar_parametros({'precio_excedentes': 250.0})
+        resultados = calcular_analisis_sensibilidad(**small_system_params, hsp_lista=default_hsp_medellin,
+                                                    custom_params=params)
+        assert resultados == calcular_analisis_sensibilidad(**small_system_params, hsp_lista=default_hsp_medellin,
+                                                            custom_params={'precio_excedentes': 250.0})
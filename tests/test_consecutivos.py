@@ -0,0 +1,180 @@
+"""
+Tests for the persistent project-number allocator and the paginated Drive scan.
+"""
+import threading
+
+import pytest
+
+from src.services.consecutivos import AsignadorConsecutivos
+from src.services.drive_service import maximo_consecutivo_en_drive
+
+
+class RelojFake:
+    """Reloj controlable para probar el vencimiento de la reconciliación"""
+
+    def __init__(self):
+        self.ahora = 1_000_000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj():
+    return RelojFake()
+
+
+@pytest.fixture
+def asignador(tmp_path, reloj):
+    """Asignador respaldado por un archivo SQLite temporal"""
+    return AsignadorConsecutivos(ruta=str(tmp_path / "consecutivos.db"), reconciliar_cada=3600, reloj=reloj)
+
+
+def _crear_carpeta(fake_drive, nombre, padre="padre"):
+    return fake_drive.files().create(body={
+        'name': nombre, 'mimeType': 'application/vnd.google-apps.folder', 'parents': [padre]
+    }).execute()
+
+
+class TestAsignadorConsecutivos:
+    """Tests for reserve-next semantics."""
+
+    def test_reserve_is_sequential_and_persistent(self, asignador, tmp_path):
+        """Numbers increase by one and survive reopening the database."""
+        assert asignador.siguiente("25") == 1
+        assert [asignador.reservar("25") for _ in range(3)] == [1, 2, 3]
+
+        reabierto = AsignadorConsecutivos(ruta=asignador.ruta)
+        assert reabierto.siguiente("25") == 4
+
+    def test_years_are_independent(self, asignador):
+        """Each year has its own counter."""
+        asignador.reservar("25")
+        assert asignador.reservar("26") == 1
+
+    def test_same_key_keeps_its_number(self, asignador):
+        """Regenerating the same proposal does not burn a new number."""
+        primero = asignador.reservar("25", clave="sesion:Cliente A")
+        otro = asignador.reservar("25", clave="sesion:Cliente B")
+
+        assert asignador.reservar("25", clave="sesion:Cliente A") == primero
+        assert otro == primero + 1
+
+    def test_concurrent_reservations_never_collide(self, asignador):
+        """Threads reserving at the same time receive distinct numbers."""
+        numeros = []
+        lock = threading.Lock()
+
+        def _reservar():
+            for _ in range(20):
+                numero = asignador.reservar("25")
+                with lock:
+                    numeros.append(numero)
+
+        hilos = [threading.Thread(target=_reservar) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert sorted(numeros) == list(range(1, 81))
+
+
+class TestReconciliacion:
+    """Tests for reconciling the local counter with Drive."""
+
+    def test_reconcile_only_moves_forward(self, asignador):
+        """The counter jumps to the Drive maximum but never goes back."""
+        assert asignador.reconciliar("25", 41) == 41
+        assert asignador.reservar("25") == 42
+        assert asignador.reconciliar("25", 10) == 42
+
+    def test_reconciliation_expires(self, asignador, reloj):
+        """A reconciliation is fresh until the configured interval passes."""
+        assert asignador.necesita_reconciliar("25")
+        asignador.reconciliar("25", 0)
+        assert not asignador.necesita_reconciliar("25")
+
+        reloj.ahora += 3600
+        assert asignador.necesita_reconciliar("25")
+
+    def test_background_reconciliation_runs_once(self, asignador):
+        """The scan runs in a thread and is skipped while the result is fresh."""
+        llamadas = []
+
+        def _escanear():
+            llamadas.append(1)
+            return 7
+
+        hilo = asignador.reconciliar_en_segundo_plano("25", _escanear)
+        asignador.esperar_reconciliacion("25", timeout=5)
+
+        assert hilo is not None
+        assert asignador.siguiente("25") == 8
+        assert asignador.reconciliar_en_segundo_plano("25", _escanear) is None
+        assert len(llamadas) == 1
+
+    def test_failed_scan_keeps_counter(self, asignador):
+        """A Drive error leaves the counter untouched and the reconciliation pending."""
+        def _falla():
+            raise ConnectionError("Drive no disponible")
+
+        asignador.reconciliar_en_segundo_plano("25", _falla)
+        asignador.esperar_reconciliacion("25", timeout=5)
+
+        assert asignador.siguiente("25") == 1
+        assert asignador.necesita_reconciliar("25")
+        assert not asignador.verificado("25")
+        assert "Drive no disponible" in asignador.error_reconciliacion("25")
+
+    def test_unverified_counter_refuses_new_numbers(self, asignador):
+        """After a failed scan no new number is issued until a scan succeeds."""
+        asignador.reconciliar("25", 40)
+        asignador.reservar("25", clave="borrador-1", exigir_reconciliacion=True)
+        asignador.registrar_fallo_reconciliacion("25", ConnectionError("Drive no disponible"))
+
+        with pytest.raises(RuntimeError, match="Drive no disponible"):
+            asignador.reservar("25", clave="borrador-2", exigir_reconciliacion=True)
+        # Un borrador que ya tenía número lo conserva
+        assert asignador.reservar("25", clave="borrador-1", exigir_reconciliacion=True) == 41
+
+        asignador.reconciliar("25", 45)
+        assert asignador.verificado("25")
+        assert asignador.reservar("25", clave="borrador-2", exigir_reconciliacion=True) == 46
+
+    def test_never_reconciled_counter_is_not_verified(self, asignador):
+        """A fresh host cannot issue numbers from its local counter when Drive is required."""
+        with pytest.raises(RuntimeError):
+            asignador.reservar("25", exigir_reconciliacion=True)
+        assert asignador.reservar("25") == 1
+
+
+class TestMaximoConsecutivoEnDrive:
+    """Tests for the paginated Drive scan."""
+
+    def test_scan_pages_past_first_page(self, fake_drive, monkeypatch):
+        """Folders beyond the first page are counted (no silent 1000-item cap)."""
+        lista_original = type(fake_drive.files()).list
+
+        def _lista_paginada(self, q, pageSize=None, **kwargs):
+            return lista_original(self, q, pageSize=2, **kwargs)
+
+        monkeypatch.setattr(type(fake_drive.files()), "list", _lista_paginada)
+        for numero in (3, 1, 12, 5, 9):
+            _crear_carpeta(fake_drive, f"FV25{numero:03d} - Cliente {numero}")
+        _crear_carpeta(fake_drive, "FV24099 - Año anterior")
+        fake_drive.llamadas = 0
+
+        assert maximo_consecutivo_en_drive(fake_drive, "padre", "25") == 12
+        assert fake_drive.llamadas == 3
+
+    def test_four_digit_numbers_are_supported(self, fake_drive):
+        """Past 999 projects the number keeps growing."""
+        _crear_carpeta(fake_drive, "FV25999 - Cliente")
+        _crear_carpeta(fake_drive, "FV251000 - Cliente")
+
+        assert maximo_consecutivo_en_drive(fake_drive, "padre", "25") == 1000
+
+    def test_empty_parent_returns_zero(self, fake_drive):
+        """Without project folders the scan returns 0."""
+        assert maximo_consecutivo_en_drive(fake_drive, "padre", "25") == 0
@@ -0,0 +1,124 @@
+"""
+Unit tests for contract_generator.py - Compiled DOCX contract template.
+"""
+import io
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from docx import Document
+
+from src.utils import contract_generator
+from src.utils.contract_generator import PlantillaCompilada, generar_contrato_docx, generar_contratos_docx
+
+
+@pytest.fixture
+def datos_contrato():
+    """Datos de contrato tal como los arma la interfaz."""
+    return {
+        "Cliente": "Cliente & Hijos <SAS>",
+        "Documento del Cliente": "900123456",
+        "Dirección del Proyecto": "Calle 10 # 5-20",
+        "Tamano del Sistema (kWp)": "5.0",
+        "Cantidad de Paneles": "10 de 500W",
+        "Potencia de Paneles": "500",
+        "Inversor Recomendado": "1x5kW",
+        "Valor Total del Proyecto (COP)": "$25,000,000",
+        "Fecha de la Propuesta": datetime.date(2025, 3, 4),
+    }
+
+
+def _docx_con_placeholders_partidos():
+    """DOCX con un placeholder partido en tres runs, otro en una tabla y otro en el encabezado."""
+    doc = Document()
+    parrafo = doc.add_paragraph("Cliente: ")
+    parrafo.add_run("{{NOM")
+    parrafo.add_run("BRE_CLI").bold = True
+    parrafo.add_run("ENTE}} firma.")
+    tabla = doc.add_table(rows=1, cols=1)
+    tabla.cell(0, 0).text = "Valor {{VALOR}}"
+    doc.sections[0].header.paragraphs[0].text = "Contrato {{NUMERO}}"
+    salida = io.BytesIO()
+    doc.save(salida)
+    return salida.getvalue()
+
+
+def _texto(docx_bytes):
+    doc = Document(io.BytesIO(docx_bytes))
+    partes = [p.text for p in doc.paragraphs]
+    partes += [c.text for t in doc.tables for fila in t.rows for c in fila.cells]
+    partes += [p.text for p in doc.sections[0].header.paragraphs]
+    return "\n".join(partes)
+
+
+class TestPlantillaCompilada:
+    """Tests for placeholder indexing and XML substitution."""
+
+    def test_finds_split_table_and_header_placeholders(self):
+        """Placeholders split across runs, in tables and in headers are indexed."""
+        plantilla = PlantillaCompilada(_docx_con_placeholders_partidos())
+        assert plantilla.placeholders == {"NOMBRE_CLIENTE", "VALOR", "NUMERO"}
+
+    def test_fill_replaces_everywhere(self):
+        """Every indexed placeholder is replaced and surrounding text is kept."""
+        plantilla = PlantillaCompilada(_docx_con_placeholders_partidos())
+        texto = _texto(plantilla.rellenar({"NOMBRE_CLIENTE": "Ana", "VALOR": "$10", "NUMERO": "FV25001"}))
+
+        assert "Cliente: Ana firma." in texto
+        assert "Valor $10" in texto
+        assert "Contrato FV25001" in texto
+        assert "{{" not in texto
+
+    def test_missing_values_keep_placeholder(self):
+        """Placeholders without a value are left untouched."""
+        plantilla = PlantillaCompilada(_docx_con_placeholders_partidos())
+        texto = _texto(plantilla.rellenar({"VALOR": "$10"}))
+        assert "{{NOMBRE_CLIENTE}}" in texto
+
+    def test_values_are_xml_escaped(self):
+        """Special characters in values do not break the document."""
+        plantilla = PlantillaCompilada(_docx_con_placeholders_partidos())
+        texto = _texto(plantilla.rellenar({"NOMBRE_CLIENTE": "A & B <C>", "VALOR": "", "NUMERO": ""}))
+        assert "Cliente: A & B <C> firma." in texto
+
+
+class TestGenerarContratoDocx:
+    """Tests for contract generation from the real template."""
+
+    def test_real_template_is_fully_filled(self, datos_contrato):
+        texto = _texto(generar_contrato_docx(datos_contrato))
+
+        assert "Cliente & Hijos <SAS>" in texto
+        assert "4 de marzo de 2025" in texto
+        assert "VEINTICINCO MILLONES PESOS M/CTE" in texto
+        assert "{{" not in texto
+
+    def test_template_is_compiled_once(self, datos_contrato, monkeypatch):
+        """Bulk generation parses the template a single time."""
+        contract_generator._plantillas.clear()
+        compilaciones = []
+        original = PlantillaCompilada.desde_archivo.__func__
+
+        def _espia(cls, ruta):
+            compilaciones.append(ruta)
+            return original(cls, ruta)
+
+        monkeypatch.setattr(PlantillaCompilada, "desde_archivo", classmethod(_espia))
+        contratos = generar_contratos_docx([{**datos_contrato, "Cliente": f"Cliente {i}"} for i in range(5)])
+
+        assert len(compilaciones) == 1
+        assert all(contratos)
+        assert "Cliente 3" in _texto(contratos[3])
+
+    def test_cache_is_safe_across_threads(self, datos_contrato, monkeypatch):
+        """Concurrent sessions hitting and evicting the contract cache do not corrupt it."""
+        monkeypatch.setattr(contract_generator, "MAX_CONTRATOS_CACHE", 4)
+        contract_generator._cache_contratos.clear()
+        lote = [{**datos_contrato, "Cliente": f"Cliente {i % 12}"} for i in range(120)]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            contratos = list(pool.map(generar_contrato_docx, lote))
+
+        assert all(contratos)
+        assert len(contract_generator._cache_contratos) <= 4
+        assert "Cliente 7" in _texto(contratos[7])
@@ -0,0 +1,85 @@
+"""
+Tests for the Drive sync layer: batched folder-tree creation and parallel uploads.
+"""
+import pytest
+
+from src.services.drive_service import crear_subcarpetas, crear_proyecto_en_drive, subir_archivos_en_paralelo
+from src.config import ESTRUCTURA_CARPETAS
+
+
+ESTRUCTURA_ANIDADA = {
+    "01_Propuesta": {},
+    "04_UPME": {"Planos": {}, "Memorias": {"Firmadas": {}}},
+}
+
+
+class TestCrearSubcarpetas:
+    """Tests for batched folder-tree creation."""
+
+    def test_flat_tree_is_created_in_one_batch(self, fake_drive):
+        """All first-level folders travel in a single HTTP round-trip."""
+        ids = crear_subcarpetas(fake_drive, "padre", ESTRUCTURA_CARPETAS)
+
+        assert fake_drive.llamadas == 1
+        assert set(ids) == set(ESTRUCTURA_CARPETAS)
+        assert {a["name"] for a in fake_drive.hijos("padre")} == set(ESTRUCTURA_CARPETAS)
+
+    def test_nested_tree_uses_one_batch_per_level(self, fake_drive):
+        """Each depth level is one batch and returned IDs match the created folders."""
+        ids = crear_subcarpetas(fake_drive, "padre", ESTRUCTURA_ANIDADA)
+
+        assert fake_drive.lotes == 3
+        assert set(ids) == {"01_Propuesta", "04_UPME", "04_UPME/Planos", "04_UPME/Memorias", "04_UPME/Memorias/Firmadas"}
+        assert fake_drive.archivos[ids["04_UPME/Memorias/Firmadas"]]["parents"] == [ids["04_UPME/Memorias"]]
+        assert fake_drive.archivos[ids["04_UPME/Planos"]]["parents"] == [ids["04_UPME"]]
+
+    def test_batch_transport_failure_propagates(self, fake_drive):
+        """A failed batch raises so the queue can retry the job."""
+        fake_drive.fallas_pendientes = 1
+        with pytest.raises(ConnectionError):
+            crear_subcarpetas(fake_drive, "padre", ESTRUCTURA_CARPETAS)
+
+
+class TestCrearProyectoEnDriveLotes:
+    """Tests for round-trip counts of the full project creation."""
+
+    def test_new_project_does_not_relist_destination(self, fake_drive):
+        """New project: lookup, folder, one batch and one request per file."""
+        crear_proyecto_en_drive(fake_drive, "padre", "FV25011 - Cliente", b"pdf", "p.pdf", b"docx", "c.docx",
+                                "a;b\n1;2\n", "flujo.csv")
+
+        assert fake_drive.llamadas == 6
+        destino = fake_drive.por_nombre("01_Propuesta_y_Contratacion")[0]
+        archivos = {a["name"]: a["contenido"] for a in fake_drive.hijos(destino["id"])}
+        assert archivos == {"p.pdf": b"pdf", "c.docx": b"docx", "flujo.csv": b"a;b\n1;2\n"}
+
+    def test_csv_is_optional(self, fake_drive):
+        """Without CSV only the PDF and the contract are uploaded."""
+        crear_proyecto_en_drive(fake_drive, "padre", "FV25012 - Cliente", b"pdf", "p.pdf", b"docx", "c.docx")
+
+        destino = fake_drive.por_nombre("01_Propuesta_y_Contratacion")[0]
+        assert {a["name"] for a in fake_drive.hijos(destino["id"])} == {"p.pdf", "c.docx"}
+
+
+class TestSubirArchivosEnParalelo:
+    """Tests for parallel uploads to a single folder."""
+
+    def test_existing_files_are_replaced(self, fake_drive):
+        """With reemplazar=True, a file with the same name is updated instead of duplicated."""
+        subir_archivos_en_paralelo(fake_drive, "carpeta", [("a.pdf", b"v1", "application/pdf")])
+        subir_archivos_en_paralelo(fake_drive, "carpeta", [
+            ("a.pdf", b"v2", "application/pdf"),
+            ("b.docx", b"docx", "application/octet-stream"),
+        ])
+
+        archivos = {a["name"]: a["contenido"] for a in fake_drive.hijos("carpeta")}
+        assert archivos == {"a.pdf": b"v2", "b.docx": b"docx"}
+
+    def test_upload_error_propagates(self, fake_drive):
+        """A failed upload raises instead of being swallowed by the worker thread."""
+        fake_drive.fallas_pendientes = 1
+        with pytest.raises(ConnectionError):
+            subir_archivos_en_paralelo(fake_drive, "carpeta", [
+                ("a.pdf", b"pdf", "application/pdf"),
+                ("b.pdf", b"pdf", "application/pdf"),
+            ], reemplazar=False)
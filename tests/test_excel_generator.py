@@ -0,0 +1,96 @@
+"""
+Unit tests for excel_generator.py - streaming portfolio export.
+"""
+import io
+import zipfile
+import tracemalloc
+from datetime import date, datetime
+
+import openpyxl
+import pytest
+
+from src.utils.excel_generator import generar_excel_portafolio, _columna
+
+
+def _proyectos(n, horizonte=25):
+    """Genera n proyectos sintéticos sin materializar la lista."""
+    for i in range(n):
+        datos = {
+            'cliente': f'Cliente {i}',
+            'proyecto': f'FV25{i:04d} - Cliente {i} - Medellín',
+            'tamano_kwp': 10.5,
+            'valor_proyecto': 50_000_000 + i,
+            'tir': 0.18,
+            'vpn': 12_000_000 + i,
+            'payback': 4.7,
+        }
+        yield datos, [-50_000_000] + [7_000_000] * horizonte, [1_000 + i] * 12
+
+
+class TestExcelPortafolio:
+    """Tests for generar_excel_portafolio."""
+
+    def test_writes_one_row_per_project_and_total_rows(self):
+        contenido = generar_excel_portafolio(_proyectos(5), horizonte=25)
+        wb = openpyxl.load_workbook(io.BytesIO(contenido))
+
+        resumen = wb['Portafolio']
+        assert resumen['A3'].value == 'Cliente 0'
+        assert resumen['I7'].value == 12_000_004
+        assert resumen['A8'].value is None
+
+        flujos = wb['Flujos de Caja']
+        assert flujos['B2'].value == 'Año 0'
+        assert flujos['AA2'].value == 'Año 25'
+        assert flujos['B3'].value == -50_000_000
+        assert flujos['A8'].value == 'Total Portafolio'
+        assert flujos['C8'].value == '=SUM(C3:C7)'
+
+        generacion = wb['Generación Mensual']
+        assert generacion['M4'].value == 1_001
+        assert generacion['N4'].value == '=SUM(B4:M4)'
+        assert generacion['B8'].value == '=SUM(B3:B7)'
+
+    def test_dates_are_written_as_iso_text(self):
+        proyectos = [
+            ({'cliente': 'A', 'fecha': date(2025, 3, 7)}, [-1, 1], [1] * 12),
+            ({'cliente': 'B', 'fecha': datetime(2025, 11, 20, 9, 30)}, [-1, 1], [1] * 12),
+            ({'cliente': 'C', 'fecha': '2025-12-01'}, [-1, 1], [1] * 12),
+        ]
+        wb = openpyxl.load_workbook(io.BytesIO(generar_excel_portafolio(proyectos, horizonte=1)))
+
+        resumen = wb['Portafolio']
+        assert [resumen[f'C{fila}'].value for fila in (3, 4, 5)] == ['2025-03-07', '2025-11-20', '2025-12-01']
+
+    def test_consumes_generator_and_writes_to_path(self, tmp_path):
+        ruta = tmp_path / 'portafolio.xlsx'
+        assert generar_excel_portafolio(_proyectos(30), horizonte=25, destino=str(ruta)) == 30
+        assert openpyxl.load_workbook(ruta)['Portafolio'].max_row == 32
+
+    def test_empty_portfolio_has_headers_only(self, tmp_path):
+        """Without projects no total rows are written (they would sum themselves)."""
+        ruta = tmp_path / 'vacio.xlsx'
+        assert generar_excel_portafolio(iter([]), horizonte=25, destino=str(ruta)) == 0
+
+        wb = openpyxl.load_workbook(ruta)
+        for hoja in ('Portafolio', 'Flujos de Caja', 'Generación Mensual'):
+            assert wb[hoja].max_row == 2
+        with zipfile.ZipFile(ruta) as archivo:
+            assert not [nombre for nombre in archivo.namelist() if nombre.startswith('xl/charts/')]
+
+    def test_memory_does_not_grow_with_projects(self, tmp_path):
+        """Peak memory for 1000 projects stays close to the peak for 100."""
+        def pico(n):
+            tracemalloc.start()
+            try:
+                generar_excel_portafolio(_proyectos(n), horizonte=25, destino=str(tmp_path / f'{n}.xlsx'))
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        pico(10)  # Calentamiento: importaciones y cachés de xlsxwriter
+        assert pico(1000) < 2 * pico(100)
+
+    @pytest.mark.parametrize('indice, letras', [(0, 'A'), (25, 'Z'), (26, 'AA'), (27, 'AB'), (701, 'ZZ'), (702, 'AAA')])
+    def test_column_letters(self, indice, letras):
+        assert _columna(indice) == letras
@@ -0,0 +1,78 @@
+"""
+Unit tests for flujo_mensual.py - monthly-resolution cash flow.
+"""
+import numpy as np
+import pytest
+
+from src.services.calculator_service import cotizacion
+from src.services.flujo_mensual import flujo_caja_mensual
+
+
+@pytest.fixture
+def argumentos(medium_system_params, default_hsp_medellin):
+    """Argumentos de cotizacion() para un sistema comercial financiado"""
+    return dict(medium_system_params, hsp_lista=default_hsp_medellin, perc_financiamiento=50,
+                tasa_interes_credito=0.14, plazo_credito_años=7)
+
+
+class TestFlujoCajaMensual:
+    """Tests for the monthly cash-flow model."""
+
+    def test_yearly_sums_match_cotizacion_without_escalation(self, argumentos):
+        sin_indexacion = dict(argumentos, index=0, tasa_degradacion=0)
+        mensual = flujo_caja_mensual(**sin_indexacion)
+        anual = cotizacion(**sin_indexacion)
+        assert len(mensual["flujo_caja"]) == 25 * 12 + 1
+        # cotizacion() redondea la cuota hacia arriba
+        np.testing.assert_allclose(mensual["flujo_anual"], anual.flujo_caja, rtol=1e-5)
+        assert mensual["valor_proyecto_total"] == anual.valor_proyecto_total
+
+    def test_monthly_escalation_and_discounting(self, argumentos):
+        mensual = flujo_caja_mensual(**argumentos)
+        np.testing.assert_allclose(mensual["tarifa"][12], argumentos["costkWh"] * 1.05)
+        assert mensual["tarifa"][1] > mensual["tarifa"][0]
+        # Con tasa de descuento cero el VPN es la suma del flujo
+        sin_descuento = flujo_caja_mensual(**dict(argumentos, dRate=0))
+        assert sin_descuento["valor_presente"] == pytest.approx(sin_descuento["flujo_caja"].sum())
+        # La TIR anual es la mensual compuesta
+        assert mensual["tasa_interna"] == pytest.approx((1 + mensual["tasa_interna_mensual"]) ** 12 - 1)
+        tasa = mensual["tasa_interna_mensual"]
+        flujo = mensual["flujo_caja"]
+        assert (flujo / (1 + tasa) ** np.arange(len(flujo))).sum() == pytest.approx(0, abs=1e-3)
+
+    def test_commissioning_delay(self, argumentos):
+        argumentos = dict(argumentos, tasa_degradacion=0.01)
+        inmediato = flujo_caja_mensual(**argumentos)
+        demorado = flujo_caja_mensual(**argumentos, mes_puesta_en_marcha=6)
+        assert not demorado["generacion"][:6].any() and not demorado["ahorro"][:6].any()
+        assert demorado["generacion"][6] == pytest.approx(inmediato["generacion"][6] / 0.99 ** 0.5)
+        assert demorado["valor_presente"] < inmediato["valor_presente"]
+        # Las cuotas se pagan aunque el sistema no opere
+        assert demorado["cuota_credito"][0] > 0
+        assert flujo_caja_mensual(**argumentos, demora_6_meses=True)["valor_presente"] == \
+            pytest.approx(demorado["valor_presente"])
+
+    def test_calendar_month_picks_the_hsp(self, argumentos):
+        argumentos = dict(argumentos, tasa_degradacion=0)
+        enero = flujo_caja_mensual(**argumentos)
+        julio = flujo_caja_mensual(**argumentos, mes_calendario_inicio=7)
+        assert julio["generacion"][0] == pytest.approx(enero["generacion"][6])
+        assert julio["generacion"][6] == pytest.approx(enero["generacion"][0])
+
+    def test_loan_payments(self, argumentos):
+        mensual = flujo_caja_mensual(**argumentos, mes_inicio_credito=3)
+        cuotas = mensual["cuota_credito"]
+        assert not cuotas[:3].any()
+        assert np.count_nonzero(cuotas) == 84
+        assert cuotas[3] == pytest.approx(cotizacion(**argumentos).cuota_mensual_credito, abs=1)
+
+    def test_payments_after_horizon_are_settled_in_the_last_month(self, argumentos):
+        mensual = flujo_caja_mensual(**dict(argumentos, horizonte_tiempo=5))
+        cuotas = mensual["cuota_credito"]
+        assert cuotas[-1] > 20 * cuotas[0]
+        assert len(cuotas) == 60
+
+    def test_manual_price(self, argumentos):
+        mensual = flujo_caja_mensual(**argumentos, precio_manual=40_000_000)
+        assert mensual["valor_proyecto_total"] == 40_000_000
+        assert mensual["flujo_caja"][0] == -20_000_000
@@ -0,0 +1,167 @@
+"""
+Tests for the persistent geocoding cache and the Nominatim rate limiter.
+"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.location_service import (
+    CacheGeocodificacion, LimitadorTasa, normalizar_direccion, geocodificar_google, geocodificar_nominatim,
+    PROVEEDOR_GOOGLE, TTL_NO_ENCONTRADA_SEGUNDOS,
+)
+
+
+class RelojFake:
+    """Reloj controlable; dormir() avanza el tiempo en lugar de esperar"""
+
+    def __init__(self):
+        self.ahora = 1_000_000.0
+        self.esperas = []
+
+    def __call__(self):
+        return self.ahora
+
+    def dormir(self, segundos):
+        self.esperas.append(segundos)
+        self.ahora += segundos
+
+
+class GmapsFake:
+    """Cliente de Google Maps falso que cuenta las consultas"""
+
+    def __init__(self, resultados=None):
+        self.resultados = resultados or {}
+        self.consultas = []
+
+    def geocode(self, address, region=None):
+        self.consultas.append(address)
+        coords = self.resultados.get(address)
+        if coords is None:
+            return []
+        return [{'geometry': {'location': {'lat': coords[0], 'lng': coords[1]}}, 'formatted_address': address}]
+
+
+@pytest.fixture
+def reloj():
+    return RelojFake()
+
+
+@pytest.fixture
+def cache(tmp_path, reloj):
+    """Caché de geocodificación en un archivo SQLite temporal"""
+    return CacheGeocodificacion(ruta=str(tmp_path / "geo.db"), max_entradas=3, reloj=reloj)
+
+
+class TestNormalizarDireccion:
+    """Tests for address normalization."""
+
+    def test_equivalent_spellings_share_a_key(self):
+        """Abbreviations, accents, punctuation and spacing do not change the key."""
+        assert normalizar_direccion("Cl. 77 Sur #40-168, Sabaneta") == \
+            normalizar_direccion("CALLE 77 sur No. 40 - 168 sabaneta")
+        assert normalizar_direccion("Carrera 43A # 1-50, Medellín") == normalizar_direccion("cra 43a #1 - 50 medellin")
+
+    def test_different_addresses_differ(self):
+        assert normalizar_direccion("Cl 10 # 5-20") != normalizar_direccion("Cr 10 # 5-20")
+
+
+class TestCacheGeocodificacion:
+    """Tests for the on-disk LRU cache."""
+
+    def test_repeat_lookup_hits_cache(self, cache):
+        """A repeated address (even spelled differently) does not call the provider again."""
+        gmaps = GmapsFake({"Calle 10 # 5-20, Medellín": (6.2, -75.5)})
+
+        assert geocodificar_google(gmaps, "Calle 10 # 5-20, Medellín", cache=cache) == (6.2, -75.5)
+        assert geocodificar_google(gmaps, "cl. 10 No. 5 - 20 medellin", cache=cache) == (6.2, -75.5)
+        assert len(gmaps.consultas) == 1
+
+    def test_cache_is_shared_through_disk(self, cache, tmp_path):
+        """Another instance on the same file (another session) sees the entry."""
+        cache.guardar(PROVEEDOR_GOOGLE, "cl 1 # 2-3", (1.0, 2.0))
+        otra = CacheGeocodificacion(ruta=cache.ruta)
+
+        assert otra.obtener(PROVEEDOR_GOOGLE, "cl 1 # 2-3") == (True, (1.0, 2.0))
+
+    def test_least_recently_used_is_evicted(self, cache, reloj):
+        """Past max_entradas the entry used longest ago is dropped."""
+        for i, clave in enumerate(["a", "b", "c"]):
+            reloj.ahora += 1
+            cache.guardar(PROVEEDOR_GOOGLE, clave, (i, i))
+        reloj.ahora += 1
+        cache.obtener(PROVEEDOR_GOOGLE, "a")
+        reloj.ahora += 1
+        cache.guardar(PROVEEDOR_GOOGLE, "d", (3, 3))
+
+        assert len(cache) == 3
+        assert cache.obtener(PROVEEDOR_GOOGLE, "b") == (False, None)
+        assert cache.obtener(PROVEEDOR_GOOGLE, "a")[0]
+
+    def test_not_found_is_cached_temporarily(self, cache, reloj):
+        """Unknown addresses are not re-queried until the negative TTL expires."""
+        gmaps = GmapsFake()
+        geocodificar_google(gmaps, "Dirección inexistente", cache=cache)
+        geocodificar_google(gmaps, "Dirección inexistente", cache=cache)
+        assert len(gmaps.consultas) == 1
+
+        reloj.ahora += TTL_NO_ENCONTRADA_SEGUNDOS
+        geocodificar_google(gmaps, "Dirección inexistente", cache=cache)
+        assert len(gmaps.consultas) == 2
+
+
+class TestLimitadorTasa:
+    """Tests for the token-bucket limiter."""
+
+    def test_requests_are_spaced_one_second_apart(self, reloj):
+        """With 1 request/second, consecutive acquisitions wait one second each."""
+        limitador = LimitadorTasa(1.0, reloj=reloj, dormir=reloj.dormir)
+        inicio = reloj.ahora
+        for _ in range(3):
+            limitador.adquirir()
+
+        assert reloj.ahora - inicio == pytest.approx(2.0)
+
+    def test_idle_time_refills_up_to_capacity(self, reloj):
+        """Tokens accumulate while idle but never beyond the bucket capacity."""
+        limitador = LimitadorTasa(1.0, capacidad=2, reloj=reloj, dormir=reloj.dormir)
+        reloj.ahora += 60
+
+        assert limitador.adquirir() == 0
+        assert limitador.adquirir() == 0
+        assert limitador.adquirir() == pytest.approx(1.0)
+
+    def test_limit_holds_across_threads(self):
+        """Threads sharing the limiter are throttled together."""
+        import time
+        limitador = LimitadorTasa(20.0)
+        limitador.adquirir()
+        inicio = time.monotonic()
+        hilos = [threading.Thread(target=limitador.adquirir) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert time.monotonic() - inicio >= 4 / 20.0 * 0.9
+
+
+class TestGeocodificarNominatim:
+    """Tests for the cached, rate-limited Nominatim lookup."""
+
+    def test_only_cache_misses_consume_tokens(self, cache, reloj):
+        """Cached answers skip both the geocoder and the limiter."""
+        consultas = []
+
+        class GeolocalizadorFake:
+            def geocode(self, address, timeout=None):
+                consultas.append(address)
+                return SimpleNamespace(latitude=6.1, longitude=-75.6, address=address)
+
+        limitador = LimitadorTasa(1.0, reloj=reloj, dormir=reloj.dormir)
+        for _ in range(3):
+            assert geocodificar_nominatim("Cl 5 # 1-1", cache=cache, limitador=limitador,
+                                          geolocalizador=GeolocalizadorFake()) == (6.1, -75.6)
+
+        assert len(consultas) == 1
+        assert reloj.esperas == []
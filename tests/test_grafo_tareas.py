@@ -0,0 +1,125 @@
+"""
+Tests for the task-graph executor used by the report side effects.
+"""
+import time
+import threading
+
+import pytest
+
+from src.utils.grafo_tareas import (
+    GrafoTareas, ESTADO_INICIADA, ESTADO_COMPLETADA, ESTADO_FALLIDA, ESTADO_OMITIDA
+)
+
+
+class TestGrafoTareas:
+    """Tests for GrafoTareas."""
+
+    def test_dependencies_receive_results_by_name(self):
+        """A task gets the results of its dependencies as keyword args."""
+        grafo = GrafoTareas()
+        grafo.agregar("a", lambda: 2)
+        grafo.agregar("b", lambda: 3)
+        grafo.agregar("suma", lambda a, b: a + b, depende_de=("a", "b"))
+        assert grafo.ejecutar()["suma"] == 5
+
+    def test_independent_tasks_run_concurrently(self):
+        """Wall-clock approaches the slowest task, not the sum."""
+        grafo = GrafoTareas(max_workers=4)
+        for nombre in ("pdf", "contrato", "csv", "notion"):
+            grafo.agregar(nombre, lambda: time.sleep(0.2))
+        t0 = time.perf_counter()
+        grafo.ejecutar()
+        assert time.perf_counter() - t0 < 0.6
+
+    def test_dependent_task_waits(self):
+        """A dependent task starts only after its dependency finished."""
+        orden = []
+        grafo = GrafoTareas()
+        grafo.agregar("pdf", lambda: (time.sleep(0.05), orden.append("pdf")))
+        grafo.agregar("drive", lambda pdf: orden.append("drive"), depende_de=("pdf",))
+        grafo.ejecutar()
+        assert orden == ["pdf", "drive"]
+
+    def test_failure_skips_dependents_only(self):
+        """A failing task skips its dependents; independent tasks still run."""
+        def _falla():
+            raise RuntimeError("sin red")
+
+        grafo = GrafoTareas()
+        grafo.agregar("pdf", _falla)
+        grafo.agregar("drive", lambda pdf: "link", depende_de=("pdf",))
+        grafo.agregar("notion", lambda: (True, "ok"))
+        resultados = grafo.ejecutar()
+
+        assert isinstance(grafo.errores["pdf"], RuntimeError)
+        assert isinstance(grafo.errores["drive"], RuntimeError)
+        assert resultados == {"notion": (True, "ok")}
+
+    def test_skipped_required_task_reports_failed_dependency(self):
+        """A required task skipped by a failed dependency raises an error naming that dependency."""
+        def _falla():
+            raise ConnectionError("mapa no disponible")
+
+        grafo = GrafoTareas()
+        grafo.agregar("mapa", _falla)
+        grafo.agregar("pdf", lambda mapa: b"pdf", depende_de=("mapa",))
+        grafo.agregar("firma", lambda pdf: "ok", depende_de=("pdf",))
+        grafo.ejecutar()
+
+        assert "pdf" not in grafo.resultados
+        with pytest.raises(RuntimeError, match="falló 'mapa'") as info:
+            raise grafo.errores["pdf"]
+        assert isinstance(info.value.__cause__, ConnectionError)
+        assert "falló 'pdf'" in str(grafo.errores["firma"])
+
+    def test_progress_callback_runs_in_caller_thread(self):
+        """Progress events are delivered on the calling thread with durations."""
+        eventos = []
+        hilo = threading.get_ident()
+        grafo = GrafoTareas()
+        grafo.agregar("a", lambda: None, etiqueta="Tarea A")
+        grafo.agregar("b", lambda a: None, depende_de=("a",))
+        grafo.ejecutar(al_progresar=lambda e: eventos.append((e.nombre, e.estado, threading.get_ident(), e)))
+
+        assert [(n, est) for n, est, _, _ in eventos] == [
+            ("a", ESTADO_INICIADA), ("a", ESTADO_COMPLETADA), ("b", ESTADO_INICIADA), ("b", ESTADO_COMPLETADA)]
+        assert all(h == hilo for _, _, h, _ in eventos)
+        assert eventos[0][3].etiqueta == "Tarea A"
+        assert eventos[1][3].duracion is not None
+        assert eventos[-1][3].completadas == eventos[-1][3].total == 2
+
+    def test_failure_and_skip_events(self):
+        eventos = []
+        grafo = GrafoTareas()
+        grafo.agregar("a", lambda: 1 / 0)
+        grafo.agregar("b", lambda a: None, depende_de=("a",))
+        grafo.ejecutar(al_progresar=lambda e: eventos.append((e.nombre, e.estado)))
+        assert ("a", ESTADO_FALLIDA) in eventos
+        assert ("b", ESTADO_OMITIDA) in eventos
+
+    def test_inline_runs_on_caller_thread(self):
+        """Inline mode runs every task on the calling thread, in dependency order."""
+        hilos, orden = [], []
+        grafo = GrafoTareas(en_linea=True)
+        grafo.agregar("pdf", lambda: (hilos.append(threading.get_ident()), orden.append("pdf"))[1])
+        grafo.agregar("drive", lambda pdf: (hilos.append(threading.get_ident()), orden.append("drive"))[1],
+                      depende_de=("pdf",))
+        grafo.agregar("falla", lambda: 1 / 0)
+        grafo.agregar("omitida", lambda falla: None, depende_de=("falla",))
+        grafo.ejecutar()
+
+        assert hilos == [threading.get_ident()] * 2
+        assert orden == ["pdf", "drive"]
+        assert isinstance(grafo.errores["falla"], ZeroDivisionError)
+        assert isinstance(grafo.errores["omitida"].__cause__, ZeroDivisionError)
+
+    def test_unknown_dependency_rejected(self):
+        grafo = GrafoTareas()
+        with pytest.raises(ValueError):
+            grafo.agregar("drive", lambda pdf: None, depende_de=("pdf",))
+
+    def test_duplicate_task_rejected(self):
+        grafo = GrafoTareas()
+        grafo.agregar("pdf", lambda: None)
+        with pytest.raises(ValueError):
+            grafo.agregar("pdf", lambda: None)
@@ -0,0 +1,83 @@
+"""
+Unit tests for modelo_incremental.py - incremental what-if recomputation.
+"""
+import pytest
+
+from src.services.calculator_service import cotizacion
+from src.services.modelo_incremental import ModeloCotizacion, ModeloIncremental
+
+
+@pytest.fixture
+def modelo(small_system_params, default_hsp_medellin):
+    """Modelo de un sistema residencial ya evaluado una vez."""
+    modelo = ModeloCotizacion(**small_system_params, hsp_lista=default_hsp_medellin,
+                              perc_financiamiento=50, tasa_interes_credito=0.12, plazo_credito_años=5)
+    modelo.resultado()
+    return modelo
+
+
+class TestModeloIncremental:
+    """Tests for the generic memoized graph."""
+
+    def test_recomputes_only_downstream_nodes(self):
+        llamadas = []
+        grafo = ModeloIncremental().entrada("a", 1).entrada("b", 2)
+        grafo.nodo("doble_a", lambda a: llamadas.append("doble_a") or 2 * a, ("a",))
+        grafo.nodo("suma", lambda x, b: llamadas.append("suma") or x + b, ("doble_a", "b"))
+
+        assert grafo.obtener("suma") == 4
+        assert grafo.actualizar(b=5) == ["b"]
+        assert grafo.obtener("suma") == 7
+        assert grafo.recalculados == ["suma"]
+        assert llamadas == ["doble_a", "suma", "suma"]
+
+    def test_unchanged_values_do_not_invalidate(self):
+        grafo = ModeloIncremental().entrada("a", 3)
+        grafo.nodo("signo", lambda a: a > 0, ("a",))
+        grafo.nodo("texto", lambda positivo: "+" if positivo else "-", ("signo",))
+        grafo.obtener("texto")
+
+        assert grafo.actualizar(a=3) == []
+        grafo.actualizar(a=7)
+        assert grafo.obtener("texto") == "+"
+        # El signo no cambió, así que el texto no se recalcula
+        assert grafo.recalculados == ["signo"]
+
+    def test_invalid_definitions(self):
+        grafo = ModeloIncremental().entrada("a", 1)
+        with pytest.raises(ValueError):
+            grafo.nodo("b", lambda x: x, ("no_existe",))
+        with pytest.raises(ValueError):
+            grafo.entrada("a", 2)
+        with pytest.raises(KeyError):
+            grafo.actualizar(no_existe=1)
+
+
+class TestModeloCotizacion:
+    """Tests for the quote graph."""
+
+    def test_matches_cotizacion(self, modelo, small_system_params, default_hsp_medellin):
+        esperado = cotizacion(**small_system_params, hsp_lista=default_hsp_medellin,
+                              perc_financiamiento=50, tasa_interes_credito=0.12, plazo_credito_años=5)
+        assert tuple(modelo.resultado()) == tuple(esperado)
+
+    def test_discount_rate_only_touches_npv_and_lcoe(self, modelo):
+        modelo.actualizar(dRate=0.15)
+        modelo.resultado()
+        assert sorted(modelo.recalculados) == ["lcoe", "valor_presente"]
+
+    def test_tariff_and_indexation_skip_generation_and_costs(self, modelo, small_system_params, default_hsp_medellin):
+        modelo.actualizar(costkWh=950, index=0.07)
+        resultado = modelo.resultado()
+        assert not {"generacion_mensual", "inversor", "valor_proyecto_fv", "financiamiento"} & set(modelo.recalculados)
+
+        parametros = dict(small_system_params, costkWh=950, index=0.07)
+        esperado = cotizacion(**parametros, hsp_lista=default_hsp_medellin,
+                              perc_financiamiento=50, tasa_interes_credito=0.12, plazo_credito_años=5)
+        assert tuple(resultado) == tuple(esperado)
+
+    def test_size_change_reprices_the_system(self, modelo):
+        valor_antes = modelo.obtener("valor_proyecto_total")
+        modelo.actualizar(size=8.0, quantity=16)
+        assert modelo.obtener("valor_proyecto_total") > valor_antes
+        assert "valor_proyecto_fv" in modelo.recalculados
@@ -0,0 +1,95 @@
+"""
+Unit tests for motor_vectorizado.py - batched quotes.
+"""
+import numpy as np
+import numpy_financial as npf
+import pytest
+
+from src.services.calculator_service import cotizacion
+from src.services.motor_vectorizado import (
+    cotizacion_vectorizada,
+    payback_vectorizado,
+    tir_vectorizada,
+    vpn_vectorizado,
+)
+
+
+@pytest.fixture
+def lote():
+    """Escenarios variados: tamaños en ambos tramos de la curva de costos, con y sin crédito"""
+    return {
+        "Load": np.array([150.0, 300.0, 3000.5, 800.0, 20000.0]),
+        "size": np.array([2.0, 5.0, 25.0, 80.0, 300.0]),
+        "perc_financiamiento": np.array([0, 60, 30, 100, 0]),
+        "tasa_interes_credito": np.array([0.12, 0.12, 0, 0.2, 0.1]),
+        "plazo_credito_años": np.array([5, 5, 3, 10, 0]),
+    }
+
+
+class TestCotizacionVectorizada:
+    """Tests comparing the batched engine with cotizacion()."""
+
+    @pytest.mark.parametrize("opciones", [
+        {},
+        {"incluir_baterias": True, "costo_kwh_bateria": 1_000_000, "dias_autonomia": 1},
+        {"incluir_beneficios_tributarios": True, "incluir_deduccion_renta": True,
+         "incluir_depreciacion_acelerada": True, "demora_6_meses": True, "horizonte_tiempo": 12},
+        {"custom_params": {"precio_excedentes": 410.0, "tasa_degradacion_anual": 0.004}, "cubierta": "TEJA",
+         "clima": "NUBE"},
+    ])
+    def test_matches_cotizacion(self, lote, default_hsp_medellin, opciones):
+        opciones = dict({"cubierta": "LÁMINA", "clima": "SOL"}, **opciones)
+        vector = cotizacion_vectorizada(lote["Load"], lote["size"], 750, default_hsp_medellin, 0.05, 0.10,
+                                        perc_financiamiento=lote["perc_financiamiento"],
+                                        tasa_interes_credito=lote["tasa_interes_credito"],
+                                        plazo_credito_años=lote["plazo_credito_años"], **opciones)
+        for i in range(len(lote["size"])):
+            esperado = cotizacion(lote["Load"][i], lote["size"][i], 10, opciones["cubierta"], opciones["clima"],
+                                  0.05, 0.10, 750, 615,
+                                  hsp_lista=default_hsp_medellin,
+                                  perc_financiamiento=lote["perc_financiamiento"][i],
+                                  tasa_interes_credito=lote["tasa_interes_credito"][i],
+                                  plazo_credito_años=lote["plazo_credito_años"][i],
+                                  **{k: v for k, v in opciones.items() if k not in ("cubierta", "clima")})
+            assert vector["valor_proyecto_total"][i] == esperado.valor_proyecto_total
+            assert vector["cuota_mensual_credito"][i] == esperado.cuota_mensual_credito
+            np.testing.assert_allclose(vector["generacion_mensual"][i], esperado.generacion_mensual, rtol=1e-12)
+            np.testing.assert_allclose(vector["flujo_caja"][i], esperado.flujo_caja, rtol=1e-10)
+            assert vector["valor_presente"][i] == pytest.approx(esperado.valor_presente, rel=1e-9)
+            np.testing.assert_allclose(vector["tasa_interna"][i], esperado.tasa_interna, rtol=1e-8, equal_nan=True)
+
+    def test_manual_price_and_per_row_assumptions(self, default_hsp_medellin):
+        resultado = cotizacion_vectorizada(500, 5.0, 800, default_hsp_medellin, 0.05, 0.10,
+                                           valor_proyecto=[np.nan, 30_000_000],
+                                           porcentaje_mantenimiento=[0.05, 0.10])
+        calculado = cotizacion(500, 5.0, 10, "LÁMINA", "SOL", 0.05, 0.10, 800, 615, hsp_lista=default_hsp_medellin)
+        assert resultado["valor_proyecto_total"][0] == calculado.valor_proyecto_total
+        assert resultado["valor_proyecto_total"][1] == 30_000_000
+        assert resultado["flujo_caja"][1][1] < resultado["flujo_caja"][0][1]
+
+
+class TestIndicadoresVectorizados:
+    """Tests for the batched NPV, IRR and payback helpers."""
+
+    def test_npv_and_irr_match_numpy_financial(self):
+        flujos = np.array([
+            [-100.0, 30, 40, 50, 60],
+            [-100.0, 0, 0, 0, 0],
+            # Flujo no convencional (varios cambios de signo): se resuelve con npf.irr
+            [-100.0, 230, -132, 0, 0],
+        ])
+        for i, flujo in enumerate(flujos):
+            assert vpn_vectorizado(0.1, flujos)[i] == pytest.approx(npf.npv(0.1, flujo))
+        np.testing.assert_allclose(tir_vectorizada(flujos), [npf.irr(f) for f in flujos], equal_nan=True)
+
+    def test_unique_positive_irr_for_long_monthly_flows(self):
+        # Cuotas mayores que el ahorro al inicio: varios cambios de signo, pero el acumulado cambia una vez
+        flujo = np.concatenate(([-1000.0], np.full(12, -5.0), np.full(228, 20.0)))
+        tasa = tir_vectorizada(flujo, tir_positiva_unica=True, tasa_inicial=0.0)[0]
+        assert vpn_vectorizado(tasa, flujo) == pytest.approx(0, abs=1e-6)
+        assert tasa == pytest.approx(npf.irr(flujo))
+
+    def test_payback_interpolates_the_crossing_year(self):
+        paybacks = payback_vectorizado([[-100.0, 40, 40, 40], [-100.0, 10, 10, 10]])
+        assert paybacks[0] == pytest.approx(2.5)
+        assert np.isnan(paybacks[1])
@@ -0,0 +1,126 @@
+"""
+Tests for the schema-aware Notion CRM client.
+"""
+import datetime
+
+import pytest
+
+from src.services.notion_service import CRMNotion, agregar_cliente_a_notion_crm
+
+
+@pytest.fixture
+def crm(fake_notion):
+    """CRM sobre el cliente de Notion falso"""
+    return CRMNotion(fake_notion, "db-crm")
+
+
+def _registrar(crm, proyecto, nombre="Cliente"):
+    return crm.registrar(nombre, "123", "Calle 1", proyecto, datetime.date(2025, 1, 15))
+
+
+class TestCRMNotion:
+    """Tests for schema caching, filtered lookups and dedupe."""
+
+    def test_lookup_queries_only_the_proposal(self, crm, fake_notion):
+        """A new proposal costs one filtered query and the create; registering it again is one update."""
+        _registrar(crm, "FV25001 - Cliente A")
+        llamadas_iniciales = fake_notion.llamadas
+
+        for numero in range(2, 6):
+            _registrar(crm, f"FV25{numero:03d} - Cliente")
+        _registrar(crm, "FV25005 - Cliente")
+
+        assert llamadas_iniciales == 3
+        assert fake_notion.llamadas - llamadas_iniciales == 4 * 2 + 1
+        assert len(fake_notion.paginas) == 5
+        assert fake_notion.consultas[0] == {"property": "Proyecto", "rich_text": {"contains": "FV25001"}}
+        assert None not in fake_notion.consultas
+
+    def test_names_without_number_dedupe_by_full_name(self, crm, fake_notion):
+        """Mobile proposals have no FV number: each distinct project name gets its own page."""
+        _registrar(crm, "Ana - Rionegro")
+        _registrar(crm, "Luis - Rionegro")
+        _registrar(crm, "Ana - Rionegro 2")
+        assert _registrar(CRMNotion(fake_notion, "db-crm"), "Ana - Rionegro") == "Cliente actualizado en Notion"
+        assert len(fake_notion.paginas) == 3
+
+    def test_longer_number_is_not_taken_for_a_prefix(self, crm, fake_notion):
+        """FV251000 contains FV25100 as text but is a different proposal."""
+        _registrar(crm, "FV251000 - Cliente")
+        assert _registrar(CRMNotion(fake_notion, "db-crm"), "FV25100 - Cliente") == "Cliente agregado a Notion"
+        assert len(fake_notion.paginas) == 2
+
+    def test_status_type_comes_from_schema(self, crm, fake_notion):
+        """A select status column is written as select without a failed status attempt."""
+        fake_notion.acepta_status = False
+        _registrar(crm, "FV25001 - Cliente")
+
+        assert fake_notion.paginas[0]["properties"]["Estado"] == {"select": {"name": "En conversaciones"}}
+        assert fake_notion.llamadas == 3
+
+    def test_same_proposal_updates_existing_page(self, crm, fake_notion):
+        """Registering a proposal number again updates its page instead of duplicating it."""
+        _registrar(crm, "FV25001 - Cliente", nombre="Nombre viejo")
+        mensaje = _registrar(crm, "FV25001 - Cliente", nombre="Nombre nuevo")
+
+        assert mensaje == "Cliente actualizado en Notion"
+        assert len(fake_notion.paginas) == 1
+        assert fake_notion.paginas[0]["properties"]["Name"]["title"][0]["text"]["content"] == "Nombre nuevo"
+
+    def test_lookup_finds_records_from_earlier_processes(self, fake_notion):
+        """Pages created before the process started are found by a new client."""
+        anterior = CRMNotion(fake_notion, "db-crm")
+        for numero in range(1, 151):
+            _registrar(anterior, f"FV25{numero:03d} - Cliente")
+
+        nuevo = CRMNotion(fake_notion, "db-crm")
+        assert _registrar(nuevo, "FV25150 - Cliente") == "Cliente actualizado en Notion"
+        assert len(fake_notion.paginas) == 150
+
+    def test_properties_missing_from_schema_are_skipped(self, crm, monkeypatch):
+        """Configured properties that do not exist in the database are left out."""
+        monkeypatch.setenv("NOTION_PROP_DOCUMENTO", "Cedula")
+        propiedades = crm.propiedades("Cliente", "123", "Calle 1", "FV25001", None, "En conversaciones")
+
+        assert "Cedula" not in propiedades
+        assert "Fecha" not in propiedades
+        assert propiedades["Estado"] == {"status": {"name": "En conversaciones"}}
+
+    def test_data_source_schema_is_supported(self, fake_notion):
+        """With the 2025-09 API the schema and index are read from the database's data source."""
+        bases = fake_notion.databases
+
+        class _FuentesFake:
+            def retrieve(self, data_source_id):
+                return bases.retrieve("db-crm")
+
+            def query(self, data_source_id, **kwargs):
+                return bases.query("db-crm", **kwargs)
+
+        fake_notion.databases = type("BasesSinEsquema", (), {
+            "retrieve": lambda self, database_id: {"id": database_id, "data_sources": [{"id": "ds-1"}]},
+        })()
+        fake_notion.data_sources = _FuentesFake()
+        crm = CRMNotion(fake_notion, "db-crm")
+
+        _registrar(crm, "FV25001 - Cliente")
+        assert _registrar(crm, "FV25001 - Cliente") == "Cliente actualizado en Notion"
+        assert crm.esquema()["Estado"] == "status"
+
+    def test_failed_insert_raises_for_retry(self, crm, fake_notion):
+        """API errors propagate so the background queue can retry."""
+        fake_notion.fallas_pendientes = 1
+        with pytest.raises(ConnectionError):
+            _registrar(crm, "FV25001 - Cliente")
+
+
+class TestAgregarClienteANotionCRM:
+    """Tests for the UI-facing wrapper."""
+
+    def test_disabled_without_credentials(self, monkeypatch):
+        """Without token or database the integration reports it is not configured."""
+        monkeypatch.delenv("NOTION_API_TOKEN", raising=False)
+        monkeypatch.delenv("NOTION_CRM_DATABASE_ID", raising=False)
+
+        assert agregar_cliente_a_notion_crm("Cliente", "123", "Calle 1", "FV25001", None) == \
+            (False, "Integración Notion no configurada")
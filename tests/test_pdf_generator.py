@@ -0,0 +1,118 @@
+"""
+Unit tests for pdf_generator.py - Page-level cache of the proposal PDF.
+"""
+import io
+import datetime
+import pytest
+from PyPDF2 import PdfReader
+
+from src.utils import pdf_generator
+from src.utils.pdf_generator import PropuestaPDF, limpiar_cache_paginas
+
+
+@pytest.fixture
+def datos_propuesta():
+    """Datos mínimos de una propuesta tal como los arma la interfaz."""
+    return {
+        "Tamano del Sistema (kWp)": "5.0",
+        "Cantidad de Paneles": "10 de 500W",
+        "Inversor Recomendado": "1x5kW",
+        "Valor Total del Proyecto (COP)": "$25,000,000",
+        "Valor Sistema FV (sin IVA)": "$23,000,000",
+        "Valor IVA": "$2,000,000",
+        "TIR (Tasa Interna de Retorno)": "18.5%",
+    }
+
+
+@pytest.fixture
+def contador_renders(monkeypatch):
+    """Cuenta qué páginas se renderizan realmente (no salen de la caché)."""
+    limpiar_cache_paginas()
+    renderizadas = []
+    original = PropuestaPDF._renderizar_pagina
+
+    def _espia(self, documento, metodo, args):
+        renderizadas.append(metodo)
+        return original(self, documento, metodo, args)
+
+    monkeypatch.setattr(PropuestaPDF, "_renderizar_pagina", _espia)
+    yield renderizadas
+    limpiar_cache_paginas()
+
+
+def _generar(datos, cliente="Cliente Uno"):
+    pdf = PropuestaPDF(client_name=cliente, direccion="Calle 1", fecha=datetime.date(2025, 1, 15))
+    return pdf.generar(datos, usa_financiamiento=False)
+
+
+class TestCachePaginas:
+    """Tests for the incremental page re-render."""
+
+    def test_page_count_matches_uncached(self, datos_propuesta, contador_renders):
+        """The cached document should have the same pages as the direct render."""
+        con_cache = _generar(datos_propuesta)
+        sin_cache = PropuestaPDF(client_name="Cliente Uno", direccion="Calle 1",
+                                 fecha=datetime.date(2025, 1, 15)).generar(
+            datos_propuesta, usa_financiamiento=False, usar_cache=False)
+        assert len(PdfReader(io.BytesIO(con_cache)).pages) == len(PdfReader(io.BytesIO(sin_cache)).pages)
+
+    def test_fonts_are_loaded_once_per_call(self, datos_propuesta, contador_renders, monkeypatch):
+        """All missing pages are drawn in one document, so the TTF fonts are parsed once."""
+        cargas = []
+        original = PropuestaPDF.add_font
+
+        def _espia_fuente(self, *args, **kwargs):
+            cargas.append(args[:2])
+            return original(self, *args, **kwargs)
+
+        monkeypatch.setattr(PropuestaPDF, "add_font", _espia_fuente)
+        documento = _generar(datos_propuesta)
+        assert len(contador_renders) > 4
+        assert len(cargas) == 4 * 2  # propuesta + documento de renderizado
+        assert len(PdfReader(io.BytesIO(documento)).pages) == len(contador_renders)
+
+    def test_identical_inputs_render_nothing(self, datos_propuesta, contador_renders):
+        """Regenerating with the same inputs should come entirely from cache."""
+        _generar(datos_propuesta)
+        contador_renders.clear()
+        _generar(datos_propuesta)
+        assert contador_renders == []
+
+    def test_client_name_change_only_rerenders_cover(self, datos_propuesta, contador_renders):
+        """Changing the client name only affects the cover page."""
+        _generar(datos_propuesta)
+        contador_renders.clear()
+        _generar(datos_propuesta, cliente="Cliente Dos")
+        assert contador_renders == ["crear_portada"]
+
+    def test_price_change_only_rerenders_cost_pages(self, datos_propuesta, contador_renders):
+        """Changing the price only re-renders the pages that read it."""
+        _generar(datos_propuesta)
+        contador_renders.clear()
+        datos_propuesta["Valor Total del Proyecto (COP)"] = "$30,000,000"
+        _generar(datos_propuesta)
+        assert contador_renders == ["crear_pagina_terminos"]
+
+    def test_cache_is_bounded(self, datos_propuesta, contador_renders, monkeypatch):
+        """The cache should evict old pages beyond its byte budget."""
+        monkeypatch.setattr(pdf_generator, "MAX_BYTES_CACHE_PAGINAS", 1)
+        _generar(datos_propuesta)
+        assert len(pdf_generator._cache_paginas) == 1
+
+    def test_map_image_change_only_rerenders_location(self, datos_propuesta, contador_renders):
+        """The map bytes are part of the location page key; other pages stay cached."""
+        from PIL import Image
+
+        def _imagen(color):
+            salida = io.BytesIO()
+            Image.new("RGB", (60, 40), color).save(salida, format="PNG")
+            return salida.getvalue()
+
+        pdf = PropuestaPDF(client_name="Cliente Uno", direccion="Calle 1", fecha=datetime.date(2025, 1, 15))
+        pdf.generar(datos_propuesta, usa_financiamiento=False, lat=6.2, lon=-75.5, imagen_mapa=_imagen("red"))
+        contador_renders.clear()
+        pdf.generar(datos_propuesta, usa_financiamiento=False, lat=6.2, lon=-75.5, imagen_mapa=_imagen("red"))
+        assert contador_renders == []
+
+        pdf.generar(datos_propuesta, usa_financiamiento=False, lat=6.2, lon=-75.5, imagen_mapa=_imagen("blue"))
+        assert contador_renders == ["crear_pagina_ubicacion"]
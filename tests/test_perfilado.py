@@ -0,0 +1,81 @@
+"""
+Tests for the opt-in report profiling hook.
+"""
+import pstats
+import tracemalloc
+
+import pytest
+
+from src.utils.grafo_tareas import GrafoTareas
+from src.utils.perfilado import perfilar_reporte, perfilado_habilitado, perfiles_recientes
+
+
+def _trabajo():
+    return sum(len(str(i) * 10) for i in range(20000))
+
+
+@pytest.fixture
+def dir_perfiles(tmp_path, monkeypatch):
+    """Directorio temporal para los perfiles"""
+    monkeypatch.setenv("PERFILES_DIR", str(tmp_path))
+    return tmp_path
+
+
+class TestPerfilarReporte:
+    """Tests for perfilar_reporte."""
+
+    def test_inactive_does_nothing(self, dir_perfiles):
+        """With activo=False nothing is profiled or written."""
+        with perfilar_reporte("desktop", activo=False) as perfil:
+            _trabajo()
+        assert not perfil.activo
+        assert list(dir_perfiles.iterdir()) == []
+
+    def test_writes_profile_and_snapshot(self, dir_perfiles):
+        """An active run writes a loadable .prof and tracemalloc snapshot."""
+        with perfilar_reporte("desktop") as perfil:
+            _trabajo()
+
+        assert perfil.activo
+        assert perfil.ruta_perfil.endswith("_desktop.prof")
+        pstats.Stats(perfil.ruta_perfil)
+        tracemalloc.Snapshot.load(perfil.ruta_snapshot)
+        assert not tracemalloc.is_tracing()
+        assert perfiles_recientes()[0] is perfil
+
+    def test_summary_lists_hot_functions_and_lines(self, dir_perfiles):
+        """The summary includes the profiled function and allocating lines."""
+        with perfilar_reporte("mobile") as perfil:
+            _trabajo()
+
+        assert any(f["funcion"] == "_trabajo" for f in perfil.top_funciones)
+        assert perfil.top_lineas
+        assert all(set(l) == {"ubicacion", "kb", "asignaciones"} for l in perfil.top_lineas)
+
+    def test_inline_task_graph_is_profiled(self, dir_perfiles):
+        """Tasks of an inline graph run on the profiled thread and show up in the summary."""
+        with perfilar_reporte("desktop") as perfil:
+            GrafoTareas(en_linea=perfil.activo).agregar("documento", _trabajo).ejecutar()
+
+        stats = pstats.Stats(perfil.ruta_perfil)
+        assert any(funcion == "_trabajo" for _, _, funcion in stats.stats)
+
+    def test_profile_saved_even_if_generation_fails(self, dir_perfiles):
+        """Exceptions propagate and the profile is still written."""
+        with pytest.raises(ValueError):
+            with perfilar_reporte("desktop") as perfil:
+                raise ValueError("fallo")
+        assert perfil.ruta_perfil is not None
+
+
+class TestPerfiladoHabilitado:
+    """Tests for the env flag / UI toggle."""
+
+    @pytest.mark.parametrize("valor,esperado", [("1", True), ("true", True), ("False", False), ("", False)])
+    def test_env_flag(self, monkeypatch, valor, esperado):
+        monkeypatch.setenv("PERFILAR_REPORTES", valor)
+        assert perfilado_habilitado() is esperado
+
+    def test_toggle_overrides_env(self, monkeypatch):
+        monkeypatch.delenv("PERFILAR_REPORTES", raising=False)
+        assert perfilado_habilitado(toggle=True)
@@ -0,0 +1,122 @@
+"""
+Unit tests for planificador_cargadores.py - multi-point EV charging site planner.
+"""
+import itertools
+
+import numpy as np
+import pytest
+
+from src.utils.chargers import calcular_materiales_cargador, cotizacion_cargadores_costos
+from src.utils.planificador_cargadores import (
+    arbol_expansion_minima,
+    costos_cargadores_vectorizado,
+    planificar_sitio,
+    sitios_para_cotizacion,
+)
+
+
+class TestArbolExpansionMinima:
+    """Tests for the shared conduit layout."""
+
+    def test_row_of_chargers_is_a_chain(self):
+        """Chargers in a row are connected one after another, not each to the substation."""
+        padres, longitudes = arbol_expansion_minima([(0, 0), (10, 0), (20, 0), (30, 0)])
+        assert padres.tolist() == [-1, 0, 1, 2]
+        assert longitudes.tolist() == [0, 10, 10, 10]
+
+    def test_total_length_is_minimal(self):
+        """Matches a brute force over every spanning tree of a small set of points."""
+        rng = np.random.default_rng(7)
+        puntos = rng.uniform(0, 50, size=(5, 2))
+        _, longitudes = arbol_expansion_minima(puntos)
+
+        distancia = lambda a, b: float(np.hypot(*(puntos[a] - puntos[b])))
+        mejor = np.inf
+        # Cada nodo distinto de la raíz elige un padre; se descartan las asignaciones con ciclos
+        for padres in itertools.product(range(5), repeat=4):
+            padres = (-1,) + padres
+            if all(_llega_a_raiz(padres, nodo) for nodo in range(1, 5)):
+                mejor = min(mejor, sum(distancia(i, padres[i]) for i in range(1, 5)))
+        assert longitudes.sum() == pytest.approx(mejor)
+
+
+def _llega_a_raiz(padres, nodo):
+    visitados = set()
+    while nodo != 0:
+        if nodo in visitados or padres[nodo] == nodo:
+            return False
+        visitados.add(nodo)
+        nodo = padres[nodo]
+    return True
+
+
+class TestPlanificarSitio:
+    """Tests for batch costing and aggregated materials."""
+
+    def test_vectorized_costs_match_single_quote(self):
+        distancias = [1, 12.5, 40, 100]
+        precios = [None, 3_000_000, None, 0]
+        costos = costos_cargadores_vectorizado(distancias, precios)
+        for i, (d, p) in enumerate(zip(distancias, precios)):
+            iva, diseno, materiales, total, base, subtotal = cotizacion_cargadores_costos(d, p)
+            assert costos["iva"][i] == pytest.approx(iva)
+            assert costos["diseno"][i] == pytest.approx(diseno)
+            assert costos["materiales"][i] == pytest.approx(materiales)
+            assert costos["costo_total"][i] == pytest.approx(total)
+            assert costos["costo_base"][i] == pytest.approx(base)
+            assert costos["subtotal_antes_iva"][i] == pytest.approx(subtotal)
+
+    def test_cable_follows_tree_and_conduit_is_shared(self):
+        plan = planificar_sitio([(10, 0), (20, 0), (30, 0)], subestacion=(0, 0))
+
+        assert plan["recorridos_m"].tolist() == [10, 20, 30]
+        assert plan["canalizacion_m"] == pytest.approx(30)
+        assert plan["canalizacion_individual_m"] == pytest.approx(60)
+        # Cada tramo se reparte entre los puntos que pasan por él
+        np.testing.assert_allclose(plan["canalizacion_asignada_m"], [10 / 3, 10 / 3 + 5, 10 / 3 + 5 + 10])
+        assert plan["canalizacion_asignada_m"].sum() == pytest.approx(plan["canalizacion_m"])
+
+    def test_clustered_site_costs_less_than_individual_quotes(self):
+        """Shared conduit is charged once, so the site is cheaper than quoting each point alone."""
+        puntos = [(10, 0), (10, 10), (10, 20), (10, 30), (10, 40)]
+        plan = planificar_sitio(puntos, subestacion=(0, 0))
+        individual = sum(cotizacion_cargadores_costos(np.hypot(x, y))[3] for x, y in puntos)
+
+        assert plan["canalizacion_m"] == pytest.approx(50)
+        assert plan["totales"]["costo_total"] < individual
+        costo_fijo = 5 * cotizacion_cargadores_costos(0)[3]
+        # Lo que depende de la distancia baja al menos en proporción a la canalización ahorrada
+        assert plan["totales"]["costo_total"] - costo_fijo < (individual - costo_fijo) * 0.8
+
+    def test_single_point_matches_single_quote(self):
+        plan = planificar_sitio([(3, 4)], subestacion=(0, 0))
+        assert plan["totales"]["costo_total"] == pytest.approx(cotizacion_cargadores_costos(5)[3])
+
+    def test_single_point_matches_single_charger_materials(self):
+        plan = planificar_sitio([(0, 17)], subestacion=(0, 0))
+        assert plan["materiales"] == calcular_materiales_cargador(17)
+
+    def test_materials_count_conduit_per_run_and_cable_per_point(self):
+        plan = planificar_sitio([(9, 0), (18, 0)], subestacion=(0, 0))
+        materiales = {item: cantidad for item, cantidad, _ in plan["materiales"]}
+
+        # Dos tramos de 9 m: 3 tubos + 1 por tramo
+        assert materiales["TUBERIA EMT 3/4 Pulg"] == 8
+        # Cable negro: 2 x (recorrido + 3) por punto
+        assert materiales["CABLE 8 AWG NEGRO"] == 2 * (12 + 21)
+        assert materiales["CAJA DEXSON 18X14"] == 2
+
+    def test_fleet_quote_feeds_batch_pdf_generation(self):
+        """Each PDF is priced at the point's share of the site, not at a standalone run."""
+        plan = planificar_sitio([(5, 5), (5, 10)], subestacion=(0, 0))
+        sitios = sitios_para_cotizacion(plan, ["Flota P1", "Flota P2"])
+        assert [s[0] for s in sitios] == ["Flota P1", "Flota P2"]
+        assert [s[1] for s in sitios] == pytest.approx(plan["recorridos_m"].tolist())
+        assert [s[2] for s in sitios] == pytest.approx(plan["costos"]["costo_total"].tolist())
+        assert cotizacion_cargadores_costos(0, sitios[1][2])[3] < cotizacion_cargadores_costos(sitios[1][1])[3]
+
+    def test_invalid_input(self):
+        with pytest.raises(ValueError):
+            planificar_sitio([])
+        with pytest.raises(ValueError):
+            planificar_sitio([(1, 1), (2, 2)], precios_manuales=[None])
@@ -0,0 +1,100 @@
+"""
+Unit tests for puntos_equilibrio.py - break-even and target-return solvers.
+"""
+import numpy as np
+import pytest
+
+from src.services.calculator_service import cotizacion
+from src.services.motor_vectorizado import argumentos_vectorizados, cotizacion_vectorizada
+from src.services.puntos_equilibrio import (
+    MAX_EVALUACIONES,
+    _buscar_limite,
+    precio_maximo_para_payback,
+    precio_maximo_para_tir,
+    tamano_minimo_para_cobertura,
+    tarifa_equilibrio,
+)
+
+
+@pytest.fixture
+def argumentos(medium_system_params, default_hsp_medellin):
+    """Argumentos de cotizacion() para un sistema comercial financiado"""
+    return dict(medium_system_params, hsp_lista=default_hsp_medellin, perc_financiamiento=50,
+                tasa_interes_credito=0.14, plazo_credito_años=7)
+
+
+def _metricas(argumentos, **variantes):
+    return cotizacion_vectorizada(**dict(argumentos_vectorizados(**argumentos), **variantes))
+
+
+class TestBuscarLimite:
+    """Tests for the batched bracketing search."""
+
+    def test_finds_threshold_in_few_evaluations(self):
+        valor, evaluaciones = _buscar_limite(lambda x: x ** 2 <= 2, np.linspace(0, 10, 33), 1e-9)
+        assert valor == pytest.approx(np.sqrt(2), abs=1e-8)
+        assert valor ** 2 <= 2
+        assert evaluaciones <= 7
+
+    def test_condition_above_the_threshold(self):
+        valor, _ = _buscar_limite(lambda x: x >= 3.3, np.linspace(0, 10, 33), 1e-9, cumple_abajo=False)
+        assert valor == pytest.approx(3.3) and valor >= 3.3
+
+    def test_unreachable_and_always_met(self):
+        assert _buscar_limite(lambda x: x < -1, np.linspace(0, 10, 33), 1e-9)[0] is None
+        assert _buscar_limite(lambda x: x < 100, np.linspace(0, 10, 33), 1e-9)[0] == 10
+        assert _buscar_limite(lambda x: x > 100, np.linspace(0, 10, 33), 1e-9, cumple_abajo=False)[0] is None
+
+
+class TestPrecioMaximo:
+    """Tests for the maximum sale price solvers."""
+
+    def test_price_for_target_irr(self, argumentos):
+        resultado = precio_maximo_para_tir(0.18, **argumentos)
+        precio = resultado["valor"]
+        assert resultado["tasa_interna"] >= 0.18
+        assert resultado["evaluaciones"] < MAX_EVALUACIONES
+        # Un peso más ya no cumple (o queda dentro del redondeo)
+        tir_siguiente = _metricas(argumentos, valor_proyecto=precio + 1000)["tasa_interna"][0]
+        assert tir_siguiente < 0.18
+
+    def test_price_for_target_payback(self, argumentos):
+        resultado = precio_maximo_para_payback(6, **argumentos)
+        assert resultado["payback"] <= 6
+        assert _metricas(argumentos, valor_proyecto=resultado["valor"] + 1000)["payback"][0] > 6
+
+    def test_higher_targets_lower_the_price(self, argumentos):
+        assert precio_maximo_para_tir(0.25, **argumentos)["valor"] < precio_maximo_para_tir(0.15, **argumentos)["valor"]
+
+    def test_unreachable_target(self, argumentos):
+        # Ni con un precio 100 veces menor se recupera la inversión en medio día
+        assert precio_maximo_para_payback(0.001, **argumentos) is None
+
+
+class TestTarifaEquilibrio:
+    """Tests for the zero-NPV tariff."""
+
+    def test_npv_is_zero_at_the_tariff(self, argumentos):
+        resultado = tarifa_equilibrio(**argumentos)
+        assert 0 < resultado["valor"] < argumentos["costkWh"]
+        esperado = cotizacion(**dict(argumentos, costkWh=resultado["valor"]))
+        assert esperado.valor_presente == pytest.approx(0, abs=1e-6 * esperado.valor_proyecto_total)
+
+    def test_manual_price_raises_the_break_even(self, argumentos):
+        calculada = tarifa_equilibrio(**argumentos)["valor"]
+        assert tarifa_equilibrio(**argumentos, precio_manual=200_000_000)["valor"] > calculada
+
+
+class TestTamanoMinimo:
+    """Tests for the minimum size for a coverage target."""
+
+    @pytest.mark.parametrize("cobertura", [0.3, 1.0, 1.5])
+    def test_smallest_panel_count(self, argumentos, cobertura):
+        resultado = tamano_minimo_para_cobertura(cobertura, **argumentos)
+        assert resultado["cobertura"] >= cobertura
+        potencia_panel = argumentos["module"] / 1000
+        anterior = cotizacion(**dict(argumentos, size=(resultado["cantidad_paneles"] - 1) * potencia_panel))
+        assert sum(anterior.generacion_mensual) < cobertura * argumentos["Load"] * 12
+
+    def test_zero_load(self, argumentos):
+        assert tamano_minimo_para_cobertura(1.0, **dict(argumentos, Load=0)) is None
@@ -0,0 +1,113 @@
+"""
+Unit tests for resultado_cotizacion.py - typed quotation results and batches.
+"""
+import pickle
+
+import numpy as np
+import pytest
+
+from src.services.calculator_service import cotizacion
+from src.services.resultado_cotizacion import CAMPOS_COTIZACION, LoteCotizaciones, ResultadoCotizacion
+
+
+@pytest.fixture
+def resultado(small_system_params, default_hsp_medellin):
+    """Cotización de un sistema residencial."""
+    return cotizacion(**small_system_params, ciudad="MEDELLIN", hsp_lista=default_hsp_medellin)
+
+
+def _resultado_sintetico(**cambios):
+    campos = dict(
+        valor_proyecto_total=100, size=5.0, monto_a_financiar=0, cuota_mensual_credito=0,
+        desembolso_inicial_cliente=100, flujo_caja=[-100, 30, 40, 50], arboles=1.0,
+        generacion_mensual=[10.0] * 12, valor_presente=5.0, tasa_interna=0.1, cantidad_paneles=10,
+        vida_util=3, recomendacion_inversor="1x5kW", lcoe=200.0, performance_ratio=0.8,
+        hsp_mensual=[4.0] * 12, potencia_ac_inversor=5, ahorro_año1=30.0, area_requerida=30,
+        capacidad_nominal_bateria=0, carbon_data={},
+    )
+    campos.update(cambios)
+    return ResultadoCotizacion(**campos)
+
+
+class TestResultadoCotizacion:
+    """Tests for the slotted, frozen result."""
+
+    def test_unpacks_like_the_legacy_tuple(self, resultado):
+        valores = tuple(resultado)
+        assert len(valores) == 21
+        for campo, valor in zip(CAMPOS_COTIZACION, valores):
+            esperado = getattr(resultado, campo)
+            if isinstance(esperado, np.ndarray):
+                assert isinstance(valor, list) and valor == esperado.tolist()
+            elif campo in ("hsp_mensual", "carbon_data"):
+                assert valor == (list(esperado) if campo == "hsp_mensual" else esperado)
+            else:
+                assert valor is esperado
+        assert resultado[5] == resultado.flujo_caja.tolist()
+        assert resultado[-1] == resultado.carbon_data
+
+    def test_is_frozen_and_arrays_are_read_only(self, resultado):
+        with pytest.raises(AttributeError):
+            resultado.tasa_interna = 1
+        with pytest.raises(AttributeError):
+            resultado.otro_campo = 1
+        with pytest.raises(ValueError):
+            resultado.flujo_caja[0] = 0
+        assert not hasattr(resultado, "__dict__")
+
+    def test_lazy_fields_are_computed_once_on_access(self):
+        llamadas = []
+
+        def _lcoe():
+            llamadas.append(1)
+            return 123.0
+
+        resultado = _resultado_sintetico(lcoe=_lcoe)
+        _ = resultado.valor_presente, resultado.flujo_caja
+        assert llamadas == []
+        assert resultado.lcoe == 123.0
+        assert resultado.lcoe == 123.0
+        assert llamadas == [1]
+
+    def test_carbon_data_reads_are_copies(self):
+        resultado = _resultado_sintetico(carbon_data=lambda: {"annual_co2_avoided_tons": 1.5})
+        resultado.carbon_data["annual_co2_avoided_tons"] = 0
+        assert resultado.carbon_data == {"annual_co2_avoided_tons": 1.5}
+
+    def test_lcoe_is_computed_from_the_quote(self, resultado):
+        assert 100 < resultado.lcoe < 600
+
+    def test_pickle_round_trip(self):
+        resultado = _resultado_sintetico(lcoe=lambda: 7.0)
+        copia = pickle.loads(pickle.dumps(resultado))
+        assert copia.lcoe == 7.0
+        assert tuple(copia) == tuple(resultado)
+
+
+class TestLoteCotizaciones:
+    """Tests for the struct-of-arrays batch."""
+
+    def test_columns_and_matrices(self):
+        lote = LoteCotizaciones.desde_resultados([
+            _resultado_sintetico(),
+            _resultado_sintetico(size=8.0, flujo_caja=[-100, 10, 10]),
+        ])
+        np.testing.assert_array_equal(lote.size, [5.0, 8.0])
+        assert lote.generacion_mensual.shape == (2, 12)
+        assert lote.flujo_caja.shape == (2, 4)
+        assert np.isnan(lote.flujo_caja[1, 3])
+        assert lote.recomendacion_inversor == ["1x5kW", "1x5kW"]
+        assert lote[1].size == 8.0
+
+    def test_payback(self):
+        lote = LoteCotizaciones([
+            _resultado_sintetico(flujo_caja=[-100, 30, 40, 50]),
+            _resultado_sintetico(flujo_caja=[-100, 10, 10]),
+        ])
+        pagos = lote.payback()
+        assert pagos[0] == 3
+        assert np.isnan(pagos[1])
+
+    def test_unknown_field(self):
+        with pytest.raises(AttributeError):
+            LoteCotizaciones([]).no_existe
@@ -0,0 +1,98 @@
+"""
+Unit tests for superficie_respuesta.py - instant sidebar estimates.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from src.services.calculator_service import cotizacion
+from src.services.superficie_respuesta import (
+    CacheSuperficies,
+    clave_superficie,
+    construir_superficie,
+    estimar_resumen,
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Caché de superficies en un directorio temporal"""
+    return CacheSuperficies(directorio=str(tmp_path))
+
+
+def _payback_exacto(flujo_caja):
+    acumulado = np.cumsum(flujo_caja)
+    k = int(np.argmax(acumulado >= 0))
+    return (k - 1) + abs(acumulado[k - 1]) / (acumulado[k] - acumulado[k - 1])
+
+
+class TestEstimarResumen:
+    """Tests comparing the surface estimate with the full quote."""
+
+    @pytest.mark.parametrize("size,Load,costkWh,hsp,perc,cubierta", [
+        (5.0, 500, 850, 4.4, 0, "LÁMINA"),
+        (12.3, 900, 1100, 5.2, 70, "TEJA"),
+        (48.0, 9000, 650, 3.8, 50, "LÁMINA"),
+        (150.0, 8000, 900, 4.5, 0, "LÁMINA"),
+    ])
+    def test_matches_cotizacion_with_flat_hsp(self, cache, size, Load, costkWh, hsp, perc, cubierta):
+        esperado = cotizacion(Load, size, 10, cubierta, "SOL", 0.05, 0.10, costkWh, 615, hsp_lista=[hsp] * 12,
+                              perc_financiamiento=perc, tasa_interes_credito=0.15, plazo_credito_años=5)
+        estimacion = estimar_resumen(size, Load, costkWh, hsp, 0.05, 0.10, cubierta=cubierta,
+                                     perc_financiamiento=perc, tasa_interes_credito=0.15, plazo_credito_años=5,
+                                     cache=cache)
+
+        assert estimacion["generacion_anual"] == pytest.approx(sum(esperado.generacion_mensual), rel=1e-12)
+        assert estimacion["valor_proyecto_total"] == esperado.valor_proyecto_total
+        assert estimacion["valor_presente"] == pytest.approx(esperado.valor_presente, rel=1e-4,
+                                                             abs=1e-5 * esperado.valor_proyecto_total)
+        assert estimacion["tasa_interna"] == pytest.approx(esperado.tasa_interna, abs=1e-5)
+        assert estimacion["payback"] == pytest.approx(_payback_exacto(esperado.flujo_caja), abs=1e-3)
+
+    def test_custom_params_are_applied(self, cache, custom_params_conservative):
+        base = estimar_resumen(10.0, 1000, 850, 4.5, 0.05, 0.10, cache=cache)
+        conservador = estimar_resumen(10.0, 1000, 850, 4.5, 0.05, 0.10, custom_params=custom_params_conservative,
+                                      cache=cache)
+        assert conservador["valor_presente"] != base["valor_presente"]
+
+    def test_invalid_params_raise(self, cache):
+        with pytest.raises(ValueError):
+            estimar_resumen(10.0, 1000, 850, 4.5, 0.05, 0.10, custom_params={"tasa_degradacion_anual": 2}, cache=cache)
+
+
+class TestCacheSuperficies:
+    """Tests for surface storage and invalidation."""
+
+    def test_surface_is_saved_compressed_and_reused(self, tmp_path):
+        cache = CacheSuperficies(directorio=str(tmp_path))
+        superficie = cache.obtener(25)
+        assert cache.obtener(25) is superficie
+        assert len(os.listdir(tmp_path)) == 1
+
+        # Otra instancia (otro proceso) la lee del disco en vez de recalcularla
+        leida = CacheSuperficies(directorio=str(tmp_path)).obtener(25)
+        np.testing.assert_array_equal(leida.autoconsumo, superficie.autoconsumo)
+
+    def test_key_changes_with_params_and_horizon(self):
+        base = clave_superficie(25)
+        assert clave_superficie(25, {}) == base
+        assert clave_superficie(20) != base
+        assert clave_superficie(25, {"tasa_degradacion_anual": 0.01}) != base
+
+    def test_changed_default_params_rebuild_the_surface(self, cache, monkeypatch):
+        from src import config_parametros
+        antes = cache.obtener(25)
+        monkeypatch.setitem(config_parametros.DEFAULT_PARAMS, "tasa_degradacion_anual", 0.009)
+        despues = cache.obtener(25)
+        assert despues is not antes
+        # Con más degradación, el autoconsumo de los últimos años es menor
+        assert despues.autoconsumo[-1].sum() < antes.autoconsumo[-1].sum()
+
+    def test_surface_shape(self):
+        superficie = construir_superficie(10)
+        assert superficie.autoconsumo.shape == superficie.excedentes.shape == (10, len(superficie.cobertura))
+        assert superficie.autoconsumo.dtype == np.float32
+        # Con cobertura 0 no hay ahorro; con cobertura alta todos los meses quedan cubiertos
+        assert superficie.autoconsumo[:, 0].sum() == 0
+        assert superficie.autoconsumo[0, -1] == pytest.approx(12)
@@ -0,0 +1,96 @@
+"""
+Tests for the per-stage timing instrumentation.
+"""
+import json
+import urllib.request
+
+import pytest
+
+from src.utils import telemetria
+from src.utils.telemetria import RegistroTiempos, iniciar_reporte
+
+
+@pytest.fixture
+def registro(tmp_path, monkeypatch):
+    """Registro aislado que escribe el log en un directorio temporal"""
+    monkeypatch.setenv("TIEMPOS_LOG_PATH", str(tmp_path / "tiempos.jsonl"))
+    return RegistroTiempos()
+
+
+class TestReporteTiempos:
+    """Tests for spans recorded within one report."""
+
+    def test_sequential_stages_are_closed_automatically(self, registro):
+        """Starting a stage closes the previous one; exiting closes the last."""
+        with iniciar_reporte("desktop", registro) as reporte:
+            reporte.iniciar_etapa("calculo")
+            reporte.iniciar_etapa("pdf")
+
+        etapas = [e["etapa"] for e in reporte.etapas]
+        assert etapas == ["calculo", "pdf"]
+        assert all(e["ok"] for e in reporte.etapas)
+        assert reporte.duracion_total >= sum(e["segundos"] for e in reporte.etapas)
+
+    def test_failing_stage_is_marked_and_exception_propagates(self, registro):
+        """An exception marks the open stage as failed and is re-raised."""
+        with pytest.raises(RuntimeError):
+            with iniciar_reporte("mobile", registro) as reporte:
+                reporte.iniciar_etapa("drive")
+                raise RuntimeError("sin conexión")
+
+        assert reporte.etapas == [{"etapa": "drive", "segundos": reporte.etapas[0]["segundos"], "ok": False}]
+        assert registro.resumen()[0]["errores"] == 1
+
+    def test_context_manager_stage(self, registro):
+        """reporte.etapa() measures a block."""
+        with iniciar_reporte("desktop", registro) as reporte:
+            with reporte.etapa("contrato"):
+                pass
+        assert reporte.etapas[0]["etapa"] == "contrato"
+
+    def test_report_is_appended_to_json_log(self, registro, tmp_path):
+        """Each finished report writes one JSON line."""
+        for _ in range(2):
+            with iniciar_reporte("desktop", registro) as reporte:
+                reporte.iniciar_etapa("calculo")
+
+        lineas = (tmp_path / "tiempos.jsonl").read_text(encoding="utf-8").splitlines()
+        assert len(lineas) == 2
+        datos = json.loads(lineas[0])
+        assert datos["flujo"] == "desktop"
+        assert datos["etapas"][0]["etapa"] == "calculo"
+
+
+class TestExportacionPrometheus:
+    """Tests for the aggregated Prometheus text output."""
+
+    def test_counters_and_histogram(self, registro):
+        """Observations show up as counter, buckets, sum and count."""
+        registro.observar("desktop", "pdf", 0.2)
+        registro.observar("desktop", "pdf", 3.0, ok=False)
+
+        texto = registro.exportar_prometheus()
+        assert 'calculadora_etapa_total{flujo="desktop",etapa="pdf"} 2' in texto
+        assert 'calculadora_etapa_errores_total{flujo="desktop",etapa="pdf"} 1' in texto
+        assert 'calculadora_etapa_segundos_bucket{flujo="desktop",etapa="pdf",le="0.25"} 1' in texto
+        assert 'calculadora_etapa_segundos_bucket{flujo="desktop",etapa="pdf",le="+Inf"} 2' in texto
+        assert 'calculadora_etapa_segundos_count{flujo="desktop",etapa="pdf"} 2' in texto
+
+    def test_local_endpoint_serves_metrics(self, monkeypatch):
+        """The local HTTP endpoint returns the global registry."""
+        monkeypatch.setattr(telemetria, "_servidor_metricas", None)
+        puerto = telemetria.iniciar_servidor_metricas(puerto=0)
+        try:
+            telemetria.registro_tiempos.observar("test", "endpoint", 0.01)
+            with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/metrics", timeout=5) as resp:
+                cuerpo = resp.read().decode("utf-8")
+            assert 'etapa="endpoint"' in cuerpo
+        finally:
+            telemetria._servidor_metricas.shutdown()
+            telemetria._servidor_metricas.server_close()
+
+    def test_endpoint_disabled_without_port(self, monkeypatch):
+        """Without METRICS_PORT nothing is started."""
+        monkeypatch.delenv("METRICS_PORT", raising=False)
+        monkeypatch.setattr(telemetria, "_servidor_metricas", None)
+        assert telemetria.iniciar_servidor_metricas() is None